@@ -1,2 +1,3 @@
-from ozone.ode_function import ODEFunction
+from ozone.ode_function import ODEFunction, EnsembleODEFunction
 from ozone.ode_integrator import ODEIntegrator
+from ozone.simulation import simulate
@@ -0,0 +1,212 @@
+import numpy as np
+import time
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator
+from ozone.methods_list import family_names, method_families, get_method
+from ozone.utils.suppress_printing import nostdout
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.split_prothero_robinson_func import \
+    SplitProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.two_d_orbit_func import TwoDOrbitFunction
+
+
+formulations = ['time-marching', 'solver-based', 'optimizer-based']
+num_times_list = [100, 1000, 10000]
+
+# The state sizes are multiples of that of the ODE of each family, by integrating ensembles.
+num_members_list = [1, 10]
+
+# The measured phases of each case, in the order in which they run.
+phases = ['setup', 'final_setup', 'run_model', 'compute_totals']
+
+
+def get_case(family_name, formulation, num_times, num_members):
+    """
+    Return the ODE integrator of a benchmark case.
+
+    The method is the second of the family, as in the timing plot. The ODE is the simple
+    nonlinear one, except for the families that require more of the ODE function: the split
+    Prothero--Robinson ODE for IMEX methods, its linear part for exponential methods, and the
+    2-D orbit for symplectic methods.
+
+    Parameters
+    ----------
+    family_name : str
+        The method family, one of family_names.
+    formulation : str
+        The formulation, one of formulations.
+    num_times : int
+        Number of times.
+    num_members : int
+        Number of members integrated as an ensemble; with 1, the ODE is integrated alone.
+
+    Returns
+    -------
+    Group
+        The integrator.
+    str
+        The name of the first state, whose final value is differentiated.
+    int
+        The total state size.
+
+    Raises
+    ------
+    NotImplementedError
+        If the method does not support the formulation.
+    """
+    method_name = method_families[family_name][1]
+    method = get_method(method_name)
+
+    if method.linearly_implicit or method.imex or method.exponential or method.partitioned:
+        if formulation not in ['time-marching', 'fused-time-marching']:
+            raise NotImplementedError('%s does not support %s' % (method_name, formulation))
+
+    static_parameters = None
+    if method.imex:
+        ode_function = SplitProtheroRobinsonODEFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+        static_parameters = {'k': 10.}
+    elif method.exponential:
+        ode_function = SplitProtheroRobinsonODEFunction(split=False)
+        ode_function.set_linear_operator([[-10.]])
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+        static_parameters = {'k': 10.}
+    elif method.partitioned:
+        ode_function = TwoDOrbitFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+    else:
+        ode_function = SimpleNonlinearODEFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+
+    state_name = list(ode_function._states)[0]
+    state_size = num_members * sum(
+        int(np.prod(state['shape'])) for state in ode_function._states.values())
+
+    integrator = ODEIntegrator(ode_function, formulation, method_name,
+        times=np.linspace(t0, t1, num_times), initial_conditions=initial_conditions,
+        static_parameters=static_parameters,
+        num_members=num_members if num_members > 1 else None)
+
+    return integrator, state_name, state_size
+
+
+def get_cases(family_names=family_names, formulations=formulations,
+        num_times_list=num_times_list, num_members_list=num_members_list):
+    """
+    Return the benchmark cases, by default all of them.
+
+    Parameters
+    ----------
+    family_names : list of str
+        The method families.
+    formulations : list of str
+        The formulations.
+    num_times_list : list of int
+        The numbers of times.
+    num_members_list : list of int
+        The numbers of members.
+
+    Returns
+    -------
+    list of tuple
+        The (family_name, formulation, num_times, num_members) of each case.
+    """
+    return [
+        (family_name, formulation, num_times, num_members)
+        for family_name in family_names
+        for formulation in formulations
+        for num_times in num_times_list
+        for num_members in num_members_list]
+
+
+def run_case(family_name, formulation, num_times, num_members):
+    """
+    Run a benchmark case and measure the time of each phase and the peak memory.
+
+    The peak resident set size is that of this process, so each case should run in its own.
+
+    Parameters
+    ----------
+    family_name : str
+        The method family, one of family_names.
+    formulation : str
+        The formulation, one of formulations.
+    num_times : int
+        Number of times.
+    num_members : int
+        Number of members integrated as an ensemble.
+
+    Returns
+    -------
+    dict
+        The case, its method and state size, its status, which is 'ok', 'unsupported', or the
+        error raised, the wall-clock time in seconds of each phase keyed by '<phase>_time',
+        and the peak resident set size in bytes before and after the case, as by get_peak_rss.
+    """
+    result = {
+        'family_name': family_name,
+        'formulation': formulation,
+        'num_times': num_times,
+        'num_members': num_members,
+        'method_name': method_families[family_name][1],
+        'base_rss': get_peak_rss(),
+    }
+
+    try:
+        integrator, state_name, state_size = get_case(
+            family_name, formulation, num_times, num_members)
+    except NotImplementedError:
+        result['status'] = 'unsupported'
+        return result
+
+    result['state_size'] = state_size
+    prob = Problem(integrator)
+
+    phase_functions = {
+        'setup': lambda: prob.setup(check=False, mode='rev'),
+        'final_setup': prob.final_setup,
+        'run_model': prob.run_model,
+        'compute_totals': lambda: prob.compute_totals(
+            of=['state:%s' % state_name], wrt=['initial_condition:%s' % state_name]),
+    }
+
+    try:
+        with nostdout():
+            for phase in phases:
+                start_time = time.time()
+                phase_functions[phase]()
+                result['%s_time' % phase] = time.time() - start_time
+    except Exception as error:
+        result['status'] = '%s: %s' % (type(error).__name__, error)
+    else:
+        result['status'] = 'ok'
+
+    result['peak_rss'] = get_peak_rss()
+
+    return result
+
+
+def get_peak_rss():
+    """
+    Return the peak resident set size of this process.
+
+    Returns
+    -------
+    int or None
+        The peak resident set size in bytes, or None where the resource module is unavailable.
+    """
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # It is in bytes on macOS and in kilobytes elsewhere.
+    return peak_rss if sys.platform == 'darwin' else 1024 * peak_rss
@@ -0,0 +1,88 @@
+"""
+Benchmark suites in the format of airspeed velocity (asv), one per measured phase.
+
+The suites are parameterized by the cases of ozone.benchmarks.cases; asv skips the cases whose
+method does not support the formulation. asv runs each phase after the previous ones in setup,
+and measures the peak memory of a whole case with peakmem_case.
+"""
+from openmdao.api import Problem
+
+from ozone.benchmarks.cases import get_case, formulations, num_times_list, num_members_list
+from ozone.methods_list import family_names
+from ozone.utils.suppress_printing import nostdout
+
+
+class _IntegratorSuite(object):
+
+    params = [family_names, formulations, num_times_list, num_members_list]
+    param_names = ['family_name', 'formulation', 'num_times', 'num_members']
+    number = 1
+    timeout = 3600
+
+    # The phases run in setup, before the measured one.
+    setup_phases = []
+
+    def setup(self, family_name, formulation, num_times, num_members):
+        integrator, state_name, state_size = get_case(
+            family_name, formulation, num_times, num_members)
+
+        self.prob = Problem(integrator)
+        self.of = ['state:%s' % state_name]
+        self.wrt = ['initial_condition:%s' % state_name]
+
+        with nostdout():
+            for phase in self.setup_phases:
+                getattr(self, 'run_' + phase)()
+
+    def run_setup(self):
+        self.prob.setup(check=False, mode='rev')
+
+    def run_final_setup(self):
+        self.prob.final_setup()
+
+    def run_run_model(self):
+        self.prob.run_model()
+
+    def run_compute_totals(self):
+        self.prob.compute_totals(of=self.of, wrt=self.wrt)
+
+
+class SetupSuite(_IntegratorSuite):
+
+    def time_setup(self, *params):
+        with nostdout():
+            self.run_setup()
+
+    def peakmem_case(self, *params):
+        with nostdout():
+            self.run_setup()
+            self.run_final_setup()
+            self.run_run_model()
+            self.run_compute_totals()
+
+
+class FinalSetupSuite(_IntegratorSuite):
+
+    setup_phases = ['setup']
+
+    def time_final_setup(self, *params):
+        with nostdout():
+            self.run_final_setup()
+
+
+class RunModelSuite(_IntegratorSuite):
+
+    setup_phases = ['setup', 'final_setup']
+
+    def time_run_model(self, *params):
+        with nostdout():
+            self.run_run_model()
+
+
+class ComputeTotalsSuite(_IntegratorSuite):
+
+    setup_phases = ['setup', 'final_setup', 'run_model']
+
+    def time_compute_totals(self, *params):
+        with nostdout():
+            self.run_compute_totals()
@@ -0,0 +1,97 @@
+"""
+Run the benchmark cases and write their results to a JSON file.
+
+Each case runs in a new worker process, one at a time, so that the peak memory is that of the
+case and the timings do not contend. For example, to compare two releases on the small cases:
+
+    python -m ozone.benchmarks.run --num-times 100 1000 --label 0.1 -o results.json
+"""
+import argparse
+import datetime
+import json
+import platform
+
+import numpy as np
+import scipy
+import openmdao
+
+from ozone.benchmarks.cases import get_cases, run_case, formulations, num_times_list, \
+    num_members_list
+from ozone.methods_list import family_names
+from ozone.utils.run_utils import get_context
+
+
+def run_benchmarks(cases, label=None, verbose=False):
+    """
+    Run the benchmark cases, each in a new process.
+
+    Parameters
+    ----------
+    cases : list of tuple
+        The (family_name, formulation, num_times, num_members) of each case.
+    label : str or None
+        Label of the results, e.g., the release.
+    verbose : bool
+        Whether to print the results of each case.
+
+    Returns
+    -------
+    dict
+        The label, the date, the platform and the versions of Python, NumPy, SciPy, and
+        OpenMDAO, and the results of the cases as returned by run_case.
+    """
+    results = []
+
+    pool = get_context().Pool(1, maxtasksperchild=1)
+    try:
+        for result in pool.imap(_run_case, cases, chunksize=1):
+            results.append(result)
+
+            if verbose:
+                print('%s %s %s %s: %s' % (result['family_name'], result['formulation'],
+                    result['num_times'], result['num_members'], result['status']))
+    finally:
+        pool.close()
+        pool.join()
+
+    return {
+        'label': label,
+        'date': datetime.datetime.now().isoformat(),
+        'platform': platform.platform(),
+        'versions': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'openmdao': openmdao.__version__,
+        },
+        'results': results,
+    }
+
+
+def _run_case(case):
+    return run_case(*case)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Run the ozone benchmarks.')
+    parser.add_argument('-o', '--output', default='benchmarks.json',
+        help='the JSON file to which the results are written')
+    parser.add_argument('--label', default=None, help='label of the results, e.g., the release')
+    parser.add_argument('--families', nargs='+', default=family_names, choices=family_names)
+    parser.add_argument('--formulations', nargs='+', default=formulations,
+        choices=formulations)
+    parser.add_argument('--num-times', nargs='+', type=int, default=num_times_list)
+    parser.add_argument('--num-members', nargs='+', type=int, default=num_members_list)
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(args)
+
+    cases = get_cases(args.families, args.formulations, args.num_times, args.num_members)
+
+    benchmarks = run_benchmarks(cases, label=args.label, verbose=args.verbose)
+
+    with open(args.output, 'w') as f:
+        json.dump(benchmarks, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
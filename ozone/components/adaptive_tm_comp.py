@@ -0,0 +1,366 @@
+import numpy as np
+from six import iteritems
+import scipy.sparse
+
+from openmdao.api import ExplicitComponent, AnalysisError
+
+from ozone.utils.var_names import get_name
+from ozone.utils.glm_stepper import GLMStepper
+from ozone.utils.ensemble_stepper import get_stepper
+from ozone.utils.sparse_linear_spline import get_sparse_linear_spline
+
+
+class AdaptiveTMComp(ExplicitComponent):
+    """
+    March an embedded Runge--Kutta method with step sizes chosen from an error tolerance.
+
+    The steps are taken between the output times, and each output time is hit exactly.
+    A step is accepted if the RMS norm of the local error estimate, scaled by
+    atol + rtol * |y|, is at most 1, and the next step size is the current one times
+    safety * err ** (-1 / (q + 1)), limited to [min_factor, max_factor], where q is the
+    lower of the two orders of the pair. Dynamic parameters are linearly interpolated from
+    all_norm_times to the stage times of the accepted steps.
+
+    The derivatives are those of the accepted steps, with the step sizes frozen as fractions
+    of the time interval; they are applied as tangent and adjoint sweeps.
+    """
+
+    def initialize(self):
+        self.options.declare('ode_function')
+        self.options.declare('time_units', types=str, allow_none=True)
+        self.options.declare('normalized_times', types=np.ndarray)
+        self.options.declare('all_norm_times', types=np.ndarray)
+        self.options.declare('glm_A', types=np.ndarray)
+        self.options.declare('glm_U', types=np.ndarray)
+        self.options.declare('glm_B', types=np.ndarray)
+        self.options.declare('glm_V', types=np.ndarray)
+        self.options.declare('abscissa', types=np.ndarray)
+        self.options.declare('error_weights', types=np.ndarray)
+        self.options.declare('error_order', types=int)
+        self.options.declare('explicit', types=bool, default=True)
+        self.options.declare('atol', types=float, default=1e-6)
+        self.options.declare('rtol', types=float, default=1e-6)
+        self.options.declare('initial_step', types=float, allow_none=True, default=None)
+        self.options.declare('max_num_steps', types=int, default=100000)
+        self.options.declare('safety', types=float, default=0.9)
+        self.options.declare('min_factor', types=float, default=0.2)
+        self.options.declare('max_factor', types=float, default=5.0)
+
+    def setup(self):
+        ode_function = self.options['ode_function']
+        time_units = self.options['time_units']
+        num_times = len(self.options['normalized_times'])
+        num_all_times = len(self.options['all_norm_times'])
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+
+        self._setup_stepper()
+
+        self.step_times = np.zeros(0)
+        self.step_sizes = np.zeros(0)
+        self.num_rejected = 0
+
+        self.add_input('initial_time', units=time_units)
+        self.add_input('final_time', units=time_units)
+
+        for state_name, state in iteritems(states):
+            self.add_input(get_name('y0', state_name),
+                shape=(1,) + state['shape'],
+                units=state['units'])
+
+            self.add_output(get_name('y', state_name),
+                shape=(num_times, 1,) + state['shape'],
+                units=state['units'])
+
+        for parameter_name, parameter in iteritems(static_parameters):
+            self.add_input(get_name('static_parameter', parameter_name),
+                shape=parameter['shape'],
+                units=parameter['units'])
+
+        for parameter_name, parameter in iteritems(dynamic_parameters):
+            self.add_input(get_name('dynamic_parameter', parameter_name),
+                shape=(num_all_times,) + parameter['shape'],
+                units=parameter['units'])
+
+    def _setup_stepper(self):
+        assert self.options['glm_V'].shape == (1, 1), \
+            'Adaptive time-marching requires a one-step method'
+
+        self.stepper = get_stepper(self.options['ode_function'], GLMStepper,
+            self.options['glm_A'], self.options['glm_U'],
+            self.options['glm_B'], self.options['glm_V'],
+            explicit=self.options['explicit'])
+        self.ode_step = self.stepper.ode_step
+
+    def _set_steps(self, step_norm_times, step_norm_sizes, Y, F, output_steps):
+        # Accepted steps, with their start times and sizes normalized to [initial_time, final_time].
+        num_stages = self.stepper.num_stages
+        n = self.ode_step.state_size
+
+        self.step_norm_times = np.array(step_norm_times)
+        self.step_norm_sizes = np.array(step_norm_sizes)
+        self.Y = np.array(Y).reshape((-1, num_stages, n))
+        self.F = np.array(F).reshape((-1, num_stages, n))
+        self.output_steps = output_steps
+
+        self.stage_norm_times = (self.step_norm_times[:, None]
+            + np.outer(self.step_norm_sizes, self.options['abscissa']))
+
+        all_norm_times = self.options['all_norm_times']
+        num_stage_times = self.stage_norm_times.size
+        if num_stage_times > 0:
+            data, rows, cols = get_sparse_linear_spline(all_norm_times,
+                np.clip(self.stage_norm_times.flatten(), all_norm_times[0], all_norm_times[-1]))
+        else:
+            data, rows, cols = np.zeros(0), np.zeros(0, int), np.zeros(0, int)
+        self.dynamic_mtx = scipy.sparse.csr_matrix((data, (rows, cols)),
+            shape=(num_stage_times, len(all_norm_times)))
+
+    def _unpack_inputs(self, inputs):
+        # Variables missing from the vector (e.g., irrelevant d_inputs) are treated as zero.
+        evaluator = self.ode_step
+
+        t0 = inputs['initial_time'][0] if 'initial_time' in inputs else 0.
+        t1 = inputs['final_time'][0] if 'final_time' in inputs else 0.
+
+        y0 = np.zeros((1, evaluator.state_size))
+        for state_name, state_slice in iteritems(evaluator.state_slices):
+            name = get_name('y0', state_name)
+            if name in inputs:
+                y0[:, state_slice] = inputs[name].reshape((1, -1))
+
+        static = np.zeros(evaluator.static_size)
+        for parameter_name, parameter_slice in iteritems(evaluator.static_slices):
+            name = get_name('static_parameter', parameter_name)
+            if name in inputs:
+                static[parameter_slice] = inputs[name].flatten()
+
+        dynamic = np.zeros((len(self.options['all_norm_times']), evaluator.dynamic_size))
+        for parameter_name, parameter_slice in iteritems(evaluator.dynamic_slices):
+            name = get_name('dynamic_parameter', parameter_name)
+            if name in inputs:
+                dynamic[:, parameter_slice] = inputs[name].reshape((dynamic.shape[0], -1))
+
+        return t0, t1, y0, static, dynamic
+
+    def _interpolate_dynamic(self, norm_times, dynamic):
+        all_norm_times = self.options['all_norm_times']
+        stage_dynamic = np.zeros((len(norm_times), dynamic.shape[1]))
+        for index in range(dynamic.shape[1]):
+            stage_dynamic[:, index] = np.interp(norm_times, all_norm_times, dynamic[:, index])
+        return stage_dynamic
+
+    def _get_initial_step(self, t0, t1, y0, static, dynamic):
+        # Initial step estimate of Hairer, Norsett, and Wanner, without the second evaluation.
+        normalized_times = self.options['normalized_times']
+        atol = self.options['atol']
+        rtol = self.options['rtol']
+        initial_step = self.options['initial_step']
+
+        if initial_step is not None:
+            return initial_step
+
+        t_start = t0 + normalized_times[0] * (t1 - t0)
+        t_end = t0 + normalized_times[-1] * (t1 - t0)
+
+        evaluator = self.ode_step
+        evaluator.set_inputs(y0, t=np.array([t_start]), static=static,
+            dynamic=self._interpolate_dynamic(normalized_times[:1], dynamic))
+        f0 = evaluator.compute()
+
+        scale = atol + rtol * np.abs(y0)
+        d0 = np.sqrt(np.mean((y0 / scale) ** 2))
+        d1 = np.sqrt(np.mean((f0 / scale) ** 2))
+
+        if d0 < 1e-5 or d1 < 1e-5:
+            return 1e-6 * abs(t_end - t_start)
+        return min(0.01 * d0 / d1, abs(t_end - t_start))
+
+    def compute(self, inputs, outputs):
+        normalized_times = self.options['normalized_times']
+        error_weights = self.options['error_weights']
+        error_order = self.options['error_order']
+        abscissa = self.options['abscissa']
+        atol = self.options['atol']
+        rtol = self.options['rtol']
+        max_num_steps = self.options['max_num_steps']
+        safety = self.options['safety']
+        min_factor = self.options['min_factor']
+        max_factor = self.options['max_factor']
+
+        t0, t1, y0, static, dynamic = self._unpack_inputs(inputs)
+
+        num_stages = self.stepper.num_stages
+        n = self.ode_step.state_size
+        num_times = len(normalized_times)
+        span = t1 - t0
+
+        out_times = t0 + normalized_times * span
+        y_out = np.zeros((num_times, 1, n))
+        output_steps = np.zeros(num_times, int)
+
+        step_norm_times, step_norm_sizes, Y_list, F_list = [], [], [], []
+        Y = np.zeros((num_stages, n))
+        F = np.zeros((num_stages, n))
+
+        h_next = self._get_initial_step(t0, t1, y0, static, dynamic)
+        num_attempts = 0
+        self.num_rejected = 0
+
+        y_out[0] = y0
+        y_step = y0
+        for i_time in range(num_times - 1):
+            t = out_times[i_time]
+            t_end = out_times[i_time + 1]
+
+            while t < t_end:
+                num_attempts += 1
+                if num_attempts > max_num_steps:
+                    raise AnalysisError('Adaptive time-marching exceeded %i steps' % max_num_steps)
+
+                is_last = h_next >= t_end - t
+                h = t_end - t if is_last else h_next
+
+                norm_stage_times = (t - t0 + h * abscissa) / span
+                y_new = self.stepper.compute_step(y_step, h, t + h * abscissa, static,
+                    self._interpolate_dynamic(norm_stage_times, dynamic), Y, F)
+
+                scale = atol + rtol * np.maximum(np.abs(y_step), np.abs(y_new))
+                error = np.sqrt(np.mean((h * error_weights.dot(F) / scale) ** 2))
+
+                if error == 0.:
+                    factor = max_factor
+                else:
+                    factor = min(max_factor,
+                        max(min_factor, safety * error ** (-1. / (error_order + 1))))
+
+                if error <= 1.:
+                    step_norm_times.append((t - t0) / span)
+                    step_norm_sizes.append(h / span)
+                    Y_list.append(Y.copy())
+                    F_list.append(F.copy())
+
+                    t = t_end if is_last else t + h
+                    y_step = y_new
+                    # A step shortened to hit an output time does not limit the next one.
+                    h_next = max(h_next, h * factor) if is_last else h * factor
+                else:
+                    self.num_rejected += 1
+                    h_next = h * min(1., factor)
+
+            y_out[i_time + 1] = y_step
+            output_steps[i_time + 1] = len(step_norm_times)
+
+        self._set_steps(step_norm_times, step_norm_sizes, Y_list, F_list, output_steps)
+        self.step_times = t0 + self.step_norm_times * span
+        self.step_sizes = self.step_norm_sizes * span
+
+        for state_name, state_slice in iteritems(self.ode_step.state_slices):
+            y_name = get_name('y', state_name)
+            outputs[y_name] = y_out[:, :, state_slice].reshape(outputs[y_name].shape)
+
+    def compute_partials(self, inputs, partials):
+        t0, t1, y0, static, dynamic = self._unpack_inputs(inputs)
+
+        num_steps = len(self.step_norm_times)
+        stage_dynamic = self.dynamic_mtx.dot(dynamic).reshape(
+            (num_steps, self.stepper.num_stages, -1))
+
+        self.jacobians = []
+        for i_step in range(num_steps):
+            self.jacobians.append(self.stepper.linearize_step(self.Y[i_step],
+                self.step_norm_sizes[i_step] * (t1 - t0),
+                t0 + self.stage_norm_times[i_step] * (t1 - t0), static, stage_dynamic[i_step]))
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        evaluator = self.ode_step
+        n = evaluator.state_size
+
+        y_names = [get_name('y', state_name) for state_name in evaluator.state_slices]
+        if not any(y_name in d_outputs for y_name in y_names):
+            return
+
+        t0, t1, y0, static, dynamic = self._unpack_inputs(inputs)
+
+        num_steps = len(self.step_norm_times)
+        num_stages = self.stepper.num_stages
+        h_vec = self.step_norm_sizes * (t1 - t0)
+
+        if mode == 'fwd':
+            d_t0, d_t1, d_y0, d_static, d_dynamic = self._unpack_inputs(d_inputs)
+
+            d_stage_dynamic = self.dynamic_mtx.dot(d_dynamic).reshape(
+                (num_steps, num_stages, -1))
+
+            d_y = np.zeros((num_steps + 1, 1, n))
+            d_y[0] = d_y0
+            for i_step in range(num_steps):
+                d_h = self.step_norm_sizes[i_step] * (d_t1 - d_t0)
+                d_stage_times = d_t0 + self.stage_norm_times[i_step] * (d_t1 - d_t0)
+
+                d_y[i_step + 1] = self.stepper.tangent_step(d_y[i_step],
+                    h_vec[i_step], d_h, self.F[i_step], self.jacobians[i_step],
+                    d_stage_times, d_static, d_stage_dynamic[i_step])
+
+            d_y_out = d_y[self.output_steps]
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    d_outputs[y_name] += d_y_out[:, :, state_slice].reshape(
+                        d_outputs[y_name].shape)
+
+        elif mode == 'rev':
+            # b_ denotes the adjoint (reverse-mode seed) of a variable.
+            b_y_out = np.zeros((len(self.output_steps), 1, n))
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    b_y_out[:, :, state_slice] = d_outputs[y_name].reshape(
+                        (len(self.output_steps), 1, -1))
+
+            b_y_steps = np.zeros((num_steps + 1, 1, n))
+            np.add.at(b_y_steps, self.output_steps, b_y_out)
+
+            b_t0 = 0.
+            b_t1 = 0.
+            b_static = np.zeros(evaluator.static_size)
+            b_stage_dynamic = np.zeros((num_steps, num_stages, evaluator.dynamic_size))
+
+            b_y = b_y_steps[num_steps]
+            for i_step in range(num_steps - 1, -1, -1):
+                b_y_old, b_h, b_t, b_s, b_d = self.stepper.adjoint_step(
+                    b_y, h_vec[i_step], self.F[i_step], self.jacobians[i_step])
+
+                stage_norm_times = self.stage_norm_times[i_step]
+                b_t0 += -self.step_norm_sizes[i_step] * b_h + np.sum((1 - stage_norm_times) * b_t)
+                b_t1 += self.step_norm_sizes[i_step] * b_h + np.sum(stage_norm_times * b_t)
+                b_static += b_s
+                b_stage_dynamic[i_step] = b_d
+
+                b_y = b_y_old + b_y_steps[i_step]
+
+            b_dynamic = self.dynamic_mtx.T.dot(
+                b_stage_dynamic.reshape((num_steps * num_stages, -1)))
+
+            if 'initial_time' in d_inputs:
+                d_inputs['initial_time'] += b_t0
+            if 'final_time' in d_inputs:
+                d_inputs['final_time'] += b_t1
+
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y0_name = get_name('y0', state_name)
+                if y0_name in d_inputs:
+                    d_inputs[y0_name] += b_y[:, state_slice].reshape(d_inputs[y0_name].shape)
+
+            for parameter_name, parameter_slice in iteritems(evaluator.static_slices):
+                name = get_name('static_parameter', parameter_name)
+                if name in d_inputs:
+                    d_inputs[name] += b_static[parameter_slice].reshape(d_inputs[name].shape)
+
+            for parameter_name, parameter_slice in iteritems(evaluator.dynamic_slices):
+                name = get_name('dynamic_parameter', parameter_name)
+                if name in d_inputs:
+                    d_inputs[name] += b_dynamic[:, parameter_slice].reshape(
+                        d_inputs[name].shape)
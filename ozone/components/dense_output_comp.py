@@ -0,0 +1,321 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import ExplicitComponent
+
+from ozone.utils.var_names import get_name
+from ozone.utils.units import get_rate_units
+from ozone.utils.ode_evaluator import ODEEvaluator
+
+
+class DenseOutputComp(ExplicitComponent):
+    """
+    Evaluate the states at output times between the integration times.
+
+    On each interval [t_i, t_i+1] of the integration times, the states are interpolated with the
+    cubic Hermite polynomial of the states and their derivatives at both ends. Its error is
+    O(h^4) for every method, so the states at the output times are at most fourth-order accurate
+    even with methods of a higher order, e.g., RK6 or GaussLegendre6, whose error at the
+    integration times is smaller.
+
+    If endpoint_rates is True, the derivatives at both ends of each interval are inputs, which
+    the integrator connects from the stage derivatives of the step when the method has stages at
+    both ends of its steps, as the FSAL, Lobatto IIIA, and ESDIRK methods do. Otherwise, they are
+    computed with one vectorized evaluation of the ODE at the integration times.
+
+    The output times are given normalized like the integration times, so they are at fixed
+    fractions of their intervals, and each output only depends on the two ends of its interval.
+    """
+
+    def initialize(self):
+        self.options.declare('ode_function')
+        self.options.declare('time_units', types=str, allow_none=True)
+        self.options.declare('normalized_times', types=np.ndarray)
+        self.options.declare('normalized_output_times', types=np.ndarray)
+        self.options.declare('endpoint_rates', default=False, types=bool)
+
+    def setup(self):
+        ode_function = self.options['ode_function']
+        time_units = self.options['time_units']
+        normalized_times = self.options['normalized_times']
+        normalized_output_times = self.options['normalized_output_times']
+
+        num_times = len(normalized_times)
+        num_output_times = len(normalized_output_times)
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+
+        intervals, theta = get_intervals(normalized_times, normalized_output_times)
+        self.intervals = intervals
+
+        # Hermite basis polynomials; the values at both ends and the derivatives at both ends.
+        self.weights = np.array([
+            (1. + 2. * theta) * (1. - theta) ** 2,
+            theta * (1. - theta) ** 2,
+            theta ** 2 * (3. - 2. * theta),
+            theta ** 2 * (theta - 1.),
+        ])
+
+        self.add_input('times', shape=num_times, units=time_units)
+
+        for state_name, state in iteritems(states):
+            self.add_input(get_name('state', state_name),
+                shape=(num_times,) + state['shape'],
+                units=state['units'])
+
+            self.add_output(get_name('state_at', state_name),
+                shape=(num_output_times,) + state['shape'],
+                units=state['units'])
+
+        nodes = np.array([intervals, intervals + 1]).T
+
+        if self.options['endpoint_rates']:
+            self._setup_endpoint_rates(nodes)
+            return
+
+        self.ode_nodes = evaluator = ODEEvaluator(ode_function, num_times)
+
+        for parameter_name, parameter in iteritems(static_parameters):
+            self.add_input(get_name('static_parameter', parameter_name),
+                shape=parameter['shape'],
+                units=parameter['units'])
+
+        for parameter_name, parameter in iteritems(dynamic_parameters):
+            self.add_input(get_name('dynamic_parameter', parameter_name),
+                shape=(num_times,) + parameter['shape'],
+                units=parameter['units'])
+
+        # Each output depends on the two ends of its interval: on all the states there, through
+        # the derivatives, and on the static parameters.
+        for state_name, of_slice in iteritems(evaluator.state_slices):
+            of_name = get_name('state_at', state_name)
+            of_size = of_slice.stop - of_slice.start
+
+            for name, wrt_slice in iteritems(evaluator.state_slices):
+                wrt_size = wrt_slice.stop - wrt_slice.start
+                rows, cols = self._get_pattern(nodes, of_size, wrt_size)
+                self.declare_partials(of_name, get_name('state', name), rows=rows, cols=cols)
+
+            rows, cols = self._get_pattern(nodes, of_size, 1)
+            self.declare_partials(of_name, 'times', rows=rows, cols=cols)
+
+            for name, wrt_slice in iteritems(evaluator.static_slices):
+                wrt_size = wrt_slice.stop - wrt_slice.start
+                rows, cols = self._get_pattern(np.zeros((num_output_times, 1), int),
+                    of_size, wrt_size)
+                self.declare_partials(of_name, get_name('static_parameter', name),
+                    rows=rows, cols=cols)
+
+            for name, wrt_slice in iteritems(evaluator.dynamic_slices):
+                wrt_size = wrt_slice.stop - wrt_slice.start
+                rows, cols = self._get_pattern(nodes, of_size, wrt_size)
+                self.declare_partials(of_name, get_name('dynamic_parameter', name),
+                    rows=rows, cols=cols)
+
+    def _setup_endpoint_rates(self, nodes):
+        # Add the derivatives at the ends of the intervals that contain output times as inputs.
+        ode_function = self.options['ode_function']
+        time_units = self.options['time_units']
+        intervals = self.intervals
+        w00, w10, w01, w11 = self.weights
+
+        for state_name, state in iteritems(ode_function._states):
+            size = np.prod(state['shape'])
+            arange = np.arange(size)
+            of_name = get_name('state_at', state_name)
+
+            for i_step in np.unique(intervals):
+                for rate_type in ['F_start', 'F_end']:
+                    rate_name = get_name(rate_type, state_name, i_step=i_step)
+                    self.add_input(rate_name, shape=state['shape'],
+                        units=get_rate_units(state['units'], time_units))
+
+                    outputs = np.where(intervals == i_step)[0]
+                    rows = (outputs[:, None] * size + arange).flatten()
+                    cols = np.tile(arange, len(outputs))
+                    self.declare_partials(of_name, rate_name, rows=rows, cols=cols)
+
+            # The output is linear in the states at both ends, with constant weights.
+            shape = (len(intervals), 2, size)
+            rows = (np.arange(len(intervals))[:, None, None] * size + arange) * np.ones(shape, int)
+            cols = nodes[:, :, None] * size + arange
+            val = np.array([w00, w01]).T[:, :, None] * np.ones(shape)
+            self.declare_partials(of_name, get_name('state', state_name),
+                rows=rows.flatten(), cols=cols.flatten(), val=val.flatten())
+
+            rows, cols = self._get_pattern(nodes, size, 1)
+            self.declare_partials(of_name, 'times', rows=rows, cols=cols)
+
+    def _get_endpoint_rates(self, inputs, state_name):
+        # The derivatives at both ends of the interval of each output time.
+        return [
+            np.array([inputs[get_name(rate_type, state_name, i_step=i_step)].flatten()
+                for i_step in self.intervals])
+            for rate_type in ['F_start', 'F_end']]
+
+    def _get_pattern(self, nodes, of_size, wrt_size):
+        # Rows and columns of the blocks of the outputs with the variables at the given nodes.
+        num_output_times, num_nodes = nodes.shape
+        shape = (num_output_times, of_size, num_nodes, wrt_size)
+
+        rows =(np.arange(num_output_times)[:, None, None, None] * of_size
+            + np.arange(of_size)[None, :, None, None]) * np.ones(shape, int)
+        cols = (nodes[:, None, :, None] * wrt_size
+            + np.arange(wrt_size)[None, None, None, :]) * np.ones(shape, int)
+
+        return rows.flatten(), cols.flatten()
+
+    def _evaluate(self, inputs):
+        # Pack the inputs and evaluate the ODE at the integration times.
+        evaluator = self.ode_nodes
+        num_times = evaluator.num_nodes
+
+        y = np.zeros((num_times, evaluator.state_size))
+        for state_name, state_slice in iteritems(evaluator.state_slices):
+            y[:, state_slice] = inputs[get_name('state', state_name)].reshape((num_times, -1))
+
+        static = np.zeros(evaluator.static_size)
+        for parameter_name, parameter_slice in iteritems(evaluator.static_slices):
+            static[parameter_slice] = inputs[get_name('static_parameter', parameter_name)].flatten()
+
+        dynamic = np.zeros((num_times, evaluator.dynamic_size))
+        for parameter_name, parameter_slice in iteritems(evaluator.dynamic_slices):
+            dynamic[:, parameter_slice] = \
+                inputs[get_name('dynamic_parameter', parameter_name)].reshape((num_times, -1))
+
+        evaluator.set_inputs(y, t=inputs['times'], static=static, dynamic=dynamic)
+
+        return y, evaluator.compute()
+
+    def compute(self, inputs, outputs):
+        ode_function = self.options['ode_function']
+        intervals = self.intervals
+        w00, w10, w01, w11 = self.weights
+
+        # The output times are t_i + theta h, so only h depends on the integration times.
+        times = inputs['times']
+        h = (times[intervals + 1] - times[intervals])[:, None]
+
+        if self.options['endpoint_rates']:
+            for state_name, state in iteritems(ode_function._states):
+                y = inputs[get_name('state', state_name)].reshape((len(times), -1))
+                F_start, F_end = self._get_endpoint_rates(inputs, state_name)
+
+                y_out = w00[:, None] * y[intervals] + w01[:, None] * y[intervals + 1] \
+                    + h * (w10[:, None] * F_start + w11[:, None] * F_end)
+
+                outputs[get_name('state_at', state_name)] = y_out.reshape(
+                    (len(intervals),) + state['shape'])
+            return
+
+        evaluator = self.ode_nodes
+        y, F = self._evaluate(inputs)
+
+        y_out = w00[:, None] * y[intervals] + w01[:, None] * y[intervals + 1] \
+            + h * (w10[:, None] * F[intervals] + w11[:, None] * F[intervals + 1])
+
+        for state_name, state in iteritems(ode_function._states):
+            outputs[get_name('state_at', state_name)] = \
+                y_out[:, evaluator.state_slices[state_name]].reshape(
+                    (len(intervals),) + state['shape'])
+
+    def compute_partials(self, inputs, partials):
+        ode_function = self.options['ode_function']
+        intervals = self.intervals
+        w00, w10, w01, w11 = self.weights
+
+        times = inputs['times']
+        h = times[intervals + 1] - times[intervals]
+
+        if self.options['endpoint_rates']:
+            for state_name, state in iteritems(ode_function._states):
+                size = np.prod(state['shape'])
+                of_name = get_name('state_at', state_name)
+                F_start, F_end = self._get_endpoint_rates(inputs, state_name)
+
+                slope = w10[:, None] * F_start + w11[:, None] * F_end
+                d_t = np.zeros((len(intervals), size, 2))
+                d_t[:, :, 0] = -slope
+                d_t[:, :, 1] = slope
+                partials[of_name, 'times'] = d_t.flatten()
+
+                for i_step in np.unique(intervals):
+                    outputs = intervals == i_step
+                    for rate_type, w_rate in [('F_start', w10), ('F_end', w11)]:
+                        partials[of_name, get_name(rate_type, state_name, i_step=i_step)] = \
+                            np.repeat(h[outputs] * w_rate[outputs], size)
+            return
+
+        evaluator = self.ode_nodes
+        n = evaluator.state_size
+
+        y, F = self._evaluate(inputs)
+        jacobians = evaluator.compute_jacobians()
+
+        # Derivatives of the outputs with respect to the variables at both ends of the intervals,
+        # ndarray[num_output_times, state_size, 2, ...].
+        ends = [(w00, w10, intervals), (w01, w11, intervals + 1)]
+        d_y = np.zeros((len(intervals), n, 2, n))
+        d_t = np.zeros((len(intervals), n, 2, 1))
+        d_static = np.zeros((len(intervals), n, 1, evaluator.static_size))
+        d_dynamic = np.zeros((len(intervals), n, 2, evaluator.dynamic_size))
+
+        slope = w10[:, None] * F[intervals] + w11[:, None] * F[intervals + 1]
+        d_t[:, :, 0, 0] = -slope
+        d_t[:, :, 1, 0] = slope
+
+        for i_end, (w_value, w_rate, nodes) in enumerate(ends):
+            scale = (h * w_rate)[:, None, None]
+
+            d_y[:, :, i_end, :] = scale * jacobians['y'][nodes]
+            d_y[:, range(n), i_end, range(n)] += w_value[:, None]
+            d_t[:, :, i_end, 0] += scale[:, :, 0] * jacobians['t'][nodes]
+            d_static[:, :, 0, :] += scale * jacobians['static'][nodes]
+            d_dynamic[:, :, i_end, :] = scale * jacobians['dynamic'][nodes]
+
+        for state_name, of_slice in iteritems(evaluator.state_slices):
+            of_name = get_name('state_at', state_name)
+
+            for name, wrt_slice in iteritems(evaluator.state_slices):
+                partials[of_name, get_name('state', name)] = \
+                    d_y[:, of_slice, :, wrt_slice].flatten()
+
+            partials[of_name, 'times'] = d_t[:, of_slice].flatten()
+
+            for name, wrt_slice in iteritems(evaluator.static_slices):
+                partials[of_name, get_name('static_parameter', name)] = \
+                    d_static[:, of_slice, :, wrt_slice].flatten()
+
+            for name, wrt_slice in iteritems(evaluator.dynamic_slices):
+                partials[of_name, get_name('dynamic_parameter', name)] = \
+                    d_dynamic[:, of_slice, :, wrt_slice].flatten()
+
+
+def get_intervals(normalized_times, normalized_output_times):
+    """
+    Return the interval of each output time and the fraction of it at which the output time is.
+
+    Parameters
+    ----------
+    normalized_times : ndarray
+        The normalized integration times.
+    normalized_output_times : ndarray
+        The normalized output times, within the integration times.
+
+    Returns
+    -------
+    ndarray
+        The index of the first integration time of the interval of each output time.
+    ndarray
+        The fraction of its interval at which each output time is.
+    """
+    num_times = len(normalized_times)
+
+    intervals = np.searchsorted(normalized_times, normalized_output_times, side='right') - 1
+    intervals = np.clip(intervals, 0, num_times - 2)
+    theta = (normalized_output_times - normalized_times[intervals]) \
+        / (normalized_times[intervals + 1] - normalized_times[intervals])
+
+    return intervals, theta
@@ -62,4 +62,6 @@ class DynamicParameterComp(ExplicitComponent):
             in_name = get_name('in', parameter_name)
             out_name = get_name('out', parameter_name)
 
-            outputs[out_name] = self.mtx.dot(inputs[in_name])
+            # The sparse product only applies to 2-D arrays.
+            outputs[out_name] = self.mtx.dot(
+                inputs[in_name].reshape((self.mtx.shape[1], -1))).reshape(outputs[out_name].shape)
@@ -0,0 +1,140 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import Group, ExplicitComponent
+
+from ozone.utils.var_names import get_name
+from ozone.utils.units import get_rate_units
+
+
+class EnsembleGroup(Group):
+    """
+    The user's ODE system for all the members of an ensemble, folded into its nodes.
+
+    The variables of the ensemble have shape (num_nodes, num_members) + shape, which
+    ensemble_input_comp reshapes to (num_nodes * num_members,) + shape for the user's system,
+    instantiated with num_nodes * num_members nodes; the time is repeated for all members.
+    ensemble_output_comp reshapes the rate sources back. The reshapes do not move any data,
+    so their partials are identities.
+    """
+
+    def initialize(self):
+        self.options.declare('ode_function')
+        self.options.declare('num_members', types=int)
+        self.options.declare('num_nodes', types=int)
+
+    def setup(self):
+        ode_function = self.options['ode_function']
+        num_members = self.options['num_members']
+        num = self.options['num_nodes']
+        time_units = ode_function._time_options['units']
+
+        # (in_name, out_name, in_shape, out_shape, units) of each input and rate source.
+        inputs = []
+        rates = []
+
+        if ode_function._time_options['targets']:
+            inputs.append(('t', 'member_t', (num,), (num * num_members,), time_units))
+
+        for type_, variables in [
+                ('state', ode_function._states),
+                ('static_parameter', ode_function._static_parameters),
+                ('dynamic_parameter', ode_function._dynamic_parameters)]:
+            for name, variable in iteritems(variables):
+                if variable['targets']:
+                    inputs.append((get_name(type_, name), get_name('member_' + type_, name),
+                        (num, num_members) + variable['shape'],
+                        (num * num_members,) + variable['shape'], variable['units']))
+
+        for state_name, state in iteritems(ode_function._states):
+            rate_units = get_rate_units(state['units'], time_units)
+
+            # The split rate sources are summed by the split rate comp of the ensemble.
+            if state['stiff_rate_source'] is None:
+                sources = [('rate', state['rate_source'])]
+            else:
+                sources = [
+                    ('nonstiff_rate', state['nonstiff_rate_source']),
+                    ('stiff_rate', state['stiff_rate_source'])]
+
+            for type_, source in sources:
+                rates.append((source, get_name('member_' + type_, state_name),
+                    get_name(type_, state_name),
+                    (num * num_members,) + state['shape'],
+                    (num, num_members) + state['shape'], rate_units))
+
+        self.add_subsystem('ensemble_input_comp', EnsembleReshapeComp(variables=inputs))
+
+        self.add_subsystem('system', ode_function._system_class(
+            num_nodes=num * num_members, **ode_function._system_init_kwargs))
+
+        self.add_subsystem('ensemble_output_comp', EnsembleReshapeComp(
+            variables=[rate[1:] for rate in rates]))
+
+        targets = {'member_t': ode_function._time_options['targets']}
+        for type_, variables in [
+                ('state', ode_function._states),
+                ('static_parameter', ode_function._static_parameters),
+                ('dynamic_parameter', ode_function._dynamic_parameters)]:
+            for name, variable in iteritems(variables):
+                targets[get_name('member_' + type_, name)] = variable['targets']
+
+        for _, out_name, _, _, _ in inputs:
+            for target in targets[out_name]:
+                self.connect('ensemble_input_comp.%s' % out_name, 'system.%s' % target)
+
+        for source, in_name, _, _, _, _ in rates:
+            self.connect('system.%s' % source, 'ensemble_output_comp.%s' % in_name)
+
+
+class EnsembleReshapeComp(ExplicitComponent):
+
+    def initialize(self):
+        self.options.declare('variables', types=list)
+
+    def setup(self):
+        for in_name, out_name, in_shape, out_shape, units in self.options['variables']:
+            in_size = np.prod(in_shape)
+            out_size = np.prod(out_shape)
+
+            self.add_input(in_name, shape=in_shape, units=units)
+            self.add_output(out_name, shape=out_shape, units=units)
+
+            # Each input value is repeated out_size / in_size times, e.g., the time of a node
+            # for all members, or only reshaped.
+            arange = np.arange(out_size)
+            self.declare_partials(out_name, in_name, val=np.ones(out_size),
+                rows=arange, cols=arange // (out_size // in_size))
+
+    def compute(self, inputs, outputs):
+        for in_name, out_name, in_shape, out_shape, units in self.options['variables']:
+            repeats = np.prod(out_shape) // np.prod(in_shape)
+            outputs[out_name] = np.repeat(inputs[in_name].flatten(), repeats).reshape(out_shape)
+
+
+class EnsembleTransposeComp(ExplicitComponent):
+    """
+    Swap the first two axes of variables, i.e., the time and member axes of their histories.
+    """
+
+    def initialize(self):
+        self.options.declare('variables', types=list)
+
+    def setup(self):
+        for name, in_shape, units in self.options['variables']:
+            in_name = get_name('in', name)
+            out_name = get_name('out', name)
+            size = np.prod(in_shape)
+
+            self.add_input(in_name, shape=in_shape, units=units)
+            self.add_output(out_name, shape=(in_shape[1], in_shape[0]) + in_shape[2:],
+                units=units)
+
+            # Each output value is the input value whose first two indices are swapped.
+            cols = np.arange(size).reshape(in_shape).swapaxes(0, 1).flatten()
+            self.declare_partials(out_name, in_name, val=np.ones(size),
+                rows=np.arange(size), cols=cols)
+
+    def compute(self, inputs, outputs):
+        for name, in_shape, units in self.options['variables']:
+            outputs[get_name('out', name)] = inputs[get_name('in', name)].swapaxes(0, 1)
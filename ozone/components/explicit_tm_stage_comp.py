@@ -9,6 +9,12 @@ from ozone.utils.units import get_rate_units
 
 
 class ExplicitTMStageComp(ExplicitComponent):
+    """
+    Compute the value of one stage from the step vector and the derivatives of the previous stages.
+
+    If implicit is True, the derivative of the stage itself is included, as in diagonally implicit
+    methods; the stage is then solved for together with its ODE evaluation.
+    """
 
     def initialize(self):
         self.options.declare('states', types=dict)
@@ -19,12 +25,14 @@ class ExplicitTMStageComp(ExplicitComponent):
         self.options.declare('glm_U', types=np.ndarray)
         self.options.declare('i_stage', types=int)
         self.options.declare('i_step', types=int)
+        self.options.declare('implicit', types=bool, default=False)
 
     def setup(self):
         time_units = self.options['time_units']
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
         i_stage = self.options['i_stage']
+        num_coupled = i_stage + 1 if self.options['implicit'] else i_stage
         i_step = self.options['i_step']
         glm_A = self.options['glm_A']
         glm_U = self.options['glm_U']
@@ -39,7 +47,7 @@ class ExplicitTMStageComp(ExplicitComponent):
             y_old_name = get_name('y_old', state_name, i_step=i_step, i_stage=i_stage)
             Y_name = get_name('Y', state_name, i_step=i_step, i_stage=i_stage)
 
-            for j_stage in range(i_stage):
+            for j_stage in range(num_coupled):
                 F_name = get_name('F', state_name, i_step=i_step, i_stage=i_stage, j_stage=j_stage)
 
                 self.add_input(F_name, shape=(1,) + state['shape'],
@@ -64,7 +72,7 @@ class ExplicitTMStageComp(ExplicitComponent):
 
             self.declare_partials(Y_name, y_old_name, val=vals, rows=rows, cols=cols)
 
-            for j_stage in range(i_stage):
+            for j_stage in range(num_coupled):
                 F_name = get_name('F', state_name, i_step=i_step, i_stage=i_stage, j_stage=j_stage)
 
                 arange = np.arange(size)
@@ -74,6 +82,7 @@ class ExplicitTMStageComp(ExplicitComponent):
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
         i_stage = self.options['i_stage']
+        num_coupled = i_stage + 1 if self.options['implicit'] else i_stage
         glm_A = self.options['glm_A']
         glm_U = self.options['glm_U']
         i_step = self.options['i_step']
@@ -86,7 +95,7 @@ class ExplicitTMStageComp(ExplicitComponent):
 
             outputs[Y_name][0, :] = np.einsum('i,i...->...', glm_U[i_stage, :], inputs[y_old_name])
 
-            for j_stage in range(i_stage):
+            for j_stage in range(num_coupled):
                 F_name = get_name('F', state_name, i_step=i_step, i_stage=i_stage, j_stage=j_stage)
 
                 outputs[Y_name] += inputs['h'] * glm_A[i_stage, j_stage] * inputs[F_name]
@@ -95,6 +104,7 @@ class ExplicitTMStageComp(ExplicitComponent):
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
         i_stage = self.options['i_stage']
+        num_coupled = i_stage + 1 if self.options['implicit'] else i_stage
         glm_A = self.options['glm_A']
         glm_U = self.options['glm_U']
         i_step = self.options['i_step']
@@ -106,7 +116,7 @@ class ExplicitTMStageComp(ExplicitComponent):
 
             partials[Y_name, 'h'][:, 0] = 0.
 
-            for j_stage in range(i_stage):
+            for j_stage in range(num_coupled):
                 F_name = get_name('F', state_name, i_step=i_step, i_stage=i_stage, j_stage=j_stage)
 
                 partials[Y_name, F_name] = inputs['h'] * glm_A[i_stage, j_stage]
@@ -0,0 +1,456 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import ExplicitComponent
+
+from ozone.utils.var_names import get_name
+from ozone.utils.units import get_rate_units
+from ozone.utils.glm_stepper import GLMStepper
+from ozone.utils.rosenbrock_stepper import RosenbrockStepper
+from ozone.utils.imex_stepper import IMEXStepper
+from ozone.utils.exponential_stepper import ExponentialStepper
+from ozone.utils.partitioned_stepper import PartitionedStepper
+from ozone.utils.ensemble_stepper import get_stepper
+from ozone.utils.checkpointing import reverse_with_checkpoints
+
+
+class FusedTMComp(ExplicitComponent):
+    """
+    March all time steps of a GLM method inside a single component.
+
+    The steps are taken by a GLMStepper on preallocated trajectory arrays, and
+    derivatives are provided matrix-free through tangent and adjoint sweeps. For implicit
+    methods, the stage equations of each step are solved with Newton's method, or with the
+    simplified Newton iteration on the diagonalized stage system if stage_solver is 'kronecker'.
+    If rosenbrock_gamma is given, glm_A and glm_B are the coefficients of a Rosenbrock method,
+    whose steps are taken by a RosenbrockStepper with one linear solve per stage, and whose
+    derivatives use central differences of the ODE Jacobian with relative step
+    rosenbrock_fd_step. If
+    explicit_glm_A is given, glm_A and glm_B are the implicit coefficients of an IMEX additive
+    Runge--Kutta method and explicit_glm_A and explicit_glm_B its explicit coefficients, and its
+    steps are taken by an IMEXStepper. If exponential_method is given, it is an exponential
+    Runge--Kutta method, whose steps are taken by an ExponentialStepper. If position_glm_A is
+    given, glm_A and glm_B are the velocity coefficients of a partitioned Runge--Kutta method
+    and position_glm_A and position_glm_B its position coefficients, and its steps are taken by
+    a PartitionedStepper.
+
+    If num_checkpoints is given, the stage values and ODE Jacobians are not stored for the
+    whole trajectory. The tangent sweep recomputes them step by step, and the adjoint sweep
+    recomputes them from at most num_checkpoints stored step vectors using binomial
+    checkpointing.
+
+    If endpoint_stages is given, it is the pair of stages whose values are the step vectors at
+    the start and at the end of each step, and their derivatives are outputs, so that they can
+    be reused by the dense output. This requires a GLMStepper without checkpointing.
+    """
+
+    def initialize(self):
+        self.options.declare('ode_function')
+        self.options.declare('time_units', types=str, allow_none=True)
+        self.options.declare('num_times', types=int)
+        self.options.declare('num_stages', types=int)
+        self.options.declare('num_step_vars', types=int)
+        self.options.declare('glm_A', types=np.ndarray)
+        self.options.declare('glm_U', types=np.ndarray)
+        self.options.declare('glm_B', types=np.ndarray)
+        self.options.declare('glm_V', types=np.ndarray)
+        self.options.declare('explicit', types=bool, default=True)
+        self.options.declare('num_checkpoints', types=int, allow_none=True, default=None)
+        self.options.declare('newton_atol', types=float, default=1e-12)
+        self.options.declare('newton_maxiter', types=int, default=100)
+        self.options.declare('stage_solver', values=['dense', 'kronecker'], default='dense')
+        self.options.declare('rosenbrock_gamma', types=np.ndarray, allow_none=True, default=None)
+        self.options.declare('rosenbrock_fd_step', types=float, default=1e-5)
+        self.options.declare('explicit_glm_A', types=np.ndarray, allow_none=True, default=None)
+        self.options.declare('explicit_glm_B', types=np.ndarray, allow_none=True, default=None)
+        self.options.declare('exponential_method', allow_none=True, default=None)
+        self.options.declare('position_glm_A', types=np.ndarray, allow_none=True, default=None)
+        self.options.declare('position_glm_B', types=np.ndarray, allow_none=True, default=None)
+        self.options.declare('endpoint_stages', types=tuple, allow_none=True, default=None)
+
+    def setup(self):
+        ode_function = self.options['ode_function']
+        time_units = self.options['time_units']
+        num_times = self.options['num_times']
+        num_stages = self.options['num_stages']
+        num_step_vars = self.options['num_step_vars']
+        num_checkpoints = self.options['num_checkpoints']
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+
+        self.has_time = len(ode_function._time_options['targets']) > 0
+
+        if self.options['rosenbrock_gamma'] is not None:
+            self.stepper = get_stepper(ode_function, RosenbrockStepper,
+                self.options['glm_A'], self.options['glm_B'], self.options['rosenbrock_gamma'],
+                fd_step=self.options['rosenbrock_fd_step'])
+        elif self.options['explicit_glm_A'] is not None:
+            self.stepper = get_stepper(ode_function, IMEXStepper,
+                self.options['explicit_glm_A'], self.options['explicit_glm_B'],
+                self.options['glm_A'], self.options['glm_B'],
+                newton_atol=self.options['newton_atol'],
+                newton_maxiter=self.options['newton_maxiter'])
+        elif self.options['exponential_method'] is not None:
+            self.stepper = get_stepper(ode_function, ExponentialStepper,
+                self.options['exponential_method'])
+        elif self.options['position_glm_A'] is not None:
+            self.stepper = get_stepper(ode_function, PartitionedStepper,
+                self.options['position_glm_A'], self.options['position_glm_B'],
+                self.options['glm_A'], self.options['glm_B'])
+        else:
+            self.stepper = get_stepper(ode_function, GLMStepper,
+                self.options['glm_A'], self.options['glm_U'],
+                self.options['glm_B'], self.options['glm_V'],
+                explicit=self.options['explicit'],
+                newton_atol=self.options['newton_atol'],
+                newton_maxiter=self.options['newton_maxiter'],
+                stage_solver=self.options['stage_solver'])
+        self.ode_step = self.stepper.ode_step
+
+        if self.options['endpoint_stages'] is not None:
+            assert num_checkpoints is None and type(self.stepper) is GLMStepper, \
+                'endpoint_stages requires a GLM method without checkpointing'
+
+        n = self.ode_step.state_size
+
+        # Trajectory arrays, allocated once and overwritten by each compute.
+        # With checkpointing, only the step vectors are kept, at the checkpoints.
+        if num_checkpoints is None:
+            self.y = np.zeros((num_times, num_step_vars, n))
+            self.Y = np.zeros((num_times - 1, num_stages, n))
+            self.F = np.zeros((num_times - 1, num_stages, n))
+
+            # The linearizations of the steps, keyed as returned by the stepper; each array is
+            # allocated at the first linearization since the keys depend on the stepper.
+            self.jacobians = {}
+        else:
+            assert num_checkpoints >= 1, 'num_checkpoints must be at least 1'
+            self.y0 = np.zeros((num_step_vars, n))
+
+        self.add_input('h_vec', shape=num_times - 1, units=time_units)
+
+        if self.has_time:
+            self.add_input('stage_times', shape=(num_times - 1) * num_stages, units=time_units)
+
+        for state_name, state in iteritems(states):
+            y0_name = get_name('y0', state_name)
+            y_name = get_name('y', state_name)
+
+            self.add_input(y0_name,
+                shape=(num_step_vars,) + state['shape'],
+                units=state['units'])
+
+            self.add_output(y_name,
+                shape=(num_times, num_step_vars,) + state['shape'],
+                units=state['units'])
+
+            if self.options['endpoint_stages'] is not None:
+                for rate_type in ['F_start', 'F_end']:
+                    self.add_output(get_name(rate_type, state_name),
+                        shape=(num_times - 1,) + state['shape'],
+                        units=get_rate_units(state['units'], time_units))
+
+        for parameter_name, parameter in iteritems(static_parameters):
+            self.add_input(get_name('static_parameter', parameter_name),
+                shape=parameter['shape'],
+                units=parameter['units'])
+
+        for parameter_name, parameter in iteritems(dynamic_parameters):
+            self.add_input(get_name('dynamic_parameter', parameter_name),
+                shape=((num_times - 1) * num_stages,) + parameter['shape'],
+                units=parameter['units'])
+
+    def _unpack_inputs(self, inputs):
+        # Variables missing from the vector (e.g., irrelevant d_inputs) are treated as zero.
+        num_times = self.options['num_times']
+        num_stages = self.options['num_stages']
+        num_step_vars = self.options['num_step_vars']
+
+        evaluator = self.ode_step
+
+        y0 = np.zeros((num_step_vars, evaluator.state_size))
+        for state_name, state_slice in iteritems(evaluator.state_slices):
+            name = get_name('y0', state_name)
+            if name in inputs:
+                y0[:, state_slice] = inputs[name].reshape((num_step_vars, -1))
+
+        h_vec = np.zeros(num_times - 1)
+        if 'h_vec' in inputs:
+            h_vec[:] = inputs['h_vec']
+
+        stage_times = np.zeros((num_times - 1, num_stages))
+        if self.has_time and 'stage_times' in inputs:
+            stage_times[:] = inputs['stage_times'].reshape((num_times - 1, num_stages))
+
+        static = np.zeros(evaluator.static_size)
+        for parameter_name, parameter_slice in iteritems(evaluator.static_slices):
+            name = get_name('static_parameter', parameter_name)
+            if name in inputs:
+                static[parameter_slice] = inputs[name].flatten()
+
+        dynamic = np.zeros((num_times - 1, num_stages, evaluator.dynamic_size))
+        for parameter_name, parameter_slice in iteritems(evaluator.dynamic_slices):
+            name = get_name('dynamic_parameter', parameter_name)
+            if name in inputs:
+                dynamic[:, :, parameter_slice] = inputs[name].reshape(
+                    (num_times - 1, num_stages, -1))
+
+        return y0, h_vec, stage_times, static, dynamic
+
+    def compute(self, inputs, outputs):
+        num_times = self.options['num_times']
+        num_stages = self.options['num_stages']
+        num_step_vars = self.options['num_step_vars']
+        num_checkpoints = self.options['num_checkpoints']
+
+        y0, h_vec, stage_times, static, dynamic = self._unpack_inputs(inputs)
+
+        evaluator = self.ode_step
+
+        if num_checkpoints is None:
+            y, Y, F = self.y, self.Y, self.F
+
+            y[0] = y0
+            for i_step in range(num_times - 1):
+                y[i_step + 1] = self.stepper.compute_step(y[i_step], h_vec[i_step],
+                    stage_times[i_step], static, dynamic[i_step], Y[i_step], F[i_step])
+
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                outputs[y_name] = y[:, :, state_slice].reshape(outputs[y_name].shape)
+
+            self._set_endpoint_rates(outputs)
+        else:
+            # The outputs are written step by step; the sweeps restart from y0.
+            self.y0[:] = y0
+
+            Y = np.zeros((num_stages, evaluator.state_size))
+            F = np.zeros((num_stages, evaluator.state_size))
+
+            y_names = {}
+            for state_name in evaluator.state_slices:
+                y_name = get_name('y', state_name)
+                y_names[state_name] = y_name
+                outputs[y_name][0] = y0[:, evaluator.state_slices[state_name]].reshape(
+                    outputs[y_name].shape[1:])
+
+            y_step = y0
+            for i_step in range(num_times - 1):
+                y_step = self.stepper.compute_step(y_step, h_vec[i_step],
+                    stage_times[i_step], static, dynamic[i_step], Y, F)
+
+                for state_name, state_slice in iteritems(evaluator.state_slices):
+                    y_name = y_names[state_name]
+                    outputs[y_name][i_step + 1] = y_step[:, state_slice].reshape(
+                        outputs[y_name].shape[1:])
+
+    def _set_endpoint_rates(self, outputs):
+        # The stored derivatives of the endpoint stages of all steps.
+        if self.options['endpoint_stages'] is None:
+            return
+
+        for rate_type, i_stage in zip(['F_start', 'F_end'], self.options['endpoint_stages']):
+            for state_name, state_slice in iteritems(self.ode_step.state_slices):
+                name = get_name(rate_type, state_name)
+                outputs[name] = self.F[:, i_stage, state_slice].reshape(outputs[name].shape)
+
+    def compute_partials(self, inputs, partials):
+        num_times = self.options['num_times']
+
+        if self.options['num_checkpoints'] is not None:
+            return
+
+        y0, h_vec, stage_times, static, dynamic = self._unpack_inputs(inputs)
+
+        # The stage values are known after compute, so each step is linearized at once.
+        for i_step in range(num_times - 1):
+            jacobians = self.stepper.linearize_step(
+                self.Y[i_step], h_vec[i_step], stage_times[i_step], static, dynamic[i_step])
+
+            for key, jac in iteritems(jacobians):
+                if key not in self.jacobians:
+                    self.jacobians[key] = np.zeros((num_times - 1,) + jac.shape)
+                self.jacobians[key][i_step] = jac
+
+    def _get_stored_step(self, i_step):
+        jacobians = {key: jac[i_step] for key, jac in iteritems(self.jacobians)}
+        return self.F[i_step], jacobians
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        num_times = self.options['num_times']
+        num_stages = self.options['num_stages']
+        num_step_vars = self.options['num_step_vars']
+        num_checkpoints = self.options['num_checkpoints']
+
+        evaluator = self.ode_step
+        n = evaluator.state_size
+        p = evaluator.static_size
+        q = evaluator.dynamic_size
+
+        if not any(name in d_outputs for name in self._get_output_names()):
+            return
+
+        y0, h_vec, stage_times, static, dynamic = self._unpack_inputs(inputs)
+
+        Y = np.zeros((num_stages, n))
+        F = np.zeros((num_stages, n))
+
+        if mode == 'fwd':
+            d_y0, d_h_vec, d_stage_times, d_static, d_dynamic = self._unpack_inputs(d_inputs)
+
+            d_y = np.zeros((num_times, num_step_vars, n))
+
+            d_y[0] = d_y0
+            y_step = self.y0 if num_checkpoints is not None else None
+            for i_step in range(num_times - 1):
+                if num_checkpoints is None:
+                    F_step, jacobians = self._get_stored_step(i_step)
+                else:
+                    y_new = self.stepper.compute_step(y_step, h_vec[i_step],
+                        stage_times[i_step], static, dynamic[i_step], Y, F)
+                    jacobians = self.stepper.linearize_step(
+                        Y, h_vec[i_step], stage_times[i_step], static, dynamic[i_step])
+                    F_step = F
+                    y_step = y_new
+
+                d_y[i_step + 1] = self.stepper.tangent_step(d_y[i_step],
+                    h_vec[i_step], d_h_vec[i_step], F_step, jacobians,
+                    d_stage_times[i_step], d_static, d_dynamic[i_step])
+
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    d_outputs[y_name] += d_y[:, :, state_slice].reshape(d_outputs[y_name].shape)
+
+            self._add_endpoint_rates_tangent(d_outputs, d_y[:-1], d_y[1:],
+                d_stage_times, d_static, d_dynamic)
+
+        elif mode == 'rev':
+            # b_ denotes the adjoint (reverse-mode seed) of a variable.
+            b_y = np.zeros((num_times, num_step_vars, n))
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    b_y[:, :, state_slice] = d_outputs[y_name].reshape(
+                        (num_times, num_step_vars, -1))
+
+            b_h_vec = np.zeros(num_times - 1)
+            b_stage_times = np.zeros((num_times - 1, num_stages))
+            b_static = np.zeros(p)
+            b_dynamic = np.zeros((num_times - 1, num_stages, q))
+
+            if self.options['endpoint_stages'] is not None:
+                b_y_old, b_y_new = self._add_endpoint_rates_adjoint(d_outputs,
+                    b_stage_times, b_static, b_dynamic)
+                b_y[:-1] += b_y_old
+                b_y[1:] += b_y_new
+
+            def reverse_step(i_step, F_step, jacobians):
+                b_y_old, b_h, b_t, b_s, b_d = self.stepper.adjoint_step(
+                    b_y[i_step + 1], h_vec[i_step], F_step, jacobians)
+
+                b_y[i_step] += b_y_old
+                b_h_vec[i_step] += b_h
+                b_stage_times[i_step] += b_t
+                b_static[:] += b_s
+                b_dynamic[i_step] += b_d
+
+            if num_checkpoints is None:
+                for i_step in range(num_times - 2, -1, -1):
+                    reverse_step(i_step, *self._get_stored_step(i_step))
+            else:
+                def advance(i_step, y_step):
+                    return self.stepper.compute_step(y_step, h_vec[i_step],
+                        stage_times[i_step], static, dynamic[i_step], Y, F)
+
+                def recompute_and_reverse(i_step, y_step):
+                    advance(i_step, y_step)
+                    reverse_step(i_step, F, self.stepper.linearize_step(
+                        Y, h_vec[i_step], stage_times[i_step], static, dynamic[i_step]))
+
+                reverse_with_checkpoints(num_times - 1, num_checkpoints, self.y0,
+                    advance, recompute_and_reverse)
+
+            self._add_to_d_inputs(d_inputs, b_y[0], b_h_vec, b_stage_times, b_static, b_dynamic)
+
+    def _get_output_names(self):
+        # The names of all outputs.
+        names = []
+        for state_name in self.ode_step.state_slices:
+            names.append(get_name('y', state_name))
+            if self.options['endpoint_stages'] is not None:
+                names.append(get_name('F_start', state_name))
+                names.append(get_name('F_end', state_name))
+        return names
+
+    def _add_endpoint_rates_tangent(self, d_outputs, d_y_old, d_y_new,
+            d_stage_times, d_static, d_dynamic):
+        # Add the perturbations of the endpoint stage derivatives to d_outputs, given those of
+        # the step vectors at the start and at the end of each step, d_y_old and d_y_new.
+        if self.options['endpoint_stages'] is None:
+            return
+
+        jacobians = self.jacobians
+
+        for rate_type, i_stage, d_y in zip(['F_start', 'F_end'],
+                self.options['endpoint_stages'], [d_y_old, d_y_new]):
+            d_F = np.einsum('iab,ib->ia', jacobians['y'][:, i_stage], d_y[:, 0]) \
+                + jacobians['t'][:, i_stage] * d_stage_times[:, i_stage, None] \
+                + np.einsum('iab,b->ia', jacobians['static'][:, i_stage], d_static) \
+                + np.einsum('iab,ib->ia', jacobians['dynamic'][:, i_stage], d_dynamic[:, i_stage])
+
+            for state_name, state_slice in iteritems(self.ode_step.state_slices):
+                name = get_name(rate_type, state_name)
+                if name in d_outputs:
+                    d_outputs[name] += d_F[:, state_slice].reshape(d_outputs[name].shape)
+
+    def _add_endpoint_rates_adjoint(self, d_outputs, b_stage_times, b_static, b_dynamic):
+        # Add the adjoints of the endpoint stage derivatives to those of the stage times and
+        # parameters, and return those of the step vectors at the start and at the end of each
+        # step.
+        num_times = self.options['num_times']
+        n = self.ode_step.state_size
+
+        jacobians = self.jacobians
+
+        b_y_ends = []
+        for rate_type, i_stage in zip(['F_start', 'F_end'], self.options['endpoint_stages']):
+            b_F = np.zeros((num_times - 1, n))
+            for state_name, state_slice in iteritems(self.ode_step.state_slices):
+                name = get_name(rate_type, state_name)
+                if name in d_outputs:
+                    b_F[:, state_slice] = d_outputs[name].reshape((num_times - 1, -1))
+
+            b_y_ends.append(
+                np.einsum('iab,ia->ib', jacobians['y'][:, i_stage], b_F)[:, None, :])
+            b_stage_times[:, i_stage] += np.einsum('ia,ia->i', jacobians['t'][:, i_stage], b_F)
+            b_static += np.einsum('iab,ia->b', jacobians['static'][:, i_stage], b_F)
+            b_dynamic[:, i_stage] += np.einsum('iab,ia->ib', jacobians['dynamic'][:, i_stage], b_F)
+
+        return b_y_ends
+
+    def _add_to_d_inputs(self, d_inputs, b_y0, b_h_vec, b_stage_times, b_static, b_dynamic):
+        evaluator = self.ode_step
+
+        if 'h_vec' in d_inputs:
+            d_inputs['h_vec'] += b_h_vec
+
+        if self.has_time and 'stage_times' in d_inputs:
+            d_inputs['stage_times'] += b_stage_times.flatten()
+
+        for state_name, state_slice in iteritems(evaluator.state_slices):
+            y0_name = get_name('y0', state_name)
+            if y0_name in d_inputs:
+                d_inputs[y0_name] += b_y0[:, state_slice].reshape(d_inputs[y0_name].shape)
+
+        for parameter_name, parameter_slice in iteritems(evaluator.static_slices):
+            name = get_name('static_parameter', parameter_name)
+            if name in d_inputs:
+                d_inputs[name] += b_static[parameter_slice].reshape(d_inputs[name].shape)
+
+        for parameter_name, parameter_slice in iteritems(evaluator.dynamic_slices):
+            name = get_name('dynamic_parameter', parameter_name)
+            if name in d_inputs:
+                d_inputs[name] += b_dynamic[:, :, parameter_slice].reshape(d_inputs[name].shape)
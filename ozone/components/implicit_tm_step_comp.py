@@ -56,12 +56,14 @@ class ImplicitTMStepComp(ExplicitComponent):
 
             # -----------------
 
-            # (num_step_vars, num_stages,) + shape
-            rows = np.einsum('i...,j->ij...', y_arange, np.ones(num_stages, int)).flatten()
-
-            cols = np.zeros((num_step_vars, num_stages,) + shape, int).flatten()
+            # (num_step_vars,) + shape; the stages are summed here, since the repeated entries of
+            # a sparse partial overwrite each other in an assembled Jacobian.
+            rows = y_arange.flatten()
+            cols = np.zeros(num_step_vars * size, int)
             self.declare_partials(y_new_name, 'h', rows=rows, cols=cols)
 
+            # (num_step_vars, num_stages,) + shape
+            rows = np.einsum('i...,j->ij...', y_arange, np.ones(num_stages, int)).flatten()
             cols = np.einsum('j...,i->ij...', F_arange, np.ones(num_step_vars, int)).flatten()
             self.declare_partials(y_new_name, F_name, rows=rows, cols=cols)
 
@@ -114,4 +116,4 @@ class ImplicitTMStepComp(ExplicitComponent):
                 '...,ij->ij...', np.ones(shape), glm_B).flatten() * inputs['h']
 
             partials[y_new_name, 'h'] = np.einsum(
-                'ij,j...->ij...', glm_B, inputs[F_name]).flatten()
+                'ij,j...->i...', glm_B, inputs[F_name]).flatten()
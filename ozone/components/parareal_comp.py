@@ -0,0 +1,230 @@
+import numpy as np
+from six import iteritems
+
+from ozone.components.fused_tm_comp import FusedTMComp
+from ozone.utils.var_names import get_name
+from ozone.utils.glm_stepper import GLMStepper
+from ozone.utils.rosenbrock_stepper import RosenbrockStepper
+from ozone.utils.imex_stepper import IMEXStepper
+from ozone.utils.exponential_stepper import ExponentialStepper
+from ozone.utils.partitioned_stepper import PartitionedStepper
+from ozone.utils.ensemble_stepper import get_stepper
+from ozone.utils.segment_workers import SegmentPool
+
+
+class PararealComp(FusedTMComp):
+    """
+    March the steps of a one-step GLM method with the parareal algorithm.
+
+    The time steps are divided into num_segments segments. A cheap coarse method, taking
+    num_coarse_steps steps per segment, predicts the segment initial conditions serially,
+    and the fine method given to this component corrects all segments independently, in
+    num_workers worker processes if given; the workers are created at the first compute and
+    reused until close_workers is called. The update U[n + 1] = G(U_new[n]) + F(U[n]) - G(U[n])
+    is iterated until the change in the segment initial conditions is within
+    parareal_atol + parareal_rtol * |U|; segments that have already converged are not
+    recomputed.
+
+    The outputs are the fine trajectories of the last iteration, which match the serial fine
+    solution to the parareal tolerance. The derivatives are those of FusedTMComp, i.e., serial
+    tangent and adjoint sweeps linearized about these trajectories.
+    """
+
+    def initialize(self):
+        super(PararealComp, self).initialize()
+
+        self.options.declare('abscissa', types=np.ndarray)
+        self.options.declare('coarse_glm_A', types=np.ndarray)
+        self.options.declare('coarse_glm_U', types=np.ndarray)
+        self.options.declare('coarse_glm_B', types=np.ndarray)
+        self.options.declare('coarse_glm_V', types=np.ndarray)
+        self.options.declare('coarse_abscissa', types=np.ndarray)
+        self.options.declare('coarse_explicit', types=bool, default=True)
+        self.options.declare('coarse_rosenbrock_gamma', types=np.ndarray, allow_none=True,
+            default=None)
+        self.options.declare('coarse_explicit_glm_A', types=np.ndarray, allow_none=True,
+            default=None)
+        self.options.declare('coarse_explicit_glm_B', types=np.ndarray, allow_none=True,
+            default=None)
+        self.options.declare('coarse_exponential_method', allow_none=True, default=None)
+        self.options.declare('coarse_position_glm_A', types=np.ndarray, allow_none=True,
+            default=None)
+        self.options.declare('coarse_position_glm_B', types=np.ndarray, allow_none=True,
+            default=None)
+        self.options.declare('num_segments', types=int, default=2)
+        self.options.declare('num_coarse_steps', types=int, default=1)
+        self.options.declare('num_workers', types=int, allow_none=True, default=None)
+        self.options.declare('parareal_atol', types=float, default=1e-12)
+        self.options.declare('parareal_rtol', types=float, default=1e-10)
+        self.options.declare('parareal_maxiter', types=int, allow_none=True, default=None)
+
+    def setup(self):
+        super(PararealComp, self).setup()
+
+        num_times = self.options['num_times']
+        num_segments = self.options['num_segments']
+        num_workers = self.options['num_workers']
+
+        assert self.options['num_checkpoints'] is None, \
+            'Checkpointing is not supported with parareal'
+        assert self.options['num_step_vars'] == 1 \
+            and self.options['coarse_glm_V'].shape == (1, 1), \
+            'Parareal requires one-step methods for both the coarse and fine propagators'
+        assert self.options['num_coarse_steps'] >= 1, 'num_coarse_steps must be at least 1'
+
+        self.segment_indices = np.unique(
+            np.round(np.linspace(0, num_times - 1, num_segments + 1)).astype(int))
+        assert len(self.segment_indices) == num_segments + 1, \
+            'There are fewer time steps (%i) than segments (%i)' % (num_times - 1, num_segments)
+
+        if self.options['coarse_rosenbrock_gamma'] is not None:
+            self.coarse_stepper = get_stepper(self.options['ode_function'], RosenbrockStepper,
+                self.options['coarse_glm_A'], self.options['coarse_glm_B'],
+                self.options['coarse_rosenbrock_gamma'])
+        elif self.options['coarse_explicit_glm_A'] is not None:
+            self.coarse_stepper = get_stepper(self.options['ode_function'], IMEXStepper,
+                self.options['coarse_explicit_glm_A'], self.options['coarse_explicit_glm_B'],
+                self.options['coarse_glm_A'], self.options['coarse_glm_B'],
+                newton_atol=self.options['newton_atol'],
+                newton_maxiter=self.options['newton_maxiter'])
+        elif self.options['coarse_exponential_method'] is not None:
+            self.coarse_stepper = get_stepper(self.options['ode_function'], ExponentialStepper,
+                self.options['coarse_exponential_method'])
+        elif self.options['coarse_position_glm_A'] is not None:
+            self.coarse_stepper = get_stepper(self.options['ode_function'], PartitionedStepper,
+                self.options['coarse_position_glm_A'], self.options['coarse_position_glm_B'],
+                self.options['coarse_glm_A'], self.options['coarse_glm_B'])
+        else:
+            self.coarse_stepper = get_stepper(self.options['ode_function'], GLMStepper,
+                self.options['coarse_glm_A'], self.options['coarse_glm_U'],
+                self.options['coarse_glm_B'], self.options['coarse_glm_V'],
+                explicit=self.options['coarse_explicit'],
+                newton_atol=self.options['newton_atol'],
+                newton_maxiter=self.options['newton_maxiter'],
+                stage_solver=self.options['stage_solver'])
+
+        if getattr(self, 'segment_pool', None) is not None:
+            self.segment_pool.close()
+        self.segment_pool = SegmentPool(self.stepper, num_workers)
+
+        # History of the last compute.
+        self.num_iterations = 0
+        self.defect_history = []
+        self.segment_times = np.zeros((0, num_segments))
+
+    def _interpolate_dynamic(self, t):
+        # Dynamic parameters at the coarse stage times, linearly interpolated in time.
+        fine_times, fine_dynamic = self._fine_dynamic
+        dynamic = np.zeros((len(t), fine_dynamic.shape[1]))
+        for index in range(fine_dynamic.shape[1]):
+            dynamic[:, index] = np.interp(t, fine_times, fine_dynamic[:, index])
+        return dynamic
+
+    def _propagate_coarse(self, i_segment, y_start):
+        num_coarse_steps = self.options['num_coarse_steps']
+        coarse_abscissa = self.options['coarse_abscissa']
+
+        times, h_vec, stage_times, static, dynamic = self._step_data
+        i_start, i_end = self.segment_indices[i_segment:i_segment + 2]
+
+        stepper = self.coarse_stepper
+        Y = np.zeros((stepper.num_stages, self.ode_step.state_size))
+        F = np.zeros((stepper.num_stages, self.ode_step.state_size))
+
+        coarse_times = np.linspace(times[i_start], times[i_end], num_coarse_steps + 1)
+
+        y_step = y_start
+        for i_step in range(num_coarse_steps):
+            h = coarse_times[i_step + 1] - coarse_times[i_step]
+            t = coarse_times[i_step] + h * coarse_abscissa
+            y_step = stepper.compute_step(y_step, h, t, static, self._interpolate_dynamic(t), Y, F)
+
+        return y_step
+
+    def close_workers(self):
+        """
+        Terminate the worker processes, if any; the next compute creates them again.
+        """
+        self.segment_pool.close()
+
+    def compute(self, inputs, outputs):
+        num_times = self.options['num_times']
+        num_stages = self.options['num_stages']
+        num_segments = self.options['num_segments']
+        abscissa = self.options['abscissa']
+        parareal_atol = self.options['parareal_atol']
+        parareal_rtol = self.options['parareal_rtol']
+        parareal_maxiter = self.options['parareal_maxiter']
+
+        if parareal_maxiter is None:
+            parareal_maxiter = num_segments
+
+        y0, h_vec, stage_times, static, dynamic = self._unpack_inputs(inputs)
+
+        # Times of the steps; they are only relative to the first one if the ODE has no time.
+        times = np.zeros(num_times)
+        if self.has_time:
+            times[0] = stage_times[0, 0] - abscissa[0] * h_vec[0]
+        times[1:] = times[0] + np.cumsum(h_vec)
+
+        fine_stage_times = (times[:-1, None] + np.outer(h_vec, abscissa)).flatten()
+        indices = np.argsort(fine_stage_times, kind='mergesort')
+        self._fine_dynamic = (fine_stage_times[indices],
+            dynamic.reshape((num_stages * (num_times - 1), -1))[indices])
+
+        self._step_data = (times, h_vec, stage_times, static, dynamic)
+
+        U = np.zeros((num_segments + 1, 1, self.ode_step.state_size))
+        G = np.zeros((num_segments, 1, self.ode_step.state_size))
+        F_end = np.zeros((num_segments, 1, self.ode_step.state_size))
+
+        U[0] = y0
+        for i_segment in range(num_segments):
+            G[i_segment] = self._propagate_coarse(i_segment, U[i_segment])
+            U[i_segment + 1] = G[i_segment]
+
+        self.defect_history = []
+        segment_times = []
+        for iteration in range(parareal_maxiter):
+            # After k iterations, the first k segments start from their exact values.
+            segments = range(iteration, num_segments)
+            tasks = []
+            for i_segment in segments:
+                i_start, i_end = self.segment_indices[i_segment:i_segment + 2]
+                tasks.append((U[i_segment], h_vec[i_start:i_end],
+                    stage_times[i_start:i_end], static, dynamic[i_start:i_end]))
+
+            results = self.segment_pool.map(tasks)
+
+            iteration_times = np.zeros(num_segments)
+            for i_segment, (y, Y, F, elapsed) in zip(segments, results):
+                i_start, i_end = self.segment_indices[i_segment:i_segment + 2]
+                self.y[i_start:i_end + 1] = y
+                self.Y[i_start:i_end] = Y
+                self.F[i_start:i_end] = F
+                F_end[i_segment] = y[-1]
+                iteration_times[i_segment] = elapsed
+            segment_times.append(iteration_times)
+
+            U_new = U.copy()
+            for i_segment in segments:
+                G_new = self._propagate_coarse(i_segment, U_new[i_segment])
+                U_new[i_segment + 1] = G_new + F_end[i_segment] - G[i_segment]
+                G[i_segment] = G_new
+
+            defect = np.abs(U_new - U)
+            self.defect_history.append(np.max(defect))
+
+            U = U_new
+            if np.all(defect <= parareal_atol + parareal_rtol * np.abs(U)):
+                break
+
+        self.num_iterations = len(self.defect_history)
+        self.segment_times = np.array(segment_times)
+
+        for state_name, state_slice in iteritems(self.ode_step.state_slices):
+            y_name = get_name('y', state_name)
+            outputs[y_name] = self.y[:, :, state_slice].reshape(outputs[y_name].shape)
+
+        self._set_endpoint_rates(outputs)
+
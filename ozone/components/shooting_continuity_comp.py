@@ -0,0 +1,69 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import ImplicitComponent
+
+from ozone.utils.var_names import get_name
+
+
+class ShootingContinuityComp(ImplicitComponent):
+    """
+    Initial conditions of the multiple-shooting segments, defined implicitly by continuity.
+
+    The initial condition of segment i is the final state of segment i - 1 for i >= 1.
+    """
+
+    def initialize(self):
+        self.options.declare('states', types=dict)
+        self.options.declare('num_segments', types=int)
+
+    def setup(self):
+        num_segments = self.options['num_segments']
+
+        for state_name, state in iteritems(self.options['states']):
+            size = np.prod(state['shape'])
+
+            for i_segment in range(1, num_segments):
+                final_state_name = get_name('final_state', state_name, i_segment=i_segment - 1)
+                initial_condition_name = get_name('initial_condition', state_name,
+                    i_segment=i_segment)
+
+                self.add_input(final_state_name, shape=state['shape'], units=state['units'])
+                self.add_output(initial_condition_name, shape=state['shape'],
+                    units=state['units'])
+
+                arange = np.arange(size)
+                self.declare_partials(initial_condition_name, initial_condition_name,
+                    val=np.ones(size), rows=arange, cols=arange)
+                self.declare_partials(initial_condition_name, final_state_name,
+                    val=-np.ones(size), rows=arange, cols=arange)
+
+    def apply_nonlinear(self, inputs, outputs, residuals):
+        num_segments = self.options['num_segments']
+
+        for state_name, state in iteritems(self.options['states']):
+            for i_segment in range(1, num_segments):
+                final_state_name = get_name('final_state', state_name, i_segment=i_segment - 1)
+                initial_condition_name = get_name('initial_condition', state_name,
+                    i_segment=i_segment)
+
+                residuals[initial_condition_name] = \
+                    outputs[initial_condition_name] - inputs[final_state_name]
+
+    def solve_nonlinear(self, inputs, outputs):
+        num_segments = self.options['num_segments']
+
+        for state_name, state in iteritems(self.options['states']):
+            for i_segment in range(1, num_segments):
+                final_state_name = get_name('final_state', state_name, i_segment=i_segment - 1)
+                initial_condition_name = get_name('initial_condition', state_name,
+                    i_segment=i_segment)
+
+                outputs[initial_condition_name] = inputs[final_state_name]
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        # The Jacobian with respect to the outputs is the identity.
+        if mode == 'fwd':
+            d_outputs.set_vec(d_residuals)
+        elif mode == 'rev':
+            d_residuals.set_vec(d_outputs)
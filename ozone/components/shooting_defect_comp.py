@@ -0,0 +1,53 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import ExplicitComponent
+
+from ozone.utils.var_names import get_name
+
+
+class ShootingDefectComp(ExplicitComponent):
+    """
+    Continuity defects between multiple-shooting segments.
+
+    The defect of segment i is its initial condition minus the final state of segment i - 1
+    for i >= 1.
+    """
+
+    def initialize(self):
+        self.options.declare('states', types=dict)
+        self.options.declare('num_segments', types=int)
+
+    def setup(self):
+        num_segments = self.options['num_segments']
+
+        for state_name, state in iteritems(self.options['states']):
+            size = np.prod(state['shape'])
+
+            for i_segment in range(1, num_segments):
+                final_state_name = get_name('final_state', state_name, i_segment=i_segment - 1)
+                initial_condition_name = get_name('initial_condition', state_name,
+                    i_segment=i_segment)
+                defect_name = get_name('defect', state_name, i_segment=i_segment)
+
+                self.add_input(final_state_name, shape=state['shape'], units=state['units'])
+                self.add_input(initial_condition_name, shape=state['shape'], units=state['units'])
+                self.add_output(defect_name, shape=state['shape'], units=state['units'])
+
+                arange = np.arange(size)
+                self.declare_partials(defect_name, initial_condition_name,
+                    val=np.ones(size), rows=arange, cols=arange)
+                self.declare_partials(defect_name, final_state_name,
+                    val=-np.ones(size), rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        num_segments = self.options['num_segments']
+
+        for state_name, state in iteritems(self.options['states']):
+            for i_segment in range(1, num_segments):
+                final_state_name = get_name('final_state', state_name, i_segment=i_segment - 1)
+                initial_condition_name = get_name('initial_condition', state_name,
+                    i_segment=i_segment)
+                defect_name = get_name('defect', state_name, i_segment=i_segment)
+
+                outputs[defect_name] = inputs[initial_condition_name] - inputs[final_state_name]
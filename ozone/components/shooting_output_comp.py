@@ -0,0 +1,68 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import ExplicitComponent
+
+from ozone.utils.var_names import get_name
+
+
+class ShootingOutputComp(ExplicitComponent):
+    """
+    Concatenate the state histories of the multiple-shooting segments.
+
+    Consecutive segments share their boundary time; the value at the boundary is taken from
+    the later segment, i.e., from its initial condition.
+    """
+
+    def initialize(self):
+        self.options.declare('states', types=dict)
+        self.options.declare('segment_indices', types=np.ndarray)
+
+    def setup(self):
+        segment_indices = self.options['segment_indices']
+
+        num_times = segment_indices[-1] + 1
+
+        for state_name, state in iteritems(self.options['states']):
+            size = np.prod(state['shape'])
+            shape = state['shape']
+
+            out_state_name = get_name('state', state_name)
+
+            self.add_output(out_state_name, shape=(num_times,) + shape, units=state['units'])
+
+            out_state_arange = np.arange(num_times * size).reshape((num_times,) + shape)
+
+            for i_segment in range(len(segment_indices) - 1):
+                i_start, i_end = segment_indices[i_segment:i_segment + 2]
+
+                num_segment_times = i_end - i_start + 1
+                is_last = i_segment == len(segment_indices) - 2
+                num_used_times = num_segment_times if is_last else num_segment_times - 1
+
+                segment_state_name = get_name('state', state_name, i_segment=i_segment)
+
+                self.add_input(segment_state_name, shape=(num_segment_times,) + shape,
+                    units=state['units'])
+
+                rows = out_state_arange[i_start:i_start + num_used_times].flatten()
+                cols = np.arange(num_used_times * size)
+                self.declare_partials(out_state_name, segment_state_name,
+                    val=np.ones(num_used_times * size), rows=rows, cols=cols)
+
+    def compute(self, inputs, outputs):
+        segment_indices = self.options['segment_indices']
+
+        for state_name, state in iteritems(self.options['states']):
+            out_state_name = get_name('state', state_name)
+
+            for i_segment in range(len(segment_indices) - 1):
+                i_start, i_end = segment_indices[i_segment:i_segment + 2]
+
+                is_last = i_segment == len(segment_indices) - 2
+                i_stop = i_end + 1 if is_last else i_end
+
+                segment_state_name = get_name('state', state_name, i_segment=i_segment)
+
+                outputs[out_state_name][i_start:i_stop] = \
+                    inputs[segment_state_name][:i_stop - i_start]
@@ -0,0 +1,208 @@
+import numpy as np
+from six import iteritems
+
+from ozone.components.fused_tm_comp import FusedTMComp
+from ozone.utils.var_names import get_name
+from ozone.utils.segment_workers import SegmentPool
+
+
+class ShootingTMComp(FusedTMComp):
+    """
+    March the multiple-shooting segments of a one-step GLM method inside a single component.
+
+    The steps from segment_indices[i] to segment_indices[i + 1] form segment i, which starts
+    from y0 if i is 0 and from its initial condition input otherwise. The segments are
+    independent, so they are propagated in num_workers worker processes if given; the workers
+    are created at the first compute and reused until close_workers is called. The y output
+    holds the trajectories of the segments, with the value at each boundary taken from the
+    later segment, and the final states of all segments but the last are separate outputs.
+    """
+
+    def initialize(self):
+        super(ShootingTMComp, self).initialize()
+
+        self.options.declare('segment_indices', types=np.ndarray)
+        self.options.declare('num_workers', types=int, allow_none=True, default=None)
+
+    def setup(self):
+        super(ShootingTMComp, self).setup()
+
+        num_segments = len(self.options['segment_indices']) - 1
+
+        assert self.options['num_checkpoints'] is None, \
+            'Checkpointing is not supported with multiple shooting in worker processes'
+        assert self.options['num_step_vars'] == 1, \
+            'Multiple shooting in worker processes requires a one-step method'
+
+        if getattr(self, 'segment_pool', None) is not None:
+            self.segment_pool.close()
+        self.segment_pool = SegmentPool(self.stepper, self.options['num_workers'])
+
+        for state_name, state in iteritems(self.options['ode_function']._states):
+            for i_segment in range(1, num_segments):
+                self.add_input(get_name('initial_condition', state_name, i_segment=i_segment),
+                    shape=state['shape'], units=state['units'])
+                self.add_output(get_name('final_state', state_name, i_segment=i_segment - 1),
+                    shape=state['shape'], units=state['units'])
+
+        self.y_final = np.zeros((num_segments, 1, self.ode_step.state_size))
+
+    def close_workers(self):
+        """
+        Terminate the worker processes, if any; the next compute creates them again.
+        """
+        self.segment_pool.close()
+
+    def _unpack_initial_conditions(self, inputs, y0):
+        # The step vectors at the start of the segments; missing variables are zero.
+        num_segments = len(self.options['segment_indices']) - 1
+
+        y_starts = np.zeros((num_segments, 1, self.ode_step.state_size))
+        y_starts[0] = y0
+        for state_name, state_slice in iteritems(self.ode_step.state_slices):
+            for i_segment in range(1, num_segments):
+                name = get_name('initial_condition', state_name, i_segment=i_segment)
+                if name in inputs:
+                    y_starts[i_segment, 0, state_slice] = inputs[name].flatten()
+
+        return y_starts
+
+    def compute(self, inputs, outputs):
+        segment_indices = self.options['segment_indices']
+        num_segments = len(segment_indices) - 1
+
+        y0, h_vec, stage_times, static, dynamic = self._unpack_inputs(inputs)
+        y_starts = self._unpack_initial_conditions(inputs, y0)
+
+        tasks = []
+        for i_segment in range(num_segments):
+            i_start, i_end = segment_indices[i_segment:i_segment + 2]
+            tasks.append((y_starts[i_segment], h_vec[i_start:i_end],
+                stage_times[i_start:i_end], static, dynamic[i_start:i_end]))
+
+        # In order, so that the boundary values are those of the later segments.
+        for i_segment, (y, Y, F, elapsed) in enumerate(self.segment_pool.map(tasks)):
+            i_start, i_end = segment_indices[i_segment:i_segment + 2]
+            self.y[i_start:i_end + 1] = y
+            self.Y[i_start:i_end] = Y
+            self.F[i_start:i_end] = F
+            self.y_final[i_segment] = y[-1]
+
+        self._set_outputs(outputs, self.y, self.y_final)
+        self._set_endpoint_rates(outputs)
+
+    def _set_outputs(self, outputs, y, y_final, add=False):
+        num_segments = len(self.options['segment_indices']) - 1
+
+        for state_name, state_slice in iteritems(self.ode_step.state_slices):
+            y_name = get_name('y', state_name)
+            if y_name in outputs:
+                value = y[:, :, state_slice].reshape(outputs[y_name].shape)
+                outputs[y_name] = outputs[y_name] + value if add else value
+
+            for i_segment in range(num_segments - 1):
+                name = get_name('final_state', state_name, i_segment=i_segment)
+                if name in outputs:
+                    value = y_final[i_segment, 0, state_slice].reshape(outputs[name].shape)
+                    outputs[name] = outputs[name] + value if add else value
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        num_times = self.options['num_times']
+        num_stages = self.options['num_stages']
+        segment_indices = self.options['segment_indices']
+        num_segments = len(segment_indices) - 1
+
+        evaluator = self.ode_step
+        n = evaluator.state_size
+
+        y0, h_vec, stage_times, static, dynamic = self._unpack_inputs(inputs)
+
+        # The end of the last step of each segment is its final state, not the boundary value.
+        i_last_steps = segment_indices[1:-1] - 1
+
+        if mode == 'fwd':
+            d_y0, d_h_vec, d_stage_times, d_static, d_dynamic = self._unpack_inputs(d_inputs)
+            d_y_starts = self._unpack_initial_conditions(d_inputs, d_y0)
+
+            d_y = np.zeros((num_times, 1, n))
+            d_y_final = np.zeros((num_segments, 1, n))
+
+            for i_segment in range(num_segments):
+                i_start, i_end = segment_indices[i_segment:i_segment + 2]
+
+                d_y_step = d_y_starts[i_segment]
+                d_y[i_start] = d_y_step
+                for i_step in range(i_start, i_end):
+                    F_step, jacobians = self._get_stored_step(i_step)
+                    d_y_step = self.stepper.tangent_step(d_y_step,
+                        h_vec[i_step], d_h_vec[i_step], F_step, jacobians,
+                        d_stage_times[i_step], d_static, d_dynamic[i_step])
+                    d_y[i_step + 1] = d_y_step
+                d_y_final[i_segment] = d_y_step
+
+            self._set_outputs(d_outputs, d_y, d_y_final, add=True)
+
+            d_y_new = d_y[1:].copy()
+            d_y_new[i_last_steps] = d_y_final[:-1]
+            self._add_endpoint_rates_tangent(d_outputs, d_y[:-1], d_y_new,
+                d_stage_times, d_static, d_dynamic)
+
+        elif mode == 'rev':
+            # b_ denotes the adjoint (reverse-mode seed) of a variable.
+            b_y = np.zeros((num_times, 1, n))
+            b_y_final = np.zeros((num_segments, 1, n))
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    b_y[:, :, state_slice] = d_outputs[y_name].reshape((num_times, 1, -1))
+
+                for i_segment in range(num_segments - 1):
+                    name = get_name('final_state', state_name, i_segment=i_segment)
+                    if name in d_outputs:
+                        b_y_final[i_segment, 0, state_slice] = d_outputs[name].flatten()
+
+            b_y_starts = np.zeros((num_segments, 1, n))
+            b_h_vec = np.zeros(num_times - 1)
+            b_stage_times = np.zeros((num_times - 1, num_stages))
+            b_static = np.zeros(evaluator.static_size)
+            b_dynamic = np.zeros((num_times - 1, num_stages, evaluator.dynamic_size))
+
+            if self.options['endpoint_stages'] is not None:
+                b_y_old, b_y_new = self._add_endpoint_rates_adjoint(d_outputs,
+                    b_stage_times, b_static, b_dynamic)
+                b_y[:-1] += b_y_old
+                b_y_final[:-1] += b_y_new[i_last_steps]
+                b_y_new[i_last_steps] = 0.
+                b_y[1:] += b_y_new
+
+            for i_segment in range(num_segments):
+                i_start, i_end = segment_indices[i_segment:i_segment + 2]
+
+                # The boundary value of the output belongs to the next segment.
+                if i_segment < num_segments - 1:
+                    b_y_step = b_y_final[i_segment]
+                else:
+                    b_y_step = b_y[i_end]
+
+                for i_step in range(i_end - 1, i_start - 1, -1):
+                    F_step, jacobians = self._get_stored_step(i_step)
+                    b_y_old, b_h, b_t, b_s, b_d = self.stepper.adjoint_step(
+                        b_y_step, h_vec[i_step], F_step, jacobians)
+
+                    b_y_step = b_y[i_step] + b_y_old
+                    b_h_vec[i_step] += b_h
+                    b_stage_times[i_step] += b_t
+                    b_static[:] += b_s
+                    b_dynamic[i_step] += b_d
+
+                b_y_starts[i_segment] = b_y_step
+
+            self._add_to_d_inputs(d_inputs, b_y_starts[0], b_h_vec, b_stage_times, b_static,
+                b_dynamic)
+
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                for i_segment in range(1, num_segments):
+                    name = get_name('initial_condition', state_name, i_segment=i_segment)
+                    if name in d_inputs:
+                        d_inputs[name] += b_y_starts[i_segment, 0, state_slice].reshape(
+                            d_inputs[name].shape)
@@ -0,0 +1,76 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import Group, ExplicitComponent
+
+from ozone.utils.var_names import get_name
+from ozone.utils.units import get_rate_units
+
+
+class SplitRateGroup(Group):
+    """
+    The user's ODE system, with the sums of the split rate sources.
+
+    The system is promoted, so its variables have the same paths as without this group. For
+    each state with a stiff_rate_source, split_rate_comp adds the non-stiff and stiff parts into
+    the rate source declared for the state.
+    """
+
+    def initialize(self):
+        self.options.declare('ode_function')
+        self.options.declare('num_nodes', types=int)
+
+    def setup(self):
+        ode_function = self.options['ode_function']
+        num = self.options['num_nodes']
+
+        states = dict([
+            (state_name, state) for state_name, state in iteritems(ode_function._states)
+            if state['stiff_rate_source'] is not None])
+
+        self.add_subsystem('system', ode_function._system_class(
+            num_nodes=num, **ode_function._system_init_kwargs), promotes=['*'])
+
+        self.add_subsystem('split_rate_comp', SplitRateComp(
+            states=states, time_units=ode_function._time_options['units'], num_nodes=num))
+
+        for state_name, state in iteritems(states):
+            self.connect(state['nonstiff_rate_source'],
+                'split_rate_comp.%s' % get_name('nonstiff_rate', state_name))
+            self.connect(state['stiff_rate_source'],
+                'split_rate_comp.%s' % get_name('stiff_rate', state_name))
+
+
+class SplitRateComp(ExplicitComponent):
+
+    def initialize(self):
+        self.options.declare('states', types=dict)
+        self.options.declare('time_units', types=str, allow_none=True)
+        self.options.declare('num_nodes', types=int)
+
+    def setup(self):
+        time_units = self.options['time_units']
+        num = self.options['num_nodes']
+
+        for state_name, state in iteritems(self.options['states']):
+            size = np.prod(state['shape'])
+            rate_units = get_rate_units(state['units'], time_units)
+
+            nonstiff_name = get_name('nonstiff_rate', state_name)
+            stiff_name = get_name('stiff_rate', state_name)
+            rate_name = get_name('rate', state_name)
+
+            self.add_input(nonstiff_name, shape=(num,) + state['shape'], units=rate_units)
+            self.add_input(stiff_name, shape=(num,) + state['shape'], units=rate_units)
+            self.add_output(rate_name, shape=(num,) + state['shape'], units=rate_units)
+
+            ones = np.ones(num * size)
+            arange = np.arange(num * size)
+            self.declare_partials(rate_name, nonstiff_name, val=ones, rows=arange, cols=arange)
+            self.declare_partials(rate_name, stiff_name, val=ones, rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        for state_name in self.options['states']:
+            outputs[get_name('rate', state_name)] = \
+                inputs[get_name('nonstiff_rate', state_name)] \
+                + inputs[get_name('stiff_rate', state_name)]
@@ -0,0 +1,510 @@
+import numpy as np
+from six import iteritems
+import scipy.sparse
+import scipy.linalg
+
+from openmdao.api import AnalysisError
+
+from ozone.components.adaptive_tm_comp import AdaptiveTMComp
+from ozone.utils.var_names import get_name
+from ozone.utils.ode_evaluator import ODEEvaluator
+from ozone.utils.sparse_linear_spline import get_sparse_linear_spline
+from ozone.utils.nordsieck import get_predict_matrix, get_restore_matrix, get_rescale_matrix, \
+    get_bdf_coefficients, get_order_decrease_matrix, get_order_increase_matrix, \
+    get_interpolation_weights
+
+
+# Step size and order selection constants of CVODE.
+ETA_THRESHOLD = 1.5
+ETA_MAX_FIRST = 1e4
+ETA_MAX = 10.
+ETA_MIN = 0.1
+ETA_MAX_ERROR_FAIL = 0.2
+ETA_CONV_FAIL = 0.25
+BIAS_DOWN = 6.
+BIAS = 6.
+BIAS_UP = 10.
+ADDON = 1e-6
+NUM_ERROR_FAILS_ETA = 3
+LONG_WAIT = 10
+
+# Newton iteration constants of CVODE.
+MAX_NUM_CORRECTIONS = 3
+MAX_NUM_FAILURES = 10
+NEWTON_COEFF = 0.1
+CRATE_DECAY = 0.3
+DIVERGENCE_RATIO = 2.
+MAX_GAMMA_CHANGE = 0.3
+MAX_STEPS_ITERATION_MATRIX = 20
+MAX_STEPS_JACOBIAN = 50
+
+
+class VariableBDFComp(AdaptiveTMComp):
+    """
+    March a variable-step, variable-order BDF method stored in Nordsieck form.
+
+    The step size and the order, from 1 to max_order, are chosen after each step from the
+    local error estimates at orders q - 1, q, and q + 1, with the heuristics of CVODE. The
+    corrector is solved with a modified Newton method whose ODE Jacobian and iteration matrix
+    are reused over several steps. The steps end exactly at the last output time, and the
+    other output times are interpolated from the Nordsieck array. Dynamic parameters are
+    linearly interpolated from all_norm_times to the step times.
+
+    The derivatives are those of the accepted steps, with the orders fixed, the step sizes
+    frozen as fractions of the time interval, and the corrector equations solved exactly;
+    they are applied as tangent and adjoint sweeps.
+    """
+
+    def initialize(self):
+        super(VariableBDFComp, self).initialize()
+
+        self.options.declare('max_order', types=int, default=5)
+
+    def _setup_stepper(self):
+        assert 1 <= self.options['max_order'] <= 5, \
+            'The maximum order of variable-order BDF must be between 1 and 5'
+
+        self.ode_step = ODEEvaluator(self.options['ode_function'], 1)
+
+        self.orders = np.zeros(0, int)
+        self.num_jacobians = 0
+
+    def _compute_rate(self, y, t, static, dynamic):
+        evaluator = self.ode_step
+        evaluator.set_inputs(y.reshape((1, -1)), t=np.array([t]), static=static,
+            dynamic=dynamic.reshape((1, -1)))
+        return evaluator.compute()[0]
+
+    def _compute_jacobian(self, y, t, static, dynamic):
+        self._compute_rate(y, t, static, dynamic)
+        self.num_jacobians += 1
+        return self.ode_step.compute_jacobians()['y'][0]
+
+    def compute(self, inputs, outputs):
+        normalized_times = self.options['normalized_times']
+        max_order = self.options['max_order']
+        atol = self.options['atol']
+        rtol = self.options['rtol']
+        max_num_steps = self.options['max_num_steps']
+
+        t0, t1, y0, static, dynamic = self._unpack_inputs(inputs)
+
+        n = self.ode_step.state_size
+        num_times = len(normalized_times)
+        span = t1 - t0
+
+        out_times = t0 + normalized_times * span
+        t_end = out_times[-1]
+        y_out = np.zeros((num_times, 1, n))
+
+        def wrms(vec, weights):
+            return np.sqrt(np.mean((vec * weights) ** 2))
+
+        def get_dynamic(t):
+            return self._interpolate_dynamic(np.array([(t - t0) / span]), dynamic)[0]
+
+        # Nordsieck array, and the product of the linear operations since the last correction.
+        h = self._get_initial_step(t0, t1, y0, static, dynamic)
+        z = np.zeros((max_order + 1, n))
+        z[0] = y0[0]
+        z[1] = h * self._compute_rate(y0[0], out_times[0], static, get_dynamic(out_times[0]))
+        mtx = np.eye(max_order + 1)
+
+        def apply(op):
+            z[:] = op.dot(z)
+            mtx[:] = op.dot(mtx)
+
+        order = 1
+        order_wait = 2
+        eta_max = ETA_MAX_FIRST
+        tau = np.zeros(max_order + 2)
+        saved_ratio = 0.
+
+        jac = None
+        lu = None
+        gamma_lu = 0.
+        step_lu = 0
+        step_jac = 0
+        crate = 1.
+
+        self.h0_norm = h / span
+        self.num_rejected = 0
+        self.num_jacobians = 0
+        steps = []
+
+        output_steps = np.zeros(num_times, int)
+        output_weights = np.zeros((num_times, max_order + 1))
+        output_weights[0, 0] = 1.
+        y_out[0] = y0
+        i_out = 1
+
+        t = out_times[0]
+        num_attempts = 0
+        while i_out < num_times:
+            weights = 1. / (rtol * np.abs(z[0]) + atol)
+            num_error_fails = 0
+            num_conv_fails = 0
+            failed = failed_conv = False
+
+            while True:
+                num_attempts += 1
+                if num_attempts > max_num_steps:
+                    raise AnalysisError('Variable-order BDF exceeded %i steps' % max_num_steps)
+
+                # The steps end exactly at the last output time.
+                is_last = t + h >= t_end - 1e-12 * abs(span)
+                if is_last and t + h != t_end:
+                    apply(get_rescale_matrix(order, max_order, (t_end - t) / h))
+                    h = t_end - t
+
+                apply(get_predict_matrix(order, max_order))
+
+                l, tq = get_bdf_coefficients(order, h, tau, order_wait == 1)
+                c = 1. / l[1]
+                gamma = h * c
+                t_new = t + h
+                dynamic_new = get_dynamic(t_new)
+
+                # Modified Newton iteration on the correction y - z[0].
+                new_jac = False
+                if lu is None or failed or step_lu >= MAX_STEPS_ITERATION_MATRIX \
+                        or abs(gamma / gamma_lu - 1.) > MAX_GAMMA_CHANGE:
+                    if jac is None or failed_conv or step_jac >= MAX_STEPS_JACOBIAN:
+                        jac = self._compute_jacobian(z[0], t_new, static, dynamic_new)
+                        new_jac = True
+                        step_jac = 0
+                    lu = scipy.linalg.lu_factor(np.eye(n) - gamma * jac)
+                    gamma_lu = gamma
+                    step_lu = 0
+                    crate = 1.
+                failed = failed_conv = False
+
+                acor = np.zeros(n)
+                converged = False
+                for i_iter in range(MAX_NUM_CORRECTIONS):
+                    f = self._compute_rate(z[0] + acor, t_new, static, dynamic_new)
+                    delta = scipy.linalg.lu_solve(lu, c * (h * f - z[1]) - acor)
+                    if gamma != gamma_lu:
+                        delta *= 2. / (1. + gamma / gamma_lu)
+                    acor += delta
+
+                    norm = wrms(delta, weights)
+                    if i_iter > 0:
+                        crate = max(CRATE_DECAY * crate, norm / norm_old)
+                    if norm * min(1., crate) * tq['e'] / NEWTON_COEFF <= 1.:
+                        converged = True
+                        break
+                    if i_iter > 0 and norm > DIVERGENCE_RATIO * norm_old:
+                        break
+                    norm_old = norm
+
+                if not converged:
+                    apply(get_restore_matrix(order, max_order))
+                    failed = failed_conv = True
+                    if new_jac:
+                        num_conv_fails += 1
+                        self.num_rejected += 1
+                        if num_conv_fails >= MAX_NUM_FAILURES:
+                            raise AnalysisError('Variable-order BDF: corrector failed to converge')
+                        eta_max = 1.
+                        apply(get_rescale_matrix(order, max_order, ETA_CONV_FAIL))
+                        h *= ETA_CONV_FAIL
+                    continue
+
+                # Local error test.
+                error = wrms(acor, weights) * tq['e']
+                if error > 1.:
+                    apply(get_restore_matrix(order, max_order))
+                    failed = True
+                    num_error_fails += 1
+                    self.num_rejected += 1
+                    if num_error_fails >= MAX_NUM_FAILURES:
+                        raise AnalysisError('Variable-order BDF: error test failed repeatedly')
+                    eta_max = 1.
+
+                    if num_error_fails <= NUM_ERROR_FAILS_ETA:
+                        eta = 1. / ((BIAS * error) ** (1. / (order + 1)) + ADDON)
+                        eta = max(ETA_MIN, eta)
+                        if num_error_fails >= 2:
+                            eta = min(eta, ETA_MAX_ERROR_FAIL)
+                    else:
+                        # Unlike CVODE, z[1] is rescaled rather than re-evaluated at order 1,
+                        # so that all the operations between corrections remain linear.
+                        eta = ETA_MIN
+                        if order > 1:
+                            apply(get_order_decrease_matrix(order, max_order, h, tau))
+                            order -= 1
+                            order_wait = order + 1
+                        else:
+                            order_wait = LONG_WAIT
+                    apply(get_rescale_matrix(order, max_order, eta))
+                    h *= eta
+                    continue
+
+                break
+
+            # Complete the step.
+            step_lu += 1
+            step_jac += 1
+            tau[2:] = tau[1:-1]
+            tau[1] = h
+
+            l_pad = np.zeros(max_order + 1)
+            l_pad[:order + 1] = l
+            z += np.outer(l_pad, acor)
+
+            t_old = t
+            t = t_end if is_last else t_new
+            order_wait -= 1
+
+            save = False
+            if order_wait == 1 and order != max_order:
+                save = True
+                saved_ratio = tq['ratio']
+
+            # Choose the step size and the order of the next step.
+            new_order = order
+            eta = 1.
+            if eta_max != 1.:
+                eta = 1. / ((BIAS * error) ** (1. / (order + 1)) + ADDON)
+                if order_wait == 0:
+                    order_wait = 2
+                    eta_down = eta_up = 0.
+                    if order > 1:
+                        error_down = wrms(z[order], weights) * tq['e_down']
+                        eta_down = 1. / ((BIAS_DOWN * error_down) ** (1. / order) + ADDON)
+                    if order != max_order and saved_ratio != 0.:
+                        ratio = tq['ratio'] / saved_ratio * (h / tau[2]) ** (order + 1)
+                        error_up = wrms(acor - ratio * z[max_order], weights) * tq['e_up']
+                        eta_up = 1. / ((BIAS_UP * error_up) ** (1. / (order + 2)) + ADDON)
+
+                    if max(eta, eta_down, eta_up) < ETA_THRESHOLD:
+                        eta = 1.
+                    elif eta >= max(eta_down, eta_up):
+                        pass
+                    elif eta_down >= eta_up:
+                        eta = eta_down
+                        new_order = order - 1
+                    else:
+                        eta = eta_up
+                        new_order = order + 1
+                        save = True
+
+                if eta < ETA_THRESHOLD:
+                    eta = 1.
+                    new_order = order
+                else:
+                    eta = min(eta, eta_max)
+            else:
+                order_wait = max(order_wait, 2)
+            eta_max = ETA_MAX
+
+            if save:
+                z[max_order] = acor
+
+            keep = np.ones(max_order + 1)
+            if save:
+                keep[max_order] = 0.
+                l_pad[max_order] = 1.
+
+            steps.append({
+                'mtx': mtx.copy(), 'keep': keep, 'l': l_pad, 'c': c, 'order': order,
+                't_norm': (t - t0) / span, 'h_norm': h / span, 't_old_norm': (t_old - t0) / span,
+                'y': z[0].copy(),
+            })
+
+            while i_out < num_times and (out_times[i_out] <= t or is_last):
+                s = (out_times[i_out] - t) / h
+                output_steps[i_out] = len(steps)
+                output_weights[i_out] = get_interpolation_weights(order, max_order, s)
+                y_out[i_out, 0] = output_weights[i_out].dot(z)
+                i_out += 1
+
+            mtx[:] = np.eye(max_order + 1)
+            if new_order < order:
+                apply(get_order_decrease_matrix(order, max_order, h, tau))
+            elif new_order > order:
+                apply(get_order_increase_matrix(order, max_order, h, tau))
+            if new_order != order:
+                order = new_order
+                order_wait = order + 1
+            if eta != 1.:
+                apply(get_rescale_matrix(order, max_order, eta))
+                h *= eta
+
+        self._set_bdf_steps(steps, output_steps, output_weights)
+        self.step_times = t0 + self.step_norm_times * span
+        self.step_sizes = self.step_norm_sizes * span
+
+        for state_name, state_slice in iteritems(self.ode_step.state_slices):
+            y_name = get_name('y', state_name)
+            outputs[y_name] = y_out[:, :, state_slice].reshape(outputs[y_name].shape)
+
+    def _set_bdf_steps(self, steps, output_steps, output_weights):
+        # Accepted steps, with their end times and sizes normalized to [initial_time, final_time].
+        self.steps = steps
+        self.output_steps = output_steps
+        self.output_weights = output_weights
+
+        self.step_norm_times = np.array([step['t_old_norm'] for step in steps])
+        self.step_norm_sizes = np.array([step['h_norm'] for step in steps])
+        self.orders = np.array([step['order'] for step in steps], int)
+
+        # The ODE is evaluated at the first output time and at the end of each step.
+        all_norm_times = self.options['all_norm_times']
+        self.point_norm_times = np.concatenate([
+            self.options['normalized_times'][:1], [step['t_norm'] for step in steps]])
+        data, rows, cols = get_sparse_linear_spline(all_norm_times,
+            np.clip(self.point_norm_times, all_norm_times[0], all_norm_times[-1]))
+        self.dynamic_mtx = scipy.sparse.csr_matrix((data, (rows, cols)),
+            shape=(len(self.point_norm_times), len(all_norm_times)))
+
+    def compute_partials(self, inputs, partials):
+        t0, t1, y0, static, dynamic = self._unpack_inputs(inputs)
+        span = t1 - t0
+        n = self.ode_step.state_size
+
+        point_dynamic = self.dynamic_mtx.dot(dynamic)
+        point_y = [y0[0]] + [step['y'] for step in self.steps]
+        point_h = [self.h0_norm * span] + [step['h_norm'] * span for step in self.steps]
+
+        self.F = []
+        self.jacobians = []
+        self.lu = [None]
+        for i_point, norm_time in enumerate(self.point_norm_times):
+            evaluator = self.ode_step
+            self.F.append(self._compute_rate(point_y[i_point], t0 + norm_time * span,
+                static, point_dynamic[i_point]))
+            jacobians = evaluator.compute_jacobians()
+            self.jacobians.append({key: value[0] for key, value in iteritems(jacobians)})
+
+            if i_point > 0:
+                gamma = self.steps[i_point - 1]['c'] * point_h[i_point]
+                self.lu.append(scipy.linalg.lu_factor(np.eye(n) - gamma * jacobians['y'][0]))
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        evaluator = self.ode_step
+        n = evaluator.state_size
+        max_order = self.options['max_order']
+        num_times = len(self.output_steps)
+
+        y_names = [get_name('y', state_name) for state_name in evaluator.state_slices]
+        if not any(y_name in d_outputs for y_name in y_names):
+            return
+
+        t0, t1, y0, static, dynamic = self._unpack_inputs(inputs)
+        span = t1 - t0
+
+        if mode == 'fwd':
+            d_t0, d_t1, d_y0, d_static, d_dynamic = self._unpack_inputs(d_inputs)
+            d_span = d_t1 - d_t0
+            d_point_dynamic = self.dynamic_mtx.dot(d_dynamic)
+
+            def get_d_rate(i_point, d_h, d_y):
+                # Perturbation of h * f at a point, for a given perturbation of its state.
+                jacobians = self.jacobians[i_point]
+                h = self.h0_norm * span if i_point == 0 else self.steps[i_point - 1]['h_norm'] * span
+                d_t = d_t0 + self.point_norm_times[i_point] * d_span
+                return d_h * self.F[i_point] + h * (jacobians['y'].dot(d_y)
+                    + jacobians['t'] * d_t + jacobians['static'].dot(d_static)
+                    + jacobians['dynamic'].dot(d_point_dynamic[i_point]))
+
+            d_y_out = np.zeros((num_times, 1, n))
+
+            d_z = np.zeros((max_order + 1, n))
+            d_z[0] = d_y0[0]
+            d_z[1] = get_d_rate(0, self.h0_norm * d_span, d_y0[0])
+
+            for i_point in range(len(self.point_norm_times)):
+                if i_point > 0:
+                    step = self.steps[i_point - 1]
+                    c = step['c']
+
+                    d_zp = step['mtx'].dot(d_z)
+                    rhs = d_zp[0] - c * d_zp[1] + c * get_d_rate(i_point,
+                        step['h_norm'] * d_span, np.zeros(n))
+                    d_y = scipy.linalg.lu_solve(self.lu[i_point], rhs)
+                    d_z = step['keep'][:, None] * d_zp + np.outer(step['l'], d_y - d_zp[0])
+
+                for i_out in np.where(self.output_steps == i_point)[0]:
+                    d_y_out[i_out, 0] = self.output_weights[i_out].dot(d_z)
+
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    d_outputs[y_name] += d_y_out[:, :, state_slice].reshape(
+                        d_outputs[y_name].shape)
+
+        elif mode == 'rev':
+            # b_ denotes the adjoint (reverse-mode seed) of a variable.
+            b_y_out = np.zeros((num_times, n))
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y_name = get_name('y', state_name)
+                if y_name in d_outputs:
+                    b_y_out[:, state_slice] = d_outputs[y_name].reshape((num_times, -1))
+
+            b_span = 0.
+            b_t0 = 0.
+            b_static = np.zeros(evaluator.static_size)
+            b_point_dynamic = np.zeros((len(self.point_norm_times), evaluator.dynamic_size))
+
+            def add_b_rate(i_point, h_norm, b_rate):
+                # Adjoints of the inputs of h * f at a point, except its state.
+                jacobians = self.jacobians[i_point]
+                h = h_norm * span
+                b_t = h * jacobians['t'].dot(b_rate)
+                b_static[:] += h * jacobians['static'].T.dot(b_rate)
+                b_point_dynamic[i_point] = h * jacobians['dynamic'].T.dot(b_rate)
+                return h_norm * self.F[i_point].dot(b_rate) \
+                    + self.point_norm_times[i_point] * b_t, b_t
+
+            b_z = np.zeros((max_order + 1, n))
+            for i_point in range(len(self.point_norm_times) - 1, -1, -1):
+                for i_out in np.where(self.output_steps == i_point)[0]:
+                    b_z += np.outer(self.output_weights[i_out], b_y_out[i_out])
+
+                if i_point > 0:
+                    step = self.steps[i_point - 1]
+                    c = step['c']
+
+                    b_y = step['l'].dot(b_z)
+                    b_zp = step['keep'][:, None] * b_z
+                    b_zp[0] -= b_y
+
+                    b_rhs = scipy.linalg.lu_solve(self.lu[i_point], b_y, trans=1)
+                    b_zp[0] += b_rhs
+                    b_zp[1] -= c * b_rhs
+
+                    b_s, b_t = add_b_rate(i_point, step['h_norm'], c * b_rhs)
+                    b_span += b_s
+                    b_t0 += b_t
+
+                    b_z = step['mtx'].T.dot(b_zp)
+
+            b_y0 = b_z[0] + self.h0_norm * span * self.jacobians[0]['y'].T.dot(b_z[1])
+            b_s, b_t = add_b_rate(0, self.h0_norm, b_z[1])
+            b_span += b_s
+            b_t0 += b_t
+
+            b_dynamic = self.dynamic_mtx.T.dot(b_point_dynamic)
+
+            if 'initial_time' in d_inputs:
+                d_inputs['initial_time'] += b_t0 - b_span
+            if 'final_time' in d_inputs:
+                d_inputs['final_time'] += b_span
+
+            for state_name, state_slice in iteritems(evaluator.state_slices):
+                y0_name = get_name('y0', state_name)
+                if y0_name in d_inputs:
+                    d_inputs[y0_name] += b_y0[state_slice].reshape(d_inputs[y0_name].shape)
+
+            for parameter_name, parameter_slice in iteritems(evaluator.static_slices):
+                name = get_name('static_parameter', parameter_name)
+                if name in d_inputs:
+                    d_inputs[name] += b_static[parameter_slice].reshape(d_inputs[name].shape)
+
+            for parameter_name, parameter_slice in iteritems(evaluator.dynamic_slices):
+                name = get_name('dynamic_parameter', parameter_name)
+                if name in d_inputs:
+                    d_inputs[name] += b_dynamic[:, parameter_slice].reshape(
+                        d_inputs[name].shape)
@@ -0,0 +1,102 @@
+import numpy as np
+from six import iteritems
+
+from ozone.components.vectorized_output_comp import VectorizedOutputComp
+from ozone.utils.var_names import get_name
+
+
+class VectorizedOutput2Comp(VectorizedOutputComp):
+    """
+    Matrix-free counterpart of VectorizedOutputComp.
+
+    The outputs are copies and linear combinations of the step vectors,
+    so the derivatives are applied directly instead of being declared as partials.
+    """
+
+    def _declare_state_partials(self, state_name, state):
+        pass
+
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        self._apply_jacvec(inputs, d_inputs, d_outputs, mode, False)
+
+    def compute_multi_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        # The right-hand sides are stored along a trailing axis.
+        self._apply_jacvec(inputs, d_inputs, d_outputs, mode, True)
+
+    def _apply_jacvec(self, inputs, d_inputs, d_outputs, mode, multi):
+        num_starting_times = self.options['num_starting_times']
+        num_my_times = self.options['num_my_times']
+        num_step_vars = self.options['num_step_vars']
+        starting_coeffs = self.options['starting_coeffs']
+
+        num_times = num_starting_times + num_my_times - 1
+
+        has_starting_method = num_starting_times > 1
+        is_starting_method = starting_coeffs is not None
+
+        for state_name, state in iteritems(self.options['states']):
+            shape = state['shape']
+
+            y_name = get_name('y', state_name)
+            starting_state_name = get_name('starting_state', state_name)
+            out_state_name = get_name('state', state_name)
+            starting_name = get_name('starting', state_name)
+
+            # The number of right-hand sides is that of the copies of the state in its array.
+            if not multi:
+                extra_shape = ()
+            elif out_state_name in d_outputs:
+                extra_shape = (d_outputs[out_state_name].size
+                    // int(np.prod((num_times,) + shape)),)
+            elif y_name in d_inputs:
+                extra_shape = (d_inputs[y_name].size
+                    // int(np.prod((num_my_times, num_step_vars,) + shape)),)
+            else:
+                continue
+
+            y_shape = (num_my_times, num_step_vars,) + shape + extra_shape
+            starting_state_shape = (num_starting_times,) + shape + extra_shape
+            out_state_shape = (num_times,) + shape + extra_shape
+
+            if mode == 'fwd':
+                if out_state_name in d_outputs:
+                    d_state = np.zeros(out_state_shape)
+
+                    if y_name in d_inputs:
+                        d_state[num_starting_times - 1:] = \
+                            d_inputs[y_name].reshape(y_shape)[:, 0]
+
+                    if has_starting_method and starting_state_name in d_inputs:
+                        d_state[:num_starting_times - 1] = \
+                            d_inputs[starting_state_name].reshape(starting_state_shape)[:-1]
+
+                    d_outputs[out_state_name] += d_state.reshape(d_outputs[out_state_name].shape)
+
+                if is_starting_method and starting_name in d_outputs and y_name in d_inputs:
+                    d_outputs[starting_name] += np.einsum('ijk,jk...->i...',
+                        starting_coeffs, d_inputs[y_name].reshape(y_shape)
+                    ).reshape(d_outputs[starting_name].shape)
+
+            elif mode == 'rev':
+                if y_name in d_inputs:
+                    b_y = np.zeros(y_shape)
+
+                    if out_state_name in d_outputs:
+                        b_y[:, 0] = d_outputs[out_state_name].reshape(
+                            out_state_shape)[num_starting_times - 1:]
+
+                    if is_starting_method and starting_name in d_outputs:
+                        num_starting = starting_coeffs.shape[0]
+                        b_y += np.einsum('ijk,i...->jk...', starting_coeffs,
+                            d_outputs[starting_name].reshape((num_starting,) + shape + extra_shape))
+
+                    d_inputs[y_name] += b_y.reshape(d_inputs[y_name].shape)
+
+                if has_starting_method and starting_state_name in d_inputs \
+                        and out_state_name in d_outputs:
+                    b_starting_state = np.zeros(starting_state_shape)
+                    b_starting_state[:-1] = d_outputs[out_state_name].reshape(
+                        out_state_shape)[:num_starting_times - 1]
+
+                    d_inputs[starting_state_name] += b_starting_state.reshape(
+                        d_inputs[starting_state_name].shape)
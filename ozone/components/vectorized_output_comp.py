@@ -59,43 +59,65 @@ class VectorizedOutputComp(ExplicitComponent):
                     shape=(num_starting,) + shape,
                     units=state['units'])
 
-            y_arange = np.arange(num_my_times * num_step_vars * size).reshape(
-                (num_my_times, num_step_vars,) + shape)
+            self._declare_state_partials(state_name, state)
 
-            out_state_arange = np.arange(num_times * size).reshape(
-                (num_times,) + shape)
+    def _declare_state_partials(self, state_name, state):
+        num_starting_times = self.options['num_starting_times']
+        num_my_times = self.options['num_my_times']
+        num_step_vars = self.options['num_step_vars']
+        starting_coeffs = self.options['starting_coeffs']
 
-            data = np.ones(num_my_times * size, int)
-            rows = out_state_arange[num_starting_times - 1:, :].flatten()
-            cols = y_arange[:, 0, :].flatten()
+        num_times = num_starting_times + num_my_times - 1
 
-            self.declare_partials(out_state_name, y_name, val=data, rows=rows, cols=cols)
+        has_starting_method = num_starting_times > 1
+        is_starting_method = starting_coeffs is not None
 
-            if has_starting_method:
+        size = np.prod(state['shape'])
+        shape = state['shape']
 
-                starting_state_arange = np.arange(num_starting_times * size).reshape(
-                    (num_starting_times,) + shape)
+        y_name = get_name('y', state_name)
+        starting_state_name = get_name('starting_state', state_name)
+        out_state_name = get_name('state', state_name)
+        starting_name = get_name('starting', state_name)
 
-                data = np.ones((num_starting_times - 1) * size, int)
-                rows = out_state_arange[:num_starting_times - 1, :].flatten()
-                cols = starting_state_arange[:-1, :].flatten()
+        y_arange = np.arange(num_my_times * num_step_vars * size).reshape(
+            (num_my_times, num_step_vars,) + shape)
 
-                self.declare_partials(out_state_name, starting_state_name,
-                    val=data, rows=rows, cols=cols)
+        out_state_arange = np.arange(num_times * size).reshape(
+            (num_times,) + shape)
 
-            if is_starting_method:
+        data = np.ones(num_my_times * size, int)
+        rows = out_state_arange[num_starting_times - 1:, :].flatten()
+        cols = y_arange[:, 0, :].flatten()
+
+        self.declare_partials(out_state_name, y_name, val=data, rows=rows, cols=cols)
+
+        if has_starting_method:
+
+            starting_state_arange = np.arange(num_starting_times * size).reshape(
+                (num_starting_times,) + shape)
+
+            data = np.ones((num_starting_times - 1) * size, int)
+            rows = out_state_arange[:num_starting_times - 1, :].flatten()
+            cols = starting_state_arange[:-1, :].flatten()
+
+            self.declare_partials(out_state_name, starting_state_name,
+                val=data, rows=rows, cols=cols)
+
+        if is_starting_method:
+            num_starting = starting_coeffs.shape[0]
 
-                starting_arange = np.arange(num_starting * size).reshape(
-                    (num_starting,) + shape)
+            starting_arange = np.arange(num_starting * size).reshape(
+                (num_starting,) + shape)
 
-                # (num_starting, num_times, num_step_vars,) + shape
-                data = np.einsum('ijk,...->ijk...', starting_coeffs, np.ones(shape)).flatten()
-                rows = np.einsum('jk,i...->ijk...',
-                    np.ones((num_times, num_step_vars), int), starting_arange).flatten()
-                cols = np.einsum('i,jk...->ijk...',
-                    np.ones(num_starting, int), y_arange).flatten()
+            # (num_starting, num_times, num_step_vars,) + shape
+            data = np.einsum('ijk,...->ijk...', starting_coeffs, np.ones(shape)).flatten()
+            rows = np.einsum('jk,i...->ijk...',
+                np.ones((num_times, num_step_vars), int), starting_arange).flatten()
+            cols = np.einsum('i,jk...->ijk...',
+                np.ones(num_starting, int), y_arange).flatten()
 
-                self.declare_partials(starting_name, y_name, val=data, rows=rows, cols=cols)
+            self.declare_partials(starting_name, y_name, val=data, rows=rows, cols=cols)
 
     def compute(self, inputs, outputs):
         num_starting_times = self.options['num_starting_times']
@@ -74,13 +74,14 @@ class VectorizedStageComp(ExplicitComponent):
 
             # -----------------
 
-            # (num_times - 1, num_stages, num_stages,) + shape
-            rows = np.einsum('ij...,k->ijk...', Y_arange, np.ones(num_stages, int)).flatten()
-
-            cols = np.einsum('jk...,i->ijk...',
-                np.ones((num_stages, num_stages,) + shape, int), h_arange).flatten()
+            # (num_times - 1, num_stages,) + shape
+            rows = Y_arange.flatten()
+            cols = np.einsum('j...,i->ij...',
+                np.ones((num_stages,) + shape, int), h_arange).flatten()
             self.declare_partials(Y_out_name, 'h_vec', rows=rows, cols=cols)
 
+            # (num_times - 1, num_stages, num_stages,) + shape
+            rows = np.einsum('ij...,k->ijk...', Y_arange, np.ones(num_stages, int)).flatten()
             cols = np.einsum('ik...,j->ijk...', F_arange, np.ones(num_stages, int)).flatten()
             self.declare_partials(Y_out_name, F_name, rows=rows, cols=cols)
 
@@ -133,5 +134,6 @@ class VectorizedStageComp(ExplicitComponent):
             partials[Y_out_name, F_name] = np.einsum(
                 '...,jk,i->ijk...', np.ones(shape), glm_A, inputs['h_vec']).flatten()
 
+            # (num_times - 1, num_stages,) + shape
             partials[Y_out_name, 'h_vec'] = np.einsum(
-                'jk,ik...->ijk...', glm_A, inputs[F_name]).flatten()
+                'jk,ik...->ij...', glm_A, inputs[F_name]).flatten()
@@ -1,15 +1,22 @@
 import numpy as np
 from six import iteritems
-import scipy.sparse
-import scipy.sparse.linalg
 
 from openmdao.api import ExplicitComponent
 
 from ozone.utils.var_names import get_name
 from ozone.utils.units import get_rate_units
+from ozone.utils.block_bidiagonal import BlockBidiagonalSolver
 
 
 class VectorizedStageStepComp(ExplicitComponent):
+    """
+    Compute the stage values from the stage derivatives for all time steps.
+
+    The step vectors are eliminated with the step recurrence, so that
+    Y_out = -Y_in + h A F + U y, where y[i] - V y[i - 1] = h B F[i - 1] and y[0] = y0.
+    The derivatives with respect to h_vec, F, and y0 are dense and lower block-triangular,
+    so they are applied matrix-free as sweeps over the time steps instead of being assembled.
+    """
 
     def initialize(self):
         self.options.declare('states', types=dict)
@@ -27,17 +34,9 @@ class VectorizedStageStepComp(ExplicitComponent):
         num_times = self.options['num_times']
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
-        glm_A = self.options['glm_A']
-        glm_U = self.options['glm_U']
-        glm_B = self.options['glm_B']
         glm_V = self.options['glm_V']
 
-        self.mtx_y0_dict = {}
-        self.mtx_dict = {}
-        self.mtx_h_dict = {}
-
-        h_arange = np.arange(num_times - 1)
-        num_h = num_times - 1
+        self.mtx_y = BlockBidiagonalSolver(glm_V)
 
         self.add_input('h_vec', shape=(num_times - 1), units=time_units)
 
@@ -50,26 +49,6 @@ class VectorizedStageStepComp(ExplicitComponent):
             Y_in_name = get_name('Y_in', state_name)
             Y_out_name = get_name('Y_out', state_name)
 
-            # --------------------------------------------------------------------------------
-
-            y0_arange = np.arange(num_step_vars * size).reshape((num_step_vars,) + shape)
-
-            F_arange = np.arange((num_times - 1) * num_stages * size).reshape(
-                (num_times - 1, num_stages,) + shape)
-
-            Y_arange = np.arange((num_times - 1) * num_stages * size).reshape(
-                (num_times - 1, num_stages,) + shape)
-
-            y_arange = np.arange(num_times * num_step_vars * size).reshape(
-                (num_times, num_step_vars,) + shape)
-
-            num_y0 = np.prod(y0_arange.shape)
-            num_F = np.prod(F_arange.shape)
-            num_Y = np.prod(Y_arange.shape)
-            num_y = np.prod(y_arange.shape)
-
-            # --------------------------------------------------------------------------------
-
             self.add_input(y0_name,
                 shape=(num_step_vars,) + shape,
                 units=state['units'])
@@ -88,143 +67,109 @@ class VectorizedStageStepComp(ExplicitComponent):
 
             # -----------------
 
-            self.declare_partials(Y_out_name, 'h_vec')
-            self.declare_partials(Y_out_name, y0_name)
-            self.declare_partials(Y_out_name, F_name)
-
-            # -----------------
-
             ones = -np.ones((num_times - 1) * num_stages * size)
             arange = np.arange((num_times - 1) * num_stages * size)
             self.declare_partials(Y_out_name, Y_in_name, val=ones, rows=arange, cols=arange)
 
-            # --------------------------------------------------------------------------------
-            # mtx_y0: num_stages x num_step_vars x ...
-
-            data = np.ones((num_step_vars,) + shape).flatten()
-            rows = y_arange[0, :, :].flatten()
-            cols = y0_arange.flatten()
-            mtx_y0 = scipy.sparse.csc_matrix((data, (rows, cols)), shape=(num_y, num_y0)).toarray()
-
-            # --------------------------------------------------------------------------------
-            # mtx_A: (num_times - 1) x num_stages x num_stages x ...
-
-            data = np.einsum('jk,i...->ijk...',
-                glm_A, np.ones((num_times - 1,) + shape)).flatten()
-            rows = np.einsum('ij...,k->ijk...',
-                Y_arange, np.ones(num_stages, int)).flatten()
-            cols = np.einsum('ik...,j->ijk...',
-                F_arange, np.ones(num_stages, int)).flatten()
-            mtx_A = scipy.sparse.csc_matrix((data, (rows, cols)), shape=(num_Y, num_F)).toarray()
-
-            # --------------------------------------------------------------------------------
-            # mtx_B: (num_times - 1) x num_step_vars x num_stages x ...
-
-            data = np.einsum('jk,i...->ijk...',
-                glm_B, np.ones((num_times - 1,) + shape)).flatten()
-            rows = np.einsum('ij...,k->ijk...',
-                y_arange[1:, :, :], np.ones(num_stages, int)).flatten()
-            cols = np.einsum('ik...,j->ijk...',
-                F_arange, np.ones(num_step_vars, int)).flatten()
-            mtx_B = scipy.sparse.csc_matrix((data, (rows, cols)), shape=(num_y, num_F)).toarray()
-
-            # --------------------------------------------------------------------------------
-            # mtx_U: (num_times - 1) x num_stages x num_step_vars x ...
-
-            data = np.einsum('jk,i...->ijk...',
-                glm_U, np.ones((num_times - 1,) + shape)).flatten()
-            rows = np.einsum('ij...,k->ijk...',
-                Y_arange, np.ones(num_step_vars, int)).flatten()
-            cols = np.einsum('ik...,j->ijk...',
-                y_arange[:-1, :, :], np.ones(num_stages, int)).flatten()
-            mtx_U = scipy.sparse.csc_matrix((data, (rows, cols)), shape=(num_Y, num_y)).toarray()
-
-            # --------------------------------------------------------------------------------
-            # mtx_y
-
-            data_list = []
-            rows_list = []
-            cols_list = []
-
-            # identity
-            data = np.ones(num_y)
-            rows = np.arange(num_y)
-            cols = np.arange(num_y)
-            data_list.append(data); rows_list.append(rows); cols_list.append(cols)
-
-            # (num_times - 1) x num_step_var x num_step_var x ...
-            data = np.einsum('jk,i...->ijk...',
-                -glm_V, np.ones((num_times - 1,) + shape)).flatten()
-            rows = np.einsum('ij...,k->ijk...',
-                y_arange[1:, :, :], np.ones(num_step_vars, int)).flatten()
-            cols = np.einsum('ik...,j->ijk...',
-                y_arange[:-1, :, :], np.ones(num_step_vars, int)).flatten()
-            data_list.append(data); rows_list.append(rows); cols_list.append(cols)
-
-            # concatenate
-            data = np.concatenate(data_list)
-            rows = np.concatenate(rows_list)
-            cols = np.concatenate(cols_list)
-
-            mtx_y = scipy.sparse.csc_matrix((data, (rows, cols)), shape=(num_y, num_y))
-            mtx_y_inv = scipy.sparse.linalg.splu(mtx_y)
-
-            # --------------------------------------------------------------------------------
-            # mtx_h
-
-            data = np.ones(num_F)
-            rows = np.arange(num_F)
-            cols = np.einsum('i,j...->ij...',
-                h_arange, np.ones((num_stages,) + shape, int)).flatten()
-            mtx_h = scipy.sparse.csc_matrix((data, (rows, cols)), shape=(num_F, num_h)).toarray()
-
-            # --------------------------------------------------------------------------------
-            self.mtx_y0_dict[state_name] = mtx_U.dot(mtx_y_inv.solve(mtx_y0))
-            self.mtx_dict[state_name] = mtx_A + mtx_U.dot(mtx_y_inv.solve(mtx_B))
-            self.mtx_h_dict[state_name] = mtx_h
+    def _compute_Y(self, hF, y0):
+        # Y = A hF + U y, where y is the solution of the step recurrence.
+        glm_A = self.options['glm_A']
+        glm_U = self.options['glm_U']
+        glm_B = self.options['glm_B']
 
-    def compute(self, inputs, outputs):
-        num_times = self.options['num_times']
-        num_stages = self.options['num_stages']
+        y = np.empty((hF.shape[0] + 1,) + y0.shape)
+        y[0] = y0
+        np.einsum('jk,ik...->ij...', glm_B, hF, out=y[1:])
+        self.mtx_y.solve(y, y, 'N')
+
+        return np.einsum('jk,ik...->ij...', glm_A, hF) \
+            + np.einsum('jk,ik...->ij...', glm_U, y[:-1])
+
+    def _compute_Y_adjoint(self, b_Y):
+        # Transpose of _compute_Y; returns the adjoints of hF and y0.
         num_step_vars = self.options['num_step_vars']
+        glm_A = self.options['glm_A']
+        glm_U = self.options['glm_U']
+        glm_B = self.options['glm_B']
 
-        for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
-            shape = state['shape']
+        b_y = np.zeros((b_Y.shape[0] + 1, num_step_vars,) + b_Y.shape[2:])
+        np.einsum('kj,ik...->ij...', glm_U, b_Y, out=b_y[:-1])
+        self.mtx_y.solve(b_y, b_y, 'T')
+
+        b_hF = np.einsum('kj,ik...->ij...', glm_A, b_Y) \
+            + np.einsum('kj,ik...->ij...', glm_B, b_y[1:])
+
+        return b_hF, b_y[0]
 
+    def compute(self, inputs, outputs):
+        for state_name, state in iteritems(self.options['states']):
             F_name = get_name('F', state_name)
             Y_out_name = get_name('Y_out', state_name)
             Y_in_name = get_name('Y_in', state_name)
             y0_name = get_name('y0', state_name)
 
-            mtx_y0 = self.mtx_y0_dict[state_name]
-            mtx = self.mtx_dict[state_name]
-            mtx_h = self.mtx_h_dict[state_name]
+            hF = np.einsum('i,i...->i...', inputs['h_vec'], inputs[F_name])
 
-            Y_shape = outputs[Y_out_name].shape
+            outputs[Y_out_name] = -inputs[Y_in_name] + self._compute_Y(hF, inputs[y0_name])
 
-            outputs[Y_out_name] = -inputs[Y_in_name] \
-                + mtx.dot(mtx_h.dot(inputs['h_vec']) * inputs[F_name].flatten()).reshape(Y_shape) \
-                + mtx_y0.dot(inputs[y0_name].flatten()).reshape(Y_shape)
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        self._apply_jacvec(inputs, d_inputs, d_outputs, mode, False)
 
-    def compute_partials(self, inputs, partials):
+    def compute_multi_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        # The right-hand sides are stored along a trailing axis, which the sweeps carry along.
+        self._apply_jacvec(inputs, d_inputs, d_outputs, mode, True)
+
+    def _apply_jacvec(self, inputs, d_inputs, d_outputs, mode, multi):
         num_times = self.options['num_times']
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
 
         for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
             shape = state['shape']
 
             F_name = get_name('F', state_name)
             Y_out_name = get_name('Y_out', state_name)
-            Y_in_name = get_name('Y_in', state_name)
             y0_name = get_name('y0', state_name)
 
-            mtx_y0 = self.mtx_y0_dict[state_name]
-            mtx = self.mtx_dict[state_name]
-            mtx_h = self.mtx_h_dict[state_name]
-
-            partials[Y_out_name, 'h_vec'][:, :] = mtx.dot(np.diag(inputs[F_name].flatten())).dot(mtx_h)
-            partials[Y_out_name, F_name][:, :] = mtx.dot(np.diag(mtx_h.dot(inputs['h_vec'])))
-            partials[Y_out_name, y0_name][:, :] = mtx_y0
+            if Y_out_name not in d_outputs:
+                continue
+
+            F_shape = (num_times - 1, num_stages,) + shape
+            y0_shape = (num_step_vars,) + shape
+
+            # The number of right-hand sides is that of the copies of Y_out in its array.
+            if multi:
+                extra_shape = (d_outputs[Y_out_name].size // int(np.prod(F_shape)),)
+            else:
+                extra_shape = ()
+
+            # Broadcast h_vec and F against the trailing axis of the right-hand sides.
+            h_shape = (num_times - 1,) + (1,) * (1 + len(shape))
+            F = inputs[F_name].reshape(F_shape + (1,) * len(extra_shape))
+            h_vec = inputs['h_vec'].reshape(h_shape + (1,) * len(extra_shape))
+
+            if mode == 'fwd':
+                d_hF = np.zeros(F_shape + extra_shape)
+                d_y0 = np.zeros(y0_shape + extra_shape)
+
+                if 'h_vec' in d_inputs:
+                    d_hF += d_inputs['h_vec'].reshape(h_shape + extra_shape) * F
+                if F_name in d_inputs:
+                    d_hF += h_vec * d_inputs[F_name].reshape(F_shape + extra_shape)
+                if y0_name in d_inputs:
+                    d_y0[:] = d_inputs[y0_name].reshape(y0_shape + extra_shape)
+
+                d_outputs[Y_out_name] += self._compute_Y(d_hF, d_y0).reshape(
+                    d_outputs[Y_out_name].shape)
+
+            elif mode == 'rev':
+                b_hF, b_y0 = self._compute_Y_adjoint(
+                    d_outputs[Y_out_name].reshape(F_shape + extra_shape))
+
+                if 'h_vec' in d_inputs:
+                    d_inputs['h_vec'] += np.sum(b_hF * F, axis=tuple(range(1, 2 + len(shape)))
+                        ).reshape(d_inputs['h_vec'].shape)
+                if F_name in d_inputs:
+                    d_inputs[F_name] += (h_vec * b_hF).reshape(d_inputs[F_name].shape)
+                if y0_name in d_inputs:
+                    d_inputs[y0_name] += b_y0.reshape(d_inputs[y0_name].shape)
@@ -1,15 +1,21 @@
 import numpy as np
 from six import iteritems
-import scipy.sparse
-import scipy.sparse.linalg
 
 from openmdao.api import ExplicitComponent
 
 from ozone.utils.var_names import get_name
 from ozone.utils.units import get_rate_units
+from ozone.utils.block_bidiagonal import BlockBidiagonalSolver
 
 
 class VectorizedStep2Comp(ExplicitComponent):
+    """
+    Explicit, matrix-free counterpart of VectorizedStepComp.
+
+    The step vectors are computed by solving y[i] - V y[i - 1] = h B F[i - 1] with y[0] = y0,
+    and the derivatives are applied as forward and reverse sweeps of the same recurrence,
+    so no partials are assembled.
+    """
 
     def initialize(self):
         self.options.declare('states', types=dict)
@@ -25,47 +31,19 @@ class VectorizedStep2Comp(ExplicitComponent):
         num_times = self.options['num_times']
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
-        glm_B = self.options['glm_B']
         glm_V = self.options['glm_V']
 
-        self.mtx_lu_dict = {}
-        self.mtx_y0_dict = {}
-        self.mtx_h_dict = {}
-        self.mtx_hf_dict = {}
-
-        self.num_y0_dict = {}
-        self.num_F_dict = {}
-        self.num_y_dict = {}
-
-        h_arange = np.arange(num_times - 1)
-        num_h = num_times - 1
+        self.mtx_y = BlockBidiagonalSolver(glm_V)
 
         self.add_input('h_vec', shape=(num_times - 1), units=time_units)
 
         for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
             shape = state['shape']
 
             y0_name = get_name('y0', state_name)
             F_name = get_name('F', state_name)
             y_name = get_name('y', state_name)
 
-            # --------------------------------------------------------------------------------
-
-            y0_arange = np.arange(num_step_vars * size).reshape((num_step_vars,) + shape)
-
-            F_arange = np.arange((num_times - 1) * num_stages * size).reshape(
-                (num_times - 1, num_stages,) + shape)
-
-            y_arange = np.arange(num_times * num_step_vars * size).reshape(
-                (num_times, num_step_vars,) + shape)
-
-            num_y0 = np.prod(y0_arange.shape)
-            num_F = np.prod(F_arange.shape)
-            num_y = np.prod(y_arange.shape)
-
-            # --------------------------------------------------------------------------------
-
             self.add_input(y0_name,
                 shape=(num_step_vars,) + shape,
                 units=state['units'])
@@ -78,154 +56,95 @@ class VectorizedStep2Comp(ExplicitComponent):
                 shape=(num_times, num_step_vars,) + shape,
                 units=state['units'])
 
-            # --------------------------------------------------------------------------------
-
-            data_list = []
-            rows_list = []
-            cols_list = []
-
-            # y identity
-            data = np.ones(num_y)
-            rows = np.arange(num_y)
-            cols = np.arange(num_y)
-            data_list.append(data); rows_list.append(rows); cols_list.append(cols)
-
-            # V blocks: (num_times - 1) x num_step_var x num_step_var x ...
-            data = np.einsum('jk,i...->ijk...',
-                -glm_V, np.ones((num_times - 1,) + shape)).flatten()
-            rows = np.einsum('ij...,k->ijk...',
-                y_arange[1:, :, :], np.ones(num_step_vars, int)).flatten()
-            cols = np.einsum('ik...,j->ijk...',
-                y_arange[:-1, :, :], np.ones(num_step_vars, int)).flatten()
-            data_list.append(data); rows_list.append(rows); cols_list.append(cols)
-
-            # concatenate
-            data = np.concatenate(data_list)
-            rows = np.concatenate(rows_list)
-            cols = np.concatenate(cols_list)
-
-            mtx = scipy.sparse.csc_matrix(
-                (data, (rows, cols)),
-                shape=(num_y, num_y))
-
-            self.mtx_lu_dict[state_name] = scipy.sparse.linalg.splu(mtx)
-
-            # --------------------------------------------------------------------------------
-
-            data = np.ones(num_y0)
-            rows = y_arange[0, :, :].flatten()
-            cols = np.arange(num_y0)
-            self.mtx_y0_dict[state_name] = scipy.sparse.csc_matrix(
-                (data, (rows, cols)),
-                shape=(num_y, num_y0))
-
-            # --------------------------------------------------------------------------------
-
-            data = np.ones(num_F)
-            rows = np.arange(num_F)
-            cols = np.einsum('i,j...->ij...',
-                h_arange, np.ones((num_stages,) + shape, int)).flatten()
-            self.mtx_h_dict[state_name] = scipy.sparse.csc_matrix(
-                (data, (rows, cols)),
-                shape=(num_F, num_h))
-
-            # --------------------------------------------------------------------------------
-
-            # B blocks: (num_times - 1) x num_step_vars x num_stage x ...
-            data = np.einsum('jk,i...->ijk...',
-                glm_B, np.ones((num_times - 1,) + shape)).flatten()
-            rows = np.einsum('ij...,k->ijk...',
-                y_arange[1:, :, :], np.ones(num_stages, int)).flatten()
-            cols = np.einsum('ik...,j->ijk...',
-                F_arange, np.ones(num_step_vars, int)).flatten()
-
-            self.mtx_hf_dict[state_name] = scipy.sparse.csc_matrix(
-                (data, (rows, cols)),
-                shape=(num_y, num_F))
+    def _compute_y(self, hF, y0):
+        glm_B = self.options['glm_B']
 
-    def compute(self, inputs, outputs):
-        num_times = self.options['num_times']
-        num_stages = self.options['num_stages']
-        num_step_vars = self.options['num_step_vars']
+        y = np.empty((hF.shape[0] + 1,) + y0.shape)
+        y[0] = y0
+        np.einsum('jk,ik...->ij...', glm_B, hF, out=y[1:])
+        self.mtx_y.solve(y, y, 'N')
 
-        for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
-            shape = state['shape']
+        return y
+
+    def _compute_y_adjoint(self, b_y):
+        glm_B = self.options['glm_B']
+
+        b_rhs = np.empty(b_y.shape)
+        self.mtx_y.solve(b_y, b_rhs, 'T')
 
+        b_hF = np.einsum('kj,ik...->ij...', glm_B, b_rhs[1:])
+
+        return b_hF, b_rhs[0]
+
+    def compute(self, inputs, outputs):
+        for state_name, state in iteritems(self.options['states']):
             y0_name = get_name('y0', state_name)
             F_name = get_name('F', state_name)
             y_name = get_name('y', state_name)
 
-            mtx_lu = self.mtx_lu_dict[state_name]
-            mtx_y0 = self.mtx_y0_dict[state_name]
-            mtx_h = self.mtx_h_dict[state_name]
-            mtx_hf = self.mtx_hf_dict[state_name]
+            hF = np.einsum('i,i...->i...', inputs['h_vec'], inputs[F_name])
 
-            # ------------------------------------------------------------------------------
+            outputs[y_name] = self._compute_y(hF, inputs[y0_name])
 
-            vec = mtx_h.dot(inputs['h_vec']) * inputs[F_name].flatten()
-            vec = mtx_hf.dot(vec)
-            vec = mtx_lu.solve(vec)
+    def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        self._apply_jacvec(inputs, d_inputs, d_outputs, mode, False)
 
-            outputs[y_name] = vec.reshape((num_times, num_step_vars,) + shape)
+    def compute_multi_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        # The right-hand sides are stored along a trailing axis, which the sweeps carry along.
+        self._apply_jacvec(inputs, d_inputs, d_outputs, mode, True)
 
-            outputs[y_name][0, :, :] -= inputs[y0_name]
-
-    def compute_jacvec_product(self, inputs, outputs, d_inputs, d_outputs, mode):
+    def _apply_jacvec(self, inputs, d_inputs, d_outputs, mode, multi):
         num_times = self.options['num_times']
         num_stages = self.options['num_stages']
         num_step_vars = self.options['num_step_vars']
 
         for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
             shape = state['shape']
 
             y0_name = get_name('y0', state_name)
             F_name = get_name('F', state_name)
             y_name = get_name('y', state_name)
 
-            mtx_lu = self.mtx_lu_dict[state_name]
-            mtx_y0 = self.mtx_y0_dict[state_name]
-            mtx_h = self.mtx_h_dict[state_name]
-            mtx_hf = self.mtx_hf_dict[state_name]
-
-            # ------------------------------------------------------------------------------
+            if y_name not in d_outputs:
+                continue
 
-            if mode == 'fwd':
-                if y_name in d_outputs:
-                    if y0_name in d_inputs:
-                        d_outputs[y_name][0, :, :] -= d_inputs[y0_name]
+            F_shape = (num_times - 1, num_stages,) + shape
+            y0_shape = (num_step_vars,) + shape
+            y_shape = (num_times, num_step_vars,) + shape
 
-                    if F_name in d_inputs:
-                        vec = mtx_h.dot(inputs['h_vec']) * d_inputs[F_name].flatten()
-                        vec = mtx_hf.dot(vec)
-                        vec = mtx_lu.solve(vec)
+            # The number of right-hand sides is that of the copies of y in its array.
+            if multi:
+                extra_shape = (d_outputs[y_name].size // int(np.prod(y_shape)),)
+            else:
+                extra_shape = ()
 
-                        d_outputs[y_name] += vec.reshape(
-                            (num_times, num_step_vars,) + shape)
+            # Broadcast h_vec and F against the trailing axis of the right-hand sides.
+            h_shape = (num_times - 1,) + (1,) * (1 + len(shape))
+            F = inputs[F_name].reshape(F_shape + (1,) * len(extra_shape))
+            h_vec = inputs['h_vec'].reshape(h_shape + (1,) * len(extra_shape))
 
-                    if 'h_vec' in d_inputs:
-                        vec = mtx_h.dot(d_inputs['h_vec']) * inputs[F_name].flatten()
-                        vec = mtx_hf.dot(vec)
-                        vec = mtx_lu.solve(vec)
+            if mode == 'fwd':
+                d_hF = np.zeros(F_shape + extra_shape)
+                d_y0 = np.zeros(y0_shape + extra_shape)
 
-                        d_outputs[y_name] += vec.reshape(
-                            (num_times, num_step_vars,) + shape)
+                if 'h_vec' in d_inputs:
+                    d_hF += d_inputs['h_vec'].reshape(h_shape + extra_shape) * F
+                if F_name in d_inputs:
+                    d_hF += h_vec * d_inputs[F_name].reshape(F_shape + extra_shape)
+                if y0_name in d_inputs:
+                    d_y0[:] = d_inputs[y0_name].reshape(y0_shape + extra_shape)
 
-            # ------------------------------------------------------------------------------
+                d_outputs[y_name] += self._compute_y(d_hF, d_y0).reshape(
+                    d_outputs[y_name].shape)
 
             elif mode == 'rev':
-                if y_name in d_outputs:
-                    if y0_name in d_inputs:
-                        d_inputs[y0_name] -= d_outputs[y_name][0, :, :]
-
-                    vec = d_outputs[y_name].flatten()
-                    vec = mtx_lu.solve(vec, 'T')
-                    vec = mtx_hf.T.dot(vec)
-
-                    if F_name in d_inputs:
-                        d_inputs[F_name] += (mtx_h.dot(inputs['h_vec']) * vec).reshape(
-                            (num_times - 1, num_stages,) + shape)
-
-                    if 'h_vec' in d_inputs:
-                        d_inputs['h_vec'] += mtx_h.T.dot(vec * inputs[F_name].flatten())
+                b_hF, b_y0 = self._compute_y_adjoint(
+                    d_outputs[y_name].reshape(y_shape + extra_shape))
+
+                if 'h_vec' in d_inputs:
+                    d_inputs['h_vec'] += np.sum(b_hF * F, axis=tuple(range(1, 2 + len(shape)))
+                        ).reshape(d_inputs['h_vec'].shape)
+                if F_name in d_inputs:
+                    d_inputs[F_name] += (h_vec * b_hF).reshape(d_inputs[F_name].shape)
+                if y0_name in d_inputs:
+                    d_inputs[y0_name] += b_y0.reshape(d_inputs[y0_name].shape)
@@ -1,12 +1,11 @@
 import numpy as np
 from six import iteritems
-import scipy.sparse
-import scipy.sparse.linalg
 
 from openmdao.api import ImplicitComponent
 
 from ozone.utils.var_names import get_name
 from ozone.utils.units import get_rate_units
+from ozone.utils.block_bidiagonal import BlockBidiagonalSolver
 
 
 class VectorizedStepComp(ImplicitComponent):
@@ -28,8 +27,8 @@ class VectorizedStepComp(ImplicitComponent):
         glm_B = self.options['glm_B']
         glm_V = self.options['glm_V']
 
-        self.dy_dy = dy_dy = {}
-        self.dy_dy_inv = dy_dy_inv = {}
+        # dy_dy is block lower-bidiagonal with I on the diagonal and -glm_V below it.
+        self.dy_dy = BlockBidiagonalSolver(glm_V)
 
         h_arange = np.arange(num_times - 1)
 
@@ -82,14 +81,6 @@ class VectorizedStepComp(ImplicitComponent):
             rows = np.concatenate([rows1, rows2])
             cols = np.concatenate([cols1, cols2])
 
-            dy_dy[state_name] = scipy.sparse.csc_matrix(
-                (data, (rows, cols)),
-                shape=(
-                    num_times * num_step_vars * size,
-                    num_times * num_step_vars * size))
-
-            dy_dy_inv[state_name] = scipy.sparse.linalg.splu(dy_dy[state_name])
-
             self.declare_partials(y_name, y_name, val=data, rows=rows, cols=cols)
 
             # -----------------
@@ -103,13 +94,14 @@ class VectorizedStepComp(ImplicitComponent):
 
             # -----------------
 
-            # (num_times - 1, num_step_vars, num_stages,) + shape
-            rows = np.einsum('ij...,k->ijk...', y_arange[1:, :, :], np.ones(num_stages)).flatten()
-
-            cols = np.einsum('jk...,i->ijk...',
-                np.ones((num_step_vars, num_stages,) + shape), h_arange).flatten()
+            # (num_times - 1, num_step_vars,) + shape
+            rows = y_arange[1:, :, :].flatten()
+            cols = np.einsum('j...,i->ij...',
+                np.ones((num_step_vars,) + shape, int), h_arange).flatten()
             self.declare_partials(y_name, 'h_vec', rows=rows, cols=cols)
 
+            # (num_times - 1, num_step_vars, num_stages,) + shape
+            rows = np.einsum('ij...,k->ijk...', y_arange[1:, :, :], np.ones(num_stages)).flatten()
             cols = np.einsum('ik...,j->ijk...', F_arange, np.ones(num_step_vars)).flatten()
             self.declare_partials(y_name, F_name, rows=rows, cols=cols)
 
@@ -128,12 +120,7 @@ class VectorizedStepComp(ImplicitComponent):
             y0_name = get_name('y0', state_name)
             y_name = get_name('y', state_name)
 
-            # dy_dy term
-            in_vec = outputs[y_name].reshape((num_times * num_step_vars * size))
-            out_vec = dy_dy[state_name].dot(in_vec).reshape(
-                (num_times, num_step_vars,) + shape)
-
-            residuals[y_name] = out_vec # y term
+            dy_dy.multiply(outputs[y_name], residuals[y_name]) # y term
             residuals[y_name][0, :, :] -= inputs[y0_name] # y0 term
             residuals[y_name][1:, :, :] -= np.einsum('jl,i,il...->ij...',
                 glm_B, inputs['h_vec'], inputs[F_name]) # hF term
@@ -143,7 +130,7 @@ class VectorizedStepComp(ImplicitComponent):
         num_step_vars = self.options['num_step_vars']
         glm_B = self.options['glm_B']
 
-        dy_dy_inv = self.dy_dy_inv
+        dy_dy = self.dy_dy
 
         for state_name, state in iteritems(self.options['states']):
             size = np.prod(state['shape'])
@@ -153,13 +140,13 @@ class VectorizedStepComp(ImplicitComponent):
             y0_name = get_name('y0', state_name)
             y_name = get_name('y', state_name)
 
-            vec = np.zeros((num_times, num_step_vars,) + shape)
-            vec[0, :, :] += inputs[y0_name] # y0 term
-            vec[1:, :, :] += np.einsum('jl,i,il...->ij...',
-                glm_B, inputs['h_vec'], inputs[F_name]) # hF term
+            # The right-hand side is assembled in the output vector and solved in place.
+            vec = outputs[y_name]
+            vec[0, :, :] = inputs[y0_name] # y0 term
+            np.einsum('jl,i,il...->ij...',
+                glm_B, inputs['h_vec'], inputs[F_name], out=vec[1:, :, :]) # hF term
 
-            outputs[y_name] = dy_dy_inv[state_name].solve(vec.flatten(), 'N').reshape(
-                (num_times, num_step_vars,) + shape)
+            dy_dy.solve(vec, vec, 'N')
 
     def linearize(self, inputs, outputs, partials):
         glm_B = self.options['glm_B']
@@ -177,60 +164,21 @@ class VectorizedStepComp(ImplicitComponent):
             partials[y_name, F_name] = -np.einsum(
                 '...,jk,i->ijk...', np.ones(shape), glm_B, inputs['h_vec']).flatten()
 
+            # (num_times - 1, num_step_vars,) + shape
             partials[y_name, 'h_vec'] = -np.einsum(
-                'jk,ik...->ijk...', glm_B, inputs[F_name]).flatten()
+                'jk,ik...->ij...', glm_B, inputs[F_name]).flatten()
 
     def solve_linear(self, d_outputs, d_residuals, mode):
-        num_times = self.options['num_times']
-        num_step_vars = self.options['num_step_vars']
-
-        dy_dy_inv = self.dy_dy_inv
+        dy_dy = self.dy_dy
 
         for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
-            shape = state['shape']
-
             y_name = get_name('y', state_name)
 
             if mode == 'fwd':
-                rhs_vec = d_residuals[y_name].flatten()
-                solve_mode = 'N'
-            elif mode == 'rev':
-                rhs_vec = d_outputs[y_name].flatten()
-                solve_mode = 'T'
-
-            sol_vec = dy_dy_inv[state_name].solve(rhs_vec, solve_mode)
-
-            if mode == 'fwd':
-                d_outputs[y_name] = sol_vec.reshape((num_times, num_step_vars,) + shape)
+                dy_dy.solve(d_residuals[y_name], d_outputs[y_name], 'N')
             elif mode == 'rev':
-                d_residuals[y_name] = sol_vec.reshape((num_times, num_step_vars,) + shape)
+                dy_dy.solve(d_outputs[y_name], d_residuals[y_name], 'T')
 
     def solve_multi_linear(self, d_outputs, d_residuals, mode):
-        num_times = self.options['num_times']
-        num_step_vars = self.options['num_step_vars']
-
-        dy_dy_inv = self.dy_dy_inv
-
-        for state_name, state in iteritems(self.options['states']):
-            size = np.prod(state['shape'])
-            shape = state['shape']
-
-            y_name = get_name('y', state_name)
-
-            nrow = num_times * num_step_vars * size
-            ncol = d_outputs[y_name].shape[-1]
-
-            if mode == 'fwd':
-                rhs_array = d_residuals[y_name].reshape((nrow, ncol))
-                sol_array = d_outputs[y_name].reshape((nrow, ncol))
-                solve_mode = 'N'
-            elif mode == 'rev':
-                rhs_array = d_outputs[y_name].reshape((nrow, ncol))
-                sol_array = d_residuals[y_name].reshape((nrow, ncol))
-                solve_mode = 'T'
-
-            for icol in range(ncol):
-                rhs = rhs_array[:, icol]
-                sol = dy_dy_inv[state_name].solve(rhs, solve_mode)
-                sol_array[:, icol] = sol
+        # The right-hand sides are stored along the last axis, so they are solved at once.
+        self.solve_linear(d_outputs, d_residuals, mode)
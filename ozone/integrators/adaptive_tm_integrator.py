@@ -0,0 +1,147 @@
+import numpy as np
+
+from ozone.integrators.integrator import Integrator
+from ozone.components.time_comp import TimeComp
+from ozone.components.starting_comp import StartingComp
+from ozone.components.adaptive_tm_comp import AdaptiveTMComp
+from ozone.components.variable_bdf_comp import VariableBDFComp
+from ozone.methods.linear_multistep.bdf import BDF
+from ozone.components.vectorized_output_comp import VectorizedOutputComp
+from ozone.utils.var_names import get_name
+
+
+class AdaptiveTMIntegrator(Integrator):
+    """
+    Integrate with time-marching using an embedded method and adaptive step sizes.
+
+    The given times are the output times; the steps between them are chosen to keep the
+    local error estimate within atol + rtol * |y|, so their number depends on the solution.
+    With a BDF method, the order is also varied, from 1 up to that of the method, and the
+    output times other than the last one are interpolated rather than stepped to.
+    """
+
+    def initialize(self):
+        super(AdaptiveTMIntegrator, self).initialize()
+
+        self.options.declare('atol', default=1e-6, types=float)
+        self.options.declare('rtol', default=1e-6, types=float)
+        self.options.declare('initial_step', default=None, types=float, allow_none=True)
+        self.options.declare('max_num_steps', default=100000, types=int)
+
+    def setup(self):
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+        normalized_times = self.options['normalized_times']
+        all_norm_times = self.options['all_norm_times']
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+        time_units = ode_function._time_options['units']
+
+        is_bdf = isinstance(method, BDF)
+
+        assert is_bdf or hasattr(method, 'error_weights'), \
+            'Adaptive time-marching requires an embedded method, e.g., DormandPrince54, ' \
+            'or a BDF method'
+
+        num_times = len(normalized_times)
+
+        # ------------------------------------------------------------------------------------
+        # inputs
+        self._add_inputs()
+
+        # ------------------------------------------------------------------------------------
+        # Time comp
+        comp = TimeComp(time_units=time_units,
+            my_norm_times=normalized_times, stage_norm_times=normalized_times,
+            normalized_times=normalized_times)
+        self.add_subsystem('time_comp', comp,
+            promotes_inputs=['initial_time', 'final_time'],
+            promotes_outputs=['times'])
+
+        # ------------------------------------------------------------------------------------
+        # Starting comp
+        comp = StartingComp(states=states, num_step_vars=1)
+        self.add_subsystem('starting_system', comp,
+            promotes_inputs=[get_name('initial_condition', state_name) for state_name in states])
+
+        # ------------------------------------------------------------------------------------
+        # Integration comp
+        promotes = ['initial_time', 'final_time']
+        promotes.extend([
+            get_name('static_parameter', parameter_name)
+            for parameter_name in static_parameters])
+        promotes.extend([
+            get_name('dynamic_parameter', parameter_name)
+            for parameter_name in dynamic_parameters])
+
+        if is_bdf:
+            comp = VariableBDFComp(ode_function=ode_function, time_units=time_units,
+                normalized_times=normalized_times, all_norm_times=all_norm_times,
+                max_order=method.order,
+                atol=self.options['atol'], rtol=self.options['rtol'],
+                initial_step=self.options['initial_step'],
+                max_num_steps=self.options['max_num_steps'],
+            )
+        else:
+            comp = AdaptiveTMComp(ode_function=ode_function, time_units=time_units,
+                normalized_times=normalized_times, all_norm_times=all_norm_times,
+                glm_A=method.A, glm_U=method.U, glm_B=method.B, glm_V=method.V,
+                abscissa=np.atleast_1d(method.abscissa), error_weights=method.error_weights,
+                error_order=min(method.order, method.embedded_order),
+                explicit=bool(method.explicit),
+                atol=self.options['atol'], rtol=self.options['rtol'],
+                initial_step=self.options['initial_step'],
+                max_num_steps=self.options['max_num_steps'],
+            )
+        self.add_subsystem('integration_comp', comp, promotes_inputs=promotes)
+
+        self._connect_multiple(
+            self._get_state_names('starting_system', 'starting'),
+            self._get_state_names('integration_comp', 'y0'),
+        )
+
+        # ------------------------------------------------------------------------------------
+        # Output comp
+        comp = VectorizedOutputComp(states=states,
+            num_starting_times=1, num_my_times=num_times, num_step_vars=1, starting_coeffs=None,
+        )
+        self.add_subsystem('output_comp', comp,
+            promotes_outputs=[get_name('state', state_name) for state_name in states])
+
+        self._connect_multiple(
+            self._get_state_names('integration_comp', 'y'),
+            self._get_state_names('output_comp', 'y'),
+        )
+
+        self._add_dense_output()
+
+    def get_step_history(self):
+        """
+        Return the steps accepted in the last run of the model.
+
+        Returns
+        -------
+        dict
+            'num_steps' : the number of accepted steps;
+            'num_rejected' : the number of rejected steps;
+            'step_times' : ndarray[num_steps] of the start times of the accepted steps;
+            'step_sizes' : ndarray[num_steps] of the sizes of the accepted steps;
+            and, with a BDF method,
+            'orders' : ndarray[num_steps] of the orders of the accepted steps;
+            'num_jacobians' : the number of ODE Jacobian evaluations.
+        """
+        comp = self.integration_comp
+
+        history = {
+            'num_steps': len(comp.step_sizes),
+            'num_rejected': comp.num_rejected,
+            'step_times': comp.step_times,
+            'step_sizes': comp.step_sizes,
+        }
+        if isinstance(comp, VariableBDFComp):
+            history['orders'] = comp.orders
+            history['num_jacobians'] = comp.num_jacobians
+
+        return history
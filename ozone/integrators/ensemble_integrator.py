@@ -0,0 +1,128 @@
+from openmdao.api import Group, IndepVarComp
+from six import iteritems
+
+from ozone.components.ensemble_comp import EnsembleTransposeComp
+from ozone.integrators.integrator import Integrator
+from ozone.utils.var_names import get_name
+
+
+class EnsembleIntegrator(Group):
+    """
+    The integrator of an ensemble, with the members along the leading axis of all its variables.
+
+    The integrator of the EnsembleODEFunction marches all the members at once, so its dynamic
+    parameters and state histories have shape (num_times, num_members) + shape. This group
+    swaps their first two axes, so that the dynamic_parameter:<name>, state:<name>, and
+    state_at:<name> variables have shape (num_members, num_times) + shape, as the initial
+    conditions and the static parameters, which have shape (num_members,) + shape and are
+    promoted unchanged along with the times. The history and worker methods of the integrator,
+    e.g., get_newton_history and close_workers, are available on this group.
+    """
+
+    def initialize(self):
+        self.options.declare('integrator', types=Integrator)
+        self.options.declare('dynamic_parameters', types=dict, allow_none=True, default=None)
+
+    def setup(self):
+        integrator = self.options['integrator']
+        given_dynamic_parameters = self.options['dynamic_parameters']
+
+        ode_function = integrator.options['ode_function']
+        num_members = ode_function.num_members
+        num_times = len(integrator.options['normalized_times'])
+        num_all_times = len(integrator.options['all_norm_times'])
+        normalized_output_times = integrator.options['normalized_output_times']
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+
+        # ------------------------------------------------------------------------------------
+        # Given dynamic parameters, with the members first
+        if given_dynamic_parameters is not None:
+            comp = IndepVarComp()
+            promotes = []
+
+            for parameter_name, value in iteritems(given_dynamic_parameters):
+                name = get_name('dynamic_parameter', parameter_name)
+                parameter = dynamic_parameters[parameter_name]
+
+                comp.add_output(name, val=value, units=parameter['units'])
+                promotes.append(name)
+
+            self.add_subsystem('inputs', comp, promotes_outputs=promotes)
+
+        # ------------------------------------------------------------------------------------
+        # Dynamic parameter comp
+        if len(dynamic_parameters) > 0:
+            comp = EnsembleTransposeComp(variables=[
+                (parameter_name, _get_member_shape(num_members, num_all_times, parameter),
+                    parameter['units'])
+                for parameter_name, parameter in iteritems(dynamic_parameters)])
+
+            promotes = [
+                (get_name('in', parameter_name), get_name('dynamic_parameter', parameter_name))
+                for parameter_name in dynamic_parameters]
+            self.add_subsystem('dynamic_parameter_comp', comp, promotes_inputs=promotes)
+
+            for parameter_name in dynamic_parameters:
+                self.connect(
+                    'dynamic_parameter_comp.%s' % get_name('out', parameter_name),
+                    'integrator.%s' % get_name('dynamic_parameter', parameter_name))
+
+        # ------------------------------------------------------------------------------------
+        # Integrator
+        promotes_inputs = ['initial_time', 'final_time']
+        promotes_inputs.extend([
+            get_name('initial_condition', state_name) for state_name in states])
+        promotes_inputs.extend([
+            get_name('static_parameter', parameter_name) for parameter_name in static_parameters])
+
+        # The times, and the initial conditions, static parameters, and times given to it.
+        promotes_outputs = ['times']
+        for type_, values in [
+                ('initial_condition', integrator.options['initial_conditions']),
+                ('static_parameter', integrator.options['static_parameters'])]:
+            if values is not None:
+                promotes_outputs.extend([get_name(type_, name) for name in values])
+
+        for name in ['initial_time', 'final_time']:
+            if integrator.options[name] is not None:
+                promotes_outputs.append(name)
+
+        self.add_subsystem('integrator', integrator,
+            promotes_inputs=promotes_inputs, promotes_outputs=promotes_outputs)
+
+        # ------------------------------------------------------------------------------------
+        # State comps, with the members first
+        outputs = [('state', num_times)]
+        if normalized_output_times is not None:
+            outputs.append(('state_at', len(normalized_output_times)))
+
+        for type_, num in outputs:
+            comp = EnsembleTransposeComp(variables=[
+                (state_name, (num,) + state['shape'], state['units'])
+                for state_name, state in iteritems(states)])
+
+            promotes = [
+                (get_name('out', state_name), get_name(type_, state_name))
+                for state_name in states]
+            self.add_subsystem('%s_comp' % type_, comp, promotes_outputs=promotes)
+
+            for state_name in states:
+                self.connect(
+                    'integrator.%s' % get_name(type_, state_name),
+                    '%s_comp.%s' % (type_, get_name('in', state_name)))
+
+    def __getattr__(self, name):
+        # Only called for the attributes that the group does not have.
+        if name == 'close_workers' or name.startswith('get_') and name.endswith('_history'):
+            return getattr(self.options['integrator'], name)
+
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
+
+def _get_member_shape(num_members, num_times, parameter):
+    # The shape of a dynamic parameter of the ensemble with the members first.
+    return (num_members, num_times) + parameter['shape'][1:]
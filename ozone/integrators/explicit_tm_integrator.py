@@ -100,7 +100,7 @@ class ExplicitTMIntegrator(Integrator):
 
                         arange = np.arange(((len(my_norm_times) - 1) * num_stages * size)).reshape(
                             ((len(my_norm_times) - 1, num_stages,) + shape))
-                        src_indices = arange[i_step, i_stage, :]
+                        src_indices = arange[i_step, i_stage:i_stage + 1]
                         src_indices_list.append(src_indices)
                     self._connect_multiple(
                         self._get_dynamic_parameter_names('dynamic_parameter_comp', 'out'),
@@ -176,3 +176,12 @@ class ExplicitTMIntegrator(Integrator):
                         'integration_group.step_comp_%i' % (i_step - 1), 'y_new', i_step=i_step - 1),
                     self._get_state_names('output_comp', 'y', i_step=i_step),
                 )
+
+        self._add_dense_output()
+
+    def _has_stage_rates(self):
+        return True
+
+    def _get_stage_rate(self, i_step, i_stage, state_name):
+        state = self.options['ode_function']._states[state_name]
+        return 'integration_group.ode_comp_%i_%i.%s' % (i_step, i_stage, state['rate_source']), 0
@@ -0,0 +1,159 @@
+import numpy as np
+from six import iteritems
+
+from ozone.integrators.integrator import Integrator
+from ozone.ode_function import EnsembleODEFunction
+from ozone.components.fused_tm_comp import FusedTMComp
+from ozone.components.vectorized_output_comp import VectorizedOutputComp
+from ozone.utils.var_names import get_name
+
+
+class FusedTMIntegrator(Integrator):
+    """
+    Integrate with a time-marching approach in which all steps are marched in one component.
+
+    If num_checkpoints is given, the derivative sweeps recompute the steps from at most
+    num_checkpoints stored step vectors instead of storing the ODE Jacobians of all steps.
+    For implicit methods, stage_solver='kronecker' solves the stage equations in the eigenbasis
+    of the method's A matrix, with one factorization of the size of the state per eigenvalue.
+    Rosenbrock methods are supported, with one linear solve per stage and no Newton iterations.
+    Their derivatives involve second derivatives of the ODE, which are approximated by central
+    differences of the ODE Jacobian with the relative step rosenbrock_fd_step; the total
+    derivatives are then accurate to about 1e-10 relative rather than to machine precision.
+
+    For GLM methods with stages at both ends of the steps, such as the FSAL, Lobatto IIIA, and
+    ESDIRK methods, the derivatives of these stages are outputs of integration_comp when there
+    are output times or endpoint_rates is True, and the dense output reuses them. This is not
+    available with checkpointing or for ensembles.
+    """
+
+    def initialize(self):
+        super(FusedTMIntegrator, self).initialize()
+
+        self.options.declare('num_checkpoints', types=int, allow_none=True, default=None)
+        self.options.declare('stage_solver', values=['dense', 'kronecker'], default='dense')
+        self.options.declare('rosenbrock_fd_step', types=float, default=1e-5)
+        self.options.declare('endpoint_rates', types=bool, default=False)
+
+    def setup(self):
+        super(FusedTMIntegrator, self).setup()
+
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+        starting_coeffs = self.options['starting_coeffs']
+
+        has_starting_method = method.starting_method is not None
+        is_starting_method = starting_coeffs is not None
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+        time_units = ode_function._time_options['units']
+
+        starting_norm_times, my_norm_times = self._get_meta()
+
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        num_times = len(my_norm_times)
+
+        # ------------------------------------------------------------------------------------
+
+        comp = self._create_integration_comp(num_times)
+        self.add_subsystem('integration_comp', comp)
+        self.connect('time_comp.h_vec', 'integration_comp.h_vec')
+        if ode_function._time_options['targets']:
+            self.connect('time_comp.stage_times', 'integration_comp.stage_times')
+
+        self._connect_multiple(
+            self._get_state_names('starting_system', 'starting'),
+            self._get_state_names('integration_comp', 'y0'),
+        )
+        if len(static_parameters) > 0:
+            self._connect_multiple(
+                self._get_static_parameter_names('static_parameter_comp', 'out'),
+                self._get_static_parameter_names('integration_comp', 'static_parameter'),
+            )
+        if len(dynamic_parameters) > 0:
+            self._connect_multiple(
+                self._get_dynamic_parameter_names('dynamic_parameter_comp', 'out'),
+                self._get_dynamic_parameter_names('integration_comp', 'dynamic_parameter'),
+            )
+
+        # ------------------------------------------------------------------------------------
+
+        comp = VectorizedOutputComp(states=states,
+            num_starting_times=len(starting_norm_times), num_my_times=len(my_norm_times),
+            num_step_vars=num_step_vars, starting_coeffs=starting_coeffs,
+        )
+
+        promotes = []
+        promotes.extend([get_name('state', state_name) for state_name in states])
+        if is_starting_method:
+            promotes.extend([get_name('starting', state_name) for state_name in states])
+
+        self.add_subsystem('output_comp', comp, promotes_outputs=promotes)
+        if has_starting_method:
+            self._connect_multiple(
+                self._get_state_names('starting_system', 'state'),
+                self._get_state_names('output_comp', 'starting_state'),
+            )
+
+        self._connect_multiple(
+            self._get_state_names('integration_comp', 'y'),
+            self._get_state_names('output_comp', 'y'),
+        )
+
+        self._add_dense_output()
+
+    def _has_stage_rates(self):
+        method = self.options['method']
+
+        # The endpoint derivatives use the linearizations of a GLMStepper, not those of the
+        # members of an ensemble, which are stacked by its EnsembleStepper.
+        is_glm = not (method.linearly_implicit or method.imex or method.exponential
+            or method.partitioned)
+        return is_glm and self.options['num_checkpoints'] is None \
+            and not isinstance(self.options['ode_function'], EnsembleODEFunction) \
+            and self._get_endpoint_stages() is not None \
+            and (self.options['endpoint_rates']
+                or self.options['normalized_output_times'] is not None)
+
+    def _get_stage_rate(self, i_step, i_stage, state_name):
+        i_start_stage, i_end_stage = self._get_endpoint_stages()
+        rate_type = 'F_start' if i_stage == i_start_stage else 'F_end'
+        return 'integration_comp.%s' % get_name(rate_type, state_name), i_step
+
+    def _get_comp_endpoint_stages(self):
+        # The endpoint_stages option of integration_comp.
+        return self._get_endpoint_stages() if self._has_stage_rates() else None
+
+    def _create_integration_comp(self, num_times):
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        return FusedTMComp(ode_function=ode_function,
+            time_units=ode_function._time_options['units'],
+            num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+            glm_A=glm_A, glm_U=glm_U, glm_B=glm_B, glm_V=glm_V,
+            explicit=bool(method.explicit), num_checkpoints=self.options['num_checkpoints'],
+            stage_solver=self.options['stage_solver'],
+            rosenbrock_fd_step=self.options['rosenbrock_fd_step'],
+            endpoint_stages=self._get_comp_endpoint_stages(),
+            **_get_stepper_options(method)
+        )
+
+
+def _get_stepper_options(method, prefix=''):
+    # The gamma matrix of a Rosenbrock method, the explicit coefficients of an IMEX method, an
+    # exponential method itself, and the position coefficients of a partitioned method, or None
+    # for the other GLM methods.
+    return {
+        prefix + 'rosenbrock_gamma': method.gamma if method.linearly_implicit else None,
+        prefix + 'explicit_glm_A': method.explicit_A if method.imex else None,
+        prefix + 'explicit_glm_B': method.explicit_B if method.imex else None,
+        prefix + 'exponential_method': method if method.exponential else None,
+        prefix + 'position_glm_A': method.position_A if method.partitioned else None,
+        prefix + 'position_glm_B': method.position_B if method.partitioned else None,
+    }
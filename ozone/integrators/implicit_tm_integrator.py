@@ -1,21 +1,63 @@
 import numpy as np
 from six import iteritems
+from functools import partial
 
-from openmdao.api import Group, IndepVarComp, NewtonSolver, DirectSolver
+from openmdao.api import Group, IndepVarComp, DirectSolver
 
 from ozone.integrators.integrator import Integrator
+from ozone.ode_function import EnsembleODEFunction
 from ozone.components.starting_comp import StartingComp
 from ozone.components.implicit_tm_stage_comp import ImplicitTMStageComp
 from ozone.components.implicit_tm_step_comp import ImplicitTMStepComp
+from ozone.components.explicit_tm_stage_comp import ExplicitTMStageComp
+from ozone.components.explicit_tm_step_comp import ExplicitTMStepComp
 from ozone.components.tm_output_comp import TMOutputComp
 from ozone.utils.var_names import get_name
+from ozone.utils.solvers import NewtonSolverHistory, SimplifiedNewtonSolver, \
+    SharedFactorization, NewtonKrylovFDSolver, ScipyKrylovHistory, StagePrecon
 
 
 class ImplicitTMIntegrator(Integrator):
     """
     Integrate an implicit method with a time-marching approach.
+
+    If simplified_newton is True, the Newton solvers of all steps share one factorization of
+    the stage Jacobian, which is only recomputed when the residual norm decreases by less than
+    a factor of max_convergence_rate in an iteration.
+
+    If stage_predictor is True, the Newton iterations of each step start from the stage values
+    and stage derivatives of the previous two steps, extrapolated to the stage times of the step
+    with a polynomial of degree at most num_stages.
+
+    With the newton-krylov solver, the Newton directions are computed with GMRES instead of a
+    dense factorization, so memory grows linearly with the state size. The Jacobian-vector
+    products are those of the partials (or compute_jacvec_product) of the ODE, or finite
+    differences of the step residuals if fd_jacvec is True. If the ODEFunction has a
+    preconditioner, it preconditions GMRES stage by stage. With the newton-direct solver, the
+    Jacobians of an ensemble are assembled and factorized as sparse matrices, since they are
+    block-diagonal over its members.
+
+    For singly diagonally implicit methods (lower-triangular A with a constant diagonal, except
+    possibly an explicit first stage), such as the SDIRK and ESDIRK methods, the stages are
+    solved sequentially, each with its own Newton solver on the n state variables, if
+    sequential_stages is True (the default) and the solver is newton-direct. The stage Jacobians
+    I - h gamma J then only differ in J, so the stages of each step share one factorization,
+    computed at the first implicit stage of the step and only recomputed when the convergence is
+    slow; with simplified_newton, this factorization is also shared by all steps. Each stage
+    starts from the derivative of the previous stage unless stage_predictor is True.
     """
 
+    def initialize(self):
+        super(ImplicitTMIntegrator, self).initialize()
+
+        self.options.declare('simplified_newton', default=False, types=bool)
+        self.options.declare('max_convergence_rate', default=0.5, types=float)
+        self.options.declare('stage_predictor', default=False, types=bool)
+        self.options.declare('solver', default='newton-direct',
+            values=['newton-direct', 'newton-krylov'])
+        self.options.declare('fd_jacvec', default=False, types=bool)
+        self.options.declare('sequential_stages', default=True, types=bool)
+
     def setup(self):
         super(ImplicitTMIntegrator, self).setup()
 
@@ -35,22 +77,35 @@ class ImplicitTMIntegrator(Integrator):
 
         glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
 
-        num_times = len(my_norm_times)
-        num_stages = method.num_stages
-        num_step_vars = method.num_values
+        is_krylov = self.options['solver'] == 'newton-krylov'
+
+        assert not (is_krylov and self.options['simplified_newton']), \
+            'simplified_newton requires the newton-direct solver'
+        assert is_krylov or not self.options['fd_jacvec'], \
+            'fd_jacvec requires the newton-krylov solver'
 
-        glm_A = method.A
-        glm_B = method.B
-        glm_U = method.U
-        glm_V = method.V
+        num_times = len(my_norm_times)
 
         # ------------------------------------------------------------------------------------
 
+        self.is_sequential = self._is_sequential()
+
         integration_group = Group()
         self.add_subsystem('integration_group', integration_group)
 
+        self.factorization = SharedFactorization()
+        self.step_factorizations = []
+        self.newton_solvers = []
+
         for i_step in range(len(my_norm_times) - 1):
-            group = Group(assembled_jac_type='dense')
+            if self.is_sequential:
+                self._add_sequential_step(integration_group, i_step)
+                continue
+
+            if is_krylov:
+                group = Group()
+            else:
+                group = Group(assembled_jac_type=self._get_assembled_jac_type())
             group_old_name = 'integration_group.step_%i' % (i_step - 1)
             group_new_name = 'integration_group.step_%i' % i_step
             integration_group.add_subsystem(group_new_name.split('.')[1], group)
@@ -67,7 +122,10 @@ class ImplicitTMIntegrator(Integrator):
                 self._connect_multiple(
                     self._get_static_parameter_names('static_parameter_comp', 'out'),
                     self._get_static_parameter_names(group_new_name + '.ode_comp', 'targets'),
-                    src_indices_list=[[0] * num_stages for _ in range(len(static_parameters))]
+                    src_indices_list=[
+                        np.einsum('i,...->i...', np.ones(num_stages, int),
+                            np.arange(np.prod(value['shape'])).reshape(value['shape']))
+                        for value in static_parameters.values()]
                 )
             if len(dynamic_parameters) > 0:
                 src_indices_list = []
@@ -77,8 +135,8 @@ class ImplicitTMIntegrator(Integrator):
 
                     arange = np.arange(((len(my_norm_times) - 1) * num_stages * size)).reshape(
                         ((len(my_norm_times) - 1, num_stages,) + shape))
-                    src_indices = arange[i_step, :, :]
-                    src_indices_list.append(src_indices.flat)
+                    src_indices = arange[i_step]
+                    src_indices_list.append(src_indices)
                 self._connect_multiple(
                     self._get_dynamic_parameter_names('dynamic_parameter_comp', 'out'),
                     self._get_dynamic_parameter_names(group_new_name + '.ode_comp', 'targets'),
@@ -135,8 +193,32 @@ class ImplicitTMIntegrator(Integrator):
                     self._get_state_names(group_new_name + '.stage_comp', 'y_old', i_step=i_step),
                 )
 
-            group.nonlinear_solver = NewtonSolver(iprint=2, maxiter=100)
-            group.linear_solver = DirectSolver(assemble_jac=True)
+            if self.options['stage_predictor']:
+                predictor = partial(self._predict_stages, i_step)
+            else:
+                predictor = None
+
+            if self.options['simplified_newton']:
+                group.nonlinear_solver = SimplifiedNewtonSolver(
+                    factorization=self.factorization, predictor=predictor, iprint=2, maxiter=100,
+                    max_convergence_rate=self.options['max_convergence_rate'])
+            elif self.options['fd_jacvec']:
+                group.nonlinear_solver = NewtonKrylovFDSolver(
+                    predictor=predictor, iprint=2, maxiter=100)
+            else:
+                group.nonlinear_solver = NewtonSolverHistory(
+                    predictor=predictor, iprint=2, maxiter=100)
+
+            if is_krylov:
+                group.linear_solver = ScipyKrylovHistory(iprint=1)
+                if ode_function._preconditioner is not None:
+                    group.linear_solver.precon = StagePrecon(
+                        preconditioner=ode_function._preconditioner,
+                        transpose_preconditioner=ode_function._transpose_preconditioner,
+                        states=states, glm_A=glm_A, glm_B=glm_B, i_step=i_step)
+            else:
+                group.linear_solver = DirectSolver(assemble_jac=True)
+            self.newton_solvers.append(group.nonlinear_solver)
 
         promotes = []
         promotes.extend([get_name('state', state_name) for state_name in states])
@@ -165,3 +247,336 @@ class ImplicitTMIntegrator(Integrator):
                     self._get_state_names('integration_group.step_%i' % (i_step - 1) + '.step_comp', 'y_new', i_step=i_step - 1),
                     self._get_state_names('output_comp', 'y', i_step=i_step),
                 )
+
+        self._add_dense_output()
+
+    def _add_sequential_step(self, integration_group, i_step):
+        # Add the group of one step whose stages are solved one after the other.
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+        time_units = ode_function._time_options['units']
+
+        starting_norm_times, my_norm_times = self._get_meta()
+
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        step_group = Group()
+        group_new_name = 'integration_group.step_%i' % i_step
+        integration_group.add_subsystem(group_new_name.split('.')[1], step_group)
+
+        if self.options['simplified_newton']:
+            factorization = self.factorization
+        else:
+            factorization = SharedFactorization()
+            self.step_factorizations.append(factorization)
+
+        if i_step == 0:
+            y_old_names = self._get_state_names('starting_system', 'starting')
+        else:
+            y_old_names = self._get_state_names(
+                'integration_group.step_%i.step_comp' % (i_step - 1), 'y_new', i_step=i_step - 1)
+
+        for i_stage in range(num_stages):
+            implicit = bool(glm_A[i_stage, i_stage] != 0.)
+
+            stage_name = '%s.stage_%i' % (group_new_name, i_stage)
+            stage_comp_name = stage_name + '.stage_comp'
+            ode_comp_name = stage_name + '.ode_comp'
+
+            if implicit:
+                group = Group(assembled_jac_type=self._get_assembled_jac_type())
+            else:
+                group = Group()
+            step_group.add_subsystem('stage_%i' % i_stage, group)
+
+            comp = ExplicitTMStageComp(
+                states=states, time_units=time_units,
+                num_stages=num_stages, num_step_vars=num_step_vars,
+                glm_A=glm_A, glm_U=glm_U, i_stage=i_stage, i_step=i_step, implicit=implicit,
+            )
+            group.add_subsystem('stage_comp', comp)
+            self.connect('time_comp.h_vec', '%s.h' % stage_comp_name, src_indices=i_step)
+
+            comp = self._create_ode(1)
+            group.add_subsystem('ode_comp', comp)
+            if ode_function._time_options['targets']:
+                self.connect('time_comp.stage_times',
+                    ['.'.join((ode_comp_name, t)) for t in
+                    ode_function._time_options['targets']],
+                    src_indices=i_step * num_stages + i_stage
+                )
+
+            if len(static_parameters) > 0:
+                self._connect_multiple(
+                    self._get_static_parameter_names('static_parameter_comp', 'out'),
+                    self._get_static_parameter_names(ode_comp_name, 'targets'),
+                )
+            if len(dynamic_parameters) > 0:
+                src_indices_list = []
+                for parameter_name, value in iteritems(dynamic_parameters):
+                    size = np.prod(value['shape'])
+                    shape = value['shape']
+
+                    arange = np.arange(((len(my_norm_times) - 1) * num_stages * size)).reshape(
+                        ((len(my_norm_times) - 1, num_stages,) + shape))
+                    src_indices = arange[i_step, i_stage:i_stage + 1]
+                    src_indices_list.append(src_indices)
+                self._connect_multiple(
+                    self._get_dynamic_parameter_names('dynamic_parameter_comp', 'out'),
+                    self._get_dynamic_parameter_names(ode_comp_name, 'targets'),
+                    src_indices_list,
+                )
+
+            for j_stage in range(i_stage + 1 if implicit else i_stage):
+                self._connect_multiple(
+                    self._get_state_names(
+                        '%s.stage_%i.ode_comp' % (group_new_name, j_stage), 'rate_source'),
+                    self._get_state_names(stage_comp_name, 'F',
+                        i_step=i_step, i_stage=i_stage, j_stage=j_stage),
+                )
+
+            self._connect_multiple(
+                self._get_state_names(stage_comp_name, 'Y', i_step=i_step, i_stage=i_stage),
+                self._get_state_names(ode_comp_name, 'targets'),
+            )
+            self._connect_multiple(
+                y_old_names,
+                self._get_state_names(stage_comp_name, 'y_old', i_step=i_step, i_stage=i_stage),
+            )
+
+            if implicit:
+                predictor = partial(self._predict_stage, i_step, i_stage)
+
+                group.nonlinear_solver = SimplifiedNewtonSolver(
+                    factorization=factorization, predictor=predictor, iprint=2,
+                    maxiter=100, max_convergence_rate=self.options['max_convergence_rate'])
+                group.linear_solver = DirectSolver(assemble_jac=True)
+                self.newton_solvers.append(group.nonlinear_solver)
+
+        step_comp_name = group_new_name + '.step_comp'
+
+        comp = ExplicitTMStepComp(
+            states=states, time_units=time_units,
+            num_stages=num_stages, num_step_vars=num_step_vars,
+            glm_B=glm_B, glm_V=glm_V, i_step=i_step,
+        )
+        step_group.add_subsystem('step_comp', comp)
+        self.connect('time_comp.h_vec', '%s.h' % step_comp_name, src_indices=i_step)
+        for j_stage in range(num_stages):
+            self._connect_multiple(
+                self._get_state_names(
+                    '%s.stage_%i.ode_comp' % (group_new_name, j_stage), 'rate_source'),
+                self._get_state_names(step_comp_name, 'F', i_step=i_step, j_stage=j_stage),
+            )
+        self._connect_multiple(
+            y_old_names,
+            self._get_state_names(step_comp_name, 'y_old', i_step=i_step),
+        )
+
+    def _is_sequential(self):
+        # Whether the stages of each step are solved one after the other.
+        return self.options['sequential_stages'] \
+            and self.options['solver'] == 'newton-direct' \
+            and is_singly_diagonally_implicit(self._get_method()[0])
+
+    def _get_assembled_jac_type(self):
+        # The Jacobian of an ensemble is block-diagonal over its members, so it is assembled and
+        # factorized as a sparse matrix.
+        if isinstance(self.options['ode_function'], EnsembleODEFunction):
+            return 'csc'
+        return 'dense'
+
+    def _has_stage_rates(self):
+        return True
+
+    def _get_stage_rate(self, i_step, i_stage, state_name):
+        state = self.options['ode_function']._states[state_name]
+        if self._is_sequential():
+            return 'integration_group.step_%i.stage_%i.ode_comp.%s' % (
+                i_step, i_stage, state['rate_source']), 0
+
+        return 'integration_group.step_%i.ode_comp.%s' % (i_step, state['rate_source']), i_stage
+
+    def _get_stage_var_names(self, i_step, state_name):
+        # Names of the stage values and stage derivatives of a step, as a list of
+        # (Y_name, F_name) pairs that cover the stages in order.
+        state = self.options['ode_function']._states[state_name]
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+        group_name = 'integration_group.step_%i' % i_step
+
+        if self.is_sequential:
+            return [(
+                '%s.stage_%i.stage_comp.%s' % (
+                    group_name, i_stage, get_name('Y', state_name, i_step=i_step, i_stage=i_stage)),
+                '%s.stage_%i.ode_comp.%s' % (group_name, i_stage, state['rate_source']),
+            ) for i_stage in range(num_stages)]
+
+        return [(
+            '%s.stage_comp.%s' % (group_name, get_name('Y', state_name, i_step=i_step)),
+            '%s.ode_comp.%s' % (group_name, state['rate_source']),
+        )]
+
+    def _extrapolate_stages(self, i_step):
+        # Stage values and derivatives of step i_step extrapolated from the previous two steps,
+        # as a dict of (Y, F) arrays of shape (num_stages, size) keyed by state name.
+        ode_function = self.options['ode_function']
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        previous_steps = [j_step for j_step in [i_step - 2, i_step - 1] if j_step >= 0]
+
+        stage_times = self._outputs['time_comp.stage_times'].reshape((-1, num_stages))
+
+        extrapolated = {}
+        for state_name in ode_function._states:
+            times = []
+            Y = []
+            F = []
+            for j_step in previous_steps:
+                times.append(stage_times[j_step])
+                for Y_name, F_name in self._get_stage_var_names(j_step, state_name):
+                    Y.append(self._outputs[Y_name].flatten())
+                    F.append(self._outputs[F_name].flatten())
+
+            times = np.concatenate(times)
+            Y = np.concatenate(Y).reshape((len(times), -1))
+            F = np.concatenate(F).reshape((len(times), -1))
+
+            # Stages at the same time, e.g., at the ends of Lobatto steps, are fitted once.
+            times, indices = np.unique(times, return_index=True)
+            degree = min(len(times) - 1, num_stages)
+
+            # Times are scaled to the span of the previous stages for conditioning.
+            scale = max(times[-1] - times[0], np.finfo(float).tiny)
+            vander = np.vander((times - times[-1]) / scale, degree + 1)
+            new_vander = np.vander((stage_times[i_step] - times[-1]) / scale, degree + 1)
+
+            coeffs = np.linalg.lstsq(vander, np.hstack([Y[indices], F[indices]]), rcond=None)[0]
+            predicted = new_vander.dot(coeffs)
+
+            size = Y.shape[1]
+            extrapolated[state_name] = (predicted[:, :size], predicted[:, size:])
+
+        return extrapolated
+
+    def _predict_stages(self, i_step):
+        # Set the initial guess of the stage values and derivatives of step i_step.
+        ode_function = self.options['ode_function']
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        if i_step == 0:
+            # Only the initial step vector is known.
+            group_name = 'integration_group.step_%i' % i_step
+            for state_name in ode_function._states:
+                Y_name, F_name = self._get_stage_var_names(i_step, state_name)[0]
+                y_old_name = '%s.stage_comp.%s' % (
+                    group_name, get_name('y_old', state_name, i_step=i_step))
+                self._outputs[Y_name] = np.einsum(
+                    'ij,j...->i...', glm_U, self._inputs[y_old_name])
+            return
+
+        for state_name, (Y, F) in iteritems(self._extrapolate_stages(i_step)):
+            Y_name, F_name = self._get_stage_var_names(i_step, state_name)[0]
+            self._outputs[Y_name] = Y.reshape(self._outputs[Y_name].shape)
+            self._outputs[F_name] = F.reshape(self._outputs[F_name].shape)
+
+    def _predict_stage(self, i_step, i_stage):
+        # Set the initial guess of stage i_stage of a step whose stages are solved sequentially.
+        ode_function = self.options['ode_function']
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        if self.options['stage_predictor'] and i_step > 0:
+            for state_name, (Y, F) in iteritems(self._extrapolate_stages(i_step)):
+                Y_name, F_name = self._get_stage_var_names(i_step, state_name)[i_stage]
+                self._outputs[Y_name] = Y[i_stage].reshape(self._outputs[Y_name].shape)
+                self._outputs[F_name] = F[i_stage].reshape(self._outputs[F_name].shape)
+            return
+
+        # Otherwise, the stage derivative is taken from the previous stage.
+        stage_comp_name = 'integration_group.step_%i.stage_%i.stage_comp' % (i_step, i_stage)
+        h = self._inputs['%s.h' % stage_comp_name]
+
+        for state_name in ode_function._states:
+            Y_name, F_name = self._get_stage_var_names(i_step, state_name)[i_stage]
+
+            Y = np.einsum('j,j...->...', glm_U[i_stage], self._inputs['%s.%s' % (
+                stage_comp_name, get_name('y_old', state_name, i_step=i_step, i_stage=i_stage))])
+
+            if i_stage > 0:
+                F_names = ['%s.%s' % (stage_comp_name, get_name('F', state_name,
+                    i_step=i_step, i_stage=i_stage, j_stage=j_stage)) for j_stage in range(i_stage)]
+                for j_stage in range(i_stage):
+                    Y = Y + h * glm_A[i_stage, j_stage] * self._inputs[F_names[j_stage]][0]
+
+                F = self._inputs[F_names[-1]]
+                Y = Y + h * glm_A[i_stage, i_stage] * F[0]
+                self._outputs[F_name] = F.reshape(self._outputs[F_name].shape)
+
+            self._outputs[Y_name] = Y.reshape(self._outputs[Y_name].shape)
+
+    def get_newton_history(self):
+        """
+        Return the Newton iteration counts and the number of factorizations of the stage Jacobian.
+
+        Returns
+        -------
+        dict
+            'iteration_counts' : list of the iteration counts of every solve, step after step,
+            with one solve per implicit stage if the stages are solved sequentially;
+            'num_factorizations' : the number of factorizations in all solves, zero with the
+            newton-krylov solver;
+            'linear_iteration_counts' : list of the GMRES iteration counts of the newton-krylov
+            solver, step after step. With fd_jacvec, these are the Newton directions only;
+            otherwise, the derivative solves of the step groups are included. Empty with the
+            newton-direct solver.
+        """
+        iteration_counts = []
+        linear_iteration_counts = []
+        for solver in self.newton_solvers:
+            iteration_counts.extend(solver.get_iteration_counts())
+
+            if self.options['fd_jacvec']:
+                linear_iteration_counts.extend(solver.linear_iteration_counts)
+            elif self.options['solver'] == 'newton-krylov':
+                linear_iteration_counts.extend(solver.linear_solver.get_iteration_counts())
+
+        if self.options['solver'] == 'newton-krylov':
+            num_factorizations = 0
+        elif self.options['simplified_newton']:
+            num_factorizations = self.factorization.num_factorizations
+        elif self.is_sequential:
+            num_factorizations = sum(
+                factorization.num_factorizations for factorization in self.step_factorizations)
+        else:
+            num_factorizations = sum(iteration_counts)
+
+        return {
+            'iteration_counts': iteration_counts,
+            'num_factorizations': num_factorizations,
+            'linear_iteration_counts': linear_iteration_counts,
+        }
+
+
+def is_singly_diagonally_implicit(glm_A):
+    """
+    Return whether the stages of a method can be solved sequentially with one stage Jacobian.
+
+    Parameters
+    ----------
+    glm_A : ndarray
+        The A matrix of the GLM method.
+
+    Returns
+    -------
+    bool
+        True if glm_A is lower triangular with more than one stage and a constant nonzero
+        diagonal, except possibly for a zero first entry (an explicit first stage).
+    """
+    num_stages = glm_A.shape[0]
+    diagonal = np.diag(glm_A)
+
+    return num_stages > 1 and np.all(np.triu(glm_A, 1) == 0.) and diagonal[-1] != 0. \
+        and np.all(diagonal[1:] == diagonal[-1]) and diagonal[0] in [0., diagonal[-1]]
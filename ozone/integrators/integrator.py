@@ -9,6 +9,7 @@ from ozone.components.time_comp import TimeComp
 from ozone.components.starting_comp import StartingComp
 from ozone.components.static_parameter_comp import StaticParameterComp
 from ozone.components.dynamic_parameter_comp import DynamicParameterComp
+from ozone.components.dense_output_comp import DenseOutputComp, get_intervals
 from ozone.methods.method import GLMMethod
 from ozone.ode_function import ODEFunction
 from ozone.utils.var_names import get_name
@@ -33,6 +34,8 @@ class Integrator(Group):
         self.options.declare('final_time', default=None)
         self.options.declare('normalized_times', types=np.ndarray)
         self.options.declare('all_norm_times', types=np.ndarray)
+        self.options.declare('normalized_output_times', types=np.ndarray, allow_none=True,
+            default=None)
 
     def setup(self):
         ode_function = self.options['ode_function']
@@ -77,53 +80,7 @@ class Integrator(Group):
 
         # ------------------------------------------------------------------------------------
         # inputs
-        if initial_conditions is not None \
-                or given_static_parameters is not None or given_dynamic_parameters is not None \
-                or initial_time is not None or final_time is not None:
-            comp = IndepVarComp()
-            promotes = []
-
-        # Initial conditions
-        if initial_conditions is not None:
-            for state_name, value in iteritems(initial_conditions):
-                name = get_name('initial_condition', state_name)
-                state = ode_function._states[state_name]
-
-                comp.add_output(name, val=value, units=state['units'])
-                promotes.append(name)
-
-        # Given static_parameters
-        if given_static_parameters is not None:
-            for parameter_name, value in iteritems(given_static_parameters):
-                name = get_name('static_parameter', parameter_name)
-                parameter = ode_function._static_parameters[parameter_name]
-
-                comp.add_output(name, val=value, units=parameter['units'])
-                promotes.append(name)
-
-        # Given dynamic_parameters
-        if given_dynamic_parameters is not None:
-            for parameter_name, value in iteritems(given_dynamic_parameters):
-                name = get_name('dynamic_parameter', parameter_name)
-                parameter = ode_function._dynamic_parameters[parameter_name]
-
-                comp.add_output(name, val=value, units=parameter['units'])
-                promotes.append(name)
-
-        # Initial time
-        if initial_time is not None:
-            comp.add_output('initial_time', val=initial_time, units=time_units)
-            promotes.append('initial_time')
-
-        # Final time
-        if final_time is not None:
-            comp.add_output('final_time', val=final_time, units=time_units)
-            promotes.append('final_time')
-
-        if initial_conditions is not None \
-                or given_static_parameters is not None or given_dynamic_parameters is not None \
-                or initial_time is not None or final_time is not None:
-            self.add_subsystem('inputs', comp, promotes_outputs=promotes)
+        self._add_inputs()
 
         # ------------------------------------------------------------------------------------
         # Time comp
@@ -180,6 +137,148 @@ class Integrator(Group):
         self.add_subsystem('starting_system', starting_system,
             promotes_inputs=promotes)
 
+    def _add_inputs(self):
+        ode_function = self.options['ode_function']
+
+        initial_conditions = self.options['initial_conditions']
+        given_static_parameters = self.options['static_parameters']
+        given_dynamic_parameters = self.options['dynamic_parameters']
+
+        initial_time = self.options['initial_time']
+        final_time = self.options['final_time']
+
+        time_units = ode_function._time_options['units']
+
+        if initial_conditions is not None \
+                or given_static_parameters is not None or given_dynamic_parameters is not None \
+                or initial_time is not None or final_time is not None:
+            comp = IndepVarComp()
+            promotes = []
+
+        # Initial conditions
+        if initial_conditions is not None:
+            for state_name, value in iteritems(initial_conditions):
+                name = get_name('initial_condition', state_name)
+                state = ode_function._states[state_name]
+
+                comp.add_output(name, val=value, units=state['units'])
+                promotes.append(name)
+
+        # Given static_parameters
+        if given_static_parameters is not None:
+            for parameter_name, value in iteritems(given_static_parameters):
+                name = get_name('static_parameter', parameter_name)
+                parameter = ode_function._static_parameters[parameter_name]
+
+                comp.add_output(name, val=value, units=parameter['units'])
+                promotes.append(name)
+
+        # Given dynamic_parameters
+        if given_dynamic_parameters is not None:
+            for parameter_name, value in iteritems(given_dynamic_parameters):
+                name = get_name('dynamic_parameter', parameter_name)
+                parameter = ode_function._dynamic_parameters[parameter_name]
+
+                comp.add_output(name, val=value, units=parameter['units'])
+                promotes.append(name)
+
+        # Initial time
+        if initial_time is not None:
+            comp.add_output('initial_time', val=initial_time, units=time_units)
+            promotes.append('initial_time')
+
+        # Final time
+        if final_time is not None:
+            comp.add_output('final_time', val=final_time, units=time_units)
+            promotes.append('final_time')
+
+        if initial_conditions is not None \
+                or given_static_parameters is not None or given_dynamic_parameters is not None \
+                or initial_time is not None or final_time is not None:
+            self.add_subsystem('inputs', comp, promotes_outputs=promotes)
+
+    def _add_dense_output(self):
+        # Add the states at the output times, interpolated from the promoted states and times.
+        # If the method has stages at both ends of its steps and their derivatives are
+        # variables of this group, the interpolation reuses them.
+        ode_function = self.options['ode_function']
+        normalized_times = self.options['normalized_times']
+        normalized_output_times = self.options['normalized_output_times']
+
+        if normalized_output_times is None:
+            return
+
+        endpoint_stages = self._get_endpoint_stages() if self._has_stage_rates() else None
+
+        promotes_inputs = ['times']
+        promotes_inputs.extend([get_name('state', state_name)
+            for state_name in ode_function._states])
+        if endpoint_stages is None:
+            promotes_inputs.extend([get_name('static_parameter', parameter_name)
+                for parameter_name in ode_function._static_parameters])
+            promotes_inputs.extend([get_name('dynamic_parameter', parameter_name)
+                for parameter_name in ode_function._dynamic_parameters])
+
+        comp = DenseOutputComp(ode_function=ode_function,
+            time_units=ode_function._time_options['units'],
+            normalized_times=normalized_times,
+            normalized_output_times=normalized_output_times,
+            endpoint_rates=endpoint_stages is not None)
+        self.add_subsystem('dense_output_comp', comp, promotes_inputs=promotes_inputs,
+            promotes_outputs=[get_name('state_at', state_name)
+                for state_name in ode_function._states])
+
+        if endpoint_stages is None:
+            return
+
+        intervals, theta = get_intervals(normalized_times, normalized_output_times)
+
+        for i_step in np.unique(intervals):
+            for rate_type, i_stage in zip(['F_start', 'F_end'], endpoint_stages):
+                for state_name, state in iteritems(ode_function._states):
+                    src_name, i_node = self._get_stage_rate(i_step, i_stage, state_name)
+
+                    size = np.prod(state['shape'])
+                    self.connect(src_name,
+                        'dense_output_comp.%s' % get_name(rate_type, state_name, i_step=i_step),
+                        src_indices=(i_node * size + np.arange(size)).reshape(state['shape']),
+                        flat_src_indices=True)
+
+    def _has_stage_rates(self):
+        # Whether the derivatives of the stages are variables of this group, given by
+        # _get_stage_rate; this only depends on the options.
+        return False
+
+    def _get_stage_rate(self, i_step, i_stage, state_name):
+        # The name of the variable that holds the derivative of a state at a stage of a step,
+        # relative to this group, and the index of the stage in its first axis.
+        raise NotImplementedError()
+
+    def _get_endpoint_stages(self):
+        # The stages whose values are the step vectors at the start and at the end of the step,
+        # as those of the FSAL, Lobatto IIIA, and ESDIRK methods, or None if there are not both.
+        method = self.options['method']
+
+        if method.starting_method is not None or method.num_values != 1:
+            return None
+
+        abscissa = np.atleast_1d(method.abscissa)
+
+        start_stages = [
+            i_stage for i_stage in range(method.num_stages)
+            if abscissa[i_stage] == 0. and np.all(method.A[i_stage] == 0.)
+            and np.all(method.U[i_stage] == 1.)]
+        end_stages = [
+            i_stage for i_stage in range(method.num_stages)
+            if np.isclose(abscissa[i_stage], 1.)
+            and np.allclose(method.A[i_stage], method.B[0], rtol=0., atol=1e-15)
+            and np.all(method.U[i_stage] == method.V[0])]
+
+        if not start_stages or not end_stages:
+            return None
+
+        return start_stages[0], end_stages[-1]
+
     def _get_state_names(self, comp, type_, i_step=None, i_stage=None, j_stage=None):
         return self._get_names('states',
             comp, type_, i_step=i_step, i_stage=i_stage, j_stage=j_stage)
@@ -224,8 +323,7 @@ class Integrator(Group):
                 self.connect(srcs, tgts, src_indices=src_indices, flat_src_indices=True)
 
     def _create_ode(self, num):
-        ode_function = self.options['ode_function']
-        return ode_function._system_class(num_nodes=num, **ode_function._system_init_kwargs)
+        return self.options['ode_function']._create_system(num)
 
     def _get_meta(self):
         method = self.options['method']
@@ -0,0 +1,282 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import Group, ParallelGroup, IndepVarComp, NonlinearBlockGS, LinearBlockGS
+
+from ozone.integrators.integrator import Integrator
+from ozone.integrators.fused_tm_integrator import FusedTMIntegrator
+from ozone.integrators.shooting_tm_integrator import ShootingTMIntegrator
+from ozone.components.time_comp import TimeComp
+from ozone.components.shooting_continuity_comp import ShootingContinuityComp
+from ozone.components.shooting_defect_comp import ShootingDefectComp
+from ozone.components.shooting_output_comp import ShootingOutputComp
+from ozone.utils.var_names import get_name
+
+
+class MultipleShootingIntegrator(Integrator):
+    """
+    Integrate with time-marching on segments of the time interval that run in parallel.
+
+    The segments are subsystems of a ParallelGroup, so they are distributed across processes
+    when running under MPI. The initial condition of each segment after the first one is
+    either solved for with a continuity residual (continuity='residual'), or it is a design
+    variable and the defect with the previous segment's final state is a constraint
+    (continuity='constraint'). In the latter case, all segments are independent within a
+    model evaluation.
+
+    If num_workers is given, the segment_formulation must be 'fused-time-marching' and the
+    method a one-step method. The segments are then marched in a single component, which
+    propagates them in num_workers worker processes without requiring MPI.
+
+    If the segments have the derivatives of the stages at both ends of their steps as
+    variables, the dense output reuses them; on the last step of a segment, the derivative at
+    the end is that of the segment's final state rather than that of the next segment's initial
+    condition, which is the same once the segments are continuous.
+    """
+
+    def initialize(self):
+        super(MultipleShootingIntegrator, self).initialize()
+
+        self.options.declare('num_segments', default=2, types=int)
+        self.options.declare('continuity', default='residual', values=['residual', 'constraint'])
+        self.options.declare('segment_formulation', default='time-marching',
+            values=['time-marching', 'fused-time-marching'])
+        self.options.declare('num_workers', default=None, types=int, allow_none=True)
+
+    def setup(self):
+        from ozone.ode_integrator import get_integrator
+
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+        initial_conditions = self.options['initial_conditions']
+        normalized_times = self.options['normalized_times']
+        all_norm_times = self.options['all_norm_times']
+        num_segments = self.options['num_segments']
+        continuity = self.options['continuity']
+        num_workers = self.options['num_workers']
+
+        has_starting_method = method.starting_method is not None
+
+        states = ode_function._states
+        static_parameters = ode_function._static_parameters
+        dynamic_parameters = ode_function._dynamic_parameters
+        time_units = ode_function._time_options['units']
+
+        num_times = len(normalized_times)
+
+        assert num_segments >= 1, 'num_segments must be at least 1'
+        assert num_workers is None \
+            or self.options['segment_formulation'] == 'fused-time-marching', \
+            'num_workers requires the fused-time-marching segment formulation'
+
+        segment_indices = np.unique(
+            np.round(np.linspace(0, num_times - 1, num_segments + 1)).astype(int))
+        assert len(segment_indices) == num_segments + 1, \
+            'There are fewer time steps (%i) than segments (%i)' % (num_times - 1, num_segments)
+
+        if has_starting_method:
+            start_time_index = method.starting_method[2]
+            assert np.min(segment_indices[1:] - segment_indices[:-1]) > start_time_index, \
+                'Each segment must have more than %i time steps for the starting method' \
+                % start_time_index
+
+        # ------------------------------------------------------------------------------------
+        # inputs
+        self._add_inputs()
+
+        # ------------------------------------------------------------------------------------
+        # Time comp
+        comp = TimeComp(time_units=time_units,
+            my_norm_times=normalized_times, stage_norm_times=normalized_times,
+            normalized_times=normalized_times)
+        self.add_subsystem('time_comp', comp,
+            promotes_inputs=['initial_time', 'final_time'],
+            promotes_outputs=['times'])
+
+        # ------------------------------------------------------------------------------------
+        # Segments
+        promotes = ['initial_time', 'final_time']
+        promotes.extend([
+            get_name('static_parameter', parameter_name)
+            for parameter_name in static_parameters])
+        promotes.extend([
+            get_name('dynamic_parameter', parameter_name)
+            for parameter_name in dynamic_parameters])
+
+        initial_condition_names = [
+            get_name('initial_condition', state_name) for state_name in states]
+
+        # With worker processes, the segments are marched in one component, whose state
+        # outputs already span all segments.
+        if num_workers is not None:
+            state_names = [get_name('state', state_name) for state_name in states]
+        else:
+            state_names = []
+
+        shooting_group = Group()
+        self.add_subsystem('shooting_group', shooting_group,
+            promotes_inputs=promotes + initial_condition_names, promotes_outputs=state_names)
+
+        if continuity == 'constraint':
+            comp = IndepVarComp()
+            for state_name, state in iteritems(states):
+                if initial_conditions is not None and state_name in initial_conditions:
+                    val = initial_conditions[state_name]
+                else:
+                    val = 0.
+
+                for i_segment in range(1, num_segments):
+                    name = get_name('initial_condition', state_name, i_segment=i_segment)
+                    comp.add_output(name, val=val, shape=state['shape'], units=state['units'])
+                    comp.add_design_var(name)
+            shooting_group.add_subsystem('initial_condition_comp', comp)
+
+        # The fused segments only output their endpoint stage derivatives if these are needed.
+        endpoint_rates = self.options['normalized_output_times'] is not None
+
+        self._segment_indices = segment_indices
+        self._segments = []
+
+        if num_workers is not None:
+            segments = ShootingTMIntegrator(ode_function=ode_function, method=method,
+                normalized_times=normalized_times, all_norm_times=all_norm_times,
+                segment_indices=segment_indices, num_workers=num_workers,
+                endpoint_rates=endpoint_rates)
+            self._segments.append(segments)
+            shooting_group.add_subsystem('segments', segments,
+                promotes_inputs=promotes + initial_condition_names, promotes_outputs=state_names)
+        else:
+            segments = ParallelGroup()
+            shooting_group.add_subsystem('segments', segments,
+                promotes_inputs=promotes + initial_condition_names)
+
+            integrator_class = get_integrator(
+                self.options['segment_formulation'], method.explicit, method.linearly_implicit,
+                method.imex, method.exponential, method.partitioned)
+
+            for i_segment in range(num_segments):
+                i_start, i_end = segment_indices[i_segment:i_segment + 2]
+
+                segment = integrator_class(ode_function=ode_function, method=method,
+                    normalized_times=normalized_times[i_start:i_end + 1],
+                    all_norm_times=all_norm_times)
+                if isinstance(segment, FusedTMIntegrator):
+                    segment.options['endpoint_rates'] = endpoint_rates
+                self._segments.append(segment)
+
+                if i_segment == 0:
+                    segment_promotes = promotes + initial_condition_names
+                else:
+                    segment_promotes = promotes
+
+                segments.add_subsystem('segment_%i' % i_segment, segment,
+                    promotes_inputs=segment_promotes)
+
+        if continuity == 'residual':
+            comp = ShootingContinuityComp(states=states, num_segments=num_segments)
+            shooting_group.add_subsystem('continuity_comp', comp)
+
+            initial_condition_comp_name = 'shooting_group.continuity_comp'
+        elif continuity == 'constraint':
+            comp = ShootingDefectComp(states=states, num_segments=num_segments)
+            shooting_group.add_subsystem('continuity_comp', comp)
+
+            initial_condition_comp_name = 'shooting_group.initial_condition_comp'
+
+            for state_name in states:
+                for i_segment in range(1, num_segments):
+                    comp.add_constraint(get_name('defect', state_name, i_segment=i_segment),
+                        equals=0.)
+
+        for state_name, state in iteritems(states):
+            size = np.prod(state['shape'])
+
+            for i_segment in range(num_segments):
+                i_start, i_end = segment_indices[i_segment:i_segment + 2]
+
+                if num_workers is not None:
+                    segment_name = 'shooting_group.segments.integration_comp'
+                else:
+                    segment_name = 'shooting_group.segments.segment_%i' % i_segment
+
+                if i_segment > 0:
+                    name = get_name('initial_condition', state_name, i_segment=i_segment)
+                    if num_workers is not None:
+                        target_name = name
+                    else:
+                        target_name = get_name('initial_condition', state_name)
+                    self.connect(
+                        '%s.%s' % (initial_condition_comp_name, name),
+                        '%s.%s' % (segment_name, target_name),
+                    )
+                    if continuity == 'constraint':
+                        self.connect(
+                            '%s.%s' % (initial_condition_comp_name, name),
+                            'shooting_group.continuity_comp.%s' % name,
+                        )
+
+                if i_segment < num_segments - 1:
+                    name = get_name('final_state', state_name, i_segment=i_segment)
+                    if num_workers is not None:
+                        self.connect(
+                            '%s.%s' % (segment_name, name),
+                            'shooting_group.continuity_comp.%s' % name,
+                        )
+                    else:
+                        num_segment_times = i_end - i_start + 1
+                        src_indices = np.arange(num_segment_times * size).reshape(
+                            (num_segment_times,) + state['shape'])[-1]
+
+                        self.connect(
+                            '%s.%s' % (segment_name, get_name('state', state_name)),
+                            'shooting_group.continuity_comp.%s' % name,
+                            src_indices=src_indices, flat_src_indices=True,
+                        )
+
+        if continuity == 'residual':
+            # Block Gauss-Seidel propagates the continuity through one more segment per
+            # iteration, so it converges in num_segments iterations.
+            shooting_group.nonlinear_solver = NonlinearBlockGS(iprint=2,
+                maxiter=num_segments + 1, atol=1e-14, rtol=1e-12)
+            shooting_group.linear_solver = LinearBlockGS(iprint=1,
+                maxiter=num_segments + 1, atol=1e-14, rtol=1e-12)
+
+        # ------------------------------------------------------------------------------------
+        # Output comp
+        if num_workers is None:
+            comp = ShootingOutputComp(states=states, segment_indices=segment_indices)
+            self.add_subsystem('output_comp', comp,
+                promotes_outputs=[get_name('state', state_name) for state_name in states])
+
+            for state_name in states:
+                for i_segment in range(num_segments):
+                    self.connect(
+                        'shooting_group.segments.segment_%i.%s' % (
+                            i_segment, get_name('state', state_name)),
+                        'output_comp.%s' % get_name('state', state_name, i_segment=i_segment),
+                    )
+
+        self._add_dense_output()
+
+    def _has_stage_rates(self):
+        return all(segment._has_stage_rates() for segment in self._segments)
+
+    def _get_stage_rate(self, i_step, i_stage, state_name):
+        if self.options['num_workers'] is not None:
+            segment_name = 'shooting_group.segments'
+            segment = self._segments[0]
+        else:
+            i_segment = np.searchsorted(self._segment_indices, i_step, side='right') - 1
+            segment_name = 'shooting_group.segments.segment_%i' % i_segment
+            segment = self._segments[i_segment]
+            i_step -= self._segment_indices[i_segment]
+
+        src_name, i_node = segment._get_stage_rate(i_step, i_stage, state_name)
+        return '%s.%s' % (segment_name, src_name), i_node
+
+    def close_workers(self):
+        """
+        Terminate the worker processes of the segments, if any; the next run creates them again.
+        """
+        if self.options['num_workers'] is not None:
+            self.shooting_group.segments.integration_comp.close_workers()
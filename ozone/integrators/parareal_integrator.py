@@ -0,0 +1,82 @@
+import numpy as np
+
+from ozone.integrators.fused_tm_integrator import FusedTMIntegrator, _get_stepper_options
+from ozone.components.parareal_comp import PararealComp
+from ozone.methods_list import get_method
+
+
+class PararealIntegrator(FusedTMIntegrator):
+    """
+    Integrate with the parareal algorithm, correcting time segments in parallel processes.
+
+    The method of the integrator is the fine propagator, and coarse_method, taking
+    num_coarse_steps steps per segment, is the coarse propagator. Both must be one-step
+    methods. If num_workers is None, the fine propagations run serially in this process;
+    otherwise, the worker processes are created at the first run and reused by the later runs.
+    """
+
+    def initialize(self):
+        super(PararealIntegrator, self).initialize()
+
+        self.options.declare('coarse_method', default='RK4', types=str)
+        self.options.declare('num_segments', default=2, types=int)
+        self.options.declare('num_coarse_steps', default=1, types=int)
+        self.options.declare('num_workers', default=None, types=int, allow_none=True)
+        self.options.declare('parareal_atol', default=1e-12, types=float)
+        self.options.declare('parareal_rtol', default=1e-10, types=float)
+        self.options.declare('parareal_maxiter', default=None, types=int, allow_none=True)
+
+    def _create_integration_comp(self, num_times):
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+        coarse_method = get_method(self.options['coarse_method'])
+
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        return PararealComp(ode_function=ode_function,
+            time_units=ode_function._time_options['units'],
+            num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+            glm_A=glm_A, glm_U=glm_U, glm_B=glm_B, glm_V=glm_V,
+            explicit=bool(method.explicit), abscissa=np.atleast_1d(method.abscissa),
+            coarse_glm_A=coarse_method.A, coarse_glm_U=coarse_method.U,
+            coarse_glm_B=coarse_method.B, coarse_glm_V=coarse_method.V,
+            coarse_abscissa=np.atleast_1d(coarse_method.abscissa),
+            coarse_explicit=bool(coarse_method.explicit),
+            num_segments=self.options['num_segments'],
+            num_coarse_steps=self.options['num_coarse_steps'],
+            num_workers=self.options['num_workers'],
+            parareal_atol=self.options['parareal_atol'],
+            parareal_rtol=self.options['parareal_rtol'],
+            parareal_maxiter=self.options['parareal_maxiter'],
+            stage_solver=self.options['stage_solver'],
+            rosenbrock_fd_step=self.options['rosenbrock_fd_step'],
+            endpoint_stages=self._get_comp_endpoint_stages(),
+            **dict(_get_stepper_options(method), **_get_stepper_options(coarse_method, 'coarse_'))
+        )
+
+    def get_parareal_history(self):
+        """
+        Return the iteration history of the last run of the parareal algorithm.
+
+        Returns
+        -------
+        dict
+            'num_iterations' : the number of parareal iterations;
+            'defect_history' : the largest change in the segment initial conditions per iteration;
+            'segment_times' : ndarray[num_iterations, num_segments] of the wall times of the
+            fine propagations, zero for segments that were not recomputed.
+        """
+        comp = self.integration_comp
+
+        return {
+            'num_iterations': comp.num_iterations,
+            'defect_history': list(comp.defect_history),
+            'segment_times': comp.segment_times,
+        }
+
+    def close_workers(self):
+        """
+        Terminate the worker processes of the fine propagator, if any; the next run creates
+        them again.
+        """
+        self.integration_comp.close_workers()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from ozone.integrators.fused_tm_integrator import FusedTMIntegrator, _get_stepper_options
+from ozone.components.shooting_tm_comp import ShootingTMComp
+
+
+class ShootingTMIntegrator(FusedTMIntegrator):
+    """
+    Integrate the multiple-shooting segments of a one-step method in a single component.
+
+    This is the group of segments of MultipleShootingIntegrator when the segments are
+    propagated in num_workers worker processes. The initial conditions of the segments after
+    the first one are inputs of integration_comp, and the final states of the segments before
+    the last one are its outputs.
+    """
+
+    def initialize(self):
+        super(ShootingTMIntegrator, self).initialize()
+
+        self.options.declare('segment_indices', types=np.ndarray)
+        self.options.declare('num_workers', types=int, allow_none=True, default=None)
+
+    def _create_integration_comp(self, num_times):
+        ode_function = self.options['ode_function']
+        method = self.options['method']
+
+        glm_A, glm_B, glm_U, glm_V, num_stages, num_step_vars = self._get_method()
+
+        return ShootingTMComp(ode_function=ode_function,
+            time_units=ode_function._time_options['units'],
+            num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+            glm_A=glm_A, glm_U=glm_U, glm_B=glm_B, glm_V=glm_V,
+            explicit=bool(method.explicit),
+            stage_solver=self.options['stage_solver'],
+            rosenbrock_fd_step=self.options['rosenbrock_fd_step'],
+            endpoint_stages=self._get_comp_endpoint_stages(),
+            segment_indices=self.options['segment_indices'],
+            num_workers=self.options['num_workers'],
+            **_get_stepper_options(method)
+        )
@@ -1,13 +1,18 @@
 import numpy as np
 from six import iteritems
 
-from openmdao.api import Group, IndepVarComp, NewtonSolver, DirectSolver, ScipyIterativeSolver, LinearBlockGS, NonlinearBlockGS, PetscKSP
+from openmdao.api import Group, IndepVarComp, DirectSolver
 
 from ozone.integrators.integrator import Integrator
 from ozone.components.vectorized_step_comp import VectorizedStepComp
+from ozone.components.vectorized_step2_comp import VectorizedStep2Comp
+from ozone.components.vectorized_stage_comp import VectorizedStageComp
 from ozone.components.vectorized_stagestep_comp import VectorizedStageStepComp
 from ozone.components.vectorized_output_comp import VectorizedOutputComp
+from ozone.components.vectorized_output2_comp import VectorizedOutput2Comp
 from ozone.utils.var_names import get_name
+from ozone.utils.solvers import NonlinearBlockGSHistory, NewtonSolverHistory, \
+    LinearBlockGSHistory, ScipyKrylovHistory, BlockTriangularPrecon
 
 
 class VectorizedIntegrator(Integrator):
@@ -19,6 +24,18 @@ class VectorizedIntegrator(Integrator):
         super(VectorizedIntegrator, self).initialize()
 
         self.options.declare('formulation', default='solver-based', values=['solver-based', 'optimizer-based'])
+        self.options.declare('matrix_free', default=False, types=bool,
+            desc='If True, the step vectors and outputs apply their derivatives matrix-free.')
+        self.options.declare('solver', default='block-gs',
+            values=['block-gs', 'newton-krylov', 'newton-direct'],
+            desc='Solver for the stage values in the solver-based formulation: '
+            'nonlinear and linear block Gauss-Seidel, '
+            'Newton with block-triangular-preconditioned GMRES, '
+            'or Newton with a sparse direct solve.')
+        self.options.declare('solver_atol', default=1e-14, types=float)
+        self.options.declare('solver_rtol', default=1e-12, types=float)
+        self.options.declare('solver_maxiter', default=40, types=int)
+        self.options.declare('solver_iprint', default=2, types=int)
 
     def setup(self):
         super(VectorizedIntegrator, self).setup()
@@ -27,6 +44,16 @@ class VectorizedIntegrator(Integrator):
         method = self.options['method']
         starting_coeffs = self.options['starting_coeffs']
         formulation = self.options['formulation']
+        matrix_free = self.options['matrix_free']
+        solver = self.options['solver']
+
+        # The direct solve factorizes the assembled sparse Jacobian of the stage, step, and
+        # ODE components; the step vectors are states of the integration group instead of
+        # being eliminated, because the eliminated Jacobian is dense.
+        is_direct = formulation == 'solver-based' and solver == 'newton-direct'
+
+        assert not (is_direct and matrix_free), \
+            'The newton-direct solver requires assembled partials; it cannot be matrix-free'
 
         has_starting_method = method.starting_method is not None
         is_starting_method = starting_coeffs is not None
@@ -44,7 +71,10 @@ class VectorizedIntegrator(Integrator):
 
         # ------------------------------------------------------------------------------------
 
-        integration_group = Group(assembled_jac_type='dense')
+        if is_direct:
+            integration_group = Group(assembled_jac_type='csc')
+        else:
+            integration_group = Group(assembled_jac_type='dense')
         self.add_subsystem('integration_group', integration_group)
 
         if formulation == 'optimizer-based':
@@ -83,29 +113,62 @@ class VectorizedIntegrator(Integrator):
                 self._get_dynamic_parameter_names('integration_group.ode_comp', 'targets'),
             )
 
-        comp = VectorizedStageStepComp(states=states, time_units=time_units,
-            num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
-            glm_A=glm_A, glm_U=glm_U, glm_B=glm_B, glm_V=glm_V,
-        )
-        integration_group.add_subsystem('vectorized_stagestep_comp', comp)
-        self.connect('time_comp.h_vec', 'integration_group.vectorized_stagestep_comp.h_vec')
+        if matrix_free:
+            step_comp_class = VectorizedStep2Comp
+            output_comp_class = VectorizedOutput2Comp
+        else:
+            step_comp_class = VectorizedStepComp
+            output_comp_class = VectorizedOutputComp
 
-        comp = VectorizedStepComp(states=states, time_units=time_units,
-            num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
-            glm_B=glm_B, glm_V=glm_V,
-        )
-        self.add_subsystem('vectorized_step_comp', comp)
-        self.connect('time_comp.h_vec', 'vectorized_step_comp.h_vec')
-        self._connect_multiple(
-            self._get_state_names('starting_system', 'starting'),
-            self._get_state_names('integration_group.vectorized_stagestep_comp', 'y0'),
-        )
+        if is_direct:
+            stage_comp_name = 'integration_group.vectorized_stage_comp'
+            step_comp_name = 'integration_group.vectorized_step_comp'
+
+            comp = VectorizedStageComp(states=states, time_units=time_units,
+                num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+                glm_A=glm_A, glm_U=glm_U,
+            )
+            integration_group.add_subsystem('vectorized_stage_comp', comp)
+
+            comp = step_comp_class(states=states, time_units=time_units,
+                num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+                glm_B=glm_B, glm_V=glm_V,
+            )
+            integration_group.add_subsystem('vectorized_step_comp', comp)
+
+            self.connect('time_comp.h_vec', stage_comp_name + '.h_vec')
+            self._connect_multiple(
+                self._get_state_names(step_comp_name, 'y'),
+                self._get_state_names(stage_comp_name, 'y'),
+            )
+        else:
+            stage_comp_name = 'integration_group.vectorized_stagestep_comp'
+            step_comp_name = 'vectorized_step_comp'
+
+            comp = VectorizedStageStepComp(states=states, time_units=time_units,
+                num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+                glm_A=glm_A, glm_U=glm_U, glm_B=glm_B, glm_V=glm_V,
+            )
+            integration_group.add_subsystem('vectorized_stagestep_comp', comp)
+            self.connect('time_comp.h_vec', stage_comp_name + '.h_vec')
+            self._connect_multiple(
+                self._get_state_names('starting_system', 'starting'),
+                self._get_state_names(stage_comp_name, 'y0'),
+            )
+
+            comp = step_comp_class(states=states, time_units=time_units,
+                num_times=num_times, num_stages=num_stages, num_step_vars=num_step_vars,
+                glm_B=glm_B, glm_V=glm_V,
+            )
+            self.add_subsystem('vectorized_step_comp', comp)
+
+        self.connect('time_comp.h_vec', step_comp_name + '.h_vec')
         self._connect_multiple(
             self._get_state_names('starting_system', 'starting'),
-            self._get_state_names('vectorized_step_comp', 'y0'),
+            self._get_state_names(step_comp_name, 'y0'),
         )
 
-        comp = VectorizedOutputComp(states=states,
+        comp = output_comp_class(states=states,
             num_starting_times=len(starting_norm_times), num_my_times=len(my_norm_times),
             num_step_vars=num_step_vars, starting_coeffs=starting_coeffs,
         )
@@ -139,30 +202,30 @@ class VectorizedIntegrator(Integrator):
         src_indices_to_ode = [np.array(idx).squeeze() for idx in src_indices_to_ode]
 
         self._connect_multiple(
-            self._get_state_names('vectorized_step_comp', 'y'),
+            self._get_state_names(step_comp_name, 'y'),
             self._get_state_names('output_comp', 'y'),
         )
 
         self._connect_multiple(
             self._get_state_names('integration_group.ode_comp', 'rate_source'),
-            self._get_state_names('vectorized_step_comp', 'F'),
+            self._get_state_names(step_comp_name, 'F'),
             src_indices_from_ode,
         )
         self._connect_multiple(
             self._get_state_names('integration_group.ode_comp', 'rate_source'),
-            self._get_state_names('integration_group.vectorized_stagestep_comp', 'F'),
+            self._get_state_names(stage_comp_name, 'F'),
             src_indices_from_ode,
         )
 
         if formulation == 'solver-based':
             self._connect_multiple(
-                self._get_state_names('integration_group.vectorized_stagestep_comp', 'Y_out'),
+                self._get_state_names(stage_comp_name, 'Y_out'),
                 self._get_state_names('integration_group.ode_comp', 'targets'),
                 src_indices_to_ode,
             )
             self._connect_multiple(
                 self._get_state_names('integration_group.dummy_comp', 'Y'),
-                self._get_state_names('integration_group.vectorized_stagestep_comp', 'Y_in'),
+                self._get_state_names(stage_comp_name, 'Y_in'),
             )
         elif formulation == 'optimizer-based':
             self._connect_multiple(
@@ -172,7 +235,7 @@ class VectorizedIntegrator(Integrator):
             )
             self._connect_multiple(
                 self._get_state_names('integration_group.desvars_comp', 'Y'),
-                self._get_state_names('integration_group.vectorized_stagestep_comp', 'Y_in'),
+                self._get_state_names(stage_comp_name, 'Y_in'),
             )
             for state_name, state in iteritems(states):
                 integration_group.add_constraint('vectorized_stagestep_comp.Y_out:%s' % state_name,
@@ -181,14 +244,80 @@ class VectorizedIntegrator(Integrator):
 
         if has_starting_method:
             self.starting_system.options['formulation'] = self.options['formulation']
+            for key in ['matrix_free', 'solver', 'solver_atol', 'solver_rtol', 'solver_maxiter',
+                    'solver_iprint']:
+                self.starting_system.options[key] = self.options[key]
 
         if formulation == 'solver-based':
-            if 1:
-                integration_group.nonlinear_solver = NonlinearBlockGS(iprint=2, maxiter=40, atol=1e-14, rtol=1e-12)
+            self._set_solvers(integration_group)
+
+        self._add_dense_output()
+
+    def _has_stage_rates(self):
+        return True
+
+    def _get_stage_rate(self, i_step, i_stage, state_name):
+        state = self.options['ode_function']._states[state_name]
+        num_stages = self.options['method'].num_stages
+        return 'integration_group.ode_comp.%s' % state['rate_source'], \
+            i_step * num_stages + i_stage
+
+    def _set_solvers(self, integration_group):
+        solver = self.options['solver']
+        atol = self.options['solver_atol']
+        rtol = self.options['solver_rtol']
+        maxiter = self.options['solver_maxiter']
+        iprint = self.options['solver_iprint']
+
+        linear_iprint = min(iprint, 1)
+
+        if solver == 'block-gs':
+            integration_group.nonlinear_solver = NonlinearBlockGSHistory(
+                iprint=iprint, maxiter=maxiter, atol=atol, rtol=rtol)
+            integration_group.linear_solver = LinearBlockGSHistory(
+                iprint=linear_iprint, maxiter=maxiter, atol=atol, rtol=rtol)
+        elif solver == 'newton-krylov':
+            # The preconditioner is a single block Gauss-Seidel sweep over the ODE and stage
+            # components, i.e., the stage feedback is the only part left to the Krylov iterations.
+            integration_group.nonlinear_solver = NewtonSolverHistory(
+                iprint=iprint, maxiter=maxiter, atol=atol, rtol=rtol)
+            integration_group.linear_solver = ScipyKrylovHistory(
+                iprint=linear_iprint, maxiter=maxiter, atol=atol)
+            integration_group.linear_solver.precon = BlockTriangularPrecon()
+        elif solver == 'newton-direct':
+            integration_group.nonlinear_solver = NewtonSolverHistory(
+                iprint=iprint, maxiter=maxiter, atol=atol, rtol=rtol)
+            integration_group.linear_solver = DirectSolver(assemble_jac=True, iprint=linear_iprint)
+
+    def get_solver_history(self):
+        """
+        Return the iteration counts and residual norms of the solver-based formulation.
+
+        Each solve of the nonlinear or linear system appends one entry, so the history
+        accumulates over repeated model runs and derivative computations.
+
+        Returns
+        -------
+        dict
+            Dictionary keyed by 'nonlinear' and 'linear', each containing a dictionary with the
+            'iteration_counts' and 'residual_history' lists. The linear entry is empty for the
+            newton-direct solver.
+        """
+        assert self.options['formulation'] == 'solver-based', \
+            'The solver history is only available with the solver-based formulation'
+
+        integration_group = self.integration_group
+
+        history = {}
+        for key, solver in [
+                ('nonlinear', integration_group.nonlinear_solver),
+                ('linear', integration_group.linear_solver)]:
+            if hasattr(solver, 'residual_history'):
+                history[key] = {
+                    'iteration_counts': solver.get_iteration_counts(),
+                    'residual_history': solver.residual_history,
+                }
             else:
-                integration_group.nonlinear_solver = NewtonSolver(iprint=2, maxiter=100)
+                history[key] = {'iteration_counts': [], 'residual_history': []}
 
-            if 1:
-                integration_group.linear_solver = LinearBlockGS(iprint=1, maxiter=40, atol=1e-14, rtol=1e-12)
-            else:
-                integration_group.linear_solver = DirectSolver(assemble_jac=True, iprint=1)
+        return history
@@ -0,0 +1,160 @@
+from __future__ import division
+
+import numpy as np
+from scipy.special import factorial
+
+from ozone.methods.method import GLMMethod
+
+
+class ExponentialRungeKutta(GLMMethod):
+    """
+    Base class for exponential Runge--Kutta methods for semi-linear ODEs, y' = L y + N(t, y).
+
+    With the linear operator L set on the ODEFunction, N = f - L y, and a step computes
+
+        Y_i = exp(c_i h L) y_n + h sum_j<i a_ij(h L) N(t_n + c_i h, Y_j)
+        y_n+1 = exp(h L) y_n + h sum_i b_i(h L) N(t_n + c_i h, Y_i),
+
+    so the linear part is integrated exactly. The coefficients are linear combinations of the
+    phi functions, phi_0(z) = exp(z) and phi_k+1(z) = (phi_k(z) - 1/k!) / z, and are given as
+    lists of (coefficient, k, c) terms, each standing for coefficient * phi_k(c h L).
+    The GLM matrices are those of the explicit Runge--Kutta method obtained with L = 0.
+    """
+
+    def __init__(self, abscissa, A_terms, B_terms):
+        """
+        Parameters
+        ----------
+        abscissa : ndarray
+            The stage abscissa c, with c_0 = 0.
+        A_terms : dict
+            The terms of a_ij keyed by (i, j), with j < i.
+        B_terms : dict
+            The terms of b_i keyed by i.
+        """
+        abscissa = np.array(abscissa, float)
+        num_stages = len(abscissa)
+
+        assert abscissa[0] == 0. and all(j < i for i, j in A_terms), \
+            'The method must be explicit with c_0 = 0'
+
+        self.A_terms = A_terms
+        self.B_terms = B_terms
+
+        A = np.zeros((num_stages, num_stages))
+        for (i, j), terms in A_terms.items():
+            A[i, j] = _evaluate_at_zero(terms)
+
+        B = np.zeros((1, num_stages))
+        for i, terms in B_terms.items():
+            B[0, i] = _evaluate_at_zero(terms)
+
+        U = np.ones((num_stages, 1))
+        V = np.array([[1.]])
+
+        starting_method = None
+
+        super(ExponentialRungeKutta, self).__init__(A, B, U, V, abscissa, starting_method)
+
+        self.exponential = True
+
+
+class ExponentialEuler(ExponentialRungeKutta):
+    """
+    First-order exponential Euler method, y_n+1 = exp(h L) y_n + h phi_1(h L) N(t_n, y_n).
+    """
+
+    def __init__(self):
+        self.order = 1
+
+        super(ExponentialEuler, self).__init__(
+            abscissa=[0.],
+            A_terms={},
+            B_terms={0: [(1., 1, 1.)]},
+        )
+
+
+class ETDRK2(ExponentialRungeKutta):
+    """
+    Second-order ETD Runge--Kutta method of Cox and Matthews (2002).
+    """
+
+    def __init__(self):
+        self.order = 2
+
+        super(ETDRK2, self).__init__(
+            abscissa=[0., 1.],
+            A_terms={(1, 0): [(1., 1, 1.)]},
+            B_terms={0: [(1., 1, 1.), (-1., 2, 1.)], 1: [(1., 2, 1.)]},
+        )
+
+
+class ETDRK4(ExponentialRungeKutta):
+    """
+    Fourth-order ETD Runge--Kutta method of Krogstad (2005).
+
+    Its coefficients only involve phi functions, with no products of them as in the method of
+    Cox and Matthews (2002), and it has a smaller error constant on stiff problems.
+    """
+
+    def __init__(self):
+        self.order = 4
+
+        b_23 = [(2., 2, 1.), (-4., 3, 1.)]
+
+        super(ETDRK4, self).__init__(
+            abscissa=[0., 1 / 2, 1 / 2, 1.],
+            A_terms={
+                (1, 0): [(1 / 2, 1, 1 / 2)],
+                (2, 0): [(1 / 2, 1, 1 / 2), (-1., 2, 1 / 2)],
+                (2, 1): [(1., 2, 1 / 2)],
+                (3, 0): [(1., 1, 1.), (-2., 2, 1.)],
+                (3, 2): [(2., 2, 1.)],
+            },
+            B_terms={
+                0: [(1., 1, 1.), (-3., 2, 1.), (4., 3, 1.)],
+                1: b_23,
+                2: b_23,
+                3: [(-1., 2, 1.), (4., 3, 1.)],
+            },
+        )
+
+
+class HochbruckOstermann4(ExponentialRungeKutta):
+    """
+    Fourth-order, five-stage exponential Runge--Kutta method of Hochbruck and Ostermann (2005),
+    which satisfies the stiff order conditions, so its order does not degrade with the stiffness
+    of L.
+    """
+
+    def __init__(self):
+        self.order = 4
+
+        a_52 = [(1 / 2, 2, 1 / 2), (-1., 3, 1.), (1 / 4, 2, 1.), (-1 / 2, 3, 1 / 2)]
+
+        super(HochbruckOstermann4, self).__init__(
+            abscissa=[0., 1 / 2, 1 / 2, 1., 1 / 2],
+            A_terms={
+                (1, 0): [(1 / 2, 1, 1 / 2)],
+                (2, 0): [(1 / 2, 1, 1 / 2), (-1., 2, 1 / 2)],
+                (2, 1): [(1., 2, 1 / 2)],
+                (3, 0): [(1., 1, 1.), (-2., 2, 1.)],
+                (3, 1): [(1., 2, 1.)],
+                (3, 2): [(1., 2, 1.)],
+                (4, 0): [(1 / 2, 1, 1 / 2), (-3 / 4, 2, 1 / 2), (1 / 2, 3, 1 / 2),
+                         (1., 3, 1.), (-1 / 4, 2, 1.)],
+                (4, 1): a_52,
+                (4, 2): a_52,
+                (4, 3): [(-1 / 4, 2, 1 / 2), (1., 3, 1.), (-1 / 4, 2, 1.), (1 / 2, 3, 1 / 2)],
+            },
+            B_terms={
+                0: [(1., 1, 1.), (-3., 2, 1.), (4., 3, 1.)],
+                3: [(-1., 2, 1.), (4., 3, 1.)],
+                4: [(4., 2, 1.), (-8., 3, 1.)],
+            },
+        )
+
+
+def _evaluate_at_zero(terms):
+    # Value of the coefficient for L = 0, since phi_k(0) = 1/k!.
+    return sum(coefficient / factorial(k) for coefficient, k, c in terms)
@@ -0,0 +1,166 @@
+from __future__ import division
+
+import numpy as np
+
+from ozone.methods.method import GLMMethod
+from ozone.methods.runge_kutta.sdirk import _esdirk_coeffs
+
+
+class AdditiveRungeKutta(GLMMethod):
+    """
+    Base class for implicit-explicit (IMEX) additive Runge--Kutta methods.
+
+    The ODE is split as f = f_N + f_S into a non-stiff and a stiff part, declared with the
+    rate_source and stiff_rate_source of each state. The stages
+
+        Y_i = y_n + h sum_j<i a^E_ij f_N(Y_j) + h sum_j<=i a^I_ij f_S(Y_j)
+
+    treat f_N with an explicit Runge--Kutta method and f_S with a diagonally implicit one, so each
+    stage only solves a nonlinear system in the stiff part. The states without a
+    stiff_rate_source are integrated with the explicit method. The GLM matrices are those of the
+    implicit method; the explicit coefficients are stored in explicit_A and explicit_B.
+    """
+
+    def __init__(self, explicit_A, explicit_b, implicit_A, implicit_b):
+        explicit_A = np.atleast_2d(explicit_A)
+        explicit_b = np.atleast_2d(explicit_b)
+        implicit_A = np.atleast_2d(implicit_A)
+        implicit_b = np.atleast_2d(implicit_b)
+
+        assert np.allclose(np.triu(explicit_A), 0.) and np.allclose(np.triu(implicit_A, 1), 0.), \
+            'The explicit and implicit coefficients must be strictly lower and lower triangular'
+        assert np.allclose(np.sum(explicit_A, 1), np.sum(implicit_A, 1)), \
+            'The explicit and implicit methods must have the same abscissa'
+
+        self.explicit_A = explicit_A
+        self.explicit_B = explicit_b
+
+        U = np.ones((implicit_A.shape[0], 1))
+        V = np.array([[1.]])
+
+        abscissa = np.sum(implicit_A, 1)
+        starting_method = None
+
+        super(AdditiveRungeKutta, self).__init__(implicit_A, implicit_b, U, V, abscissa,
+            starting_method)
+
+        self.imex = True
+
+
+class ARS222(AdditiveRungeKutta):
+    """
+    Second-order method of Ascher, Ruuth, and Spiteri (1997), whose implicit part is L-stable
+    and stiffly accurate with gamma = 1 - 1/sqrt(2).
+    """
+
+    def __init__(self):
+        self.order = 2
+
+        g = 1 - 1 / np.sqrt(2)
+        d = 1 - 1 / (2 * g)
+
+        super(ARS222, self).__init__(
+            explicit_A=np.array([
+                [0., 0., 0.],
+                [g, 0., 0.],
+                [d, 1 - d, 0.],
+            ]),
+            explicit_b=np.array([d, 1 - d, 0.]),
+            implicit_A=np.array([
+                [0., 0., 0.],
+                [0., g, 0.],
+                [0., 1 - g, g],
+            ]),
+            implicit_b=np.array([0., 1 - g, g]),
+        )
+
+
+class ARS443(AdditiveRungeKutta):
+    """
+    Third-order method of Ascher, Ruuth, and Spiteri (1997), whose implicit part is L-stable
+    and stiffly accurate with gamma = 1/2.
+    """
+
+    def __init__(self):
+        self.order = 3
+
+        explicit_A = np.array([
+            [0., 0., 0., 0., 0.],
+            [1 / 2, 0., 0., 0., 0.],
+            [11 / 18, 1 / 18, 0., 0., 0.],
+            [5 / 6, -5 / 6, 1 / 2, 0., 0.],
+            [1 / 4, 7 / 4, 3 / 4, -7 / 4, 0.],
+        ])
+        implicit_A = np.array([
+            [0., 0., 0., 0., 0.],
+            [0., 1 / 2, 0., 0., 0.],
+            [0., 1 / 6, 1 / 2, 0., 0.],
+            [0., -1 / 2, 1 / 2, 1 / 2, 0.],
+            [0., 3 / 2, -3 / 2, 1 / 2, 1 / 2],
+        ])
+
+        super(ARS443, self).__init__(
+            explicit_A=explicit_A, explicit_b=explicit_A[-1],
+            implicit_A=implicit_A, implicit_b=implicit_A[-1],
+        )
+
+
+class ARK3(AdditiveRungeKutta):
+    """
+    ARK3(2)4L[2]SA of Kennedy and Carpenter (2003): third order, with the L-stable ESDIRK3
+    as its implicit part and the same weights for both parts.
+    """
+
+    def __init__(self):
+        self.order = 3
+
+        implicit_A = _esdirk_coeffs[3]
+
+        super(ARK3, self).__init__(
+            explicit_A=np.array([
+                [0., 0., 0., 0.],
+                [1767732205903 / 2027836641118, 0., 0., 0.],
+                [5535828885825 / 10492691773637, 788022342437 / 10882634858940, 0., 0.],
+                [6485989280629 / 16251701735622, -4246266847089 / 9704473918619,
+                 10755448449292 / 10357097424841, 0.],
+            ]),
+            explicit_b=implicit_A[-1],
+            implicit_A=implicit_A, implicit_b=implicit_A[-1],
+        )
+
+
+class ARK4(AdditiveRungeKutta):
+    """
+    ARK4(3)6L[2]SA of Kennedy and Carpenter (2003): fourth order, with an L-stable,
+    stiffly accurate ESDIRK with gamma = 1/4 as its implicit part and the same weights for
+    both parts.
+    """
+
+    def __init__(self):
+        self.order = 4
+
+        implicit_A = np.array([
+            [0., 0., 0., 0., 0., 0.],
+            [1 / 4, 1 / 4, 0., 0., 0., 0.],
+            [8611 / 62500, -1743 / 31250, 1 / 4, 0., 0., 0.],
+            [5012029 / 34652500, -654441 / 2922500, 174375 / 388108, 1 / 4, 0., 0.],
+            [15267082809 / 155376265600, -71443401 / 120774400, 730878875 / 902184768,
+             2285395 / 8070912, 1 / 4, 0.],
+            [82889 / 524892, 0., 15625 / 83664, 69875 / 102672, -2260 / 8211, 1 / 4],
+        ])
+
+        super(ARK4, self).__init__(
+            explicit_A=np.array([
+                [0., 0., 0., 0., 0., 0.],
+                [1 / 2, 0., 0., 0., 0., 0.],
+                [13861 / 62500, 6889 / 62500, 0., 0., 0., 0.],
+                [-116923316275 / 2393684061468, -2731218467317 / 15368042101831,
+                 9408046702089 / 11113171139209, 0., 0., 0.],
+                [-451086348788 / 2902428689909, -2682348792572 / 7519795681897,
+                 12662868775082 / 11960479115383, 3355817975965 / 11060851509271, 0., 0.],
+                [647845179188 / 3216320057751, 73281519250 / 8382639484533,
+                 552539513391 / 3454668386233, 3354512671639 / 8306763924573, 4040 / 17871, 0.],
+            ]),
+            explicit_b=implicit_A[-1],
+            implicit_A=implicit_A, implicit_b=implicit_A[-1],
+        )
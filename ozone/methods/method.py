@@ -43,3 +43,15 @@ class GLMMethod(object):
         lower = np.tril(A, -1)
         err = np.linalg.norm(lower - A)
         self.explicit = err < 1e-15
+
+        # Whether the steps also depend on the ODE Jacobian, as in Rosenbrock methods.
+        self.linearly_implicit = False
+
+        # Whether the method treats a split ODE implicitly-explicitly, as in IMEX methods.
+        self.imex = False
+
+        # Whether the method integrates a linear part of the ODE exactly, as in exponential methods.
+        self.exponential = False
+
+        # Whether the method uses different coefficients for positions and velocities.
+        self.partitioned = False
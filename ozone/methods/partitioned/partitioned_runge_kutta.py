@@ -0,0 +1,113 @@
+from __future__ import division
+
+import numpy as np
+
+from ozone.methods.method import GLMMethod
+
+
+class PartitionedRungeKutta(GLMMethod):
+    """
+    Base class for explicit partitioned Runge--Kutta methods for second-order dynamics.
+
+    The states are partitioned into the positions q and the other states p, using the
+    position/velocity pairs declared on the ODEFunction. The stages are
+
+        Q_i = q_n + h sum_j<i a^q_ij f_q(Y_j),    P_i = p_n + h sum_j<i a^p_ij f_p(Y_j),
+
+    with Y_i = (Q_i, P_i), and the step uses the weights b^q and b^p. The GLM matrices are those
+    of the velocity partition; the position coefficients are stored in position_A and
+    position_B.
+    """
+
+    def __init__(self, position_A, position_b, velocity_A, velocity_b, abscissa):
+        position_A = np.atleast_2d(position_A)
+        position_b = np.atleast_2d(position_b)
+        velocity_A = np.atleast_2d(velocity_A)
+        velocity_b = np.atleast_2d(velocity_b)
+
+        assert np.allclose(np.triu(position_A), 0.) and np.allclose(np.triu(velocity_A), 0.), \
+            'The position and velocity coefficients must be strictly lower triangular'
+
+        self.position_A = position_A
+        self.position_B = position_b
+
+        U = np.ones((velocity_A.shape[0], 1))
+        V = np.array([[1.]])
+
+        starting_method = None
+
+        super(PartitionedRungeKutta, self).__init__(velocity_A, velocity_b, U, V,
+            np.array(abscissa, float), starting_method)
+
+        self.partitioned = True
+
+
+class SplittingMethod(PartitionedRungeKutta):
+    """
+    Symmetric splitting method, written as a partitioned Runge--Kutta method.
+
+    A step alternates kicks, p <- p + h b_k f_p(q, p), and drifts, q <- q + h a_k f_q(q, p),
+    starting and ending with a kick; each kick and drift is one stage. For separable systems,
+    q' = f_q(p) and p' = f_p(t, q), every kick and drift is an exact flow, so the method is
+    symplectic. The time advances with the drifts.
+    """
+
+    def __init__(self, kicks, drifts):
+        assert len(kicks) == len(drifts) + 1, 'A step must start and end with a kick'
+
+        num_stages = len(kicks) + len(drifts)
+        position_A = np.zeros((num_stages, num_stages))
+        velocity_A = np.zeros((num_stages, num_stages))
+        position_b = np.zeros(num_stages)
+        velocity_b = np.zeros(num_stages)
+        abscissa = np.zeros(num_stages)
+
+        # Kicks are the even stages and drifts the odd ones.
+        velocity_b[0::2] = kicks
+        position_b[1::2] = drifts
+        for i_stage in range(num_stages):
+            velocity_A[i_stage, :i_stage] = velocity_b[:i_stage]
+            position_A[i_stage, :i_stage] = position_b[:i_stage]
+            abscissa[i_stage] = np.sum(position_b[:i_stage])
+
+        super(SplittingMethod, self).__init__(position_A, position_b, velocity_A, velocity_b,
+            abscissa)
+
+
+class StormerVerlet(SplittingMethod):
+    """
+    Second-order Stormer--Verlet method in kick-drift-kick (velocity Verlet) form.
+    """
+
+    def __init__(self):
+        self.order = 2
+
+        super(StormerVerlet, self).__init__(kicks=[1 / 2, 1 / 2], drifts=[1.])
+
+
+class Yoshida(SplittingMethod):
+    """
+    Symmetric compositions of the Stormer--Verlet method of Yoshida (1990): the fourth-order
+    triple jump, and the sixth-order, seven-step composition of his solution A.
+    """
+
+    def __init__(self, order=4):
+        self.order = order
+
+        if order == 4:
+            w1 = 1 / (2 - 2 ** (1 / 3))
+            weights = [w1, -2 ** (1 / 3) * w1, w1]
+        elif order == 6:
+            w1, w2, w3 = -1.17767998417887, 0.235573213359357, 0.784513610477560
+            w0 = 1 - 2 * (w1 + w2 + w3)
+            weights = [w3, w2, w1, w0, w1, w2, w3]
+        else:
+            raise ValueError('Yoshida order must be one of the following: [4, 6]')
+
+        # Consecutive half kicks of the composed steps are merged.
+        weights = np.array(weights)
+        kicks = np.zeros(len(weights) + 1)
+        kicks[:-1] += weights / 2
+        kicks[1:] += weights / 2
+
+        super(Yoshida, self).__init__(kicks=kicks, drifts=weights)
@@ -0,0 +1,114 @@
+from __future__ import division
+
+import numpy as np
+
+from ozone.methods.method import GLMMethod
+
+
+class Rosenbrock(GLMMethod):
+    """
+    Base class for Rosenbrock (linearly implicit Runge--Kutta) methods.
+
+    A step solves the s linear systems
+
+        (I - h gamma J) k_i = h f(t_n + c_i h, y_n + sum_j<i alpha_ij k_j)
+                              + h J sum_j<i gamma_ij k_j + gamma_i h^2 f_t
+
+    and sets y_n+1 = y_n + sum_i b_i k_i, where J and f_t are the derivatives of f with respect
+    to y and t at (t_n, y_n). No Newton iterations are needed, and only I - h gamma J is
+    factorized per step. The GLM matrices are those of the explicit Runge--Kutta method obtained
+    with J = 0, i.e., A = alpha and B = b; the coupling through J is given by the gamma matrix.
+    """
+
+    def __init__(self, alpha, gamma, b):
+        alpha = np.atleast_2d(alpha)
+        gamma = np.atleast_2d(gamma)
+        b = np.atleast_2d(b)
+
+        assert np.allclose(np.diag(gamma), gamma[0, 0]) and np.allclose(np.triu(gamma, 1), 0.), \
+            'The gamma matrix must be lower triangular with a constant diagonal'
+
+        # Coefficients of the linear systems; gamma_sums are the gamma_i of the f_t term.
+        self.gamma = gamma
+        self.gamma_sums = np.sum(gamma, 1)
+
+        U = np.ones((alpha.shape[0], 1))
+        V = np.array([[1.]])
+
+        abscissa = np.sum(alpha, 1)
+        starting_method = None
+
+        super(Rosenbrock, self).__init__(alpha, b, U, V, abscissa, starting_method)
+
+        self.linearly_implicit = True
+
+
+class ROS2(Rosenbrock):
+    """
+    Two-stage, second-order, L-stable method of Verwer et al. (1999), with gamma = 1 + 1/sqrt(2).
+    """
+
+    def __init__(self):
+        self.order = 2
+
+        g = 1 + 1 / np.sqrt(2)
+
+        super(ROS2, self).__init__(
+            alpha=np.array([
+                [0., 0.],
+                [1., 0.],
+            ]),
+            gamma=np.array([
+                [g, 0.],
+                [-2 * g, g],
+            ]),
+            b=np.array([1 / 2, 1 / 2]))
+
+
+class ROS3P(Rosenbrock):
+    """
+    Three-stage, third-order, A-stable method of Lang and Verwer (2001), which does not suffer
+    from order reduction on parabolic problems.
+    """
+
+    def __init__(self):
+        self.order = 3
+
+        g = 1 / 2 + np.sqrt(3) / 6
+
+        super(ROS3P, self).__init__(
+            alpha=np.array([
+                [0., 0., 0.],
+                [1., 0., 0.],
+                [1., 0., 0.],
+            ]),
+            gamma=np.array([
+                [g, 0., 0.],
+                [-1., g, 0.],
+                [-g, -1 / 2 - np.sqrt(3) / 3, g],
+            ]),
+            b=np.array([2 / 3, 0., 1 / 3]))
+
+
+class RODAS3(Rosenbrock):
+    """
+    Four-stage, third-order, stiffly accurate method of Sandu et al. (1997), with gamma = 1/2.
+    """
+
+    def __init__(self):
+        self.order = 3
+
+        super(RODAS3, self).__init__(
+            alpha=np.array([
+                [0., 0., 0., 0.],
+                [0., 0., 0., 0.],
+                [1., 0., 0., 0.],
+                [3 / 4, -1 / 4, 1 / 2, 0.],
+            ]),
+            gamma=np.array([
+                [1 / 2, 0., 0., 0.],
+                [1., 1 / 2, 0., 0.],
+                [-1 / 4, -1 / 4, 1 / 2, 0.],
+                [1 / 12, 1 / 12, -2 / 3, 1 / 2],
+            ]),
+            b=np.array([5 / 6, -1 / 6, -1 / 6, 1 / 2]))
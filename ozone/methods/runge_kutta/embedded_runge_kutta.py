@@ -0,0 +1,119 @@
+from __future__ import division
+
+import numpy as np
+
+from ozone.methods.runge_kutta.runge_kutta import RungeKutta
+
+
+class EmbeddedRungeKutta(RungeKutta):
+    """
+    Explicit Runge--Kutta method with an embedded method of a different order.
+
+    The step is advanced with B, and h * error_weights.dot(F) estimates the local error,
+    where error_weights = B - B_hat and B_hat are the weights of the embedded method.
+    """
+
+    def __init__(self, A, B, B_hat):
+        B = np.atleast_2d(B)
+        B_hat = np.atleast_2d(B_hat)
+
+        self.error_weights = B - B_hat
+
+        super(EmbeddedRungeKutta, self).__init__(A=A, B=B)
+
+
+class BogackiShampine(EmbeddedRungeKutta):
+
+    def __init__(self):
+        self.order = 3
+        self.embedded_order = 2
+
+        A = np.array([
+            [0., 0., 0., 0.],
+            [1 / 2, 0., 0., 0.],
+            [0., 3 / 4, 0., 0.],
+            [2 / 9, 1 / 3, 4 / 9, 0.],
+        ])
+
+        B = np.array([
+            [2 / 9, 1 / 3, 4 / 9, 0.],
+        ])
+
+        B_hat = np.array([
+            [7 / 24, 1 / 4, 1 / 3, 1 / 8],
+        ])
+
+        super(BogackiShampine, self).__init__(A=A, B=B, B_hat=B_hat)
+
+
+class DormandPrince(EmbeddedRungeKutta):
+
+    def __init__(self):
+        self.order = 5
+        self.embedded_order = 4
+
+        A = np.zeros((7, 7))
+        A[1, :1] = [1 / 5]
+        A[2, :2] = [3 / 40, 9 / 40]
+        A[3, :3] = [44 / 45, -56 / 15, 32 / 9]
+        A[4, :4] = [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729]
+        A[5, :5] = [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656]
+        A[6, :6] = [35 / 384, 0., 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]
+
+        B = np.array([
+            [35 / 384, 0., 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0.],
+        ])
+
+        B_hat = np.array([
+            [5179 / 57600, 0., 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40],
+        ])
+
+        super(DormandPrince, self).__init__(A=A, B=B, B_hat=B_hat)
+
+
+class CashKarp(EmbeddedRungeKutta):
+
+    def __init__(self):
+        self.order = 5
+        self.embedded_order = 4
+
+        A = np.zeros((6, 6))
+        A[1, :1] = [1 / 5]
+        A[2, :2] = [3 / 40, 9 / 40]
+        A[3, :3] = [3 / 10, -9 / 10, 6 / 5]
+        A[4, :4] = [-11 / 54, 5 / 2, -70 / 27, 35 / 27]
+        A[5, :5] = [1631 / 55296, 175 / 512, 575 / 13824, 44275 / 110592, 253 / 4096]
+
+        B = np.array([
+            [37 / 378, 0., 250 / 621, 125 / 594, 0., 512 / 1771],
+        ])
+
+        B_hat = np.array([
+            [2825 / 27648, 0., 18575 / 48384, 13525 / 55296, 277 / 14336, 1 / 4],
+        ])
+
+        super(CashKarp, self).__init__(A=A, B=B, B_hat=B_hat)
+
+
+class Fehlberg(EmbeddedRungeKutta):
+
+    def __init__(self):
+        self.order = 4
+        self.embedded_order = 5
+
+        A = np.zeros((6, 6))
+        A[1, :1] = [1 / 4]
+        A[2, :2] = [3 / 32, 9 / 32]
+        A[3, :3] = [1932 / 2197, -7200 / 2197, 7296 / 2197]
+        A[4, :4] = [439 / 216, -8., 3680 / 513, -845 / 4104]
+        A[5, :5] = [-8 / 27, 2., -3544 / 2565, 1859 / 4104, -11 / 40]
+
+        B = np.array([
+            [25 / 216, 0., 1408 / 2565, 2197 / 4104, -1 / 5, 0.],
+        ])
+
+        B_hat = np.array([
+            [16 / 135, 0., 6656 / 12825, 28561 / 56430, -9 / 50, 2 / 55],
+        ])
+
+        super(Fehlberg, self).__init__(A=A, B=B, B_hat=B_hat)
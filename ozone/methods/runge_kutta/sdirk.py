@@ -0,0 +1,70 @@
+from __future__ import division
+
+import numpy as np
+
+from ozone.methods.runge_kutta.runge_kutta import RungeKutta
+
+
+_gamma2 = 1 - np.sqrt(2) / 2
+_gamma3 = 0.43586652150845899941601945119356
+
+_sdirk_coeffs = {
+    # Alexander (1977), L-stable.
+    2: np.array([[_gamma2, 0.],
+                 [1 - _gamma2, _gamma2]]),
+    # Alexander (1977), L-stable.
+    3: np.array([[_gamma3, 0., 0.],
+                 [(1 - _gamma3) / 2, _gamma3, 0.],
+                 [-(6 * _gamma3 ** 2 - 16 * _gamma3 + 1) / 4,
+                  (6 * _gamma3 ** 2 - 20 * _gamma3 + 5) / 4, _gamma3]]),
+    # Hairer and Wanner (1996), L-stable.
+    4: np.array([[1 / 4, 0., 0., 0., 0.],
+                 [1 / 2, 1 / 4, 0., 0., 0.],
+                 [17 / 50, -1 / 25, 1 / 4, 0., 0.],
+                 [371 / 1360, -137 / 2720, 15 / 544, 1 / 4, 0.],
+                 [25 / 24, -49 / 48, 125 / 16, -85 / 12, 1 / 4]]),
+}
+
+_esdirk_coeffs = {
+    # TR-BDF2 of Bank et al. (1985), L-stable.
+    2: np.array([[0., 0., 0.],
+                 [_gamma2, _gamma2, 0.],
+                 [np.sqrt(2) / 4, np.sqrt(2) / 4, _gamma2]]),
+    # ESDIRK3(2)4L[2]SA of Kennedy and Carpenter (2016), L-stable with stage order 2.
+    3: np.array([[0., 0., 0., 0.],
+                 [_gamma3, _gamma3, 0., 0.],
+                 [0.2576482460664272, -0.09351476757488622, _gamma3, 0.],
+                 [0.1876410243467238, -0.5952974735769553, 0.9717899277217725, _gamma3]]),
+}
+
+
+class SDIRK(RungeKutta):
+    """
+    Stiffly accurate, singly diagonally implicit Runge--Kutta methods.
+    """
+
+    def __init__(self, order=3):
+        self.order = order
+
+        if order not in _sdirk_coeffs:
+            raise ValueError('SDIRK order must be one of the following: {}'.format(
+                sorted(_sdirk_coeffs.keys())
+            ))
+        A = _sdirk_coeffs[order]
+        super(SDIRK, self).__init__(A=A, B=A[-1])
+
+
+class ESDIRK(RungeKutta):
+    """
+    Stiffly accurate, singly diagonally implicit Runge--Kutta methods with an explicit first stage.
+    """
+
+    def __init__(self, order=3):
+        self.order = order
+
+        if order not in _esdirk_coeffs:
+            raise ValueError('ESDIRK order must be one of the following: {}'.format(
+                sorted(_esdirk_coeffs.keys())
+            ))
+        A = _esdirk_coeffs[order]
+        super(ESDIRK, self).__init__(A=A, B=A[-1])
@@ -1,11 +1,19 @@
 from ozone.methods.runge_kutta.explicit_runge_kutta import \
     ForwardEuler, ExplicitMidpoint, ExplicitMidpointST, HeunsMethod, RalstonsMethod, \
     KuttaThirdOrder, KuttaThirdOrderST, RK4, RK4ST, RK6, RK6ST
+from ozone.methods.runge_kutta.embedded_runge_kutta import \
+    BogackiShampine, DormandPrince, CashKarp, Fehlberg
 from ozone.methods.runge_kutta.implicit_runge_kutta import \
     BackwardEuler, ImplicitMidpoint, TrapezoidalRule
 from ozone.methods.runge_kutta.gauss_legendre import GaussLegendre
 from ozone.methods.runge_kutta.lobatto import LobattoIIIA
 from ozone.methods.runge_kutta.radau import Radau
+from ozone.methods.runge_kutta.sdirk import SDIRK, ESDIRK
+from ozone.methods.rosenbrock.rosenbrock import ROS2, ROS3P, RODAS3
+from ozone.methods.imex.additive_runge_kutta import ARS222, ARS443, ARK3, ARK4
+from ozone.methods.exponential.exponential_runge_kutta import \
+    ExponentialEuler, ETDRK2, ETDRK4, HochbruckOstermann4
+from ozone.methods.partitioned.partitioned_runge_kutta import StormerVerlet, Yoshida
 from ozone.methods.linear_multistep.adams import AB, AM
 from ozone.methods.linear_multistep.adams_alt import ABalt, AMalt
 from ozone.methods.linear_multistep.bdf import BDF
@@ -35,7 +43,35 @@ method_classes = {
     'RadauI5': Radau('I', 5),
     'RadauII3': Radau('II', 3),
     'RadauII5': Radau('II', 5),
+    'SDIRK2': SDIRK(2),
+    'SDIRK3': SDIRK(3),
+    'SDIRK4': SDIRK(4),
+    'ESDIRK2': ESDIRK(2),
+    'ESDIRK3': ESDIRK(3),
     'Trapezoidal': TrapezoidalRule(),
+    # Embedded Runge--Kutta pairs
+    'BogackiShampine32': BogackiShampine(),
+    'DormandPrince54': DormandPrince(),
+    'CashKarp54': CashKarp(),
+    'Fehlberg45': Fehlberg(),
+    # Rosenbrock methods
+    'ROS2': ROS2(),
+    'ROS3P': ROS3P(),
+    'RODAS3': RODAS3(),
+    # IMEX additive Runge--Kutta methods
+    'ARS222': ARS222(),
+    'ARS443': ARS443(),
+    'ARK3': ARK3(),
+    'ARK4': ARK4(),
+    # Exponential Runge--Kutta methods
+    'ExponentialEuler': ExponentialEuler(),
+    'ETDRK2': ETDRK2(),
+    'ETDRK4': ETDRK4(),
+    'HochbruckOstermann4': HochbruckOstermann4(),
+    # Symplectic partitioned Runge--Kutta methods
+    'StormerVerlet': StormerVerlet(),
+    'Yoshida4': Yoshida(4),
+    'Yoshida6': Yoshida(6),
     # Adams--Bashforth family
     'AB1': ForwardEuler(),
     'AB2': AB(2),
@@ -82,9 +118,16 @@ method_classes = {
 family_names = [
     'ExplicitRungeKutta',
     'ImplicitRungeKutta',
+    'EmbeddedRungeKutta',
     'GaussLegendre',
     'Lobatto',
     'Radau',
+    'SDIRK',
+    'ESDIRK',
+    'Rosenbrock',
+    'IMEX',
+    'Exponential',
+    'Symplectic',
     'BDF',
     'AB',
     'AM',
@@ -108,6 +151,12 @@ method_families['ImplicitRungeKutta'] = [
     'ImplicitMidpoint',
     'Trapezoidal',
 ]
+method_families['EmbeddedRungeKutta'] = [
+    'BogackiShampine32',
+    'DormandPrince54',
+    'CashKarp54',
+    'Fehlberg45',
+]
 method_families['GaussLegendre'] = [
     'GaussLegendre2',
     'GaussLegendre4',
@@ -123,6 +172,37 @@ method_families['Radau'] = [
     'RadauII3',
     'RadauII5',
 ]
+method_families['SDIRK'] = [
+    'SDIRK2',
+    'SDIRK3',
+    'SDIRK4',
+]
+method_families['ESDIRK'] = [
+    'ESDIRK2',
+    'ESDIRK3',
+]
+method_families['Rosenbrock'] = [
+    'ROS2',
+    'ROS3P',
+    'RODAS3',
+]
+method_families['IMEX'] = [
+    'ARS222',
+    'ARS443',
+    'ARK3',
+    'ARK4',
+]
+method_families['Exponential'] = [
+    'ExponentialEuler',
+    'ETDRK2',
+    'ETDRK4',
+    'HochbruckOstermann4',
+]
+method_families['Symplectic'] = [
+    'StormerVerlet',
+    'Yoshida4',
+    'Yoshida6',
+]
 method_families['AB'] = [
     'AB2',
     'AB3',
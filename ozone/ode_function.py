@@ -1,11 +1,16 @@
 from __future__ import print_function, division, absolute_import
 
 from collections import Iterable
+from functools import partial
 from six import iteritems, string_types
 import numpy as np
 
 from openmdao.utils.options_dictionary import OptionsDictionary
 
+from ozone.utils.var_names import get_name
+from ozone.components.split_rate_comp import SplitRateGroup
+from ozone.components.ensemble_comp import EnsembleGroup
+
 
 class ODEFunction(object):
     """
@@ -25,6 +30,9 @@ class ODEFunction(object):
         """
         self._system_class = None
         self._system_init_kwargs = {}
+        self._preconditioner = None
+        self._transpose_preconditioner = None
+        self._linear_operator = None
 
         time_options = OptionsDictionary()
         time_options.declare('targets', default=[], types=Iterable)
@@ -34,6 +42,7 @@ class ODEFunction(object):
         self._states = {}
         self._static_parameters = {}
         self._dynamic_parameters = {}
+        self._state_pairs = []
 
         self.initialize(**kwargs)
 
@@ -63,6 +72,42 @@ class ODEFunction(object):
         if system_init_kwargs is not None:
             self._system_init_kwargs = system_init_kwargs
 
+    def set_preconditioner(self, preconditioner, transpose_preconditioner=None):
+        """
+        Set a function that approximately solves (I - gamma df/dy) x = rhs for the states.
+
+        The function is called as preconditioner(y, gamma, rhs), where y and rhs are dictionaries
+        of state values and right-hand sides keyed by state name, each with the shape of the
+        state, and gamma is a float. It returns a dictionary of the solution x in the same form.
+        It is used to precondition the Krylov solver of the implicit time-marching steps.
+
+        Parameters
+        ----------
+        preconditioner : callable
+            The preconditioning function.
+        transpose_preconditioner : callable or None
+            The function that approximately solves (I - gamma df/dy)^T x = rhs, called in the
+            same way, for the derivatives in rev mode. If None, preconditioner is used, which
+            is exact if df/dy is symmetric.
+        """
+        self._preconditioner = preconditioner
+        self._transpose_preconditioner = transpose_preconditioner
+
+    def set_linear_operator(self, linear_operator):
+        """
+        Set the constant linear part L of a semi-linear ODE, y' = L y + N(t, y).
+
+        The ODE system still computes the full derivative. Exponential methods integrate the
+        linear part exactly and the remainder, f - L y, explicitly; the other methods ignore L.
+
+        Parameters
+        ----------
+        linear_operator : ndarray[state_size, state_size]
+            The matrix L acting on the states, flattened and concatenated in the order in which
+            they were declared.
+        """
+        self._linear_operator = np.atleast_2d(np.array(linear_operator, float))
+
     def declare_time(self, targets=None, units=None):
         """
         Specify the targets and units of time or the time-like variable.
@@ -84,7 +129,8 @@ class ODEFunction(object):
         if units is not None:
             self._time_options['units'] = units
 
-    def declare_state(self, name, rate_source, targets=None, shape=None, units=None):
+    def declare_state(self, name, rate_source, targets=None, shape=None, units=None,
+            stiff_rate_source=None):
         """
         Add an ODE state variable.
 
@@ -95,7 +141,8 @@ class ODEFunction(object):
             exist as an interface to the ODE.
         rate_source : str
             The path to the variable within the ODE which represents the derivative of
-            the state variable w.r.t. the variable of integration.
+            the state variable w.r.t. the variable of integration, or its non-stiff part if
+            stiff_rate_source is given.
         targets : string_types or Iterable or None
             Paths to inputs in the ODE to which the incoming value of the state variable
             needs to be connected.
@@ -103,6 +150,11 @@ class ODEFunction(object):
             The shape of the variable to potentially be provided as a control.
         units : str or None
             Units of the variable.
+        stiff_rate_source : str or None
+            The path to the variable within the ODE which represents the stiff part of the
+            derivative, if it is split. The derivative is then the sum of the two parts; IMEX
+            methods treat the stiff part implicitly and the non-stiff part explicitly, and the
+            other methods integrate the sum.
         """
         if name in self._states:
             raise ValueError('State {0} has already been declared.'.format(name))
@@ -110,12 +162,20 @@ class ODEFunction(object):
         options = OptionsDictionary()
         options.declare('name', types=string_types)
         options.declare('rate_source', types=string_types)
+        options.declare('nonstiff_rate_source', types=string_types)
+        options.declare('stiff_rate_source', default=None, types=string_types, allow_none=True)
         options.declare('targets', default=[], types=Iterable)
         options.declare('shape', default=(1,), types=tuple)
         options.declare('units', default=None, types=string_types, allow_none=True)
 
         options['name'] = name
-        options['rate_source'] = rate_source
+        options['nonstiff_rate_source'] = rate_source
+        if stiff_rate_source is None:
+            options['rate_source'] = rate_source
+        else:
+            # The sum of the two parts is computed by the split rate comp of the ODE system.
+            options['rate_source'] = 'split_rate_comp.%s' % get_name('rate', name)
+            options['stiff_rate_source'] = stiff_rate_source
         if isinstance(targets, string_types):
             options['targets'] = [targets]
         elif isinstance(targets, Iterable):
@@ -133,6 +193,51 @@ class ODEFunction(object):
 
         self._states[name] = options
 
+    def declare_state_pair(self, position, velocity):
+        """
+        Declare a position state and its velocity state, for second-order dynamics.
+
+        Partitioned methods, such as Stormer--Verlet, integrate the positions and the other
+        states with different coefficients; the other methods ignore the pairs.
+
+        Parameters
+        ----------
+        position : str
+            The name of the position state, whose rate should only depend on the velocity.
+        velocity : str
+            The name of the velocity state, whose rate should only depend on the position.
+        """
+        for name in [position, velocity]:
+            if name not in self._states:
+                raise ValueError('State {0} has not been declared.'.format(name))
+            if any(name in pair for pair in self._state_pairs):
+                raise ValueError('State {0} is already in a pair.'.format(name))
+
+        self._state_pairs.append((position, velocity))
+
+    def _create_system(self, num_nodes):
+        """
+        Instantiate the ODE system, with the split rate comp if any state has a stiff part.
+
+        Parameters
+        ----------
+        num_nodes : int
+            Number of nodes with which the ODE system is instantiated.
+
+        Returns
+        -------
+        System
+            The ODE system, whose outputs include the rate source of every state.
+        """
+        if self._is_split():
+            return SplitRateGroup(ode_function=self, num_nodes=num_nodes)
+
+        return self._system_class(num_nodes=num_nodes, **self._system_init_kwargs)
+
+    def _is_split(self):
+        # Whether the derivative of any state is split into a non-stiff and a stiff part.
+        return any(state['stiff_rate_source'] is not None for state in self._states.values())
+
     def declare_parameter(self, name, targets, shape=None, units=None, dynamic=True):
         """
         Declare an input to the ODE.
@@ -274,3 +379,97 @@ class ODEFunction(object):
             Time at which the exact solution is desired.
         """
         pass
+
+
+class EnsembleODEFunction(ODEFunction):
+    """
+    ODE function integrating an ensemble of members of another ODE function in lock-step.
+
+    Each state and parameter of the member ODE function has the shape (num_members,) + shape,
+    with the members along the leading axis, so the members' states are marched by the same
+    stage and step updates, and the ODE system is instantiated once, for all the members at
+    every node, as an EnsembleGroup. The ODE Jacobian is block-diagonal over the members: the
+    fused formulations step the members with an EnsembleStepper, which linearizes and solves
+    them member by member, and the time-marching formulation of the implicit methods assembles
+    it as a sparse matrix. Its histories have the times first, as those of any ODE function;
+    ODEIntegrator wraps its integrator in an EnsembleIntegrator, whose dynamic parameters and
+    state histories have the members first. The state pairs, the linear operator, and the
+    preconditioner of the member ODE function apply to each member.
+    """
+
+    def initialize(self, ode_function, num_members):
+        """
+        Declare the time, states, and parameters of the ensemble.
+
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function of each member.
+        num_members : int
+            Number of members of the ensemble.
+        """
+        self.ode_function = ode_function
+        self.num_members = num_members
+
+        self.set_system(EnsembleGroup, {'ode_function': ode_function, 'num_members': num_members})
+
+        time_options = ode_function._time_options
+        self.declare_time(targets=['ensemble_input_comp.t'] if time_options['targets'] else None,
+            units=time_options['units'])
+
+        for state_name, state in iteritems(ode_function._states):
+            targets = [] if not state['targets'] \
+                else ['ensemble_input_comp.%s' % get_name('state', state_name)]
+
+            if state['stiff_rate_source'] is None:
+                self.declare_state(state_name,
+                    'ensemble_output_comp.%s' % get_name('rate', state_name),
+                    targets=targets, shape=(num_members,) + state['shape'], units=state['units'])
+            else:
+                self.declare_state(state_name,
+                    'ensemble_output_comp.%s' % get_name('nonstiff_rate', state_name),
+                    stiff_rate_source='ensemble_output_comp.%s' % get_name(
+                        'stiff_rate', state_name),
+                    targets=targets, shape=(num_members,) + state['shape'], units=state['units'])
+
+        for dynamic, parameters in [
+                (False, ode_function._static_parameters),
+                (True, ode_function._dynamic_parameters)]:
+            type_ = 'dynamic_parameter' if dynamic else 'static_parameter'
+            for parameter_name, parameter in iteritems(parameters):
+                targets = [] if not parameter['targets'] \
+                    else ['ensemble_input_comp.%s' % get_name(type_, parameter_name)]
+
+                self.declare_parameter(parameter_name, targets,
+                    shape=(num_members,) + parameter['shape'], units=parameter['units'],
+                    dynamic=dynamic)
+
+        for position, velocity in ode_function._state_pairs:
+            self.declare_state_pair(position, velocity)
+
+        if ode_function._preconditioner is not None:
+            if ode_function._transpose_preconditioner is not None:
+                transpose_preconditioner = partial(self._precondition, transpose=True)
+            else:
+                transpose_preconditioner = None
+            self.set_preconditioner(self._precondition, transpose_preconditioner)
+
+    def _precondition(self, y, gamma, rhs, transpose=False):
+        # The preconditioner of the member ODE function, or its transpose, is applied to each
+        # member.
+        if transpose:
+            preconditioner = self.ode_function._transpose_preconditioner
+        else:
+            preconditioner = self.ode_function._preconditioner
+
+        x = dict([(state_name, np.zeros(value.shape)) for state_name, value in iteritems(rhs)])
+        for i_member in range(self.num_members):
+            x_member = preconditioner(
+                dict([(state_name, value[i_member]) for state_name, value in iteritems(y)]),
+                gamma,
+                dict([(state_name, value[i_member]) for state_name, value in iteritems(rhs)]))
+
+            for state_name, value in iteritems(x_member):
+                x[state_name][i_member] = value
+
+        return x
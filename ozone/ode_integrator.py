@@ -3,12 +3,13 @@ from six import iteritems
 
 from ozone.utils.misc import _get_class
 from ozone.methods_list import get_method
+from ozone.ode_function import EnsembleODEFunction
 
 
 def ODEIntegrator(ode_function, formulation, method_name,
         initial_conditions=None, static_parameters=None, dynamic_parameters=None,
         initial_time=None, final_time=None, normalized_times=None, times=None,
-        **kwargs):
+        output_times=None, normalized_output_times=None, num_members=None, **kwargs):
     """
     Create and return an OpenMDAO group containing the ODE integrator.
 
@@ -19,7 +20,15 @@ def ODEIntegrator(ode_function, formulation, method_name,
     ode_function : ODEFunction
         The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
     formulation : str
-        Formulation for solving the ODE: 'time-marching', 'solver-based', or 'optimizer-based'.
+        Formulation for solving the ODE: 'time-marching', 'fused-time-marching',
+        'adaptive-time-marching', 'multiple-shooting', 'parareal', 'solver-based', or
+        'optimizer-based'. Rosenbrock methods only support the first two, in which case
+        'time-marching' is 'fused-time-marching', as well as 'multiple-shooting' and 'parareal';
+        so do the IMEX methods, which require the ODE rates to be split with stiff_rate_source,
+        the exponential methods, which require a linear operator set on the ODEFunction, and the
+        partitioned methods, which require position/velocity state pairs.
+        With a BDF method, 'adaptive-time-marching' also varies the order, up to that of the
+        method and at most 5.
     method_name : str
         The time integration method. The list of methods can be found in the documentation.
     initial_conditions : dict or None
@@ -41,6 +50,30 @@ def ODEIntegrator(ode_function, formulation, method_name,
         Not necessary if times is provided.
     times : np.ndarray[:]
         Vector of times required if initial time, final time, and normalized_times are not given.
+    output_times : np.ndarray[:] or None
+        Optional vector of times between the first and the last times at which the states are
+        interpolated, as the state_at:<name> outputs, without adding integration steps.
+        It requires the initial and final times to be given, since the output times are fixed
+        fractions of the time interval, which move with the initial and final times.
+    normalized_output_times : np.ndarray[:] or None
+        Alternative to output_times, normalized like normalized_times.
+    num_members : int or None
+        If given, an ensemble of num_members members of the ODE is integrated in lock-step,
+        with the members folded into the nodes of the ODE system. The members are along the
+        leading axis of all the variables: the initial conditions and the static parameters
+        have shape (num_members,) + shape, and the dynamic parameters and the state and
+        state_at outputs have shape (num_members, num_times) + shape. Initial conditions and
+        parameters given with the shape of a single member are used for all the members.
+    **kwargs : dict
+        Options of the integrator class for the given formulation, e.g., solver, fd_jacvec,
+        simplified_newton, max_convergence_rate, stage_predictor, and sequential_stages for
+        'time-marching' with implicit methods; num_checkpoints, stage_solver, and
+        rosenbrock_fd_step for 'fused-time-marching'; atol, rtol, initial_step, and
+        max_num_steps for 'adaptive-time-marching'; num_segments, continuity,
+        segment_formulation, and num_workers for 'multiple-shooting'; coarse_method,
+        num_segments, num_coarse_steps, num_workers, parareal_atol, parareal_rtol, and
+        parareal_maxiter for 'parareal'; or matrix_free, solver, solver_atol, solver_rtol,
+        solver_maxiter, and solver_iprint for 'solver-based'.
 
     Returns
     -------
@@ -48,8 +81,15 @@ def ODEIntegrator(ode_function, formulation, method_name,
         The OpenMDAO Group instance representing the requested integrator.
     """
     method = get_method(method_name)
+
+    if num_members is not None:
+        ode_function, initial_conditions, static_parameters, dynamic_parameters = \
+            _get_ensemble(ode_function, num_members,
+                initial_conditions, static_parameters, dynamic_parameters)
+
     explicit = method.explicit
-    integrator_class = get_integrator(formulation, explicit)
+    integrator_class = get_integrator(formulation, explicit, method.linearly_implicit,
+        method.imex, method.exponential, method.partitioned)
 
     # ------------------------------------------------------------------------------------
     # time-related option
@@ -71,6 +111,27 @@ def ODEIntegrator(ode_function, formulation, method_name,
         final_time = times[-1]
         normalized_times = (times - times[0]) / (times[-1] - times[0])
 
+    if output_times is not None:
+        assert isinstance(output_times, np.ndarray) and len(output_times.shape) == 1, \
+            'output_times must be a 1-D array'
+
+        assert normalized_output_times is None, \
+            'If output_times is provided: normalized_output_times cannot be'
+
+        assert initial_time is not None and final_time is not None, \
+            'output_times requires the initial and final times; use normalized_output_times'
+
+        normalized_output_times = (output_times - initial_time) / (final_time - initial_time)
+
+    if normalized_output_times is not None:
+        assert isinstance(normalized_output_times, np.ndarray) \
+            and len(normalized_output_times.shape) == 1, \
+            'normalized_output_times must be a 1-D array'
+
+        assert np.min(normalized_output_times) >= normalized_times[0] \
+            and np.max(normalized_output_times) <= normalized_times[-1], \
+            'The output times must be between the first and the last times'
+
     # ------------------------------------------------------------------------------------
     # Ensure that all initial_conditions are valid
     if initial_conditions is not None:
@@ -114,9 +175,15 @@ def ODEIntegrator(ode_function, formulation, method_name,
             assert isinstance(value, np.ndarray), \
                 'Dynamic parameter %s must be an ndarray' % parameter_name
 
+            # The dynamic parameters of an ensemble have the members along their leading axis.
             shape = ode_function._dynamic_parameters[parameter_name]['shape']
-            assert value.shape == (num_times,) + shape, \
-                'Dynamic parameter %s has the wrong shape' % state_name
+            if num_members is not None:
+                shape = shape[:1] + (num_times,) + shape[1:]
+            else:
+                shape = (num_times,) + shape
+
+            assert value.shape == shape, \
+                'Dynamic parameter %s has the wrong shape' % parameter_name
 
     # ------------------------------------------------------------------------------------
 
@@ -124,23 +191,83 @@ def ODEIntegrator(ode_function, formulation, method_name,
         kwargs['formulation'] = formulation
 
     integrator = integrator_class(ode_function=ode_function, method=method,
-        initial_conditions=initial_conditions,
-        static_parameters=static_parameters, dynamic_parameters=dynamic_parameters,
+        initial_conditions=initial_conditions, static_parameters=static_parameters,
+        dynamic_parameters=dynamic_parameters if num_members is None else None,
         initial_time=initial_time, final_time=final_time, normalized_times=normalized_times,
-        all_norm_times=normalized_times,
+        all_norm_times=normalized_times, normalized_output_times=normalized_output_times,
         **kwargs)
 
+    # The given dynamic parameters of an ensemble are transposed with its state histories.
+    if num_members is not None:
+        from ozone.integrators.ensemble_integrator import EnsembleIntegrator
+
+        integrator = EnsembleIntegrator(integrator=integrator,
+            dynamic_parameters=dynamic_parameters)
+
     return integrator
 
 
-def get_integrator(formulation, explicit):
+def _get_ensemble(ode_function, num_members,
+        initial_conditions, static_parameters, dynamic_parameters):
+    # The ensemble ODE function, and the values given for a single member broadcast to all.
+    assert isinstance(num_members, int) and num_members > 0, \
+        'num_members must be a positive integer'
+
+    ensemble_function = EnsembleODEFunction(ode_function=ode_function, num_members=num_members)
+
+    # The values of a member have no time axis, except for the dynamic parameters.
+    values = []
+    for given_values, variables, num_time_axes in [
+            (initial_conditions, ode_function._states, 0),
+            (static_parameters, ode_function._static_parameters, 0),
+            (dynamic_parameters, ode_function._dynamic_parameters, 1)]:
+        if given_values is None:
+            values.append(None)
+            continue
+
+        values.append({})
+        for name, value in iteritems(given_values):
+            value = np.atleast_1d(value)
+            if name in variables and value.shape[num_time_axes:] == variables[name]['shape']:
+                value = np.repeat(value[np.newaxis], num_members, axis=0)
+
+            values[-1][name] = value
+
+    return [ensemble_function] + values
+
+
+def get_integrator(formulation, explicit, linearly_implicit=False, imex=False,
+        exponential=False, partitioned=False):
     from ozone.integrators.explicit_tm_integrator import ExplicitTMIntegrator
     from ozone.integrators.implicit_tm_integrator import ImplicitTMIntegrator
     from ozone.integrators.vectorized_integrator import VectorizedIntegrator
+    from ozone.integrators.fused_tm_integrator import FusedTMIntegrator
+    from ozone.integrators.adaptive_tm_integrator import AdaptiveTMIntegrator
+    from ozone.integrators.multiple_shooting_integrator import MultipleShootingIntegrator
+    from ozone.integrators.parareal_integrator import PararealIntegrator
 
     integrator_classes = {
         'optimizer-based': VectorizedIntegrator,
         'solver-based': VectorizedIntegrator,
         'time-marching': ExplicitTMIntegrator if explicit else ImplicitTMIntegrator,
+        'fused-time-marching': FusedTMIntegrator,
+        'adaptive-time-marching': AdaptiveTMIntegrator,
+        'multiple-shooting': MultipleShootingIntegrator,
+        'parareal': PararealIntegrator,
     }
+
+    # The steps of Rosenbrock methods depend on the ODE Jacobian, which the residuals of the
+    # vectorized and the other time-marching formulations cannot contain without second
+    # derivatives of the ODE; they are marched with the fused formulation. So are the IMEX
+    # methods, whose stages need the non-stiff and stiff parts of the rates separately, the
+    # exponential methods, whose coefficients are matrix functions of the step size, and the
+    # partitioned methods, whose coefficients differ between states.
+    if linearly_implicit or imex or exponential or partitioned:
+        integrator_classes['time-marching'] = FusedTMIntegrator
+
+        assert formulation in ['time-marching', 'fused-time-marching', 'multiple-shooting',
+            'parareal'], \
+            'Rosenbrock, IMEX, exponential, and partitioned methods require the time-marching, ' \
+            'fused-time-marching, multiple-shooting, or parareal formulation'
+
     return _get_class(formulation, integrator_classes, 'Integrator')
@@ -0,0 +1,185 @@
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse
+from six import iteritems
+
+from ozone.methods_list import get_method
+from ozone.utils.glm_stepper import GLMStepper
+from ozone.utils.rosenbrock_stepper import RosenbrockStepper
+from ozone.utils.imex_stepper import IMEXStepper
+from ozone.utils.exponential_stepper import ExponentialStepper
+from ozone.utils.partitioned_stepper import PartitionedStepper
+from ozone.utils.ensemble_stepper import get_stepper
+from ozone.utils.sparse_linear_spline import get_sparse_linear_spline
+
+
+# The steppers of the max_cached_steppers most recently simulated ODE functions and methods,
+# so that the ODE systems are only instantiated and set up in the first simulation. They are
+# keyed by the id of the ODE function, which they keep alive.
+_steppers = OrderedDict()
+max_cached_steppers = 16
+
+
+def simulate(ode_function, method_name, times, initial_conditions,
+        static_parameters=None, dynamic_parameters=None):
+    """
+    Integrate the ODE forward in time on NumPy arrays, without an OpenMDAO model.
+
+    The steps are those of the fused time-marching formulation, but no model is set up and
+    no derivatives are computed, which makes repeated forward runs, e.g., for Monte Carlo
+    analyses, much cheaper. The ODE system is instantiated once per number of nodes the first
+    time an ODE function is simulated with a method; if it is a single ExplicitComponent, its
+    compute method is called directly. Multistep methods are started with their starting
+    method, as in ODEIntegrator.
+
+    Parameters
+    ----------
+    ode_function : ODEFunction
+        The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+    method_name : str
+        The time integration method. The list of methods can be found in the documentation.
+    times : np.ndarray[:]
+        Vector of times; there is one step between each pair of consecutive times.
+    initial_conditions : dict
+        Dictionary of initial condition values keyed by state name, for all the states.
+    static_parameters : dict or None
+        Dictionary of static parameter values keyed by parameter name.
+    dynamic_parameters : dict or None
+        Dictionary of dynamic parameter values at the times keyed by parameter name;
+        they are linearly interpolated to the stage times.
+
+    Returns
+    -------
+    dict
+        Dictionary of the state values at the times, with shape (num_times,) + shape,
+        keyed by state name.
+    """
+    method = get_method(method_name)
+
+    assert isinstance(times, np.ndarray) and len(times.shape) == 1, 'times must be a 1-D array'
+
+    for variables, values, kind in [
+            (ode_function._states, initial_conditions, 'Initial condition'),
+            (ode_function._static_parameters, static_parameters, 'Static parameter'),
+            (ode_function._dynamic_parameters, dynamic_parameters, 'Dynamic parameter')]:
+        for name in values or {}:
+            assert name in variables, '%s (%s) was not declared in ODEFunction' % (kind, name)
+
+    stepper = _get_stepper(ode_function, method_name)
+    evaluator = stepper.ode_step
+    num_times = len(times)
+
+    y0 = np.zeros((stepper.num_step_vars, evaluator.state_size))
+    for state_name, state in iteritems(ode_function._states):
+        assert state_name in initial_conditions, \
+            'The initial condition for state %s is missing' % state_name
+
+        value = np.atleast_1d(initial_conditions[state_name])
+        assert value.shape == state['shape'], \
+            'The initial condition for state %s has the wrong shape' % state_name
+
+        y0[0, evaluator.state_slices[state_name]] = value.flatten()
+
+    static = np.zeros(evaluator.static_size)
+    for parameter_name, parameter in iteritems(ode_function._static_parameters):
+        if static_parameters is not None and parameter_name in static_parameters:
+            value = np.atleast_1d(static_parameters[parameter_name])
+            assert value.shape == parameter['shape'], \
+                'Static parameter (%s) has the wrong shape' % parameter_name
+
+            static[evaluator.static_slices[parameter_name]] = value.flatten()
+
+    dynamic = np.zeros((num_times, evaluator.dynamic_size))
+    for parameter_name, parameter in iteritems(ode_function._dynamic_parameters):
+        if dynamic_parameters is not None and parameter_name in dynamic_parameters:
+            value = dynamic_parameters[parameter_name]
+            assert value.shape == (num_times,) + parameter['shape'], \
+                'Dynamic parameter %s has the wrong shape' % parameter_name
+
+            dynamic[:, evaluator.dynamic_slices[parameter_name]] = value.reshape((num_times, -1))
+
+    y = _march(ode_function, method, method_name, times, y0, static, times, dynamic)
+
+    return {
+        state_name: y[:, 0, evaluator.state_slices[state_name]].reshape(
+            (num_times,) + state['shape'])
+        for state_name, state in iteritems(ode_function._states)
+    }
+
+
+def _march(ode_function, method, method_name, times, y0, static, all_times, dynamic):
+    # Step vectors at the times, ndarray[num_times, num_step_vars, n], starting from y0.
+    stepper = _get_stepper(ode_function, method_name)
+    num_stages = stepper.num_stages
+    n = y0.shape[1]
+
+    y = np.zeros((len(times), stepper.num_step_vars, n))
+
+    # Multistep methods are started as in Integrator: the starting method integrates the first
+    # times, and the starting coefficients combine its step vectors into the first step vector.
+    i_start = 0
+    if method.starting_method is not None:
+        starting_method_name, starting_coeffs, i_start = method.starting_method
+        starting_method = get_method(starting_method_name)
+
+        y_start = np.zeros((starting_method.num_values, n))
+        y_start[0] = y0[0]
+        y_start = _march(ode_function, starting_method, starting_method_name,
+            times[:i_start + 1], y_start, static, all_times, dynamic)
+
+        y[:i_start, 0] = y_start[:i_start, 0]
+        y0 = np.einsum('ijk,jkl->il', starting_coeffs, y_start)
+
+    my_times = times[i_start:]
+    h_vec = my_times[1:] - my_times[:-1]
+    stage_times = my_times[:-1, None] + np.outer(h_vec, np.atleast_1d(method.abscissa))
+
+    # The abscissa of some methods, e.g., Yoshida's, are outside of [0, 1].
+    data, rows, cols = get_sparse_linear_spline(all_times,
+        np.clip(stage_times.flatten(), all_times[0], all_times[-1]))
+    mtx = scipy.sparse.csr_matrix((data, (rows, cols)),
+        shape=(stage_times.size, len(all_times)))
+    stage_dynamic = mtx.dot(dynamic).reshape((len(h_vec), num_stages, -1))
+
+    Y = np.zeros((num_stages, n))
+    F = np.zeros((num_stages, n))
+
+    y[i_start] = y0
+    for i_step in range(len(h_vec)):
+        y[i_start + i_step + 1] = stepper.compute_step(y[i_start + i_step], h_vec[i_step],
+            stage_times[i_step], static, stage_dynamic[i_step], Y, F)
+
+    return y
+
+
+def _get_stepper(ode_function, method_name):
+    # The stepper is chosen as in FusedTMComp.
+    key = (id(ode_function), method_name)
+
+    if key in _steppers:
+        _steppers[key] = _steppers.pop(key)
+    else:
+        method = get_method(method_name)
+
+        if method.linearly_implicit:
+            stepper = get_stepper(ode_function, RosenbrockStepper,
+                method.A, method.B, method.gamma)
+        elif method.imex:
+            stepper = get_stepper(ode_function, IMEXStepper,
+                method.explicit_A, method.explicit_B, method.A, method.B)
+        elif method.exponential:
+            stepper = get_stepper(ode_function, ExponentialStepper, method)
+        elif method.partitioned:
+            stepper = get_stepper(ode_function, PartitionedStepper,
+                method.position_A, method.position_B, method.A, method.B)
+        else:
+            stepper = get_stepper(ode_function, GLMStepper,
+                method.A, method.U, method.B, method.V,
+                explicit=bool(method.explicit))
+
+        _steppers[key] = stepper
+        if len(_steppers) > max_cached_steppers:
+            _steppers.popitem(last=False)
+
+    return _steppers[key]
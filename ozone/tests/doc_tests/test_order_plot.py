@@ -14,11 +14,12 @@ class Test(unittest.TestCase):
     def test(self):
         import numpy as np
         import matplotlib.pylab as plt
+        from multiprocessing import cpu_count
 
         from ozone.tests.ode_function_library.simple_homogeneous_func import \
             SimpleHomogeneousODEFunction
-        from ozone.utils.run_utils import compute_convergence_order, compute_ideal_error
-        from ozone.methods_list import family_names, method_families
+        from ozone.utils.run_utils import compute_study, compute_ideal_error
+        from ozone.methods_list import family_names, method_families, get_method
 
         num_times_vector = np.array([10, 15, 20])
 
@@ -30,14 +31,20 @@ class Test(unittest.TestCase):
 
         state_name = 'y'
 
-        formulation = 'solver-based'
+        # The IMEX, exponential, and partitioned methods require a split ODE, a linear operator,
+        # and position/velocity state pairs, respectively, which this ODE does not have.
+        def is_plotted(family_name):
+            method = get_method(method_families[family_name][0])
+            return not (method.imex or method.exponential or method.partitioned)
+
+        family_names = [family_name for family_name in family_names if is_plotted(family_name)]
 
         colors = ['b', 'g', 'r', 'c', 'm', 'k', 'y']
         # plt.figure(figsize=(14, 17))
-        plt.figure(figsize=(15, 9))
-
-        nrow = 3
         ncol = 4
+        nrow = (len(family_names) + ncol - 1) // ncol
+
+        plt.figure(figsize=(15, 3 * nrow))
 
         for plot_index, family_name in enumerate(family_names):
             method_family = method_families[family_name]
@@ -46,12 +53,25 @@ class Test(unittest.TestCase):
 
             plt.subplot(nrow, ncol, plot_index + 1)
 
+            # Rosenbrock methods only support the time-marching formulations.
+            if get_method(method_family[0]).linearly_implicit:
+                formulation = 'time-marching'
+            else:
+                formulation = 'solver-based'
+
+            # The cases of all the methods of the family run in one pool of workers.
+            results = compute_study(num_times_vector, t0, t1, ode_function,
+                method_family, [formulation], initial_conditions, state_name=state_name,
+                num_workers=cpu_count())
+
             legend_entries = []
             for j, method_name in enumerate(method_family):
+                rows = results[results['method_name'] == method_name]
 
-                errors_vector, step_sizes_vector, orders_vector, ideal_order = compute_convergence_order(
-                    num_times_vector, t0, t1, state_name,
-                    ode_function, formulation, method_name, initial_conditions)
+                errors_vector = rows['error']
+                step_sizes_vector = rows['step_size']
+                orders_vector = rows['order'][1:]
+                ideal_order = get_method(method_name).order
 
                 ideal_step_sizes_vector, ideal_errors_vector = compute_ideal_error(
                     step_sizes_vector, errors_vector, ideal_order)
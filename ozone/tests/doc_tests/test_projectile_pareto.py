@@ -9,10 +9,11 @@ class Test(unittest.TestCase):
     def test(self):
         import numpy as np
         import matplotlib.pylab as plt
+        from multiprocessing import cpu_count
 
         from ozone.tests.ode_function_library.projectile_dynamics_func import ProjectileFunction
         from ozone.methods_list import family_names, method_families
-        from ozone.utils.run_utils import run_integration
+        from ozone.utils.run_utils import compute_study
 
         num_times = 100
 
@@ -55,20 +56,13 @@ class Test(unittest.TestCase):
 
             print(method_family)
 
-            errors = []
-            run_times = []
-            names = []
+            results = compute_study(np.array([num_times]), t0, t1, ode_function,
+                method_family, [formulation], initial_conditions, state_name=state_name,
+                num_workers=cpu_count())
 
-            for j, method_name in enumerate(method_family):
-
-                run_time, errors_ = run_integration(
-                    num_times, t0, t1, initial_conditions, ode_function, formulation, method_name)
-
-                error = errors_[state_name]
-
-                errors.append(error)
-                run_times.append(run_time)
-                names.append(method_name)
+            errors = results['error']
+            run_times = results['runtime']
+            names = results['method_name']
 
             plt.loglog(errors, run_times, 'o', color=colors[i])
             legend_entries.append(family_name)
@@ -14,13 +14,14 @@ class Test(unittest.TestCase):
     def test(self):
         import numpy as np
         import matplotlib.pylab as plt
+        from multiprocessing import cpu_count
 
         from ozone.tests.ode_function_library.simple_linear_func import \
             SimpleLinearODEFunction
         from ozone.tests.ode_function_library.simple_nonlinear_func import \
             SimpleNonlinearODEFunction
-        from ozone.utils.run_utils import compute_runtimes, compute_ideal_runtimes
-        from ozone.methods_list import family_names, method_families
+        from ozone.utils.run_utils import compute_study, compute_ideal_runtimes
+        from ozone.methods_list import family_names, method_families, get_method
 
         num_rep = 10
 
@@ -36,14 +37,20 @@ class Test(unittest.TestCase):
 
         state_name = 'y'
 
-        formulations = ['time-marching', 'solver-based', 'optimizer-based']
+        # The IMEX, exponential, and partitioned methods require a split ODE, a linear operator,
+        # and position/velocity state pairs, respectively, which this ODE does not have.
+        def is_plotted(family_name):
+            method = get_method(method_families[family_name][0])
+            return not (method.imex or method.exponential or method.partitioned)
+
+        family_names = [family_name for family_name in family_names if is_plotted(family_name)]
 
         colors = ['b', 'g', 'r', 'c', 'm', 'k', 'y']
         # plt.figure(figsize=(14, 17))
-        plt.figure(figsize=(15, 9))
-
-        nrow = 3
         ncol = 4
+        nrow = (len(family_names) + ncol - 1) // ncol
+
+        plt.figure(figsize=(15, 3 * nrow))
 
         for plot_index, family_name in enumerate(family_names):
             method_family = method_families[family_name]
@@ -53,18 +60,28 @@ class Test(unittest.TestCase):
 
             plt.subplot(nrow, ncol, plot_index + 1)
 
-            legend_entries = []
+            # Rosenbrock methods only support the time-marching formulations.
+            if get_method(method_name).linearly_implicit:
+                formulations = ['time-marching']
+            else:
+                formulations = ['time-marching', 'solver-based', 'optimizer-based']
 
-            for j, formulation in enumerate(formulations):
+            # Each repetition runs the cases of all the formulations in one pool of workers.
+            avg_runtimes = np.zeros(len(formulations) * len(num_times_vector))
 
-                avg_runtimes_vector = np.zeros(len(num_times_vector))
+            for irep in range(num_rep):
+                results = compute_study(num_times_vector, t0, t1, ode_function,
+                    [method_name], formulations, initial_conditions, num_workers=cpu_count())
 
-                for irep in range(num_rep):
-                    step_sizes_vector, runtimes_vector = compute_runtimes(
-                        num_times_vector, t0, t1,
-                        ode_function, formulation, method_name, initial_conditions)
+                avg_runtimes += results['runtime'] / num_rep
+
+            legend_entries = []
+
+            for j, formulation in enumerate(formulations):
+                rows = results['formulation'] == formulation
 
-                    avg_runtimes_vector += runtimes_vector / num_rep
+                step_sizes_vector = results['step_size'][rows]
+                avg_runtimes_vector = avg_runtimes[rows]
 
                 ideal_step_sizes_vector, ideal_runtimes = compute_ideal_runtimes(
                     step_sizes_vector, avg_runtimes_vector)
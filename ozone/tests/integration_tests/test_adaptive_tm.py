@@ -0,0 +1,66 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.simple_homogeneous_func import SimpleHomogeneousODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+class Test(unittest.TestCase):
+
+    def get_integrator(self, method_name, tolerance):
+        return ODEIntegrator(SimpleHomogeneousODEFunction(), 'adaptive-time-marching',
+            method_name, times=np.linspace(0., 1., 5), initial_conditions={'y': 1.},
+            atol=tolerance, rtol=tolerance)
+
+    @parameterized.expand(product(
+        ['BogackiShampine32', 'DormandPrince54', 'CashKarp54', 'Fehlberg45'],  # method
+    ))
+    def test_adaptive_tm(self, method_name):
+        # The error is controlled by the tolerance, and tightening it adds steps.
+        num_steps = []
+        for tolerance in [1e-4, 1e-8]:
+            integrator = self.get_integrator(method_name, tolerance)
+            prob = run_problem(integrator)
+
+            error = np.abs(prob['state:y'][:, 0] - np.exp(np.linspace(0., 1., 5)))
+            self.assertTrue(np.max(error) <= 100 * tolerance)
+
+            history = integrator.get_step_history()
+            self.assertEqual(len(history['step_sizes']), history['num_steps'])
+            self.assertTrue(np.abs(np.sum(history['step_sizes']) - 1.) < 1e-12)
+            num_steps.append(history['num_steps'])
+
+        self.assertTrue(num_steps[0] < num_steps[1])
+
+    @parameterized.expand(product(
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_adaptive_tm_totals(self, mode):
+        # The derivatives are those of the accepted steps.
+        integrator = get_integrator('adaptive-time-marching', 'DormandPrince54',
+            GettingStartedOCFunction(), num_times=13, atol=1e-9, rtol=1e-9)
+        prob = run_problem(integrator, mode=mode)
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=['state:x', 'state:v'],
+                wrt=['dynamic_parameter:theta', 'final_time', 'initial_condition:v'])
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-5 * data['magnitude'][2] + 1e-8,
+                'Total derivative mismatch for %s' % (key,))
+
+    def test_adaptive_tm_method(self):
+        # Methods without an error estimate are rejected.
+        with self.assertRaises(AssertionError):
+            run_problem(self.get_integrator('RK4', 1e-6))
+
+
+if __name__ == '__main__':
+    unittest.main()
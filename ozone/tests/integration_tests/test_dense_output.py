@@ -0,0 +1,179 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.prothero_robinson_func import ProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+output_times = np.linspace(0.05, 1.95, 20)
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, formulation, method_name, ode_function, mode='rev', num_times=11,
+            **kwargs):
+        if isinstance(ode_function, ProtheroRobinsonODEFunction):
+            integrator = ODEIntegrator(ode_function, formulation, method_name,
+                times=np.linspace(0., 2., num_times), output_times=output_times,
+                initial_conditions={'y': 2.}, static_parameters={'k': 1.}, **kwargs)
+        else:
+            integrator = get_integrator(formulation, method_name, ode_function,
+                num_times=num_times, normalized_output_times=np.linspace(0.03, 0.97, 9),
+                **kwargs)
+
+        return run_problem(integrator, mode=mode)
+
+    @parameterized.expand(product(
+        ['RK4', 'GaussLegendre6', 'AB4'],  # method
+    ))
+    def test_dense_output_order(self, method_name):
+        # The interpolation error is fourth-order, so the states at the outputs are at most
+        # fourth-order accurate, even with the sixth-order GaussLegendre6.
+        ode_function = ProtheroRobinsonODEFunction()
+        exact = ode_function.get_exact_solution({'y': 2.}, 0., output_times, k=1.)['y']
+
+        errors = []
+        for num_times in [21, 41, 81]:
+            prob = self.run_ode('time-marching', method_name, ode_function, num_times=num_times)
+            errors.append(np.max(np.abs(prob['state_at:y'][:, 0] - exact)))
+
+        orders = np.log(np.array(errors[:-1]) / errors[1:]) / np.log(2.)
+        self.assertTrue(np.min(orders) > 3.7)
+
+    def test_dense_output_nodes(self):
+        # At the integration times, the interpolated states are the integrated ones.
+        times = np.linspace(0., 2., 11)
+        integrator = ODEIntegrator(ProtheroRobinsonODEFunction(), 'time-marching', 'RK4',
+            times=times, output_times=times[::2],
+            initial_conditions={'y': 2.}, static_parameters={'k': 1.})
+        prob = run_problem(integrator)
+
+        self.assertTrue(np.max(np.abs(prob['state_at:y'] - prob['state:y'][::2])) < 1e-14)
+
+    @parameterized.expand(product(
+        [('fused-time-marching', {}),
+         ('solver-based', {}),
+         ('multiple-shooting', {}),
+         ('parareal', {'coarse_method': 'RK4'})],  # formulation
+        [ProtheroRobinsonODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_dense_output_formulations(self, formulation, ode_function):
+        formulation, kwargs = formulation
+
+        prob_ref = self.run_ode('time-marching', 'RK4', ode_function)
+        prob = self.run_ode(formulation, 'RK4', ode_function, **kwargs)
+
+        for state_name in ode_function._states:
+            name = 'state_at:%s' % state_name
+            self.assertTrue(np.linalg.norm(prob[name] - prob_ref[name])
+                <= 1e-10 * np.linalg.norm(prob_ref[name]) + 1e-12)
+
+    @parameterized.expand(product(
+        ['DormandPrince54', 'Lobatto4', 'ESDIRK3', 'Trapezoidal'],  # method
+        [('time-marching', {}),
+         ('solver-based', {}),
+         ('fused-time-marching', {}),
+         ('multiple-shooting', {}),
+         ('parareal', {'coarse_method': 'RK4'})],  # formulation
+        [ProtheroRobinsonODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_dense_output_endpoint_rates(self, method_name, formulation, ode_function):
+        # The derivatives at the ends of the steps are taken from the stages, without evaluating
+        # the ODE again, and they are those that the fused formulation evaluates when it cannot
+        # reuse the stages because of checkpointing.
+        formulation, kwargs = formulation
+
+        prob_ref = self.run_ode('fused-time-marching', method_name, ode_function,
+            num_checkpoints=2)
+        prob = self.run_ode(formulation, method_name, ode_function, **kwargs)
+
+        self.assertTrue(prob.model.dense_output_comp.options['endpoint_rates'])
+        self.assertFalse(prob_ref.model.dense_output_comp.options['endpoint_rates'])
+
+        for state_name in ode_function._states:
+            name = 'state_at:%s' % state_name
+            self.assertTrue(np.linalg.norm(prob[name] - prob_ref[name])
+                <= 1e-8 * np.linalg.norm(prob_ref[name]) + 1e-12)
+
+    def test_dense_output_adaptive(self):
+        # The output times are between the given times, not between the adaptive steps.
+        ode_function = ProtheroRobinsonODEFunction()
+        prob = self.run_ode('adaptive-time-marching', 'DormandPrince54', ode_function,
+            num_times=41, atol=1e-10, rtol=1e-10)
+
+        exact = ode_function.get_exact_solution({'y': 2.}, 0., output_times, k=1.)['y']
+        self.assertTrue(np.max(np.abs(prob['state_at:y'][:, 0] - exact)) < 1e-6)
+
+    @parameterized.expand(product(
+        ['RK4', 'ImplicitMidpoint', 'DormandPrince54', 'Lobatto4'],  # method
+        [ProtheroRobinsonODEFunction(), GettingStartedOCFunction()],  # ODE Function
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_dense_output_totals(self, method_name, ode_function, mode):
+        prob = self.run_ode('time-marching', method_name, ode_function, mode=mode)
+
+        if isinstance(ode_function, ProtheroRobinsonODEFunction):
+            of = ['state_at:y']
+            wrt = ['initial_condition:y', 'static_parameter:k']
+        else:
+            of = ['state_at:x', 'state_at:v']
+            wrt = ['dynamic_parameter:theta', 'initial_condition:v', 'initial_time',
+                'final_time']
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt, form='central', step=1e-6)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-8 * data['magnitude'][2] + 1e-10,
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['DormandPrince54', 'Lobatto4'],  # method
+        [('fused-time-marching', {}),
+         ('multiple-shooting', {'num_segments': 3}),
+         ('multiple-shooting', {'segment_formulation': 'fused-time-marching'}),
+         ('multiple-shooting', {'segment_formulation': 'fused-time-marching',
+            'num_workers': 2}),
+         ('parareal', {'coarse_method': 'RK4'})],  # formulation
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_dense_output_endpoint_totals(self, method_name, formulation, mode):
+        formulation, kwargs = formulation
+
+        prob = self.run_ode(formulation, method_name, GettingStartedOCFunction(), mode=mode,
+            **kwargs)
+        self.assertTrue(prob.model.dense_output_comp.options['endpoint_rates'])
+
+        of = ['state_at:x', 'state_at:v']
+        wrt = ['dynamic_parameter:theta', 'initial_condition:v', 'initial_time', 'final_time']
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt, form='central', step=1e-6)
+        if kwargs.get('num_workers') is not None:
+            prob.model.close_workers()
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-8 * data['magnitude'][2] + 1e-10,
+                'Total derivative mismatch for %s' % (key,))
+
+    def test_dense_output_times(self):
+        # The output times must be within the integration times, and absolute output times
+        # require the initial and final times.
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(ProtheroRobinsonODEFunction(), 'time-marching', 'RK4',
+                times=np.linspace(0., 2., 11), output_times=np.array([1., 2.5]))
+
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(ProtheroRobinsonODEFunction(), 'time-marching', 'RK4',
+                normalized_times=np.linspace(0., 1., 11), output_times=np.array([1.]))
+
+
+if __name__ == '__main__':
+    unittest.main()
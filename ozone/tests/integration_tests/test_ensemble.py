@@ -0,0 +1,186 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator, EnsembleODEFunction, simulate
+from ozone.tests.ode_function_library.projectile_dynamics_func import ProjectileFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.tests.ode_function_library.split_prothero_robinson_func import \
+    SplitProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.two_d_orbit_func import TwoDOrbitFunction
+from ozone.tests.ode_function_library.reaction_diffusion_func import \
+    ReactionDiffusionODEFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+
+
+num_members = 3
+
+
+def get_members(ode_function):
+    # The initial conditions and the parameters of each member, and those of the ensemble.
+    if isinstance(ode_function, ProjectileFunction):
+        angles = np.linspace(0.2, 1.2, num_members)
+        members = [
+            ({'x': 0., 'y': 0., 'vx': np.cos(angle), 'vy': np.sin(angle)}, {}, {})
+            for angle in angles]
+        ensemble = (
+            {'x': 0., 'y': 0., 'vx': np.cos(angles)[:, None], 'vy': np.sin(angles)[:, None]},
+            {}, {})
+    elif isinstance(ode_function, GettingStartedOCFunction):
+        theta = np.outer(np.linspace(0.1, 1., 11), np.linspace(0.5, 1.5, num_members))
+        members = [
+            ({'x': 0., 'y': 0., 'v': 0.}, {}, {'theta': theta[:, i_member, None]})
+            for i_member in range(num_members)]
+        ensemble = ({'x': 0., 'y': 0., 'v': 0.}, {}, {'theta': theta.T[:, :, None]})
+    elif isinstance(ode_function, SplitProtheroRobinsonODEFunction):
+        k = np.array([1., 2., 5.])
+        members = [({'y': 2.}, {'k': k[i_member]}, {}) for i_member in range(num_members)]
+        ensemble = ({'y': 2.}, {'k': k[:, None]}, {})
+    elif isinstance(ode_function, TwoDOrbitFunction):
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+        scales = np.linspace(0.9, 1.1, num_members)
+        members = [
+            ({'position': initial_conditions['position'],
+              'velocity': scale * initial_conditions['velocity']}, {}, {})
+            for scale in scales]
+        ensemble = (
+            {'position': initial_conditions['position'],
+             'velocity': np.outer(scales, initial_conditions['velocity'])}, {}, {})
+    else:
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+        scales = np.linspace(0.5, 1.5, num_members)
+        members = [({'u': scale * initial_conditions['u']}, {}, {}) for scale in scales]
+        ensemble = ({'u': np.outer(scales, initial_conditions['u'])}, {}, {})
+
+    return members, ensemble
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, formulation, method_name, ode_function, initial_conditions,
+            static_parameters, dynamic_parameters, mode='rev', **kwargs):
+        integrator = ODEIntegrator(ode_function, formulation, method_name,
+            times=np.linspace(0., 1., 11), initial_conditions=dict(initial_conditions),
+            static_parameters=dict(static_parameters) or None,
+            dynamic_parameters=dict(dynamic_parameters) or None, **kwargs)
+        prob = Problem(integrator)
+
+        with suppress_stdout_stderr():
+            prob.setup(check=False, mode=mode)
+            prob.run_model()
+
+        return prob
+
+    def assert_same_members(self, formulation, method_name, ode_function, **kwargs):
+        # Each member of the ensemble has the states of its own integration.
+        members, ensemble = get_members(ode_function)
+
+        prob = self.run_ode(formulation, method_name, ode_function, *ensemble,
+            num_members=num_members, **kwargs)
+
+        for i_member, member in enumerate(members):
+            prob_ref = self.run_ode(formulation, method_name, ode_function, *member, **kwargs)
+
+            for state_name in ode_function._states:
+                name = 'state:%s' % state_name
+                self.assertEqual(prob[name].shape[:2], (num_members, 11))
+                self.assertTrue(np.linalg.norm(prob[name][i_member] - prob_ref[name])
+                    <= 1e-8 * np.linalg.norm(prob_ref[name]) + 1e-12,
+                    'State mismatch for %s of member %i' % (state_name, i_member))
+
+    @parameterized.expand(product(
+        ['time-marching', 'fused-time-marching', 'solver-based', 'multiple-shooting'],
+        ['RK4', 'GaussLegendre4'],  # method
+        [ProjectileFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_ensemble_formulations(self, formulation, method_name, ode_function):
+        self.assert_same_members(formulation, method_name, ode_function)
+
+    @parameterized.expand([
+        ('AB4', SplitProtheroRobinsonODEFunction(split=False)),
+        ('BDF3', SplitProtheroRobinsonODEFunction(split=False)),
+        ('ROS3P', SplitProtheroRobinsonODEFunction(split=False)),
+        ('ARS443', SplitProtheroRobinsonODEFunction()),
+        ('StormerVerlet', TwoDOrbitFunction()),
+        ('ETDRK4', ReactionDiffusionODEFunction(num_points=6)),
+    ])
+    def test_ensemble_methods(self, method_name, ode_function):
+        # The stiffness, the split rates, the state pairs, and the linear operator of the
+        # members are those of the member ODE function.
+        self.assert_same_members('time-marching', method_name, ode_function)
+
+    def test_ensemble_preconditioner(self):
+        self.assert_same_members('time-marching', 'BackwardEuler',
+            ReactionDiffusionODEFunction(num_points=6), solver='newton-krylov')
+
+    @parameterized.expand(product(
+        ['RK4', 'ImplicitMidpoint'],  # method
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_ensemble_totals(self, method_name, mode):
+        # The members are independent, so the derivatives are block-diagonal over them.
+        ode_function = SplitProtheroRobinsonODEFunction(split=False)
+        members, ensemble = get_members(ode_function)
+        prob = self.run_ode('time-marching', method_name, ode_function, *ensemble,
+            num_members=num_members, mode=mode)
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=['state:y'],
+                wrt=['initial_condition:y', 'static_parameter:k'], form='central', step=1e-6)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-8 * data['magnitude'][2] + 1e-10,
+                'Total derivative mismatch for %s' % (key,))
+
+        jac = totals['state:y', 'static_parameter:k']['J_fwd'].reshape(
+            (num_members, 11, num_members))
+        self.assertTrue(np.max(np.abs(jac * (1 - np.eye(num_members))[:, None, :])) < 1e-15)
+
+    def test_ensemble_simulate(self):
+        # An ensemble ODE function can also be simulated without a model.
+        ode_function = GettingStartedOCFunction()
+        members, ensemble = get_members(ode_function)
+        initial_conditions, static_parameters, dynamic_parameters = ensemble
+
+        prob = self.run_ode('time-marching', 'RK4', ode_function, *ensemble,
+            num_members=num_members)
+
+        # The histories of the ensemble ODE function have the times first.
+        states = simulate(
+            EnsembleODEFunction(ode_function=ode_function, num_members=num_members),
+            'RK4', np.linspace(0., 1., 11),
+            dict([(state_name, np.zeros((num_members, 1))) for state_name in initial_conditions]),
+            dynamic_parameters={'theta': dynamic_parameters['theta'].swapaxes(0, 1)})
+
+        for state_name in ode_function._states:
+            self.assertTrue(np.max(np.abs(
+                states[state_name].swapaxes(0, 1) - prob['state:' + state_name])) < 1e-12,
+                'State mismatch for %s' % state_name)
+
+    def test_ensemble_shapes(self):
+        # Values for a single member are used for all the members; other shapes are rejected.
+        ode_function = ProjectileFunction()
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(ode_function, 'time-marching', 'RK4', times=np.linspace(0., 1., 11),
+                initial_conditions={'x': np.zeros((num_members + 1, 1))},
+                num_members=num_members)
+
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(ode_function, 'time-marching', 'RK4', times=np.linspace(0., 1., 11),
+                num_members=0)
+
+        # The dynamic parameters have the members first, as the states.
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(GettingStartedOCFunction(), 'time-marching', 'RK4',
+                times=np.linspace(0., 1., 11),
+                dynamic_parameters={'theta': np.zeros((11, num_members, 1))},
+                num_members=num_members)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.split_prothero_robinson_func import \
+    SplitProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.tests.ode_function_library.reaction_diffusion_func import ReactionDiffusionODEFunction
+from ozone.utils.run_utils import compute_convergence_order
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+def get_prothero_robinson(stiffness=1.):
+    # The linear operator is the linear part of the deviation from cos(t).
+    ode_function = SplitProtheroRobinsonODEFunction(split=False)
+    ode_function.set_linear_operator([[-stiffness]])
+    return ode_function
+
+
+def get_getting_started_oc():
+    ode_function = GettingStartedOCFunction()
+    ode_function.set_linear_operator(-0.5 * np.eye(3))
+    return ode_function
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, formulation, method_name, ode_function, mode='rev', num_times=7,
+            **kwargs):
+        if isinstance(ode_function, SplitProtheroRobinsonODEFunction):
+            stiffness = 1. if ode_function._linear_operator is None \
+                else -ode_function._linear_operator[0, 0]
+            integrator = ODEIntegrator(ode_function, formulation, method_name,
+                initial_time=0., final_time=1., normalized_times=np.linspace(0., 1., num_times),
+                initial_conditions={'y': 2.}, static_parameters={'k': stiffness}, **kwargs)
+        elif isinstance(ode_function, ReactionDiffusionODEFunction):
+            initial_conditions, t0, t1 = ode_function.get_test_parameters()
+            integrator = ODEIntegrator(ode_function, formulation, method_name,
+                times=np.linspace(t0, t1, num_times), initial_conditions=initial_conditions,
+                **kwargs)
+        else:
+            integrator = get_integrator(formulation, method_name, ode_function,
+                num_times=num_times, **kwargs)
+
+        return run_problem(integrator, mode=mode)
+
+    @parameterized.expand(product(
+        ['ExponentialEuler', 'ETDRK2', 'ETDRK4', 'HochbruckOstermann4'],  # method
+    ))
+    def test_exponential_order(self, method_name):
+        ode_function = get_prothero_robinson()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+
+        errors_vector, step_sizes_vector, orders_vector, ideal_order = compute_convergence_order(
+            np.array([11, 21, 41]), t0, t1, 'y',
+            ode_function, 'time-marching', method_name, initial_conditions)
+
+        average_order = np.sum(orders_vector) / len(orders_vector)
+        self.assertTrue(np.abs(ideal_order - average_order) < 0.2)
+
+    @parameterized.expand(product(
+        ['ETDRK4', 'HochbruckOstermann4'],  # method
+    ))
+    def test_exponential_stiff(self, method_name):
+        # The stiff linear part is integrated exactly, so steps much larger than the initial
+        # layer remain stable and accurate after it.
+        ode_function = get_prothero_robinson(1e4)
+        prob = self.run_ode('time-marching', method_name, ode_function, num_times=11)
+
+        exact = ode_function.get_exact_solution({'y': 2.}, 0., np.linspace(0., 1., 11), k=1e4)
+        self.assertTrue(np.max(np.abs(prob['state:y'][2:, 0] - exact['y'][2:])) < 1e-6)
+
+    def test_exponential_reaction_diffusion(self):
+        # RK4 is unstable with these steps, and 100 steps are needed for a similar accuracy.
+        prob_ref = self.run_ode('time-marching', 'RK4', ReactionDiffusionODEFunction(),
+            num_times=101)
+        prob = self.run_ode('time-marching', 'ETDRK4', ReactionDiffusionODEFunction(),
+            num_times=11)
+
+        self.assertTrue(np.max(np.abs(prob['state:u'][-1] - prob_ref['state:u'][-1])) < 1e-6)
+
+        # The phi functions are only computed for the distinct step sizes.
+        stepper = prob.model.integration_comp.stepper
+        self.assertEqual(len(stepper._cache), len(np.unique(prob['integration_comp.h_vec'])))
+
+    @parameterized.expand(product(
+        ['ETDRK2', 'HochbruckOstermann4'],  # method
+        [get_prothero_robinson(), get_getting_started_oc()],  # ODE Function
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_exponential_totals(self, method_name, ode_function, mode):
+        prob = self.run_ode('time-marching', method_name, ode_function, mode=mode)
+
+        if isinstance(ode_function, SplitProtheroRobinsonODEFunction):
+            of = ['state:y']
+            wrt = ['initial_condition:y', 'static_parameter:k', 'initial_time', 'final_time']
+        else:
+            of = ['state:x', 'state:v']
+            wrt = ['dynamic_parameter:theta', 'initial_condition:v', 'final_time']
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt, form='central', step=1e-5)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-8 * data['magnitude'][2] + 1e-10,
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['ETDRK4'],  # method
+        [('fused-time-marching', {'num_checkpoints': 2}),
+         ('parareal', {'coarse_method': 'ExponentialEuler'}),
+         ('multiple-shooting', {})],  # formulation
+    ))
+    def test_exponential_formulations(self, method_name, formulation):
+        formulation, kwargs = formulation
+        ode_function = get_prothero_robinson(100.)
+
+        prob_ref = self.run_ode('time-marching', method_name, ode_function)
+        prob = self.run_ode(formulation, method_name, ode_function, **kwargs)
+
+        y_ref = prob_ref['state:y']
+        y = prob['state:y']
+        self.assertTrue(np.linalg.norm(y - y_ref) <= 1e-8 * np.linalg.norm(y_ref) + 1e-12)
+
+    @parameterized.expand(product(
+        ['solver-based', 'optimizer-based', 'adaptive-time-marching'],  # formulation
+    ))
+    def test_exponential_unsupported(self, formulation):
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(get_prothero_robinson(), formulation, 'ETDRK4',
+                times=np.linspace(0., 1., 7), initial_conditions={'y': 2.})
+
+    def test_exponential_linear_operator(self):
+        # Exponential methods require the linear operator.
+        with self.assertRaises(AssertionError):
+            self.run_ode('time-marching', 'ETDRK4', SplitProtheroRobinsonODEFunction(split=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import run_ode
+from ozone.utils.checkpointing import reverse_with_checkpoints
+
+
+class Test(unittest.TestCase):
+
+    def get_totals(self, prob, ode_function):
+        if isinstance(ode_function, SimpleNonlinearODEFunction):
+            of = ['state:y']
+            wrt = ['initial_condition:y', 'final_time']
+        else:
+            of = ['state:x', 'state:y', 'state:v']
+            wrt = ['dynamic_parameter:theta', 'final_time']
+
+        with suppress_stdout_stderr():
+            return prob.compute_totals(of=of, wrt=wrt)
+
+    def check_fused(self, reference, method_name, ode_function, **kwargs):
+        prob_ref = run_ode(reference, method_name, ode_function)
+        totals_ref = self.get_totals(prob_ref, ode_function)
+
+        for mode in ['fwd', 'rev']:
+            prob = run_ode('fused-time-marching', method_name, ode_function, mode=mode,
+                **kwargs)
+
+            for state_name in ode_function._states:
+                y_ref = prob_ref['state:%s' % state_name]
+                y = prob['state:%s' % state_name]
+                self.assertTrue(
+                    np.linalg.norm(y - y_ref) <= 1e-10 * np.linalg.norm(y_ref) + 1e-14)
+
+            totals = self.get_totals(prob, ode_function)
+            for key, jac_ref in iteritems(totals_ref):
+                self.assertTrue(np.linalg.norm(totals[key] - jac_ref)
+                    <= 1e-8 * np.linalg.norm(jac_ref) + 1e-12,
+                    'Total derivative mismatch in %s mode for %s' % (mode, key))
+
+    @parameterized.expand(product(
+        ['ForwardEuler', 'ExplicitMidpoint', 'RK4', 'RK6', 'AB3', 'ABalt3'],  # method
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_fused(self, method_name, ode_function):
+        self.check_fused('time-marching', method_name, ode_function)
+
+    @parameterized.expand(product(
+        ['BackwardEuler', 'ImplicitMidpoint', 'GaussLegendre4', 'RadauII5', 'BDF3'],  # method
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_fused_implicit(self, method_name, ode_function):
+        self.check_fused('solver-based', method_name, ode_function)
+
+    @parameterized.expand(product(
+        ['GaussLegendre2', 'GaussLegendre6', 'Lobatto4', 'RadauI5', 'RadauII5'],  # method
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_fused_kronecker(self, method_name, ode_function):
+        self.check_fused('solver-based', method_name, ode_function, stage_solver='kronecker')
+
+    @parameterized.expand(product(
+        ['RK4', 'AB3', 'GaussLegendre4'],  # method
+        [1, 3],  # number of checkpoints
+    ))
+    def test_fused_checkpointing(self, method_name, num_checkpoints):
+        self.check_fused('solver-based', method_name, GettingStartedOCFunction(),
+            num_checkpoints=num_checkpoints)
+
+    def test_checkpointing_schedule(self):
+        for num_steps, num_checkpoints in product([1, 5, 40], [1, 2, 5, 50]):
+            reversed_steps = []
+
+            def advance(i_step, y):
+                self.assertEqual(y, i_step)
+                return y + 1
+
+            def reverse_step(i_step, y):
+                self.assertEqual(y, i_step)
+                reversed_steps.append(i_step)
+
+            reverse_with_checkpoints(num_steps, num_checkpoints, 0, advance, reverse_step)
+            self.assertEqual(reversed_steps, list(range(num_steps - 1, -1, -1)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.split_prothero_robinson_func import \
+    SplitProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.run_utils import compute_convergence_order
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, formulation, method_name, ode_function, mode='rev', stiffness=1.,
+            num_times=7, **kwargs):
+        if isinstance(ode_function, SplitProtheroRobinsonODEFunction):
+            integrator = ODEIntegrator(ode_function, formulation, method_name,
+                initial_time=0., final_time=1., normalized_times=np.linspace(0., 1., num_times),
+                initial_conditions={'y': 2.}, static_parameters={'k': stiffness}, **kwargs)
+        else:
+            integrator = get_integrator(formulation, method_name, ode_function,
+                num_times=num_times, **kwargs)
+
+        return run_problem(integrator, mode=mode)
+
+    @parameterized.expand(product(
+        ['ARS222', 'ARS443', 'ARK3', 'ARK4'],  # method
+    ))
+    def test_imex_order(self, method_name):
+        # The coupling conditions between the explicit and implicit parts are checked since
+        # both parts of the split ODE are time-dependent and the non-stiff part is nonlinear.
+        ode_function = SplitProtheroRobinsonODEFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+
+        errors_vector, step_sizes_vector, orders_vector, ideal_order = compute_convergence_order(
+            np.array([11, 21, 41]), t0, t1, 'y',
+            ode_function, 'time-marching', method_name, initial_conditions)
+
+        average_order = np.sum(orders_vector) / len(orders_vector)
+        self.assertTrue(np.abs(ideal_order - average_order) < 0.2)
+
+    @parameterized.expand(product(
+        ['ARS222', 'ARK4'],  # method
+    ))
+    def test_imex_stiff(self, method_name):
+        # Only the stiff part is treated implicitly, so steps much larger than the initial
+        # layer remain stable and accurate after it.
+        ode_function = SplitProtheroRobinsonODEFunction()
+        prob = self.run_ode('time-marching', method_name, ode_function, stiffness=1e4)
+
+        exact = ode_function.get_exact_solution({'y': 2.}, 0., np.linspace(0., 1., 7), k=1e4)
+        self.assertTrue(np.max(np.abs(prob['state:y'][2:, 0] - exact['y'][2:])) < 1e-4)
+
+    @parameterized.expand(product(
+        ['ARS222', 'ARK3'],  # method
+        [SplitProtheroRobinsonODEFunction(), GettingStartedOCFunction()],  # ODE Function
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_imex_totals(self, method_name, ode_function, mode):
+        # The states of GettingStartedOCFunction are not split, so they are explicit.
+        prob = self.run_ode('time-marching', method_name, ode_function, mode=mode)
+
+        if isinstance(ode_function, SplitProtheroRobinsonODEFunction):
+            of = ['state:y']
+            wrt = ['initial_condition:y', 'static_parameter:k', 'initial_time', 'final_time']
+        else:
+            of = ['state:x', 'state:v']
+            wrt = ['dynamic_parameter:theta', 'initial_condition:v', 'final_time']
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt, form='central', step=1e-5)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-8 * data['magnitude'][2] + 1e-10,
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['ARS443', 'ARK4'],  # method
+        [('fused-time-marching', {'num_checkpoints': 2}),
+         ('parareal', {'coarse_method': 'ARS222'}), ('multiple-shooting', {})],  # formulation
+    ))
+    def test_imex_formulations(self, method_name, formulation):
+        formulation, kwargs = formulation
+        ode_function = SplitProtheroRobinsonODEFunction()
+
+        prob_ref = self.run_ode('time-marching', method_name, ode_function)
+        prob = self.run_ode(formulation, method_name, ode_function, **kwargs)
+
+        y_ref = prob_ref['state:y']
+        y = prob['state:y']
+        self.assertTrue(np.linalg.norm(y - y_ref) <= 1e-8 * np.linalg.norm(y_ref) + 1e-12)
+
+    @parameterized.expand(product(
+        ['RK4', 'SDIRK3'],  # method
+        ['time-marching', 'fused-time-marching', 'solver-based'],  # formulation
+    ))
+    def test_split_rates(self, method_name, formulation):
+        # The other methods integrate the sum of the two parts in every formulation.
+        probs = [
+            self.run_ode(formulation, method_name, SplitProtheroRobinsonODEFunction(split=split))
+            for split in [True, False]]
+
+        self.assertTrue(np.linalg.norm(probs[0]['state:y'] - probs[1]['state:y']) < 1e-9)
+
+    @parameterized.expand(product(
+        ['solver-based', 'optimizer-based', 'adaptive-time-marching'],  # formulation
+    ))
+    def test_imex_unsupported(self, formulation):
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(SplitProtheroRobinsonODEFunction(), formulation, 'ARS222',
+                times=np.linspace(0., 1., 7), initial_conditions={'y': 2.})
+
+
+if __name__ == '__main__':
+    unittest.main()
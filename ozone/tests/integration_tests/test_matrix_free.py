@@ -0,0 +1,52 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import run_ode
+
+
+class Test(unittest.TestCase):
+
+    def get_totals(self, prob, ode_function):
+        if isinstance(ode_function, SimpleNonlinearODEFunction):
+            of = ['state:y']
+            wrt = ['initial_condition:y', 'final_time']
+        else:
+            of = ['state:x', 'state:y', 'state:v']
+            wrt = ['dynamic_parameter:theta', 'final_time']
+
+        with suppress_stdout_stderr():
+            return prob.compute_totals(of=of, wrt=wrt)
+
+    @parameterized.expand(product(
+        ['ForwardEuler', 'RK4', 'AB3', 'ABalt3'],  # method
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_matrix_free(self, method_name, ode_function):
+        prob_ref = run_ode('solver-based', method_name, ode_function)
+        totals_ref = self.get_totals(prob_ref, ode_function)
+
+        for mode in ['fwd', 'rev']:
+            prob = run_ode('solver-based', method_name, ode_function, mode=mode, matrix_free=True)
+
+            for state_name in ode_function._states:
+                y_ref = prob_ref['state:%s' % state_name]
+                y = prob['state:%s' % state_name]
+                self.assertTrue(
+                    np.linalg.norm(y - y_ref) <= 1e-10 * np.linalg.norm(y_ref) + 1e-14)
+
+            totals = self.get_totals(prob, ode_function)
+            for key, jac_ref in iteritems(totals_ref):
+                self.assertTrue(np.linalg.norm(totals[key] - jac_ref)
+                    <= 1e-8 * np.linalg.norm(jac_ref) + 1e-12,
+                    'Total derivative mismatch in %s mode for %s' % (mode, key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from __future__ import division
+import numpy as np
+import unittest
+from parameterized import parameterized
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.utils.mesh_refinement import refine_mesh
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, times, method_name='RK4'):
+        integrator = ODEIntegrator(SimpleNonlinearODEFunction(), 'solver-based', method_name,
+            times=times, initial_conditions={'y': 1.})
+        prob = Problem(integrator)
+
+        with suppress_stdout_stderr():
+            prob.setup(check=False)
+            prob.run_model()
+
+        return prob
+
+    def test_mesh_refinement(self):
+        # The solution steepens towards the end, so the refined grid beats a uniform one.
+        exact_y = 2. / (2. - 1.3 ** 2)
+
+        with suppress_stdout_stderr():
+            prob, times, history = refine_mesh(SimpleNonlinearODEFunction(), 'solver-based',
+                'RK4', np.linspace(0., 1.3, 5), initial_conditions={'y': 1.},
+                atol=1e-7, rtol=1e-7)
+
+        self.assertTrue(history['max_error'][-1] <= 1.)
+        self.assertEqual(history['num_times'][-1], len(times))
+        self.assertTrue(np.min(np.diff(times)) < 0.1 * np.max(np.diff(times)))
+
+        error = np.abs(prob['state:y'][-1, 0] - exact_y)
+        uniform_error = np.abs(
+            self.run_ode(np.linspace(0., 1.3, len(times)))['state:y'][-1, 0] - exact_y)
+        self.assertTrue(error < 0.1 * uniform_error)
+
+    @parameterized.expand([
+        ('solver-based', 'RK4', {}),
+        ('solver-based', 'GaussLegendre4', {'solver': 'newton-direct'}),
+        ('optimizer-based', 'RK4', {}),
+    ])
+    def test_mesh_refinement_warm_start(self, formulation, method_name, kwargs):
+        # The warm-started solves converge to the solution on the final grid.
+        with suppress_stdout_stderr():
+            prob, times, history = refine_mesh(SimpleNonlinearODEFunction(), formulation,
+                method_name, np.linspace(0., 1., 4), initial_conditions={'y': 1.},
+                atol=1e-5, rtol=1e-5, max_num_times=12, **kwargs)
+
+        self.assertTrue(len(history['num_times']) > 1)
+        self.assertTrue(len(times) <= 12)
+
+        y_ref = self.run_ode(times, method_name)['state:y']
+        self.assertTrue(np.linalg.norm(prob['state:y'] - y_ref) <= 1e-7 * np.linalg.norm(y_ref))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+class Test(unittest.TestCase):
+
+    def get_of_wrt(self, ode_function):
+        if isinstance(ode_function, SimpleNonlinearODEFunction):
+            return ['state:y'], ['initial_condition:y', 'final_time']
+        else:
+            return ['state:x', 'state:y', 'state:v'], ['dynamic_parameter:theta', 'final_time']
+
+    def get_totals(self, prob, ode_function):
+        of, wrt = self.get_of_wrt(ode_function)
+
+        with suppress_stdout_stderr():
+            return prob.compute_totals(of=of, wrt=wrt)
+
+    @parameterized.expand(product(
+        ['RK4', 'BackwardEuler', 'GaussLegendre4'],  # method
+        [1, 3],  # num_segments
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_multiple_shooting(self, method_name, num_segments, ode_function):
+        # With one-step methods, the segments reproduce the time-marching solution.
+        prob_ref = run_problem(
+            get_integrator('time-marching', method_name, ode_function, num_times=13))
+        totals_ref = self.get_totals(prob_ref, ode_function)
+
+        for mode in ['fwd', 'rev']:
+            prob = run_problem(get_integrator('multiple-shooting', method_name, ode_function,
+                num_times=13, num_segments=num_segments), mode=mode)
+
+            for state_name in ode_function._states:
+                y_ref = prob_ref['state:%s' % state_name]
+                y = prob['state:%s' % state_name]
+                self.assertTrue(
+                    np.linalg.norm(y - y_ref) <= 1e-10 * np.linalg.norm(y_ref) + 1e-14)
+
+            totals = self.get_totals(prob, ode_function)
+            for key, jac_ref in iteritems(totals_ref):
+                self.assertTrue(np.linalg.norm(totals[key] - jac_ref)
+                    <= 1e-8 * np.linalg.norm(jac_ref) + 1e-12,
+                    'Total derivative mismatch in %s mode for %s' % (mode, key))
+
+    @parameterized.expand([
+        ('AB3', 'residual'),
+        ('RK4', 'constraint'),
+    ])
+    def test_multiple_shooting_totals(self, method_name, continuity):
+        ode_function = GettingStartedOCFunction()
+        of, wrt = self.get_of_wrt(ode_function)
+
+        integrator = get_integrator('multiple-shooting', method_name, ode_function,
+            num_times=13, num_segments=3, continuity=continuity)
+        for name in wrt:
+            integrator.add_design_var(name)
+
+        if continuity == 'constraint':
+            of = of + ['shooting_group.continuity_comp.segment2_defect:v']
+            wrt = wrt + ['shooting_group.initial_condition_comp.segment1_initial_condition:v']
+
+        prob = run_problem(integrator)
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-5 * data['magnitude'][2] + 1e-8,
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['RK4', 'GaussLegendre4'],  # method
+        ['residual', 'constraint'],  # continuity
+    ))
+    def test_multiple_shooting_workers(self, method_name, continuity):
+        # The segments propagated in worker processes match those of the parallel group.
+        ode_function = GettingStartedOCFunction()
+        of, wrt = self.get_of_wrt(ode_function)
+
+        if continuity == 'constraint':
+            of = of + ['shooting_group.continuity_comp.segment2_defect:v']
+            wrt = wrt + ['shooting_group.initial_condition_comp.segment1_initial_condition:v']
+
+        kwargs = dict(num_times=13, num_segments=3, continuity=continuity,
+            segment_formulation='fused-time-marching')
+
+        prob_ref = run_problem(
+            get_integrator('multiple-shooting', method_name, ode_function, **kwargs))
+        integrator = get_integrator('multiple-shooting', method_name, ode_function,
+            num_workers=2, **kwargs)
+        prob = run_problem(integrator)
+
+        with suppress_stdout_stderr():
+            totals_ref = prob_ref.compute_totals(of=of, wrt=wrt)
+            totals = prob.compute_totals(of=of, wrt=wrt)
+        integrator.close_workers()
+
+        for state_name in ode_function._states:
+            y_ref = prob_ref['state:%s' % state_name]
+            y = prob['state:%s' % state_name]
+            self.assertTrue(np.linalg.norm(y - y_ref) <= 1e-10 * np.linalg.norm(y_ref) + 1e-14)
+
+        for key, jac_ref in iteritems(totals_ref):
+            self.assertTrue(np.linalg.norm(totals[key] - jac_ref)
+                <= 1e-8 * np.linalg.norm(jac_ref) + 1e-12,
+                'Total derivative mismatch for %s' % (key,))
+
+    def test_multiple_shooting_constraint(self):
+        # The states match time-marching when the segment initial conditions close the defects.
+        ode_function = GettingStartedOCFunction()
+
+        prob_ref = run_problem(get_integrator('time-marching', 'RK4', ode_function, num_times=13))
+        prob = run_problem(get_integrator('multiple-shooting', 'RK4', ode_function,
+            num_times=13, num_segments=3, continuity='constraint'))
+
+        for state_name in ode_function._states:
+            for i_segment, i_time in [(1, 4), (2, 8)]:
+                prob['shooting_group.initial_condition_comp.segment%i_initial_condition:%s'
+                    % (i_segment, state_name)] = prob_ref['state:%s' % state_name][i_time]
+
+        with suppress_stdout_stderr():
+            prob.run_model()
+
+        for state_name in ode_function._states:
+            y_ref = prob_ref['state:%s' % state_name]
+            y = prob['state:%s' % state_name]
+            self.assertTrue(np.linalg.norm(y - y_ref) <= 1e-10 * np.linalg.norm(y_ref) + 1e-14)
+
+            for i_segment in [1, 2]:
+                defect = prob['shooting_group.continuity_comp.segment%i_defect:%s'
+                    % (i_segment, state_name)]
+                self.assertTrue(np.linalg.norm(defect) <= 1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.reaction_diffusion_func import \
+    ReactionDiffusionODEFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, method_name, precon=True, num_points=8, mode='fwd', **kwargs):
+        ode_function = ReactionDiffusionODEFunction(num_points=num_points)
+        if not precon:
+            ode_function.set_preconditioner(None)
+
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+        integrator = ODEIntegrator(ode_function, 'time-marching', method_name,
+            times=np.linspace(t0, t1, 6), initial_conditions=initial_conditions, **kwargs)
+        prob = Problem(integrator)
+
+        with suppress_stdout_stderr():
+            prob.setup(check=False, mode=mode)
+            prob.run_model()
+
+        return prob, integrator
+
+    def get_totals(self, prob):
+        with suppress_stdout_stderr():
+            return prob.compute_totals(of=['state:u'], wrt=['initial_condition:u'])
+
+    @parameterized.expand(product(
+        ['BackwardEuler', 'BDF2', 'RadauII5', 'GaussLegendre4'],  # method
+        [False, True],  # fd_jacvec
+    ))
+    def test_newton_krylov(self, method_name, fd_jacvec):
+        # The Krylov solves reproduce the direct solves, without factorizations.
+        prob_ref, integrator_ref = self.run_ode(method_name)
+        prob, integrator = self.run_ode(method_name, solver='newton-krylov', fd_jacvec=fd_jacvec)
+
+        u_ref = prob_ref['state:u']
+        self.assertTrue(np.linalg.norm(prob['state:u'] - u_ref) <= 1e-8 * np.linalg.norm(u_ref))
+
+        history = integrator.get_newton_history()
+        self.assertEqual(history['num_factorizations'], 0)
+        self.assertTrue(len(history['linear_iteration_counts']) > 0)
+
+        totals_ref = self.get_totals(prob_ref)
+        totals = self.get_totals(prob)
+        for key, jac_ref in iteritems(totals_ref):
+            self.assertTrue(
+                np.linalg.norm(totals[key] - jac_ref) <= 1e-8 * np.linalg.norm(jac_ref),
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['BackwardEuler', 'RadauII5'],  # method
+        [False, True],  # fd_jacvec
+    ))
+    def test_newton_krylov_precon(self, method_name, fd_jacvec):
+        # The preconditioner of the ODE function reduces the GMRES iterations.
+        linear_iteration_counts = []
+        for precon in [False, True]:
+            prob, integrator = self.run_ode(method_name, precon=precon, num_points=20,
+                solver='newton-krylov', fd_jacvec=fd_jacvec)
+            linear_iteration_counts.append(
+                sum(integrator.get_newton_history()['linear_iteration_counts']))
+
+        self.assertTrue(linear_iteration_counts[1] < 0.5 * linear_iteration_counts[0])
+
+
+    @parameterized.expand(product(
+        ['BackwardEuler', 'RadauII5'],  # method
+    ))
+    def test_newton_krylov_precon_rev(self, method_name):
+        # In rev mode, the transposed preconditioner reduces the GMRES iterations of the
+        # derivative solves, which give the same derivatives as the direct solves.
+        prob_ref, integrator_ref = self.run_ode(method_name, num_points=20, mode='rev')
+        totals_ref = self.get_totals(prob_ref)
+
+        linear_iteration_counts = []
+        for precon in [False, True]:
+            prob, integrator = self.run_ode(method_name, precon=precon, num_points=20,
+                mode='rev', solver='newton-krylov')
+            num_iterations = sum(integrator.get_newton_history()['linear_iteration_counts'])
+
+            totals = self.get_totals(prob)
+            linear_iteration_counts.append(
+                sum(integrator.get_newton_history()['linear_iteration_counts'])
+                - num_iterations)
+
+            for key, jac_ref in iteritems(totals_ref):
+                self.assertTrue(
+                    np.linalg.norm(totals[key] - jac_ref) <= 1e-8 * np.linalg.norm(jac_ref),
+                    'Total derivative mismatch for %s' % (key,))
+
+        self.assertTrue(linear_iteration_counts[1] < 0.5 * linear_iteration_counts[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import numpy as np
 import unittest
+from six import iteritems
 from itertools import product
 from parameterized import parameterized
 
@@ -24,12 +25,25 @@ class Test(unittest.TestCase):
 
         self.formulation = 'solver-based'
 
-    @parameterized.expand(method_classes.keys())
+    # Partitioned methods require position/velocity state pairs; see test_symplectic.
+    @parameterized.expand([method_name for method_name, method in iteritems(method_classes)
+        if not method.partitioned])
     def test(self, method_name):
+        # Rosenbrock and IMEX methods are not supported by the vectorized formulations.
+        method = method_classes[method_name]
+
+        if method.linearly_implicit or method.imex or method.exponential:
+            formulation = 'time-marching'
+        else:
+            formulation = self.formulation
+
+        # Exponential methods integrate part of the linear ODE exactly and the rest explicitly.
+        if method.exponential:
+            self.ode_function.set_linear_operator([[0.5]])
 
         errors_vector, step_sizes_vector, orders_vector, ideal_order = compute_convergence_order(
             self.num_times_vector, self.t0, self.t1, self.state_name,
-            self.ode_function, self.formulation, method_name, self.initial_conditions)
+            self.ode_function, formulation, method_name, self.initial_conditions)
 
         average_order = np.sum(orders_vector) / len(orders_vector)
 
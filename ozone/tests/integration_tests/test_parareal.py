@@ -0,0 +1,90 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+class Test(unittest.TestCase):
+
+    def get_of_wrt(self, ode_function):
+        if isinstance(ode_function, SimpleNonlinearODEFunction):
+            return ['state:y'], ['initial_condition:y', 'final_time']
+        else:
+            return ['state:x', 'state:y', 'state:v'], ['dynamic_parameter:theta', 'final_time']
+
+    def get_totals(self, prob, ode_function):
+        of, wrt = self.get_of_wrt(ode_function)
+
+        with suppress_stdout_stderr():
+            return prob.compute_totals(of=of, wrt=wrt)
+
+    @parameterized.expand(product(
+        [('RK4', 'ForwardEuler', None), ('GaussLegendre4', 'RK4', 2),
+            ('RK6', 'BackwardEuler', 2)],  # fine method, coarse method, num_workers
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+    ))
+    def test_parareal(self, methods, ode_function):
+        # The converged parareal solution matches the serial fine solution.
+        method_name, coarse_method, num_workers = methods
+
+        prob_ref = run_problem(
+            get_integrator('fused-time-marching', method_name, ode_function, num_times=13))
+        totals_ref = self.get_totals(prob_ref, ode_function)
+
+        num_segments = 3
+        integrator = get_integrator('parareal', method_name, ode_function, num_times=13,
+            coarse_method=coarse_method, num_segments=num_segments, num_workers=num_workers)
+        prob = run_problem(integrator)
+
+        for state_name in ode_function._states:
+            y_ref = prob_ref['state:%s' % state_name]
+            y = prob['state:%s' % state_name]
+            self.assertTrue(np.linalg.norm(y - y_ref) <= 1e-9 * np.linalg.norm(y_ref) + 1e-12)
+
+        totals = self.get_totals(prob, ode_function)
+        for key, jac_ref in iteritems(totals_ref):
+            self.assertTrue(np.linalg.norm(totals[key] - jac_ref)
+                <= 1e-8 * np.linalg.norm(jac_ref) + 1e-12,
+                'Total derivative mismatch for %s' % (key,))
+
+        history = integrator.get_parareal_history()
+        self.assertTrue(1 <= history['num_iterations'] <= num_segments)
+        self.assertEqual(len(history['defect_history']), history['num_iterations'])
+        self.assertEqual(history['segment_times'].shape,
+            (history['num_iterations'], num_segments))
+        self.assertTrue(np.all(history['segment_times'][0] > 0.))
+
+        # The worker processes are reused by the next run.
+        if num_workers is not None:
+            segment_pool = integrator.integration_comp.segment_pool
+            pool = segment_pool._pool
+            with suppress_stdout_stderr():
+                prob.run_model()
+            self.assertIs(segment_pool._pool, pool)
+
+            integrator.close_workers()
+            self.assertIsNone(segment_pool._pool)
+
+    def test_parareal_convergence(self):
+        # An accurate coarse propagator converges in fewer iterations than there are segments.
+        ode_function = GettingStartedOCFunction()
+
+        integrator = get_integrator('parareal', 'RK4', ode_function, num_times=13,
+            coarse_method='RK4', num_coarse_steps=4, num_segments=4,
+            parareal_atol=1e-6, parareal_rtol=1e-6)
+        run_problem(integrator)
+
+        history = integrator.get_parareal_history()
+        self.assertTrue(history['num_iterations'] < 4)
+        self.assertTrue(history['defect_history'][-1] <= 1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.simple_linear_func import SimpleLinearODEFunction
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.tests.ode_function_library.two_d_orbit_func import TwoDOrbitFunction
+from ozone.utils.run_utils import compute_convergence_order
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import run_ode, run_problem
+
+
+class Test(unittest.TestCase):
+
+    @parameterized.expand(product(
+        ['ROS2', 'ROS3P', 'RODAS3'],  # method
+    ))
+    def test_rosenbrock_order(self, method_name):
+        # The time-dependent ODE checks the f_t term of the linear systems.
+        ode_function = SimpleLinearODEFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+
+        errors_vector, step_sizes_vector, orders_vector, ideal_order = compute_convergence_order(
+            np.array([10, 15, 20]), t0, t1, 'y',
+            ode_function, 'time-marching', method_name, initial_conditions)
+
+        average_order = np.sum(orders_vector) / len(orders_vector)
+        self.assertTrue(np.abs(ideal_order - average_order) < 0.5)
+
+    @parameterized.expand(product(
+        ['ROS2', 'ROS3P', 'RODAS3'],  # method
+        [SimpleNonlinearODEFunction(), GettingStartedOCFunction()],  # ODE Function
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_rosenbrock_totals(self, method_name, ode_function, mode):
+        # The derivatives include the second-order terms due to the Jacobian in the step.
+        if isinstance(ode_function, SimpleNonlinearODEFunction):
+            prob = run_ode('time-marching', method_name, ode_function, mode=mode,
+                times=np.linspace(0., 1.e-1, 7))
+            of = ['state:y']
+            wrt = ['initial_condition:y', 'final_time']
+        else:
+            prob = run_ode('time-marching', method_name, ode_function, mode=mode)
+            of = ['state:x', 'state:v']
+            wrt = ['dynamic_parameter:theta', 'initial_condition:v', 'final_time']
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt, form='central', step=1e-5)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-8 * data['magnitude'][2] + 1e-10,
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['ROS3P', 'RODAS3'],  # method
+    ))
+    def test_rosenbrock_fd_step(self, method_name):
+        # The second-order terms are differenced centrally, so the error of the derivatives
+        # decreases with the square of rosenbrock_fd_step until roundoff takes over.
+        ode_function = TwoDOrbitFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+
+        def compute_totals(**kwargs):
+            prob = run_problem(ODEIntegrator(ode_function, 'fused-time-marching', method_name,
+                initial_time=t0, final_time=t1 / 4., normalized_times=np.linspace(0., 1., 11),
+                initial_conditions=initial_conditions, **kwargs))
+            with suppress_stdout_stderr():
+                totals = prob.compute_totals(of=['state:position'],
+                    wrt=['initial_condition:velocity', 'final_time'])
+            return np.hstack([np.atleast_2d(jac) for jac in totals.values()])
+
+        totals_ref = compute_totals()
+        error_coarse = np.linalg.norm(compute_totals(rosenbrock_fd_step=1e-2) - totals_ref)
+        error_fine = np.linalg.norm(compute_totals(rosenbrock_fd_step=1e-3) - totals_ref)
+
+        self.assertTrue(error_fine <= 1e-4 * np.linalg.norm(totals_ref))
+        self.assertTrue(error_coarse > 20. * error_fine)
+
+    @parameterized.expand(product(
+        ['ROS2', 'RODAS3'],  # method
+        [('fused-time-marching', {}), ('fused-time-marching', {'num_checkpoints': 2}),
+         ('parareal', {'coarse_method': 'ROS2'}), ('multiple-shooting', {})],  # formulation
+    ))
+    def test_rosenbrock_formulations(self, method_name, formulation):
+        formulation, kwargs = formulation
+        ode_function = GettingStartedOCFunction()
+
+        prob_ref = run_ode('time-marching', method_name, ode_function)
+        prob = run_ode(formulation, method_name, ode_function, **kwargs)
+
+        for state_name in ode_function._states:
+            y_ref = prob_ref['state:%s' % state_name]
+            y = prob['state:%s' % state_name]
+            self.assertTrue(np.linalg.norm(y - y_ref) <= 1e-8 * np.linalg.norm(y_ref) + 1e-12)
+
+    @parameterized.expand(product(
+        ['solver-based', 'optimizer-based', 'adaptive-time-marching'],  # formulation
+    ))
+    def test_rosenbrock_unsupported(self, formulation):
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(SimpleNonlinearODEFunction(), formulation, 'ROS2',
+                times=np.linspace(0., 1., 7), initial_conditions={'y': 1.})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import numpy as np
+import unittest
+
+from ozone.tests.ode_function_library.simple_homogeneous_func import SimpleHomogeneousODEFunction
+from ozone.utils.run_utils import compute_study, compute_convergence_order, compute_runtimes
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.num_times_vector = np.array([10, 15, 20])
+        self.ode_function = SimpleHomogeneousODEFunction()
+        self.initial_conditions = {'y': 1.}
+
+    def test_study_table(self):
+        # The cases run in worker processes have the errors of the cases run in this process.
+        method_names = ['RK4', 'BDF2']
+        formulations = ['time-marching', 'solver-based']
+
+        results = compute_study(self.num_times_vector, 0., 1., self.ode_function,
+            method_names, formulations, self.initial_conditions, num_workers=2)
+        results_ref = compute_study(self.num_times_vector, 0., 1., self.ode_function,
+            method_names, formulations, self.initial_conditions)
+
+        self.assertEqual(len(results), 12)
+        self.assertEqual(list(results['method_name'][::6]), method_names)
+        self.assertEqual(list(results['formulation'][:6:3]), formulations)
+        self.assertEqual(list(results['num_times'][:3]), list(self.num_times_vector))
+
+        self.assertTrue(np.all(results['error'] == results_ref['error']))
+        self.assertTrue(np.all(results['runtime'] > 0.))
+        self.assertTrue(np.all(np.isnan(results['order'][::3])))
+
+        orders = results['order'].reshape((4, 3))[:, 1:]
+        ideal_orders = results['ideal_order'].reshape((4, 3))[:, 1:]
+        self.assertTrue(np.all(np.abs(orders - ideal_orders) < 0.5))
+
+    def test_study_variants(self):
+        errors_vector, step_sizes_vector, orders_vector, ideal_order = compute_convergence_order(
+            self.num_times_vector, 0., 1., 'y', self.ode_function, 'solver-based', 'RK4',
+            self.initial_conditions, num_workers=2)
+        errors_ref, step_sizes_ref, orders_ref, ideal_order_ref = compute_convergence_order(
+            self.num_times_vector, 0., 1., 'y', self.ode_function, 'solver-based', 'RK4',
+            self.initial_conditions)
+
+        self.assertTrue(np.all(errors_vector == errors_ref))
+        self.assertTrue(np.all(orders_vector == orders_ref))
+        self.assertEqual(ideal_order, ideal_order_ref)
+
+        step_sizes_vector, runtimes_vector = compute_runtimes(
+            self.num_times_vector, 0., 1., self.ode_function, 'solver-based', 'RK4',
+            self.initial_conditions, num_workers=2)
+        self.assertTrue(np.all(step_sizes_vector == step_sizes_ref))
+        self.assertEqual(len(runtimes_vector), len(self.num_times_vector))
+
+
+if __name__ == '__main__':
+    unittest.main()
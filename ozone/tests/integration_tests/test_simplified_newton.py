@@ -0,0 +1,139 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+class Test(unittest.TestCase):
+
+    @parameterized.expand(product(
+        ['BDF3', 'RadauII5', 'GaussLegendre6'],  # method
+    ))
+    def test_simplified_newton(self, method_name):
+        # The same solution is found with far fewer factorizations.
+        histories = []
+        solutions = []
+        for simplified_newton in [False, True]:
+            integrator = ODEIntegrator(SimpleNonlinearODEFunction(), 'time-marching', method_name,
+                times=np.linspace(0., 1.3, 41), initial_conditions={'y': 1.},
+                simplified_newton=simplified_newton)
+            prob = run_problem(integrator)
+
+            histories.append(integrator.get_newton_history())
+            solutions.append(prob['state:y'])
+
+        self.assertTrue(np.linalg.norm(solutions[1] - solutions[0]) < 1e-9)
+        self.assertTrue(
+            histories[1]['num_factorizations'] < 0.25 * histories[0]['num_factorizations'])
+
+    @parameterized.expand(product(
+        ['BackwardEuler', 'BDF3', 'RadauII5', 'GaussLegendre6', 'Lobatto4'],  # method
+    ))
+    def test_stage_predictor(self, method_name):
+        # Starting from the extrapolated stages saves Newton iterations.
+        histories = []
+        solutions = []
+        for stage_predictor in [False, True]:
+            integrator = ODEIntegrator(SimpleNonlinearODEFunction(), 'time-marching', method_name,
+                times=np.linspace(0., 1.2, 41), initial_conditions={'y': 1.},
+                stage_predictor=stage_predictor)
+            prob = run_problem(integrator)
+
+            histories.append(integrator.get_newton_history())
+            solutions.append(prob['state:y'])
+
+        self.assertTrue(np.linalg.norm(solutions[1] - solutions[0]) < 1e-9)
+        self.assertTrue(
+            sum(histories[1]['iteration_counts']) < 0.8 * sum(histories[0]['iteration_counts']))
+
+    @parameterized.expand(product(
+        ['SDIRK2', 'SDIRK4', 'ESDIRK2', 'ESDIRK3', 'Trapezoidal'],  # method
+    ))
+    def test_sequential_stages(self, method_name):
+        # The stages of a step are solved one at a time, sharing one factorization per step, or
+        # one factorization for all steps with simplified_newton.
+        num_steps = 40
+        histories = []
+        solutions = []
+        for sequential_stages, simplified_newton in [(False, False), (True, False), (True, True)]:
+            integrator = ODEIntegrator(SimpleNonlinearODEFunction(), 'time-marching', method_name,
+                times=np.linspace(0., 1.3, num_steps + 1), initial_conditions={'y': 1.},
+                sequential_stages=sequential_stages, simplified_newton=simplified_newton)
+            prob = run_problem(integrator)
+
+            histories.append(integrator.get_newton_history())
+            solutions.append(prob['state:y'])
+
+        for solution in solutions[1:]:
+            self.assertTrue(
+                np.linalg.norm(solution - solutions[0]) < 1e-9 * np.linalg.norm(solutions[0]))
+        self.assertTrue(num_steps <= histories[1]['num_factorizations']
+            <= sum(histories[1]['iteration_counts']))
+        self.assertTrue(histories[2]['num_factorizations'] <= num_steps)
+        self.assertTrue(histories[2]['num_factorizations'] < histories[0]['num_factorizations'])
+
+    @parameterized.expand(product(
+        ['SDIRK3', 'ESDIRK3'],  # method
+        [False, True],  # stage_predictor
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_sequential_stages_totals(self, method_name, stage_predictor, mode):
+        # The derivatives match those of the coupled stage solves.
+        totals = []
+        for sequential_stages in [False, True]:
+            integrator = get_integrator('time-marching', method_name, GettingStartedOCFunction(),
+                num_times=13, sequential_stages=sequential_stages, stage_predictor=stage_predictor)
+            prob = run_problem(integrator, mode=mode)
+
+            with suppress_stdout_stderr():
+                totals.append(prob.compute_totals(of=['state:x', 'state:v'],
+                    wrt=['dynamic_parameter:theta', 'initial_condition:v']))
+
+        for key, jac_ref in iteritems(totals[0]):
+            self.assertTrue(
+                np.linalg.norm(totals[1][key] - jac_ref) <= 1e-8 * np.linalg.norm(jac_ref),
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['SDIRK3', 'ESDIRK2', 'ESDIRK3', 'Trapezoidal'],  # method
+        [False, True],  # sequential_stages
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_sequential_stages_time_totals(self, method_name, sequential_stages, mode):
+        integrator = get_integrator('time-marching', method_name, GettingStartedOCFunction(),
+            num_times=13, sequential_stages=sequential_stages)
+        prob = run_problem(integrator, mode=mode)
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=['state:x', 'state:v'],
+                wrt=['initial_time', 'final_time'], form='central', step=1e-6)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-5 * data['magnitude'][2] + 1e-8,
+                'Total derivative mismatch for %s' % (key,))
+
+    def test_simplified_newton_totals(self):
+        # The derivatives use a fresh factorization.
+        integrator = get_integrator('time-marching', 'RadauII5', GettingStartedOCFunction(),
+            num_times=13, simplified_newton=True, stage_predictor=True)
+        prob = run_problem(integrator)
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=['state:x', 'state:v'],
+                wrt=['dynamic_parameter:theta', 'initial_condition:v'])
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-5 * data['magnitude'][2] + 1e-8,
+                'Total derivative mismatch for %s' % (key,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+from __future__ import division
+import numpy as np
+import unittest
+from itertools import product
+from parameterized import parameterized
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator, simulate
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.tests.ode_function_library.split_prothero_robinson_func import \
+    SplitProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.two_d_orbit_func import TwoDOrbitFunction
+from ozone.utils.ode_evaluator import ODEEvaluator
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+
+
+def get_getting_started_oc():
+    ode_function = GettingStartedOCFunction()
+    ode_function.set_linear_operator(-0.5 * np.eye(3))
+    return ode_function
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, formulation, method_name, ode_function, times, initial_conditions,
+            **kwargs):
+        integrator = ODEIntegrator(ode_function, formulation, method_name,
+            times=times, initial_conditions=dict(initial_conditions), **kwargs)
+        prob = Problem(integrator)
+
+        with suppress_stdout_stderr():
+            prob.setup(check=False)
+            prob.run_model()
+
+        return prob
+
+    def assert_same_states(self, ode_function, states, prob):
+        for state_name in ode_function._states:
+            self.assertTrue(np.max(np.abs(states[state_name] - prob['state:' + state_name]))
+                < 1e-12, 'State mismatch for %s' % state_name)
+
+    @parameterized.expand(product(
+        ['RK4', 'GaussLegendre4', 'ImplicitMidpoint', 'AB4', 'BDF3', 'ROS3P', 'ETDRK4'],  # method
+    ))
+    def test_simulate_methods(self, method_name):
+        # The states are those of the time-marching formulation, including the starting steps
+        # of the multistep methods.
+        ode_function = get_getting_started_oc()
+        times = np.linspace(0., 1.3, 13)
+        initial_conditions = {'x': 0., 'y': 0., 'v': 0.}
+        dynamic_parameters = {'theta': np.linspace(0.1, 1., 13).reshape((13, 1))}
+
+        prob = self.run_ode('time-marching', method_name, ode_function, times,
+            initial_conditions, dynamic_parameters=dynamic_parameters)
+        states = simulate(ode_function, method_name, times, initial_conditions,
+            dynamic_parameters=dynamic_parameters)
+
+        self.assert_same_states(ode_function, states, prob)
+
+    @parameterized.expand(product(
+        ['RK4', 'Yoshida4'],  # method
+    ))
+    def test_simulate_vector_states(self, method_name):
+        ode_function = TwoDOrbitFunction()
+        initial_conditions, t0, t1 = ode_function.get_test_parameters()
+        times = np.linspace(t0, t1, 21)
+
+        prob = self.run_ode('time-marching', method_name, ode_function, times,
+            initial_conditions)
+        states = simulate(ode_function, method_name, times, initial_conditions)
+
+        self.assert_same_states(ode_function, states, prob)
+
+    def test_simulate_imex(self):
+        ode_function = SplitProtheroRobinsonODEFunction()
+        times = np.linspace(0., 1., 11)
+
+        prob = self.run_ode('time-marching', 'ARS443', ode_function, times, {'y': 2.},
+            static_parameters={'k': 100.})
+        states = simulate(ode_function, 'ARS443', times, {'y': 2.},
+            static_parameters={'k': 100.})
+
+        self.assert_same_states(ode_function, states, prob)
+
+    def test_simulate_repeated(self):
+        # The steppers are reused, with the new initial conditions and parameters.
+        ode_function = SplitProtheroRobinsonODEFunction(split=False)
+        times = np.linspace(0., 1., 11)
+
+        for stiffness in [1., 10.]:
+            prob = self.run_ode('time-marching', 'RK4', ode_function, times, {'y': 1.5},
+                static_parameters={'k': stiffness})
+            states = simulate(ode_function, 'RK4', times, {'y': 1.5},
+                static_parameters={'k': stiffness})
+
+            self.assert_same_states(ode_function, states, prob)
+
+    def test_simulate_direct(self):
+        # A single ExplicitComponent is computed directly, with the same result as running the
+        # problem; a group, like that of an ODE with split rates, runs the problem.
+        evaluator = ODEEvaluator(get_getting_started_oc(), 3)
+        self.assertTrue(evaluator._direct_transfers is not None)
+
+        evaluator.set_inputs(np.random.rand(3, 3), dynamic=np.random.rand(3, 1))
+        F = evaluator.compute()
+        evaluator._direct_transfers = None
+        self.assertTrue(np.max(np.abs(evaluator.compute() - F)) < 1e-15)
+
+        evaluator = ODEEvaluator(SplitProtheroRobinsonODEFunction(), 3)
+        self.assertTrue(evaluator._direct_transfers is None)
+
+    def test_simulate_inputs(self):
+        ode_function = SplitProtheroRobinsonODEFunction(split=False)
+        times = np.linspace(0., 1., 11)
+
+        with self.assertRaises(AssertionError):
+            simulate(ode_function, 'RK4', times, {})
+        with self.assertRaises(AssertionError):
+            simulate(ode_function, 'RK4', times, {'y': 2., 'z': 1.})
+        with self.assertRaises(AssertionError):
+            simulate(ode_function, 'RK4', times, {'y': 2.}, static_parameters={'c': 1.})
+
+
+if __name__ == '__main__':
+    unittest.main()
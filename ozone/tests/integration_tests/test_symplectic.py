@@ -0,0 +1,139 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator
+from ozone.methods_list import method_classes
+from ozone.tests.ode_function_library.two_d_orbit_func import TwoDOrbitFunction
+from ozone.tests.ode_function_library.simple_homogeneous_func import \
+    SimpleHomogeneousODEFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+
+
+def get_energy(prob):
+    position = prob['state:position']
+    velocity = prob['state:velocity']
+    return 0.5 * np.sum(velocity ** 2, axis=1) - 1. / np.linalg.norm(position, axis=1)
+
+
+class Test(unittest.TestCase):
+
+    def run_ode(self, formulation, method_name, mode='rev', num_times=21, num_orbits=0.5,
+            **kwargs):
+        initial_conditions, t0, t1 = TwoDOrbitFunction().get_test_parameters()
+        integrator = ODEIntegrator(TwoDOrbitFunction(), formulation, method_name,
+            initial_time=t0, final_time=num_orbits * 2 * np.pi,
+            normalized_times=np.linspace(0., 1., num_times),
+            initial_conditions=initial_conditions, **kwargs)
+
+        prob = Problem(integrator)
+
+        with suppress_stdout_stderr():
+            prob.setup(check=False, mode=mode)
+            prob.run_model()
+
+        return prob
+
+    @parameterized.expand(product(
+        ['StormerVerlet', 'Yoshida4', 'Yoshida6'],  # method
+    ))
+    def test_symplectic_order(self, method_name):
+        # After half an orbit, the body is at the apoapsis; compute_convergence_order only
+        # compares the first component of a vector state, so the errors are computed here.
+        initial_conditions, t0, t1 = TwoDOrbitFunction().get_test_parameters()
+        exact = TwoDOrbitFunction().get_exact_solution(initial_conditions, t0, t1)['position']
+
+        num_times_vector = np.array([101, 201, 401])
+        errors = np.zeros(len(num_times_vector))
+        for ind, num_times in enumerate(num_times_vector):
+            prob = self.run_ode('time-marching', method_name, num_times=num_times)
+            errors[ind] = np.linalg.norm(prob['state:position'][-1] - exact)
+
+        orders = np.log(errors[:-1] / errors[1:]) / np.log(2.)
+        ideal_order = method_classes[method_name].order
+        self.assertTrue(np.abs(ideal_order - np.mean(orders)) < 0.3)
+
+    @parameterized.expand([
+        ('StormerVerlet', 'fused-time-marching'),
+        ('Yoshida4', 'fused-time-marching'),
+        ('GaussLegendre4', 'time-marching'),
+    ])
+    def test_symplectic_energy(self, method_name, formulation):
+        # The energy error of a symplectic method stays bounded over many orbits, while that of
+        # RK4 grows linearly with time, even though it is smaller over a few orbits.
+        drift = {}
+        for name, form in [(method_name, formulation), ('RK4', 'fused-time-marching')]:
+            drift[name] = []
+            for num_orbits in [2, 10]:
+                prob = self.run_ode(form, name, num_times=50 * num_orbits + 1,
+                    num_orbits=num_orbits)
+                energy = get_energy(prob)
+                drift[name].append(np.max(np.abs(energy - energy[0])))
+
+        self.assertTrue(drift[method_name][1] < 1.01 * drift[method_name][0])
+        self.assertTrue(drift['RK4'][1] > 4 * drift['RK4'][0])
+
+    @parameterized.expand(product(
+        ['StormerVerlet', 'Yoshida4'],  # method
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_symplectic_totals(self, method_name, mode):
+        prob = self.run_ode('time-marching', method_name, mode=mode, num_times=11)
+
+        of = ['state:position', 'state:velocity']
+        wrt = ['initial_condition:position', 'initial_condition:velocity', 'final_time']
+
+        with suppress_stdout_stderr():
+            totals = prob.check_totals(of=of, wrt=wrt, form='central', step=1e-6)
+
+        for key, data in iteritems(totals):
+            self.assertTrue(data['abs error'][0] <= 1e-7 * data['magnitude'][2] + 1e-9,
+                'Total derivative mismatch for %s' % (key,))
+
+    @parameterized.expand(product(
+        ['Yoshida4'],  # method
+        [('fused-time-marching', {}),
+         ('fused-time-marching', {'num_checkpoints': 2}),
+         ('parareal', {'coarse_method': 'StormerVerlet'})],  # formulation
+    ))
+    def test_symplectic_formulations(self, method_name, formulation):
+        formulation, kwargs = formulation
+
+        prob_ref = self.run_ode('time-marching', method_name)
+        prob = self.run_ode(formulation, method_name, **kwargs)
+
+        for name in ['state:position', 'state:velocity']:
+            self.assertTrue(np.linalg.norm(prob[name] - prob_ref[name])
+                <= 1e-8 * np.linalg.norm(prob_ref[name]))
+
+    @parameterized.expand(product(
+        ['solver-based', 'optimizer-based', 'adaptive-time-marching'],  # formulation
+    ))
+    def test_symplectic_unsupported(self, formulation):
+        initial_conditions, t0, t1 = TwoDOrbitFunction().get_test_parameters()
+        with self.assertRaises(AssertionError):
+            ODEIntegrator(TwoDOrbitFunction(), formulation, 'StormerVerlet',
+                times=np.linspace(t0, t1, 11), initial_conditions=initial_conditions)
+
+    def test_symplectic_state_pairs(self):
+        # Partitioned methods require at least one position/velocity state pair.
+        integrator = ODEIntegrator(SimpleHomogeneousODEFunction(), 'time-marching',
+            'StormerVerlet', times=np.linspace(0., 1., 11), initial_conditions={'y': 1.})
+        with self.assertRaises(AssertionError):
+            with suppress_stdout_stderr():
+                Problem(integrator).setup(check=False)
+
+        ode_function = TwoDOrbitFunction()
+        with self.assertRaises(ValueError):
+            ode_function.declare_state_pair('position', 'velocity')
+        with self.assertRaises(ValueError):
+            ode_function.declare_state_pair('position', 'acceleration')
+
+
+if __name__ == '__main__':
+    unittest.main()
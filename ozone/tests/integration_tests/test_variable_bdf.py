@@ -0,0 +1,109 @@
+from __future__ import division
+import numpy as np
+import unittest
+from six import iteritems
+from itertools import product
+from parameterized import parameterized
+
+from ozone.api import ODEIntegrator
+from ozone.tests.ode_function_library.prothero_robinson_func import ProtheroRobinsonODEFunction
+from ozone.tests.ode_function_library.getting_started_oc_func import GettingStartedOCFunction
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.integration_utils import get_integrator, run_problem
+
+
+class Test(unittest.TestCase):
+
+    def get_integrator(self, method_name, tolerance, times, stiffness=1e3):
+        return ODEIntegrator(ProtheroRobinsonODEFunction(), 'adaptive-time-marching',
+            method_name, times=times, initial_conditions={'y': 2.},
+            static_parameters={'k': stiffness}, atol=tolerance, rtol=tolerance)
+
+    @parameterized.expand(product(
+        ['BDF2', 'BDF3', 'BDF4', 'BDF5'],  # method
+        [5, 41],  # num_times
+    ))
+    def test_variable_bdf(self, method_name, num_times):
+        # The error is controlled by the tolerance, with interpolated intermediate outputs.
+        times = np.linspace(0., 2., num_times)
+        tolerance = 1e-6
+
+        integrator = self.get_integrator(method_name, tolerance, times)
+        prob = run_problem(integrator)
+
+        exact = ProtheroRobinsonODEFunction().get_exact_solution(
+            {'y': 2.}, 0., times, k=1e3)['y']
+        self.assertTrue(np.max(np.abs(prob['state:y'][:, 0] - exact)) <= 100 * tolerance)
+
+        history = integrator.get_step_history()
+        self.assertTrue(np.abs(np.sum(history['step_sizes']) - 2.) < 1e-12)
+        self.assertEqual(np.min(history['orders']), 1)
+        self.assertEqual(np.max(history['orders']), int(method_name[3:]))
+        self.assertTrue(history['num_jacobians'] < history['num_steps'] / 5)
+
+    def test_variable_bdf_steps(self):
+        # On a stiff problem, far fewer steps are needed than with an explicit pair, and
+        # raising the maximum order reduces the number of steps at tight tolerances.
+        times = np.linspace(0., 2., 5)
+
+        num_steps = {}
+        for method_name in ['BDF2', 'BDF5', 'DormandPrince54']:
+            integrator = self.get_integrator(method_name, 1e-8, times)
+            run_problem(integrator)
+            num_steps[method_name] = integrator.get_step_history()['num_steps']
+
+        self.assertTrue(num_steps['BDF5'] < num_steps['BDF2'] / 4)
+        self.assertTrue(num_steps['BDF5'] < num_steps['DormandPrince54'] / 4)
+
+    @parameterized.expand(product(
+        ['fwd', 'rev'],  # mode
+    ))
+    def test_variable_bdf_totals(self, mode):
+        # The derivatives approximate the exact sensitivities of the stiff problem; finite
+        # differences are not used since they also see the changes in the steps and orders.
+        stiffness = 10.
+        times = np.linspace(0., 2., 5)
+
+        integrator = self.get_integrator('BDF5', 1e-9, times, stiffness=stiffness)
+        prob = run_problem(integrator, mode=mode)
+
+        with suppress_stdout_stderr():
+            totals = prob.compute_totals(of=['state:y'],
+                wrt=['initial_condition:y', 'static_parameter:k', 'final_time'])
+
+        decay = np.exp(-stiffness * times)
+        exact = {
+            'initial_condition:y': decay,
+            'static_parameter:k': -times * decay,
+            'final_time': times / 2. * (-np.sin(times) - stiffness * decay),
+        }
+        for name, value in iteritems(exact):
+            error = np.max(np.abs(totals['state:y', name][:, 0] - value))
+            self.assertTrue(error < 1e-6, 'Total derivative mismatch for %s' % name)
+
+    def test_variable_bdf_modes(self):
+        # Dynamic parameters and times are differentiated consistently in both modes.
+        of = ['state:x', 'state:v']
+        wrt = ['dynamic_parameter:theta', 'initial_time', 'final_time', 'initial_condition:v']
+
+        totals = []
+        for mode in ['fwd', 'rev']:
+            integrator = get_integrator('adaptive-time-marching', 'BDF5',
+                GettingStartedOCFunction(), num_times=13, atol=1e-8, rtol=1e-8)
+            prob = run_problem(integrator, mode=mode)
+
+            with suppress_stdout_stderr():
+                totals.append(prob.compute_totals(of=of, wrt=wrt))
+
+        for key in product(of, wrt):
+            self.assertTrue(np.max(np.abs(totals[0][key] - totals[1][key])) < 1e-12,
+                'Total derivative mismatch for %s' % (key,))
+
+    def test_variable_bdf_order(self):
+        # Orders above 5 are rejected.
+        with self.assertRaises(AssertionError):
+            run_problem(self.get_integrator('BDF6', 1e-6, np.linspace(0., 2., 5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
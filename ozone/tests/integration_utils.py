@@ -0,0 +1,44 @@
+import numpy as np
+
+from openmdao.api import Problem
+
+from ozone.api import ODEIntegrator
+from ozone.utils.suppress_printing import suppress_stdout_stderr
+from ozone.tests.ode_function_library.simple_nonlinear_func import SimpleNonlinearODEFunction
+
+
+def get_integrator(formulation, method_name, ode_function, num_times=7, **kwargs):
+    """
+    Return an integrator of SimpleNonlinearODEFunction or GettingStartedOCFunction.
+
+    SimpleNonlinearODEFunction is integrated from y = -1 over [0, 0.01], and
+    GettingStartedOCFunction from rest over [0, 1.3] with theta increasing linearly from 0.1
+    to 1. The keyword arguments are passed to ODEIntegrator and override these defaults.
+    """
+    if isinstance(ode_function, SimpleNonlinearODEFunction):
+        integrator_kwargs = dict(
+            times=np.linspace(0., 1.e-2, num_times), initial_conditions={'y': -1.})
+    else:
+        integrator_kwargs = dict(
+            initial_time=0., final_time=1.3, normalized_times=np.linspace(0., 1., num_times),
+            initial_conditions={'x': 0., 'y': 0., 'v': 0.},
+            dynamic_parameters={'theta': np.linspace(0.1, 1., num_times).reshape((-1, 1))})
+    integrator_kwargs.update(kwargs)
+
+    return ODEIntegrator(ode_function, formulation, method_name, **integrator_kwargs)
+
+
+def run_problem(integrator, mode='rev'):
+    prob = Problem(integrator)
+
+    with suppress_stdout_stderr():
+        prob.setup(check=False, mode=mode)
+        prob.run_model()
+
+    return prob
+
+
+def run_ode(formulation, method_name, ode_function, mode='rev', num_times=7, **kwargs):
+    return run_problem(
+        get_integrator(formulation, method_name, ode_function, num_times=num_times, **kwargs),
+        mode=mode)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from ozone.api import ODEFunction
+from ozone.tests.ode_function_library.prothero_robinson_sys import ProtheroRobinsonODESystem
+
+
+class ProtheroRobinsonODEFunction(ODEFunction):
+    """
+    The stiff test problem y' = -k (y - cos(t)) - sin(t), whose solution approaches cos(t).
+    """
+
+    def initialize(self):
+        self.set_system(ProtheroRobinsonODESystem)
+        self.declare_state('y', 'dy_dt', targets='y')
+        self.declare_time(targets='t')
+        self.declare_parameter('k', 'k', shape=1, dynamic=False)
+
+    def get_test_parameters(self):
+        t0 = 0.
+        t1 = 10.
+        initial_conditions = {'y': 2.}
+        return initial_conditions, t0, t1
+
+    def get_exact_solution(self, initial_conditions, t0, t, k=1e4):
+        y0 = initial_conditions['y']
+        return {'y': np.cos(t) + (y0 - np.cos(t0)) * np.exp(-k * (t - t0))}
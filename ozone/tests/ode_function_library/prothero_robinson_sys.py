@@ -0,0 +1,38 @@
+import numpy as np
+
+from openmdao.api import ExplicitComponent
+
+
+class ProtheroRobinsonODESystem(ExplicitComponent):
+
+    def initialize(self):
+        self.options.declare('num_nodes', default=1, types=int)
+
+    def setup(self):
+        num = self.options['num_nodes']
+
+        self.add_input('y', shape=(num, 1))
+        self.add_input('t', shape=num)
+        self.add_input('k', shape=(num, 1))
+        self.add_output('dy_dt', shape=(num, 1))
+
+        arange = np.arange(num)
+        self.declare_partials('dy_dt', 'y', rows=arange, cols=arange)
+        self.declare_partials('dy_dt', 't', rows=arange, cols=arange)
+        self.declare_partials('dy_dt', 'k', rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        t = inputs['t']
+        y = inputs['y'][:, 0]
+        k = inputs['k'][:, 0]
+
+        outputs['dy_dt'][:, 0] = -k * (y - np.cos(t)) - np.sin(t)
+
+    def compute_partials(self, inputs, partials):
+        t = inputs['t']
+        y = inputs['y'][:, 0]
+        k = inputs['k'][:, 0]
+
+        partials['dy_dt', 'y'] = -k
+        partials['dy_dt', 't'] = -k * np.sin(t) - np.cos(t)
+        partials['dy_dt', 'k'] = -(y - np.cos(t))
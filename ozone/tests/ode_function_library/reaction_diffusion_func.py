@@ -0,0 +1,35 @@
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from ozone.api import ODEFunction
+from ozone.tests.ode_function_library.reaction_diffusion_sys import ReactionDiffusionSystem, \
+    get_laplacian
+
+
+class ReactionDiffusionODEFunction(ODEFunction):
+    """
+    Semi-discretized u_t = D u_xx + k u (1 - u) on (0, 1), with zero boundary values.
+
+    The preconditioner inverts the diffusion part only, which is also the linear operator
+    integrated exactly by exponential methods.
+    """
+
+    def initialize(self, num_points=20, diffusivity=0.1, reaction_rate=1.):
+        self.num_points = num_points
+        self.laplacian = diffusivity * get_laplacian(num_points)
+
+        self.set_system(ReactionDiffusionSystem, dict(num_points=num_points,
+            diffusivity=diffusivity, reaction_rate=reaction_rate))
+        self.declare_state('u', 'du_dt', targets='u', shape=num_points)
+        self.set_preconditioner(self.precondition)
+        self.set_linear_operator(self.laplacian.toarray())
+
+    def precondition(self, y, gamma, rhs):
+        mtx = scipy.sparse.eye(self.num_points, format='csc') - gamma * self.laplacian
+        return {'u': scipy.sparse.linalg.spsolve(mtx, rhs['u'])}
+
+    def get_test_parameters(self):
+        x = np.linspace(0., 1., self.num_points + 2)[1:-1]
+        initial_conditions = {'u': np.sin(np.pi * x)}
+        return initial_conditions, 0., 1.
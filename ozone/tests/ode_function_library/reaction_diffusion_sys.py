@@ -0,0 +1,52 @@
+import numpy as np
+import scipy.sparse
+
+from openmdao.api import ExplicitComponent
+
+
+def get_laplacian(num_points):
+    # Second-difference matrix on (0, 1) with zero Dirichlet boundary conditions.
+    dx = 1. / (num_points + 1)
+    ones = np.ones(num_points)
+    return scipy.sparse.diags(
+        [ones[1:], -2. * ones, ones[1:]], [-1, 0, 1], format='csc') / dx ** 2
+
+
+class ReactionDiffusionSystem(ExplicitComponent):
+
+    def initialize(self):
+        self.options.declare('num_nodes', default=1, types=int)
+        self.options.declare('num_points', default=20, types=int)
+        self.options.declare('diffusivity', default=0.1, types=float)
+        self.options.declare('reaction_rate', default=1., types=float)
+
+    def setup(self):
+        num = self.options['num_nodes']
+        num_points = self.options['num_points']
+
+        self.add_input('u', shape=(num, num_points))
+        self.add_output('du_dt', shape=(num, num_points))
+
+        # The Jacobian is block-diagonal over the nodes, with tridiagonal blocks.
+        self.laplacian = self.options['diffusivity'] * get_laplacian(num_points)
+        block = scipy.sparse.kron(scipy.sparse.eye(num), self.laplacian).tocoo()
+        block = (block + scipy.sparse.eye(num * num_points)).tocoo()
+
+        self.declare_partials('du_dt', 'u', rows=block.row, cols=block.col)
+
+        self.jac_laplacian = scipy.sparse.kron(
+            scipy.sparse.eye(num), self.laplacian).tocsr()[block.row, block.col].A1
+        self.diagonal = block.row == block.col
+
+    def compute(self, inputs, outputs):
+        u = inputs['u']
+        rate = self.options['reaction_rate']
+
+        outputs['du_dt'] = self.laplacian.dot(u.T).T + rate * u * (1. - u)
+
+    def compute_partials(self, inputs, partials):
+        u = inputs['u'].flatten()
+        rate = self.options['reaction_rate']
+
+        partials['du_dt', 'u'] = self.jac_laplacian
+        partials['du_dt', 'u'][self.diagonal] += rate * (1. - 2. * u)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from ozone.api import ODEFunction
+from ozone.tests.ode_function_library.split_prothero_robinson_sys import \
+    SplitProtheroRobinsonODESystem
+
+
+class SplitProtheroRobinsonODEFunction(ODEFunction):
+    """
+    The problem y' = -k (y - cos(t)) + (y - cos(t)) ** 2 - sin(t), whose solution approaches
+    cos(t), split into its stiff, linear part and its non-stiff, nonlinear part.
+    """
+
+    def initialize(self, split=True):
+        self.set_system(SplitProtheroRobinsonODESystem)
+        if split:
+            self.declare_state('y', 'nonstiff_dy_dt', targets='y', stiff_rate_source='stiff_dy_dt')
+        else:
+            self.declare_state('y', 'dy_dt', targets='y')
+        self.declare_time(targets='t')
+        self.declare_parameter('k', 'k', shape=1, dynamic=False)
+
+    def get_test_parameters(self):
+        t0 = 0.
+        t1 = 1.
+        initial_conditions = {'y': 2.}
+        return initial_conditions, t0, t1
+
+    def get_exact_solution(self, initial_conditions, t0, t, k=1.):
+        # The deviation e = y - cos(t) satisfies the Bernoulli equation e' = -k e + e ** 2.
+        e0 = initial_conditions['y'] - np.cos(t0)
+        e = 1. / (1. / k + (1. / e0 - 1. / k) * np.exp(k * (t - t0)))
+        return {'y': np.cos(t) + e}
@@ -0,0 +1,51 @@
+import numpy as np
+
+from openmdao.api import ExplicitComponent
+
+
+class SplitProtheroRobinsonODESystem(ExplicitComponent):
+
+    def initialize(self):
+        self.options.declare('num_nodes', default=1, types=int)
+
+    def setup(self):
+        num = self.options['num_nodes']
+
+        self.add_input('y', shape=(num, 1))
+        self.add_input('t', shape=num)
+        self.add_input('k', shape=(num, 1))
+        self.add_output('stiff_dy_dt', shape=(num, 1))
+        self.add_output('nonstiff_dy_dt', shape=(num, 1))
+        self.add_output('dy_dt', shape=(num, 1))
+
+        arange = np.arange(num)
+        for name in ['stiff_dy_dt', 'nonstiff_dy_dt', 'dy_dt']:
+            self.declare_partials(name, 'y', rows=arange, cols=arange)
+            self.declare_partials(name, 't', rows=arange, cols=arange)
+        self.declare_partials('stiff_dy_dt', 'k', rows=arange, cols=arange)
+        self.declare_partials('dy_dt', 'k', rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        t = inputs['t']
+        y = inputs['y'][:, 0]
+        k = inputs['k'][:, 0]
+
+        outputs['stiff_dy_dt'][:, 0] = -k * (y - np.cos(t))
+        outputs['nonstiff_dy_dt'][:, 0] = (y - np.cos(t)) ** 2 - np.sin(t)
+        outputs['dy_dt'] = outputs['stiff_dy_dt'] + outputs['nonstiff_dy_dt']
+
+    def compute_partials(self, inputs, partials):
+        t = inputs['t']
+        y = inputs['y'][:, 0]
+        k = inputs['k'][:, 0]
+
+        partials['stiff_dy_dt', 'y'] = -k
+        partials['stiff_dy_dt', 't'] = -k * np.sin(t)
+        partials['stiff_dy_dt', 'k'] = -(y - np.cos(t))
+
+        partials['nonstiff_dy_dt', 'y'] = 2 * (y - np.cos(t))
+        partials['nonstiff_dy_dt', 't'] = 2 * (y - np.cos(t)) * np.sin(t) - np.cos(t)
+
+        partials['dy_dt', 'y'] = partials['stiff_dy_dt', 'y'] + partials['nonstiff_dy_dt', 'y']
+        partials['dy_dt', 't'] = partials['stiff_dy_dt', 't'] + partials['nonstiff_dy_dt', 't']
+        partials['dy_dt', 'k'] = partials['stiff_dy_dt', 'k']
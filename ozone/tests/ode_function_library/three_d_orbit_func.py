@@ -12,6 +12,7 @@ class ThreeDOrbitFunction(ODEFunction):
         self.declare_state('r', 'r_dot', targets='r', shape=3)
         self.declare_state('v', 'v_dot', targets='v', shape=3)
         self.declare_state('m', 'm_dot', targets='m', shape=1)
+        self.declare_state_pair('r', 'v')
 
         self.declare_parameter('d', 'd', shape=1)
         self.declare_parameter('a', 'a', shape=1)
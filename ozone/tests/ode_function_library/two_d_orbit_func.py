@@ -10,6 +10,7 @@ class TwoDOrbitFunction(ODEFunction):
         self.set_system(TwoDOrbitSystem)
         self.declare_state('position', 'dpos_dt', targets='position', shape=2)
         self.declare_state('velocity', 'dvel_dt', targets='velocity', shape=2)
+        self.declare_state_pair('position', 'velocity')
         self.declare_time(targets='t')
 
     def get_test_parameters(self):
@@ -0,0 +1,159 @@
+import numpy as np
+
+
+class BlockBidiagonalSolver(object):
+    """
+    Solve the step recurrence of a GLM method for all time steps.
+
+    The system matrix is block lower-bidiagonal, with identity blocks on the diagonal and
+    -glm_V blocks below it, i.e., y[i] - glm_V y[i - 1] = rhs[i]. The arrays have shape
+    (num_times, num_step_vars,) + shape, where the trailing shape may contain any number of
+    nodes or right-hand sides; all of them are solved at once. No factorization is required,
+    and the work arrays are reused across calls.
+
+    The time steps are grouped into blocks of block_size steps. The recurrence is solved
+    within all blocks at once using precomputed powers of glm_V, so only the last step of
+    each block is propagated sequentially.
+    """
+
+    def __init__(self, glm_V, block_size=16):
+        """
+        Parameters
+        ----------
+        glm_V : ndarray[num_step_vars, num_step_vars]
+            The V matrix of the GLM method.
+        block_size : int
+            Number of time steps per block.
+        """
+        self.glm_V = glm_V
+        self.num_step_vars = glm_V.shape[0]
+        self.block_size = block_size
+
+        # Methods with a single step variable and V = 1 (e.g., all Runge-Kutta methods)
+        # reduce to cumulative sums.
+        self._is_cumsum = self.num_step_vars == 1 and glm_V[0, 0] == 1.
+
+        self._block_mtx = {
+            'N': self._get_block_mtx(glm_V),
+            'T': self._get_block_mtx(glm_V.T),
+        }
+
+        self._work = {}
+
+    def _get_block_mtx(self, mtx):
+        num_step_vars = self.num_step_vars
+        block_size = self.block_size
+
+        # powers[k] = mtx^k
+        powers = np.zeros((block_size + 1, num_step_vars, num_step_vars))
+        powers[0] = np.eye(num_step_vars)
+        for k in range(1, block_size + 1):
+            powers[k] = mtx.dot(powers[k - 1])
+
+        # Solution within a block from a zero initial value: y[k] = sum_{j <= k} mtx^(k - j) rhs[j]
+        local_mtx = np.zeros((block_size, num_step_vars, block_size, num_step_vars))
+        for k in range(block_size):
+            for j in range(k + 1):
+                local_mtx[k, :, j, :] = powers[k - j]
+
+        # Contribution of the last value of the previous block: y[k] += mtx^(k + 1) y_prev
+        coupling_mtx = powers[1:]
+
+        return (
+            local_mtx.reshape((block_size * num_step_vars, block_size * num_step_vars)),
+            coupling_mtx.reshape((block_size * num_step_vars, num_step_vars)),
+        )
+
+    def _get_work(self, num_times, size):
+        key = (num_times, size)
+        if key not in self._work:
+            num_step_vars = self.num_step_vars
+            block_size = self.block_size
+            num_blocks = -(-num_times // block_size)
+
+            self._work[key] = (
+                np.zeros((num_blocks, block_size * num_step_vars, size)),
+                np.zeros((num_blocks, block_size * num_step_vars, size)),
+                np.zeros((num_blocks - 1, (block_size - 1) * num_step_vars, size)),
+                np.zeros((num_step_vars, size)),
+            )
+        return self._work[key]
+
+    def multiply(self, vec, out):
+        """
+        Compute out = mtx * vec; vec and out must not overlap.
+
+        Parameters
+        ----------
+        vec : ndarray[num_times, num_step_vars, ...]
+            Input array.
+        out : ndarray[num_times, num_step_vars, ...]
+            Output array, overwritten.
+        """
+        glm_V = self.glm_V
+
+        num_times = vec.shape[0]
+        vec_2d = vec.reshape((num_times, self.num_step_vars, -1))
+        out_2d = out.reshape((num_times, self.num_step_vars, -1))
+
+        out_2d[:] = vec_2d
+        out_2d[1:] -= np.einsum('jk,ikl->ijl', glm_V, vec_2d[:-1])
+
+        if not np.may_share_memory(out_2d, out):
+            out[...] = out_2d.reshape(out.shape)
+
+    def solve(self, rhs, sol, mode='N'):
+        """
+        Solve mtx * sol = rhs if mode is 'N' or mtx^T * sol = rhs if mode is 'T'.
+
+        Parameters
+        ----------
+        rhs : ndarray[num_times, num_step_vars, ...]
+            Right-hand side array.
+        sol : ndarray[num_times, num_step_vars, ...]
+            Solution array, overwritten; it may be the same array as rhs.
+        mode : str
+            'N' for the forward recurrence or 'T' for the transposed (reverse) recurrence.
+        """
+        num_step_vars = self.num_step_vars
+
+        num_times = rhs.shape[0]
+        rhs_2d = rhs.reshape((num_times, num_step_vars, -1))
+        sol_2d = sol.reshape((num_times, num_step_vars, -1))
+        size = rhs_2d.shape[2]
+
+        # The transposed recurrence is the same recurrence with glm_V^T, run backward in time.
+        if mode == 'T':
+            rhs_2d = rhs_2d[::-1]
+            sol_2d = sol_2d[::-1]
+
+        if self._is_cumsum:
+            np.cumsum(rhs_2d, axis=0, out=sol_2d)
+        else:
+            local_mtx, coupling_mtx = self._block_mtx[mode]
+            blocks, block_sol, correction, work = self._get_work(num_times, size)
+
+            # The padding at the end of the last block stays zero.
+            blocks.reshape((-1, num_step_vars, size))[:num_times] = rhs_2d
+
+            np.matmul(local_mtx, blocks, out=block_sol)
+
+            # Propagate the last value of each block to the last value of the next one.
+            last_coupling_mtx = coupling_mtx[-num_step_vars:]
+            for i_block in range(1, block_sol.shape[0]):
+                np.dot(last_coupling_mtx, block_sol[i_block - 1, -num_step_vars:], out=work)
+                block_sol[i_block, -num_step_vars:] += work
+
+            # Add the contribution of the previous block to the remaining values.
+            if correction.shape[0] > 0:
+                np.matmul(coupling_mtx[:-num_step_vars], block_sol[:-1, -num_step_vars:],
+                    out=correction)
+                block_sol[1:, :-num_step_vars] += correction
+
+            sol_2d[:] = block_sol.reshape((-1, num_step_vars, size))[:num_times]
+
+        # The reshape copies if sol is not contiguous (e.g., a column of a multi-vector).
+        if not np.may_share_memory(sol_2d, sol):
+            if mode == 'T':
+                sol_2d = sol_2d[::-1]
+            sol[...] = sol_2d.reshape(sol.shape)
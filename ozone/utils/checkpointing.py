@@ -0,0 +1,91 @@
+from __future__ import division
+
+from scipy.special import comb
+
+
+def reverse_with_checkpoints(num_steps, num_checkpoints, y0, advance, reverse_step):
+    """
+    Run a reverse sweep over a marching process using binomial (revolve-style) checkpointing.
+
+    At most num_checkpoints states, including y0, are held in memory at any time; the states
+    between checkpoints are recomputed by calling advance again. The checkpoints are placed
+    with Griewank's binomial rule, so the number of recomputed steps stays close to the
+    minimum for the given number of checkpoints.
+
+    Parameters
+    ----------
+    num_steps : int
+        Number of steps in the marching process.
+    num_checkpoints : int
+        Maximum number of states held in memory; must be at least 1.
+    y0 : object
+        State at the start of the first step.
+    advance : callable
+        advance(i_step, y) returns the state after step i_step, given the state before it.
+    reverse_step : callable
+        reverse_step(i_step, y) performs the reverse (adjoint) operation of step i_step,
+        given the state before it. It is called for i_step = num_steps - 1, ..., 0.
+
+    Returns
+    -------
+    int
+        Number of calls to advance.
+    """
+    if num_checkpoints < 1:
+        raise ValueError('num_checkpoints must be at least 1')
+
+    counter = [0]
+
+    def _advance(i_step, y):
+        counter[0] += 1
+        return advance(i_step, y)
+
+    _reverse(0, num_steps, y0, num_checkpoints - 1, _advance, reverse_step)
+
+    return counter[0]
+
+
+def _reverse(start, end, y_start, num_free, advance, reverse_step):
+    # Reverse steps start, ..., end - 1 given the checkpointed state at start
+    # and num_free unused checkpoint slots.
+    while end - start > 0:
+        num = end - start
+
+        if num == 1:
+            reverse_step(start, y_start)
+            return
+
+        if num_free == 0:
+            y = y_start
+            for i_step in range(start, end - 1):
+                y = advance(i_step, y)
+            reverse_step(end - 1, y)
+            end -= 1
+            continue
+
+        offset = _get_split(num, num_free)
+
+        y = y_start
+        for i_step in range(start, start + offset):
+            y = advance(i_step, y)
+
+        _reverse(start + offset, end, y, num_free - 1, advance, reverse_step)
+        end = start + offset
+
+
+def _get_split(num, num_free):
+    # With c checkpoints (including the one at the start) and r repetitions, at most
+    # beta(c, r) = (c + r)! / (c! r!) steps can be reversed. We find the smallest r that
+    # suffices and place the next checkpoint so that the steps after it can be reversed
+    # with c - 1 checkpoints and r repetitions.
+    num_slots = num_free + 1
+
+    num_reps = 0
+    while _beta(num_slots, num_reps) < num:
+        num_reps += 1
+
+    return max(1, num - _beta(num_slots - 1, num_reps))
+
+
+def _beta(num_free, num_reps):
+    return int(comb(num_free + num_reps, num_free, exact=True))
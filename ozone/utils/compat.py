@@ -0,0 +1,170 @@
+"""
+Accesses to OpenMDAO internals and version-dependent SciPy calls.
+
+OpenMDAO has no public API for the connections and metadata of a group, the printing state of
+its solvers, or the matrix of an assembled Jacobian, so ozone reads them here and nowhere else.
+They are those of OpenMDAO 2.3, the version ozone is developed with; importing this module warns
+if another major version is installed, and supporting it only requires changes in this module.
+"""
+import re
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import scipy
+import scipy.sparse
+import scipy.sparse.linalg
+import openmdao
+from openmdao.solvers.solver import Solver
+
+
+def _get_version(version_string):
+    # The (major, minor) version numbers of a version string such as '2.3.0' or '1.12.0rc1'.
+    return tuple(int(number) for number in re.findall(r'\d+', version_string)[:2])
+
+
+OPENMDAO_VERSION = _get_version(openmdao.__version__)
+SCIPY_VERSION = _get_version(scipy.__version__)
+
+if OPENMDAO_VERSION[0] != 2:
+    warnings.warn('ozone uses internals of OpenMDAO 2.x, but OpenMDAO %s is installed'
+        % openmdao.__version__)
+
+
+def get_connections(group):
+    """
+    Return the connections of a group that has been set up.
+
+    Parameters
+    ----------
+    group : Group
+        The group.
+
+    Returns
+    -------
+    dict
+        The absolute name of the source of each connected input, keyed by its absolute name.
+    """
+    return group._conn_global_abs_in2out
+
+
+def get_variable_metadata(group, abs_name):
+    """
+    Return the metadata of a variable of a group that has been set up.
+
+    Parameters
+    ----------
+    group : Group
+        The group.
+    abs_name : str
+        The absolute name of the variable.
+
+    Returns
+    -------
+    dict
+        The metadata, which includes 'units', 'shape', and, for an input, 'src_indices'.
+    """
+    return group._var_abs2meta[abs_name]
+
+
+@contextmanager
+def subsolver_printing(solver):
+    """
+    Indent the iteration printing of the solvers called within, as those of a subsolver.
+
+    Parameters
+    ----------
+    solver : Solver
+        The solver that calls the subsolvers, during a solve.
+    """
+    solver._solver_info.append_subsolver()
+    try:
+        yield
+    finally:
+        solver._solver_info.pop()
+
+
+@contextmanager
+def preserved_solver_printing():
+    """
+    Restore the printing state of the solvers after running another problem within.
+
+    The solvers of all problems share one printing state, which run_model clears.
+    """
+    solver_info = Solver._solver_info
+    prefix, stack = solver_info.save_cache()
+    stack = list(stack)
+
+    try:
+        yield
+    finally:
+        solver_info.restore_cache((prefix, stack))
+
+
+def get_assembled_matrix(solver):
+    """
+    Linearize the system of a Newton solver and return its assembled Jacobian.
+
+    Parameters
+    ----------
+    solver : NewtonSolver
+        The solver, whose linear solver has an assembled Jacobian.
+
+    Returns
+    -------
+    ndarray or csc_matrix
+        The Jacobian, dense or sparse as the assembled Jacobian, whose rows and columns are
+        ordered as the residual and output vectors.
+    """
+    system = solver._system
+    assembled_jac = solver.linear_solver._assembled_jac
+
+    assert assembled_jac is not None, 'The group must have an assembled Jacobian'
+
+    system._linearize(assembled_jac, sub_do_ln=False)
+    if system.linear_solver._assembled_jac is not assembled_jac:
+        assembled_jac._update(system)
+
+    matrix = assembled_jac._int_mtx._matrix
+    assert isinstance(matrix, np.ndarray) or scipy.sparse.isspmatrix_csc(matrix), \
+        'The assembled Jacobian must be dense or csc'
+
+    return matrix
+
+
+def gmres(A, b, rtol, atol, callback=None, **kwargs):
+    """
+    Solve a linear system with SciPy's GMRES and explicit tolerances.
+
+    The iteration stops when the residual norm is at most max(rtol * norm(b), atol). SciPy
+    renamed the relative tolerance from tol to rtol in version 1.12.
+
+    Parameters
+    ----------
+    A : LinearOperator
+        The matrix of the system.
+    b : ndarray
+        The right-hand side.
+    rtol : float
+        The relative tolerance.
+    atol : float
+        The absolute tolerance.
+    callback : callable or None
+        If given, called with the preconditioned residual norm after each inner iteration.
+    **kwargs : dict
+        The other arguments of scipy.sparse.linalg.gmres, such as M, restart, and maxiter.
+
+    Returns
+    -------
+    ndarray
+        The solution.
+    int
+        0 if the iteration converged, as returned by scipy.sparse.linalg.gmres.
+    """
+    kwargs['rtol' if SCIPY_VERSION >= (1, 12) else 'tol'] = rtol
+
+    if callback is not None:
+        kwargs['callback'] = callback
+        kwargs['callback_type'] = 'pr_norm'
+
+    return scipy.sparse.linalg.gmres(A, b, atol=atol, **kwargs)
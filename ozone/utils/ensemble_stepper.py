@@ -0,0 +1,173 @@
+import numpy as np
+from six import iteritems
+
+from ozone.ode_function import EnsembleODEFunction
+from ozone.utils.ode_evaluator import ODEEvaluator
+from ozone.utils.glm_stepper import GLMStepper
+from ozone.utils.partitioned_stepper import PartitionedStepper
+
+
+def get_stepper(ode_function, stepper_class, *args, **kwargs):
+    """
+    Instantiate a stepper, or an EnsembleStepper if the ODE function is an ensemble.
+
+    Parameters
+    ----------
+    ode_function : ODEFunction
+        The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+    stepper_class : type
+        GLMStepper, RosenbrockStepper, IMEXStepper, ExponentialStepper, or PartitionedStepper.
+    *args : list
+        The arguments of the stepper class after the ODE function.
+    **kwargs : dict
+        The keyword arguments of the stepper class.
+
+    Returns
+    -------
+    object
+        The stepper.
+    """
+    if not isinstance(ode_function, EnsembleODEFunction):
+        return stepper_class(ode_function, *args, **kwargs)
+
+    member_stepper = stepper_class(ode_function.ode_function, *args, **kwargs)
+
+    # The explicit steps solve no linear systems, so the members are stepped in lock-step.
+    if isinstance(member_stepper, PartitionedStepper) \
+            or isinstance(member_stepper, GLMStepper) and member_stepper.explicit:
+        ensemble_stepper = stepper_class(ode_function, *args, **kwargs)
+    else:
+        ensemble_stepper = None
+
+    return EnsembleStepper(ode_function, member_stepper, ensemble_stepper)
+
+
+class EnsembleStepper(object):
+    """
+    Take single steps of an ensemble with the stepper of its members, on packed NumPy arrays.
+
+    The arrays are packed as in the ODEEvaluator of the EnsembleODEFunction, whose states and
+    parameters hold the members along their first axis. The ODE Jacobian of the ensemble is
+    block-diagonal over the members, so the steps are linearized and their stage systems are
+    solved member by member, by the stepper of the member ODE function on the arrays of each
+    member, gathered with index arrays: the factorizations have the size n of a member instead
+    of num_members * n, and the linearizations are those of the members, stacked along a leading
+    member axis. The steps of explicit methods solve no linear systems, so if ensemble_stepper
+    is given, it computes the steps of all the members at once, with the ODE evaluated for all
+    the members in lock-step. The interface is that of GLMStepper.
+    """
+
+    def __init__(self, ode_function, member_stepper, ensemble_stepper=None):
+        """
+        Parameters
+        ----------
+        ode_function : EnsembleODEFunction
+            The ODE function of the ensemble.
+        member_stepper : object
+            The stepper of the member ODE function.
+        ensemble_stepper : object or None
+            The stepper of the ensemble ODE function, of the same class, which computes the
+            steps; if None, they are computed member by member.
+        """
+        self.member_stepper = member_stepper
+        self.ensemble_stepper = ensemble_stepper
+        self.num_members = ode_function.num_members
+
+        self.num_stages = member_stepper.num_stages
+        self.num_step_vars = member_stepper.num_step_vars
+
+        if ensemble_stepper is not None:
+            self.ode_step = ensemble_stepper.ode_step
+        else:
+            self.ode_step = ODEEvaluator(ode_function, 1)
+
+        self.state_indices = _get_member_indices(self.ode_step.state_slices, self.num_members)
+        self.static_indices = _get_member_indices(self.ode_step.static_slices, self.num_members)
+        self.dynamic_indices = _get_member_indices(
+            self.ode_step.dynamic_slices, self.num_members)
+
+    def _get_members(self):
+        # The indices of the states, static parameters, and dynamic parameters of each member.
+        return enumerate(zip(self.state_indices, self.static_indices, self.dynamic_indices))
+
+    def compute_step(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Compute the stage values and derivatives of one step in place; return the new step.
+        if self.ensemble_stepper is not None:
+            return self.ensemble_stepper.compute_step(
+                y_old, h, stage_times, static, dynamic, Y, F)
+
+        y_new = np.zeros(y_old.shape)
+        for i_member, (state_indices, static_indices, dynamic_indices) in self._get_members():
+            Y_member = Y[:, state_indices]
+            F_member = F[:, state_indices]
+
+            y_new[:, state_indices] = self.member_stepper.compute_step(
+                y_old[:, state_indices], h, stage_times, static[static_indices],
+                dynamic[:, dynamic_indices], Y_member, F_member)
+
+            Y[:, state_indices] = Y_member
+            F[:, state_indices] = F_member
+
+        return y_new
+
+    def linearize_step(self, Y, h, stage_times, static, dynamic):
+        # The linearizations of the members, stacked along a leading member axis.
+        member_jacobians = [
+            self.member_stepper.linearize_step(Y[:, state_indices], h, stage_times,
+                static[static_indices], dynamic[:, dynamic_indices])
+            for i_member, (state_indices, static_indices, dynamic_indices)
+            in self._get_members()]
+
+        return dict([
+            (key, np.array([jacobians[key] for jacobians in member_jacobians]))
+            for key in member_jacobians[0]])
+
+    def tangent_step(self, d_y_old, h, d_h, F, jacobians, d_stage_times, d_static, d_dynamic):
+        # Linearization of one step; returns the perturbation of the new step vector.
+        d_y_new = np.zeros(d_y_old.shape)
+        for i_member, (state_indices, static_indices, dynamic_indices) in self._get_members():
+            d_y_new[:, state_indices] = self.member_stepper.tangent_step(
+                d_y_old[:, state_indices], h, d_h, F[:, state_indices],
+                _get_member_jacobians(jacobians, i_member), d_stage_times,
+                d_static[static_indices], d_dynamic[:, dynamic_indices])
+
+        return d_y_new
+
+    def adjoint_step(self, b_y_new, h, F, jacobians):
+        # Transpose of tangent_step; returns the adjoints of the step's inputs.
+        b_y_old = np.zeros(b_y_new.shape)
+        b_h = 0.
+        b_stage_times = np.zeros(self.num_stages)
+        b_static = np.zeros(self.ode_step.static_size)
+        b_dynamic = np.zeros((self.num_stages, self.ode_step.dynamic_size))
+
+        # The members share the step size and the stage times, so their adjoints add.
+        for i_member, (state_indices, static_indices, dynamic_indices) in self._get_members():
+            b_y, b_h_member, b_t, b_s, b_d = self.member_stepper.adjoint_step(
+                b_y_new[:, state_indices], h, F[:, state_indices],
+                _get_member_jacobians(jacobians, i_member))
+
+            b_y_old[:, state_indices] = b_y
+            b_h += b_h_member
+            b_stage_times += b_t
+            b_static[static_indices] = b_s
+            b_dynamic[:, dynamic_indices] = b_d
+
+        return b_y_old, b_h, b_stage_times, b_static, b_dynamic
+
+
+def _get_member_jacobians(jacobians, i_member):
+    return dict([(key, jacobian[i_member]) for key, jacobian in iteritems(jacobians)])
+
+
+def _get_member_indices(slices, num_members):
+    # The indices of each member's values in the packed arrays of the ensemble, in the order of
+    # the packed arrays of a member; each variable holds the members along its first axis.
+    indices = [
+        np.arange(var_slice.start, var_slice.stop).reshape((num_members, -1))
+        for var_slice in sorted(slices.values(), key=lambda var_slice: var_slice.start)]
+
+    if not indices:
+        return np.zeros((num_members, 0), int)
+
+    return np.hstack(indices)
@@ -0,0 +1,222 @@
+from collections import OrderedDict
+
+import numpy as np
+import scipy.linalg
+
+from ozone.utils.ode_evaluator import ODEEvaluator
+
+
+class ExponentialStepper(object):
+    """
+    Take single steps of an exponential Runge--Kutta method, and their linearizations.
+
+    The ODE system computes the full derivative f, and the non-linear part N = f - L y is
+    integrated explicitly. The coefficients of a step only depend on h L, so they are cached
+    for the max_cached_steps most recent distinct step sizes; with a uniform grid, the phi
+    functions are computed once per step size. The phi functions of all orders at one abscissa
+    are read off a single matrix exponential of an augmented matrix (Saad, 1992), which does not
+    require L to be invertible. The interface is that of GLMStepper.
+    """
+
+    def __init__(self, ode_function, method, max_cached_steps=32):
+        """
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+        method : ExponentialRungeKutta
+            The exponential Runge--Kutta method.
+        max_cached_steps : int
+            Maximum number of step sizes for which the coefficients are cached.
+        """
+        assert ode_function._linear_operator is not None, \
+            'Exponential methods require a linear operator set on the ODEFunction'
+
+        self.linear_operator = ode_function._linear_operator
+        self.abscissa = np.atleast_1d(method.abscissa)
+        self.A_terms = method.A_terms
+        self.B_terms = method.B_terms
+        self.max_cached_steps = max_cached_steps
+
+        self.num_stages = len(self.abscissa)
+        self.num_step_vars = 1
+
+        self.ode_step = ODEEvaluator(ode_function, 1)
+        self.ode_stages = ODEEvaluator(ode_function, self.num_stages)
+
+        n = self.ode_step.state_size
+        assert self.linear_operator.shape == (n, n), \
+            'The linear operator must have shape (%i, %i)' % (n, n)
+
+        # The phi functions needed at each abscissa, up to the highest order.
+        self.max_orders = {1.: 0}
+        for c in self.abscissa:
+            self.max_orders[c] = max(self.max_orders.get(c, 0), 0)
+        for terms in list(self.A_terms.values()) + list(self.B_terms.values()):
+            for coefficient, k, c in terms:
+                self.max_orders[c] = max(self.max_orders.get(c, 0), k)
+
+        self._cache = OrderedDict()
+
+    def get_coefficients(self, h):
+        """
+        Return the coefficients of a step of size h and their derivatives with respect to h.
+
+        Parameters
+        ----------
+        h : float
+            The step size.
+
+        Returns
+        -------
+        dict
+            'E' : ndarray[num_stages + 1, n, n] of exp(c_i h L), and exp(h L) last;
+            'A' : ndarray[num_stages, num_stages, n, n] of a_ij(h L);
+            'B' : ndarray[num_stages, n, n] of b_i(h L);
+            and their derivatives with respect to h, 'd_E', 'd_A', and 'd_B'.
+        """
+        if h in self._cache:
+            return self._cache[h]
+
+        L = self.linear_operator
+        n = L.shape[0]
+        num_stages = self.num_stages
+
+        phi = {}
+        d_phi = {}
+        for c, max_order in self.max_orders.items():
+            # exp([[Z, I, 0, ...], [0, 0, I, ...], ...]) has phi_k(Z) in its first block row.
+            size = n * (max_order + 1)
+            augmented = np.zeros((size, size))
+            augmented[:n, :n] = c * h * L
+            augmented[np.arange(size - n), np.arange(n, size)] = 1.
+            exponential = scipy.linalg.expm(augmented)[:n]
+
+            for k in range(max_order + 1):
+                phi[k, c] = exponential[:, k * n:(k + 1) * n]
+
+            # d/dh phi_k(c h L) = c L phi_0(c h L) for k = 0, and otherwise follows from
+            # z phi_k'(z) = phi_k-1(z) - k phi_k(z), since all the matrices commute.
+            d_phi[0, c] = c * L.dot(phi[0, c])
+            for k in range(1, max_order + 1):
+                d_phi[k, c] = (phi[k - 1, c] - k * phi[k, c]) / h
+
+        def evaluate(terms, values):
+            return sum((coefficient * values[k, c] for coefficient, k, c in terms),
+                np.zeros((n, n)))
+
+        coefficients = {
+            'E': np.array([phi[0, c] for c in self.abscissa] + [phi[0, 1.]]),
+            'd_E': np.array([d_phi[0, c] for c in self.abscissa] + [d_phi[0, 1.]]),
+            'A': np.zeros((num_stages, num_stages, n, n)),
+            'd_A': np.zeros((num_stages, num_stages, n, n)),
+            'B': np.zeros((num_stages, n, n)),
+            'd_B': np.zeros((num_stages, n, n)),
+        }
+        for (i, j), terms in self.A_terms.items():
+            coefficients['A'][i, j] = evaluate(terms, phi)
+            coefficients['d_A'][i, j] = evaluate(terms, d_phi)
+        for i, terms in self.B_terms.items():
+            coefficients['B'][i] = evaluate(terms, phi)
+            coefficients['d_B'][i] = evaluate(terms, d_phi)
+
+        self._cache[h] = coefficients
+        if len(self._cache) > self.max_cached_steps:
+            self._cache.popitem(last=False)
+
+        return coefficients
+
+    def compute_step(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Compute the stage values and derivatives of one step in place; return the new step vector.
+        L = self.linear_operator
+        coefficients = self.get_coefficients(h)
+        E = coefficients['E']
+        A = coefficients['A']
+        B = coefficients['B']
+
+        evaluator = self.ode_step
+
+        N = np.zeros(F.shape)
+        for i_stage in range(self.num_stages):
+            Y[i_stage] = E[i_stage].dot(y_old[0]) \
+                + h * np.einsum('jab,jb->a', A[i_stage, :i_stage], N[:i_stage])
+
+            evaluator.set_inputs(Y[i_stage:i_stage + 1],
+                t=stage_times[i_stage:i_stage + 1], static=static,
+                dynamic=dynamic[i_stage:i_stage + 1])
+            F[i_stage] = evaluator.compute()[0]
+            N[i_stage] = F[i_stage] - L.dot(Y[i_stage])
+
+        return (E[-1].dot(y_old[0]) + h * np.einsum('jab,jb->a', B, N))[None, :]
+
+    def linearize_step(self, Y, h, stage_times, static, dynamic):
+        evaluator = self.ode_stages
+        evaluator.set_inputs(Y, t=stage_times, static=static, dynamic=dynamic)
+        F = evaluator.compute()
+
+        # The first stage value is the old step vector, since c_0 = 0.
+        jacobians = evaluator.compute_jacobians()
+        jacobians['nonlinear_rates'] = F - Y.dot(self.linear_operator.T)
+        jacobians['y_old'] = Y[0]
+
+        return jacobians
+
+    def tangent_step(self, d_y_old, h, d_h, F, jacobians, d_stage_times, d_static, d_dynamic):
+        # Linearization of one step; returns the perturbation of the new step vector.
+        L = self.linear_operator
+        coefficients = self.get_coefficients(h)
+        E, d_E = coefficients['E'], coefficients['d_E']
+        A, d_A = coefficients['A'], coefficients['d_A']
+        B, d_B = coefficients['B'], coefficients['d_B']
+
+        N = jacobians['nonlinear_rates']
+        y_old = jacobians['y_old']
+        jac_N = jacobians['y'] - L
+
+        # Perturbation of the stage derivatives due to everything but the stage values.
+        d_N = jacobians['t'] * d_stage_times[:, None] \
+            + np.einsum('jab,b->ja', jacobians['static'], d_static) \
+            + np.einsum('jab,jb->ja', jacobians['dynamic'], d_dynamic)
+
+        for i_stage in range(self.num_stages):
+            d_Y = E[i_stage].dot(d_y_old[0]) + d_h * d_E[i_stage].dot(y_old) \
+                + h * np.einsum('jab,jb->a', A[i_stage, :i_stage], d_N[:i_stage]) \
+                + d_h * np.einsum('jab,jb->a',
+                    A[i_stage, :i_stage] + h * d_A[i_stage, :i_stage], N[:i_stage])
+            d_N[i_stage] += jac_N[i_stage].dot(d_Y)
+
+        d_y_new = E[-1].dot(d_y_old[0]) + d_h * d_E[-1].dot(y_old) \
+            + h * np.einsum('jab,jb->a', B, d_N) + d_h * np.einsum('jab,jb->a', B + h * d_B, N)
+
+        return d_y_new[None, :]
+
+    def adjoint_step(self, b_y_new, h, F, jacobians):
+        # Transpose of tangent_step; returns the adjoints of the step's inputs.
+        L = self.linear_operator
+        coefficients = self.get_coefficients(h)
+        E, d_E = coefficients['E'], coefficients['d_E']
+        A, d_A = coefficients['A'], coefficients['d_A']
+        B, d_B = coefficients['B'], coefficients['d_B']
+
+        N = jacobians['nonlinear_rates']
+        y_old = jacobians['y_old']
+        jac_N = jacobians['y'] - L
+
+        b_y = b_y_new[0]
+        b_y_old = E[-1].T.dot(b_y)
+        b_h = b_y.dot(d_E[-1].dot(y_old) + np.einsum('jab,jb->a', B + h * d_B, N))
+        b_N = h * np.einsum('jab,a->jb', B, b_y)
+
+        for i_stage in range(self.num_stages - 1, -1, -1):
+            b_Y = jac_N[i_stage].T.dot(b_N[i_stage])
+
+            b_y_old += E[i_stage].T.dot(b_Y)
+            b_h += b_Y.dot(d_E[i_stage].dot(y_old) + np.einsum('jab,jb->a',
+                A[i_stage, :i_stage] + h * d_A[i_stage, :i_stage], N[:i_stage]))
+            b_N[:i_stage] += h * np.einsum('jab,a->jb', A[i_stage, :i_stage], b_Y)
+
+        b_stage_times = np.einsum('ja,ja->j', jacobians['t'], b_N)
+        b_static = np.einsum('jab,ja->b', jacobians['static'], b_N)
+        b_dynamic = np.einsum('jab,ja->jb', jacobians['dynamic'], b_N)
+
+        return b_y_old[None, :], b_h, b_stage_times, b_static, b_dynamic
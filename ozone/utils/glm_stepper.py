@@ -0,0 +1,259 @@
+import numpy as np
+import scipy.linalg
+
+from ozone.utils.ode_evaluator import ODEEvaluator
+
+
+class GLMStepper(object):
+    """
+    Take single steps of a GLM method, and their linearizations, on packed NumPy arrays.
+
+    The ODE is evaluated through ODEEvaluators with one node (explicit stages) and with
+    num_stages nodes (implicit stages and linearizations). For implicit methods, the stage
+    equations are solved with Newton's method. The arrays are packed as in ODEEvaluator:
+    y_old has shape (num_step_vars, n), and Y and F have shape (num_stages, n).
+
+    With the 'kronecker' stage solver, the stage equations are solved with a simplified Newton
+    iteration on I - h (A x J), where J is the stage Jacobian averaged over the stages.
+    Diagonalizing A = T diag(lambda) T^-1 once decouples this matrix into the n x n blocks
+    I - h lambda_k J, and only one block is factorized for each real eigenvalue or
+    complex-conjugate pair. The derivative sweeps still solve with the exact stage Jacobians.
+    """
+
+    def __init__(self, ode_function, glm_A, glm_U, glm_B, glm_V, explicit=True,
+            newton_atol=1e-12, newton_maxiter=100, stage_solver='dense'):
+        """
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+        glm_A, glm_U, glm_B, glm_V : ndarray
+            The matrices of the GLM method.
+        explicit : bool
+            Whether the stages are computed sequentially (glm_A strictly lower triangular).
+        newton_atol : float
+            Absolute tolerance on the stage residual for implicit methods.
+        newton_maxiter : int
+            Maximum number of Newton iterations per step for implicit methods.
+        stage_solver : str
+            'dense' for Newton's method on the full stage system, or 'kronecker' for the
+            simplified Newton iteration on the diagonalized stage system.
+        """
+        assert stage_solver in ['dense', 'kronecker'], \
+            'stage_solver must be \'dense\' or \'kronecker\''
+
+        self.glm_A = glm_A
+        self.glm_U = glm_U
+        self.glm_B = glm_B
+        self.glm_V = glm_V
+        self.explicit = explicit
+        self.newton_atol = newton_atol
+        self.newton_maxiter = newton_maxiter
+        self.stage_solver = stage_solver
+
+        self.num_stages = glm_A.shape[0]
+        self.num_step_vars = glm_V.shape[0]
+
+        self.ode_step = ODEEvaluator(ode_function, 1)
+        self.ode_stages = ODEEvaluator(ode_function, self.num_stages)
+
+        if stage_solver == 'kronecker' and not explicit:
+            self._setup_kronecker()
+
+    def _setup_kronecker(self):
+        eigenvalues, T = np.linalg.eig(self.glm_A)
+
+        assert np.linalg.cond(T) < 1e8, \
+            'The kronecker stage solver requires a diagonalizable glm_A'
+
+        # Real eigenvalues are stored as real numbers so their blocks are factorized in real
+        # arithmetic. The second eigenvalue of each conjugate pair reuses the first's block.
+        tol = 1e-12 * max(1., np.max(np.abs(eigenvalues)))
+        partners = -np.ones(self.num_stages, int)
+        for i_stage in range(self.num_stages):
+            if np.abs(eigenvalues[i_stage].imag) <= tol or partners[i_stage] >= 0:
+                continue
+            for j_stage in range(i_stage + 1, self.num_stages):
+                if partners[j_stage] < 0 \
+                        and np.abs(eigenvalues[j_stage] - np.conj(eigenvalues[i_stage])) <= tol:
+                    partners[i_stage] = j_stage
+                    partners[j_stage] = i_stage
+                    break
+
+        self.kronecker_eigenvalues = [
+            eigenvalue.real if np.abs(eigenvalue.imag) <= tol else eigenvalue
+            for eigenvalue in eigenvalues]
+        self.kronecker_partners = partners
+        self.kronecker_T = T
+        self.kronecker_T_inv = np.linalg.inv(T)
+
+    def compute_step(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Compute the stage values and derivatives of one step in place; return the new step vector.
+        num_stages = self.num_stages
+        glm_A = self.glm_A
+        glm_U = self.glm_U
+        glm_B = self.glm_B
+        glm_V = self.glm_V
+
+        if self.explicit:
+            evaluator = self.ode_step
+
+            for i_stage in range(num_stages):
+                Y[i_stage] = glm_U[i_stage].dot(y_old) \
+                    + h * glm_A[i_stage, :i_stage].dot(F[:i_stage])
+
+                evaluator.set_inputs(Y[i_stage:i_stage + 1],
+                    t=stage_times[i_stage:i_stage + 1], static=static,
+                    dynamic=dynamic[i_stage:i_stage + 1])
+                F[i_stage] = evaluator.compute()[0]
+        else:
+            self.solve_stages(y_old, h, stage_times, static, dynamic, Y, F)
+
+        return glm_V.dot(y_old) + h * glm_B.dot(F)
+
+    def solve_stages(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Newton's method on the stage equations, R(Y) = Y - h A F(Y) - U y_old = 0.
+        glm_A = self.glm_A
+        glm_U = self.glm_U
+        newton_atol = self.newton_atol
+        newton_maxiter = self.newton_maxiter
+        kronecker = self.stage_solver == 'kronecker'
+
+        evaluator = self.ode_stages
+
+        Y_fixed = glm_U.dot(y_old)
+
+        Y[:] = Y_fixed
+        factors = None
+        norm_old = None
+        for iteration in range(newton_maxiter + 1):
+            evaluator.set_inputs(Y, t=stage_times, static=static, dynamic=dynamic)
+            F[:] = evaluator.compute()
+
+            residual = Y - h * glm_A.dot(F) - Y_fixed
+            norm = np.linalg.norm(residual)
+            if norm < newton_atol or iteration == newton_maxiter:
+                break
+
+            if kronecker:
+                # The factorization is refreshed when the simplified iteration converges slowly.
+                if factors is None or norm > 0.5 * norm_old:
+                    jac_y = evaluator.compute_jacobians()['y']
+                    factors = self.factorize_kronecker(h, np.mean(jac_y, axis=0))
+                Y -= self.solve_kronecker(factors, residual)
+            else:
+                jac_y = evaluator.compute_jacobians()['y']
+                Y -= self.solve_stage_system(h, jac_y, residual, 'N')
+
+            norm_old = norm
+
+    def factorize_kronecker(self, h, jac):
+        # LU factorizations of I - h lambda_k J, one per real eigenvalue or conjugate pair.
+        n = jac.shape[0]
+
+        factors = []
+        for i_stage, eigenvalue in enumerate(self.kronecker_eigenvalues):
+            partner = self.kronecker_partners[i_stage]
+            if 0 <= partner < i_stage:
+                factors.append(None)
+            else:
+                factors.append(scipy.linalg.lu_factor(np.eye(n) - h * eigenvalue * jac))
+
+        return factors
+
+    def solve_kronecker(self, factors, rhs):
+        # Solve (I - h (A x J)) x = rhs in the eigenbasis of A, where J is the frozen Jacobian.
+        partners = self.kronecker_partners
+
+        rhs = self.kronecker_T_inv.dot(rhs)
+        solution = np.zeros(rhs.shape, complex)
+        for i_stage in range(self.num_stages):
+            if factors[i_stage] is not None:
+                solution[i_stage] = scipy.linalg.lu_solve(factors[i_stage], rhs[i_stage])
+            else:
+                # The block of a conjugate eigenvalue is the conjugate of its partner's block.
+                solution[i_stage] = np.conj(scipy.linalg.lu_solve(
+                    factors[partners[i_stage]], np.conj(rhs[i_stage])))
+
+        return self.kronecker_T.dot(solution).real
+
+    def solve_stage_system(self, h, jac_y, rhs, mode):
+        # Solve (I - h (A x I) J) x = rhs if mode is 'N', where J is the block-diagonal
+        # stage Jacobian, or the adjoint system (I - h (A^T x I) J^T) x = rhs if mode is 'T'.
+        glm_A = self.glm_A
+        num_stages, n = rhs.shape
+
+        if mode == 'N':
+            mtx = -h * np.einsum('jk,kab->jakb', glm_A, jac_y)
+        else:
+            mtx = -h * np.einsum('kj,kba->jakb', glm_A, jac_y)
+        mtx = mtx.reshape((num_stages * n, num_stages * n))
+        mtx[np.diag_indices(num_stages * n)] += 1.
+
+        return np.linalg.solve(mtx, rhs.flatten()).reshape((num_stages, n))
+
+    def linearize_step(self, Y, h, stage_times, static, dynamic):
+        evaluator = self.ode_stages
+        evaluator.set_inputs(Y, t=stage_times, static=static, dynamic=dynamic)
+        return evaluator.compute_jacobians()
+
+    def tangent_step(self, d_y_old, h, d_h, F, jacobians, d_stage_times, d_static, d_dynamic):
+        # Linearization of one step; returns the perturbation of the new step vector.
+        num_stages = self.num_stages
+        glm_A = self.glm_A
+        glm_U = self.glm_U
+        glm_B = self.glm_B
+        glm_V = self.glm_V
+
+        jac_y = jacobians['y']
+
+        # Perturbation of F due to everything but the stage values.
+        d_F_fixed = jacobians['t'] * d_stage_times[:, None] \
+            + np.einsum('jab,b->ja', jacobians['static'], d_static) \
+            + np.einsum('jab,jb->ja', jacobians['dynamic'], d_dynamic)
+
+        if self.explicit:
+            d_F = np.zeros(F.shape)
+            for i_stage in range(num_stages):
+                d_Y = glm_U[i_stage].dot(d_y_old) \
+                    + d_h * glm_A[i_stage, :i_stage].dot(F[:i_stage]) \
+                    + h * glm_A[i_stage, :i_stage].dot(d_F[:i_stage])
+                d_F[i_stage] = jac_y[i_stage].dot(d_Y) + d_F_fixed[i_stage]
+        else:
+            rhs = glm_U.dot(d_y_old) + glm_A.dot(d_h * F + h * d_F_fixed)
+            d_Y = self.solve_stage_system(h, jac_y, rhs, 'N')
+            d_F = np.einsum('jab,jb->ja', jac_y, d_Y) + d_F_fixed
+
+        return glm_V.dot(d_y_old) + d_h * glm_B.dot(F) + h * glm_B.dot(d_F)
+
+    def adjoint_step(self, b_y_new, h, F, jacobians):
+        # Transpose of _tangent_step; returns the adjoints of the step's inputs.
+        num_stages = self.num_stages
+        glm_A = self.glm_A
+        glm_U = self.glm_U
+        glm_B = self.glm_B
+        glm_V = self.glm_V
+
+        jac_y = jacobians['y']
+
+        b_h = np.sum(glm_B.dot(F) * b_y_new)
+        b_F = h * glm_B.T.dot(b_y_new)
+        b_y_old = glm_V.T.dot(b_y_new)
+
+        if self.explicit:
+            b_Y = np.zeros(F.shape)
+            for i_stage in range(num_stages - 1, -1, -1):
+                b_Y[i_stage] = jac_y[i_stage].T.dot(b_F[i_stage])
+                b_F[:i_stage] += h * np.outer(glm_A[i_stage, :i_stage], b_Y[i_stage])
+        else:
+            b_F = self.solve_stage_system(h, jac_y, b_F, 'T')
+            b_Y = np.einsum('jba,jb->ja', jac_y, b_F)
+
+        b_y_old += glm_U.T.dot(b_Y)
+        b_h += np.sum(glm_A.dot(F) * b_Y)
+
+        b_stage_times = np.einsum('ja,ja->j', jacobians['t'], b_F)
+        b_static = np.einsum('jab,ja->b', jacobians['static'], b_F)
+        b_dynamic = np.einsum('jab,ja->jb', jacobians['dynamic'], b_F)
+
+        return b_y_old, b_h, b_stage_times, b_static, b_dynamic
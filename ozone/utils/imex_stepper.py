@@ -0,0 +1,197 @@
+import numpy as np
+import scipy.linalg
+
+from ozone.utils.ode_evaluator import ODEEvaluator
+
+
+class IMEXStepper(object):
+    """
+    Take single steps of an IMEX additive Runge--Kutta method, and their linearizations.
+
+    The ODE is evaluated through ODEEvaluators in split mode, which return the non-stiff part
+    N and the stiff part S of the derivatives separately. The stages
+
+        Y_i = y_n + h sum_j<i a^E_ij N_j + h sum_j<=i a^I_ij S_j
+
+    are computed sequentially; for the implicit stages, only the stiff part enters the nonlinear
+    system, which is solved with a simplified Newton iteration on I - h a^I_ii J_S. The matrix
+    is factorized once per step and refreshed when the iteration converges slowly or the
+    diagonal coefficient changes. The interface is that of GLMStepper, with F = N + S.
+    """
+
+    def __init__(self, ode_function, explicit_A, explicit_B, implicit_A, implicit_B,
+            newton_atol=1e-12, newton_maxiter=100):
+        """
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+        explicit_A, explicit_B : ndarray
+            The coefficients and the weights of the explicit part of the method.
+        implicit_A, implicit_B : ndarray
+            The coefficients and the weights of the implicit part of the method.
+        newton_atol : float
+            Absolute tolerance on the stage residual.
+        newton_maxiter : int
+            Maximum number of Newton iterations per stage.
+        """
+        self.explicit_A = explicit_A
+        self.explicit_B = explicit_B
+        self.implicit_A = implicit_A
+        self.implicit_B = implicit_B
+        self.newton_atol = newton_atol
+        self.newton_maxiter = newton_maxiter
+
+        self.num_stages = implicit_A.shape[0]
+        self.num_step_vars = 1
+
+        self.ode_step = ODEEvaluator(ode_function, 1, split=True)
+        self.ode_stages = ODEEvaluator(ode_function, self.num_stages, split=True)
+
+    def compute_step(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Compute the stage values and derivatives of one step in place; return the new step vector.
+        num_stages = self.num_stages
+        explicit_A = self.explicit_A
+        implicit_A = self.implicit_A
+        newton_atol = self.newton_atol
+        newton_maxiter = self.newton_maxiter
+
+        evaluator = self.ode_step
+        n = evaluator.state_size
+
+        N = np.zeros(F.shape)
+        S = np.zeros(F.shape)
+
+        lu = None
+        lu_diag = None
+        for i_stage in range(num_stages):
+            diag = implicit_A[i_stage, i_stage]
+
+            Y_fixed = y_old[0] + h * explicit_A[i_stage, :i_stage].dot(N[:i_stage]) \
+                + h * implicit_A[i_stage, :i_stage].dot(S[:i_stage])
+
+            Y[i_stage] = Y_fixed
+            norm_old = None
+            for iteration in range(newton_maxiter + 1):
+                evaluator.set_inputs(Y[i_stage:i_stage + 1],
+                    t=stage_times[i_stage:i_stage + 1], static=static,
+                    dynamic=dynamic[i_stage:i_stage + 1])
+                N[i_stage] = evaluator.compute()[0]
+                S[i_stage] = evaluator.get_stiff_rates()[0]
+
+                if diag == 0.:
+                    break
+
+                residual = Y[i_stage] - h * diag * S[i_stage] - Y_fixed
+                norm = np.linalg.norm(residual)
+                if norm < newton_atol or iteration == newton_maxiter:
+                    break
+
+                if lu is None or diag != lu_diag \
+                        or (norm_old is not None and norm > 0.5 * norm_old):
+                    jac = evaluator.compute_jacobians()['stiff_y'][0]
+                    lu = scipy.linalg.lu_factor(np.eye(n) - h * diag * jac)
+                    lu_diag = diag
+
+                Y[i_stage] -= scipy.linalg.lu_solve(lu, residual)
+                norm_old = norm
+
+        F[:] = N + S
+
+        return y_old + h * (self.explicit_B.dot(N) + self.implicit_B.dot(S))
+
+    def linearize_step(self, Y, h, stage_times, static, dynamic):
+        evaluator = self.ode_stages
+        evaluator.set_inputs(Y, t=stage_times, static=static, dynamic=dynamic)
+        N = evaluator.compute()
+        S = evaluator.get_stiff_rates()
+
+        jacobians = evaluator.compute_jacobians()
+        jacobians['nonstiff_rates'] = N
+        jacobians['stiff_rates'] = S
+
+        return jacobians
+
+    def _get_d_fixed(self, jacobians, prefix, d_stage_times, d_static, d_dynamic):
+        # Perturbation of one part of the stage derivatives due to everything but the stage values.
+        return jacobians[prefix + 't'] * d_stage_times[:, None] \
+            + np.einsum('jab,b->ja', jacobians[prefix + 'static'], d_static) \
+            + np.einsum('jab,jb->ja', jacobians[prefix + 'dynamic'], d_dynamic)
+
+    def tangent_step(self, d_y_old, h, d_h, F, jacobians, d_stage_times, d_static, d_dynamic):
+        # Linearization of one step; returns the perturbation of the new step vector.
+        num_stages = self.num_stages
+        explicit_A = self.explicit_A
+        implicit_A = self.implicit_A
+
+        N = jacobians['nonstiff_rates']
+        S = jacobians['stiff_rates']
+        jac_N = jacobians['y']
+        jac_S = jacobians['stiff_y']
+        n = N.shape[1]
+
+        d_N_fixed = self._get_d_fixed(jacobians, '', d_stage_times, d_static, d_dynamic)
+        d_S_fixed = self._get_d_fixed(jacobians, 'stiff_', d_stage_times, d_static, d_dynamic)
+
+        d_N = np.zeros(N.shape)
+        d_S = np.zeros(S.shape)
+        for i_stage in range(num_stages):
+            diag = implicit_A[i_stage, i_stage]
+
+            rhs = d_y_old[0] \
+                + d_h * (explicit_A[i_stage, :i_stage].dot(N[:i_stage])
+                    + implicit_A[i_stage, :i_stage + 1].dot(S[:i_stage + 1])) \
+                + h * (explicit_A[i_stage, :i_stage].dot(d_N[:i_stage])
+                    + implicit_A[i_stage, :i_stage].dot(d_S[:i_stage])) \
+                + h * diag * d_S_fixed[i_stage]
+            d_Y = np.linalg.solve(np.eye(n) - h * diag * jac_S[i_stage], rhs)
+
+            d_N[i_stage] = jac_N[i_stage].dot(d_Y) + d_N_fixed[i_stage]
+            d_S[i_stage] = jac_S[i_stage].dot(d_Y) + d_S_fixed[i_stage]
+
+        return d_y_old \
+            + d_h * (self.explicit_B.dot(N) + self.implicit_B.dot(S)) \
+            + h * (self.explicit_B.dot(d_N) + self.implicit_B.dot(d_S))
+
+    def adjoint_step(self, b_y_new, h, F, jacobians):
+        # Transpose of tangent_step; returns the adjoints of the step's inputs.
+        num_stages = self.num_stages
+        explicit_A = self.explicit_A
+        implicit_A = self.implicit_A
+
+        N = jacobians['nonstiff_rates']
+        S = jacobians['stiff_rates']
+        jac_N = jacobians['y']
+        jac_S = jacobians['stiff_y']
+        n = N.shape[1]
+
+        b_y_old = b_y_new.copy()
+        b_h = np.sum(b_y_new * (self.explicit_B.dot(N) + self.implicit_B.dot(S)))
+        b_N = h * self.explicit_B.T.dot(b_y_new)
+        b_S = h * self.implicit_B.T.dot(b_y_new)
+        b_N_fixed = np.zeros(N.shape)
+        b_S_fixed = np.zeros(S.shape)
+
+        for i_stage in range(num_stages - 1, -1, -1):
+            diag = implicit_A[i_stage, i_stage]
+
+            b_N_fixed[i_stage] = b_N[i_stage]
+            b_S_fixed[i_stage] = b_S[i_stage]
+            b_Y = jac_N[i_stage].T.dot(b_N[i_stage]) + jac_S[i_stage].T.dot(b_S[i_stage])
+            b_rhs = np.linalg.solve((np.eye(n) - h * diag * jac_S[i_stage]).T, b_Y)
+
+            b_y_old[0] += b_rhs
+            b_h += b_rhs.dot(explicit_A[i_stage, :i_stage].dot(N[:i_stage])
+                + implicit_A[i_stage, :i_stage + 1].dot(S[:i_stage + 1]))
+            b_N[:i_stage] += h * np.outer(explicit_A[i_stage, :i_stage], b_rhs)
+            b_S[:i_stage] += h * np.outer(implicit_A[i_stage, :i_stage], b_rhs)
+            b_S_fixed[i_stage] += h * diag * b_rhs
+
+        b_stage_times = np.einsum('ja,ja->j', jacobians['t'], b_N_fixed) \
+            + np.einsum('ja,ja->j', jacobians['stiff_t'], b_S_fixed)
+        b_static = np.einsum('jab,ja->b', jacobians['static'], b_N_fixed) \
+            + np.einsum('jab,ja->b', jacobians['stiff_static'], b_S_fixed)
+        b_dynamic = np.einsum('jab,ja->jb', jacobians['dynamic'], b_N_fixed) \
+            + np.einsum('jab,ja->jb', jacobians['stiff_dynamic'], b_S_fixed)
+
+        return b_y_old, b_h, b_stage_times, b_static, b_dynamic
@@ -0,0 +1,265 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import Problem, ScipyOptimizer, IndepVarComp
+
+from ozone.api import ODEIntegrator
+from ozone.methods_list import get_method
+from ozone.utils.ode_evaluator import ODEEvaluator
+from ozone.utils.suppress_printing import nostdout
+
+
+def refine_mesh(ode_function, formulation, method_name, times,
+        initial_conditions=None, static_parameters=None, dynamic_parameters=None,
+        atol=1e-6, rtol=1e-6, max_num_refinements=10, max_num_times=None, **kwargs):
+    """
+    Integrate on successively refined time grids until the local errors are within tolerance.
+
+    After each solve, the local truncation error of every interval is estimated by comparing
+    the converged step with two half steps of the same method (step doubling), scaled by
+    atol + rtol * |y|. The intervals with a scaled error above 1 are bisected, and the next
+    solve is warm-started with the previous stage values, linearly interpolated in time.
+
+    Parameters
+    ----------
+    ode_function : ODEFunction
+        The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+    formulation : str
+        'solver-based' or 'optimizer-based'.
+    method_name : str
+        A one-step integration method.
+    times : np.ndarray[:]
+        The initial time grid.
+    initial_conditions : dict or None
+        Dictionary of initial condition values keyed by state name.
+    static_parameters : dict or None
+        Dictionary of static parameter values keyed by parameter name.
+    dynamic_parameters : dict or None
+        Dictionary of dynamic parameter values at the initial times keyed by parameter name;
+        they are linearly interpolated onto the refined grids.
+    atol : float
+        Absolute tolerance on the local error of each interval.
+    rtol : float
+        Relative tolerance on the local error of each interval.
+    max_num_refinements : int
+        Maximum number of refinements of the grid.
+    max_num_times : int or None
+        If given, the number of times is not refined beyond this value.
+    **kwargs : dict
+        Options of the integrator class, e.g., solver for 'solver-based'.
+
+    Returns
+    -------
+    Problem
+        The problem on the final grid, after running its driver.
+    np.ndarray[:]
+        The final time grid.
+    dict
+        Dictionary of 'num_times', 'max_error', and 'num_refined' lists with one entry per grid.
+    """
+    method = get_method(method_name)
+
+    assert formulation in ['solver-based', 'optimizer-based'], \
+        'Mesh refinement is only available for the solver-based and optimizer-based formulations'
+    assert method.num_values == 1 and method.starting_method is None, \
+        'Mesh refinement requires a one-step method'
+
+    initial_times = times
+
+    history = {'num_times': [], 'max_error': [], 'num_refined': []}
+
+    prob = None
+    previous_times = None
+    for refinement in range(max_num_refinements + 1):
+        if dynamic_parameters is not None:
+            grid_dynamic_parameters = {}
+            for parameter_name, value in iteritems(dynamic_parameters):
+                grid_dynamic_parameters[parameter_name] = _interpolate(
+                    times, initial_times, value)
+        else:
+            grid_dynamic_parameters = None
+
+        integrator = ODEIntegrator(ode_function, formulation, method_name, times=times,
+            initial_conditions=None if initial_conditions is None else dict(initial_conditions),
+            static_parameters=None if static_parameters is None else dict(static_parameters),
+            dynamic_parameters=grid_dynamic_parameters, **kwargs)
+
+        previous_prob = prob
+        prob = _setup_problem(integrator, formulation)
+
+        if previous_prob is not None:
+            _warm_start(prob, previous_prob, ode_function, method, formulation,
+                times, previous_times, kwargs.get('solver'))
+
+        with nostdout():
+            prob.run_driver()
+
+        previous_times = times
+
+        errors = _estimate_errors(prob, ode_function, method, times,
+            static_parameters, grid_dynamic_parameters, atol, rtol)
+
+        refine = errors > 1.
+        if max_num_times is not None:
+            # Refine the intervals with the largest errors first.
+            num_allowed = max(0, max_num_times - len(times))
+            if np.sum(refine) > num_allowed:
+                indices = np.argsort(-errors)[:num_allowed]
+                refine = np.zeros(len(errors), bool)
+                refine[indices] = True
+
+        history['num_times'].append(len(times))
+        history['max_error'].append(np.max(errors))
+        history['num_refined'].append(int(np.sum(refine)))
+
+        if not np.any(refine) or refinement == max_num_refinements:
+            break
+
+        midpoints = 0.5 * (times[:-1] + times[1:])
+        times = np.sort(np.concatenate([times, midpoints[refine]]))
+
+    return prob, times, history
+
+
+def _setup_problem(integrator, formulation):
+    prob = Problem(integrator)
+
+    if formulation == 'optimizer-based':
+        prob.driver = ScipyOptimizer()
+        prob.driver.options['optimizer'] = 'SLSQP'
+        prob.driver.options['tol'] = 1e-9
+        prob.driver.options['disp'] = False
+
+        integrator.add_subsystem('dummy_comp', IndepVarComp('dummy_var', val=1.0))
+        integrator.add_objective('dummy_comp.dummy_var')
+
+    with nostdout():
+        prob.setup()
+
+    return prob
+
+
+def _interpolate(new_times, old_times, values):
+    # Linear interpolation along the first axis of values.
+    values = np.asarray(values)
+    flat_values = values.reshape((values.shape[0], -1))
+
+    new_values = np.zeros((len(new_times), flat_values.shape[1]))
+    for index in range(flat_values.shape[1]):
+        new_values[:, index] = np.interp(new_times, old_times, flat_values[:, index])
+
+    return new_values.reshape((len(new_times),) + values.shape[1:])
+
+
+def _get_stage_times(times, abscissa):
+    h_vec = times[1:] - times[:-1]
+    return (times[:-1, None] + np.outer(h_vec, abscissa)).flatten()
+
+
+def _warm_start(prob, previous_prob, ode_function, method, formulation,
+        times, previous_times, solver):
+    # The stage values are the initial guess of the outputs that feed the ODE system.
+    if formulation == 'optimizer-based':
+        stage_name = 'integration_group.desvars_comp.Y:%s'
+    elif solver == 'newton-direct':
+        stage_name = 'integration_group.vectorized_stage_comp.Y_out:%s'
+    else:
+        stage_name = 'integration_group.vectorized_stagestep_comp.Y_out:%s'
+
+    abscissa = np.atleast_1d(method.abscissa)
+    stage_times = _get_stage_times(times, abscissa)
+    previous_stage_times = _get_stage_times(previous_times, abscissa)
+
+    indices = np.argsort(previous_stage_times, kind='mergesort')
+
+    for state_name, state in iteritems(ode_function._states):
+        name = stage_name % state_name
+        previous_Y = previous_prob[name].reshape((len(previous_stage_times),) + state['shape'])
+
+        Y = _interpolate(stage_times, previous_stage_times[indices], previous_Y[indices])
+        prob[name] = Y.reshape(prob[name].shape)
+
+        if formulation == 'solver-based' and solver == 'newton-direct':
+            y_name = 'integration_group.vectorized_step_comp.y:%s' % state_name
+            y = _interpolate(times, previous_times, previous_prob['state:%s' % state_name])
+            prob[y_name] = y.reshape(prob[y_name].shape)
+
+
+def _estimate_errors(prob, ode_function, method, times,
+        static_parameters, dynamic_parameters, atol, rtol):
+    num_intervals = len(times) - 1
+
+    # Explicit stages are evaluated one at a time; implicit stages are solved for together.
+    if method.explicit:
+        evaluator = ODEEvaluator(ode_function, num_intervals)
+    else:
+        evaluator = ODEEvaluator(ode_function, num_intervals * method.num_stages)
+
+    y = np.zeros((len(times), evaluator.state_size))
+    for state_name, state_slice in iteritems(evaluator.state_slices):
+        y[:, state_slice] = prob['state:%s' % state_name].reshape((len(times), -1))
+
+    static = np.zeros(evaluator.static_size)
+    if static_parameters is not None:
+        for parameter_name, value in iteritems(static_parameters):
+            static[evaluator.static_slices[parameter_name]] = np.atleast_1d(value).flatten()
+
+    dynamic = np.zeros((len(times), evaluator.dynamic_size))
+    if dynamic_parameters is not None:
+        for parameter_name, value in iteritems(dynamic_parameters):
+            dynamic[:, evaluator.dynamic_slices[parameter_name]] = value.reshape(
+                (len(times), -1))
+
+    h_vec = times[1:] - times[:-1]
+    y_half = _take_steps(evaluator, method, y[:-1], times[:-1], 0.5 * h_vec,
+        static, times, dynamic)
+    y_half = _take_steps(evaluator, method, y_half, times[:-1] + 0.5 * h_vec, 0.5 * h_vec,
+        static, times, dynamic)
+
+    # With local errors C h^(p + 1), the full step is off by (y_full - y_half) / (1 - 2^-p).
+    local_errors = (y[1:] - y_half) / (1. - 2. ** -method.order)
+    scale = atol + rtol * np.maximum(np.abs(y[:-1]), np.abs(y[1:]))
+
+    return np.sqrt(np.mean((local_errors / scale) ** 2, axis=1))
+
+
+def _take_steps(evaluator, method, y, t, h, static, times, dynamic):
+    # One step of the method from every interval at once, with stages packed as (interval, stage).
+    num_intervals, n = y.shape
+    num_stages = method.num_stages
+
+    stage_times = t[:, None] + np.outer(h, np.atleast_1d(method.abscissa))
+    stage_dynamic = _interpolate(stage_times.flatten(), times, dynamic).reshape(
+        (num_intervals, num_stages, -1))
+
+    Y_fixed = np.einsum('jk,ia->ija', method.U, y)
+
+    Y = Y_fixed.copy()
+    F = np.zeros((num_intervals, num_stages, n))
+
+    if method.explicit:
+        for i_stage in range(num_stages):
+            Y[:, i_stage] = Y_fixed[:, i_stage] \
+                + h[:, None] * np.einsum('k,ika->ia', method.A[i_stage, :i_stage], F[:, :i_stage])
+
+            evaluator.set_inputs(Y[:, i_stage], t=stage_times[:, i_stage], static=static,
+                dynamic=stage_dynamic[:, i_stage])
+            F[:, i_stage] = evaluator.compute()
+    else:
+        for iteration in range(100):
+            evaluator.set_inputs(Y.reshape((-1, n)), t=stage_times.flatten(), static=static,
+                dynamic=stage_dynamic.reshape((num_intervals * num_stages, -1)))
+            F[:] = evaluator.compute().reshape((num_intervals, num_stages, n))
+
+            residual = Y - h[:, None, None] * np.einsum('jk,ika->ija', method.A, F) - Y_fixed
+            if np.linalg.norm(residual) < 1e-12:
+                break
+
+            jac_y = evaluator.compute_jacobians()['y'].reshape((num_intervals, num_stages, n, n))
+            mtx = -np.einsum('i,jk,ikab->ijakb', h, method.A, jac_y).reshape(
+                (num_intervals, num_stages * n, num_stages * n))
+            mtx += np.eye(num_stages * n)
+
+            Y -= np.linalg.solve(mtx, residual.reshape((num_intervals, -1, 1))).reshape(Y.shape)
+
+    return y + h[:, None] * np.einsum('k,ika->ia', method.B[0], F)
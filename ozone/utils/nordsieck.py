@@ -0,0 +1,154 @@
+"""
+Operations on the Nordsieck array of a variable-step, variable-order BDF method.
+
+The Nordsieck array z has max_order + 1 rows, z[j] = h ** j y^(j) / j!, of which rows 0 to q
+are active at order q; the last row is otherwise used to store the previous correction, as in
+CVODE [Hindmarsh et al., ACM TOMS 31(3), 2005]. Every operation between two corrections is
+linear in z and is returned as a matrix acting on its rows; it only depends on the ratios of
+the step sizes. The coefficients follow the fixed-leading-coefficient form of Jackson and
+Sacks-Davis used in CVODE.
+"""
+from __future__ import division
+
+import numpy as np
+from scipy.special import comb
+
+
+def get_predict_matrix(order, max_order):
+    # Pascal-triangle prediction z[i] <- sum_j>=i C(j, i) z[j] of the active rows.
+    mtx = np.eye(max_order + 1)
+    for i in range(order + 1):
+        for j in range(i, order + 1):
+            mtx[i, j] = comb(j, i, exact=True)
+    return mtx
+
+
+def get_restore_matrix(order, max_order):
+    # Inverse of the prediction, used to undo a rejected step.
+    mtx = np.eye(max_order + 1)
+    mtx[:order + 1, :order + 1] = np.linalg.inv(get_predict_matrix(order, order))
+    return mtx
+
+
+def get_rescale_matrix(order, max_order, eta):
+    # Rescaling of the active rows to the step size eta * h.
+    mtx = np.eye(max_order + 1)
+    mtx[range(order + 1), range(order + 1)] = eta ** np.arange(order + 1)
+    return mtx
+
+
+def get_bdf_coefficients(order, h, tau, error_coefficients=False):
+    """
+    Compute the corrector coefficients and the error test quantities of one step.
+
+    Parameters
+    ----------
+    order : int
+        The current order, q.
+    h : float
+        The current step size.
+    tau : ndarray
+        tau[j] is the size of the j-th previous step, for j = 1 to order + 1.
+    error_coefficients : bool
+        Whether to also compute the error estimates at orders q - 1 and q + 1.
+
+    Returns
+    -------
+    ndarray[order + 1]
+        The coefficients l of the update z <- z + l * (y - z[0]), with l[0] = 1.
+    dict
+        The error test quantities; 'e' always, and 'e_down', 'e_up' if requested.
+        'ratio' is used to scale the previous correction when testing order q + 1.
+    """
+    l = np.zeros(order + 1)
+    l[:2] = 1.
+    xi_inv = xistar_inv = 1.
+    alpha0 = alpha0_hat = -1.
+    hsum = h
+
+    if order > 1:
+        for j in range(2, order):
+            hsum += tau[j - 1]
+            xi_inv = h / hsum
+            alpha0 -= 1. / j
+            for i in range(j, 0, -1):
+                l[i] += l[i - 1] * xi_inv
+
+        alpha0 -= 1. / order
+        xistar_inv = -l[1] - alpha0
+        hsum += tau[order - 1]
+        xi_inv = h / hsum
+        alpha0_hat = -l[1] - xi_inv
+        for i in range(order, 0, -1):
+            l[i] += l[i - 1] * xistar_inv
+
+    A1 = 1. - alpha0_hat + alpha0
+    A2 = 1. + order * A1
+    tq = {
+        'e': abs(A1 / (alpha0 * A2)),
+        'ratio': abs(A2 * xistar_inv / (l[order] * xi_inv)),
+    }
+
+    if error_coefficients:
+        if order > 1:
+            A3 = alpha0 + 1. / order
+            A4 = alpha0_hat + xi_inv
+            tq['e_down'] = abs(xistar_inv / l[order] * (1. - A4 + A3) / A3)
+        else:
+            tq['e_down'] = 1.
+
+        hsum += tau[order]
+        xi_inv = h / hsum
+        A5 = alpha0 - 1. / (order + 1)
+        A6 = alpha0_hat - xi_inv
+        tq['e_up'] = abs((1. - A6 + A5) / A2 / (xi_inv * (order + 2) * A5))
+
+    return l, tq
+
+
+def get_order_decrease_matrix(order, max_order, h, tau):
+    # Removal of the highest active row when lowering the order from q to q - 1.
+    l = np.zeros(max_order + 1)
+    l[2] = 1.
+    hsum = 0.
+    for j in range(1, order - 1):
+        hsum += tau[j]
+        xi = hsum / h
+        for i in range(j + 1, 1, -1):
+            l[i] = l[i] * xi + l[i - 1]
+
+    mtx = np.eye(max_order + 1)
+    mtx[2:order, order] -= l[2:order]
+    return mtx
+
+
+def get_order_increase_matrix(order, max_order, h, tau):
+    # New row q + 1 built from the stored correction when raising the order from q to q + 1.
+    l = np.zeros(max_order + 1)
+    l[2] = alpha1 = prod = xiold = 1.
+    alpha0 = -1.
+    hsum = h
+    for j in range(1, order):
+        hsum += tau[j + 1]
+        xi = hsum / h
+        prod *= xi
+        alpha0 -= 1. / (j + 1)
+        alpha1 += 1. / xi
+        for i in range(j + 2, 1, -1):
+            l[i] = l[i] * xiold + l[i - 1]
+        xiold = xi
+    A1 = (-alpha0 - alpha1) / prod
+
+    mtx = np.eye(max_order + 1)
+    new_row = np.zeros(max_order + 1)
+    new_row[max_order] = A1
+    mtx[order + 1] = new_row
+    mtx[2:order + 1] += np.outer(l[2:order + 1], new_row)
+    return mtx
+
+
+def get_interpolation_weights(order, max_order, s):
+    # Weights of the rows of z for the value at t_n + s * h, with -1 <= s <= 0.
+    weights = np.zeros(max_order + 1)
+    weights[:order + 1] = s ** np.arange(order + 1)
+    return weights
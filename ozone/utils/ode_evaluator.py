@@ -0,0 +1,367 @@
+import numpy as np
+from six import iteritems
+
+from openmdao.api import Problem, Group, IndepVarComp, ExplicitComponent
+
+from ozone.utils.var_names import get_name
+from ozone.utils.units import get_rate_units
+from ozone.utils.compat import get_connections, get_variable_metadata, \
+    preserved_solver_printing
+
+
+class ODEEvaluator(object):
+    """
+    Evaluate the user's ODE system directly on packed NumPy arrays.
+
+    The ODE system is instantiated once with the requested num_nodes inside a small
+    OpenMDAO problem that is owned by this object. States, static parameters, and dynamic
+    parameters are packed along the last axis in the order in which they were declared.
+    As in the vectorized formulations, the nodes are assumed to be independent, so only
+    the node-diagonal blocks of the ODE Jacobian are returned.
+
+    If split is True, compute returns the non-stiff part of the derivatives, and the stiff part,
+    which is zero for the states without a stiff_rate_source, is returned by get_stiff_rates.
+
+    If the ODE system is a single ExplicitComponent whose variables are in the units of the
+    states, parameters, and rates, compute calls the component's compute method directly on its
+    vectors, without the overhead of running the problem; the Jacobians still run the problem.
+    """
+
+    def __init__(self, ode_function, num_nodes, split=False):
+        """
+        Instantiate and set up the ODE system.
+
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+        num_nodes : int
+            Number of nodes with which the ODE system is instantiated.
+        split : bool
+            Whether the non-stiff and stiff parts of the derivatives are computed separately.
+        """
+        self.ode_function = ode_function
+        self.num_nodes = num_nodes
+        self.split = split
+
+        self.state_slices, self.state_size = _get_slices(ode_function._states)
+        self.static_slices, self.static_size = _get_slices(ode_function._static_parameters)
+        self.dynamic_slices, self.dynamic_size = _get_slices(ode_function._dynamic_parameters)
+
+        self._has_time = len(ode_function._time_options['targets']) > 0
+
+        self._setup_problem()
+
+    def __getstate__(self):
+        # The problem is not pickled; it is set up again when unpickled, e.g., in the worker
+        # processes of the spawn start method.
+        return {'ode_function': self.ode_function, 'num_nodes': self.num_nodes,
+            'split': self.split}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _setup_problem(self):
+        ode_function = self.ode_function
+        num = self.num_nodes
+        time_units = ode_function._time_options['units']
+
+        group = Group()
+
+        comp = IndepVarComp()
+        group.add_subsystem('inputs', comp)
+
+        if self._has_time:
+            comp.add_output('t', shape=num, units=time_units)
+            for target in ode_function._time_options['targets']:
+                group.connect('inputs.t', 'ode_comp.%s' % target)
+
+        for state_name, state in iteritems(ode_function._states):
+            name = get_name('Y', state_name)
+            comp.add_output(name, shape=(num,) + state['shape'], units=state['units'])
+            for target in state['targets']:
+                group.connect('inputs.%s' % name, 'ode_comp.%s' % target)
+
+        for parameter_name, parameter in iteritems(ode_function._static_parameters):
+            name = get_name('static_parameter', parameter_name)
+            comp.add_output(name, shape=(num,) + parameter['shape'], units=parameter['units'])
+            for target in parameter['targets']:
+                group.connect('inputs.%s' % name, 'ode_comp.%s' % target)
+
+        for parameter_name, parameter in iteritems(ode_function._dynamic_parameters):
+            name = get_name('dynamic_parameter', parameter_name)
+            comp.add_output(name, shape=(num,) + parameter['shape'], units=parameter['units'])
+            for target in parameter['targets']:
+                group.connect('inputs.%s' % name, 'ode_comp.%s' % target)
+
+        group.add_subsystem('ode_comp', ode_function._create_system(num))
+
+        # The rate comp converts the rate sources to the units the integrator works in.
+        group.add_subsystem('rate_comp', _RateComp(
+            states=ode_function._states, time_units=time_units, num_nodes=num))
+        for state_name, state in iteritems(ode_function._states):
+            rate_source = state['nonstiff_rate_source'] if self.split else state['rate_source']
+            group.connect('ode_comp.%s' % rate_source,
+                'rate_comp.%s' % get_name('in', state_name))
+
+        # The inputs of the states without a stiff part are left unconnected, at zero.
+        if self.split:
+            group.add_subsystem('stiff_rate_comp', _RateComp(
+                states=ode_function._states, time_units=time_units, num_nodes=num))
+            for state_name, state in iteritems(ode_function._states):
+                if state['stiff_rate_source'] is not None:
+                    group.connect('ode_comp.%s' % state['stiff_rate_source'],
+                        'stiff_rate_comp.%s' % get_name('in', state_name))
+
+        self.problem = problem = Problem(group)
+        problem.setup(check=False)
+        problem.final_setup()
+
+        self._of = [
+            'rate_comp.%s' % get_name('F', state_name) for state_name in ode_function._states]
+        if self.split:
+            self._of.extend([
+                'stiff_rate_comp.%s' % get_name('F', state_name)
+                for state_name in ode_function._states])
+        self._wrt = {
+            'y': ['inputs.%s' % get_name('Y', name) for name in ode_function._states],
+            'static': ['inputs.%s' % get_name('static_parameter', name)
+                for name in ode_function._static_parameters],
+            'dynamic': ['inputs.%s' % get_name('dynamic_parameter', name)
+                for name in ode_function._dynamic_parameters],
+        }
+        if self._has_time:
+            self._wrt['t'] = ['inputs.t']
+
+        self._direct_transfers = self._get_direct_transfers()
+
+    def _get_direct_transfers(self):
+        # The connections into the ODE component, as (source, target, shape) relative to the
+        # model and to the component, or None if compute must run the problem.
+        model = self.problem.model
+        ode_comp = model.ode_comp
+
+        if self.split or not isinstance(ode_comp, ExplicitComponent):
+            return None
+
+        transfers = []
+        for tgt, src in iteritems(get_connections(model)):
+            tgt_meta = get_variable_metadata(model, tgt)
+            src_meta = get_variable_metadata(model, src)
+            if tgt_meta['units'] != src_meta['units'] or tgt_meta['src_indices'] is not None:
+                return None
+            if tgt.startswith('ode_comp.'):
+                transfers.append((src, tgt[len('ode_comp.'):], tgt_meta['shape']))
+
+        return transfers
+
+    def set_inputs(self, y, t=None, static=None, dynamic=None):
+        """
+        Set the inputs of the ODE system.
+
+        Parameters
+        ----------
+        y : ndarray[num_nodes, state_size]
+            Packed state values.
+        t : ndarray[num_nodes] or None
+            Time values; ignored if the ODE is not explicitly time-dependent.
+        static : ndarray[static_size] or None
+            Packed static parameter values, shared by all nodes.
+        dynamic : ndarray[num_nodes, dynamic_size] or None
+            Packed dynamic parameter values.
+        """
+        ode_function = self.ode_function
+        problem = self.problem
+        num = self.num_nodes
+
+        if self._has_time and t is not None:
+            problem['inputs.t'] = t
+
+        for state_name, state in iteritems(ode_function._states):
+            problem['inputs.%s' % get_name('Y', state_name)] = \
+                y[:, self.state_slices[state_name]].reshape((num,) + state['shape'])
+
+        if static is not None:
+            for parameter_name, parameter in iteritems(ode_function._static_parameters):
+                value = static[self.static_slices[parameter_name]].reshape(parameter['shape'])
+                problem['inputs.%s' % get_name('static_parameter', parameter_name)] = \
+                    np.einsum('i,...->i...', np.ones(num), value)
+
+        if dynamic is not None:
+            for parameter_name, parameter in iteritems(ode_function._dynamic_parameters):
+                problem['inputs.%s' % get_name('dynamic_parameter', parameter_name)] = \
+                    dynamic[:, self.dynamic_slices[parameter_name]].reshape(
+                        (num,) + parameter['shape'])
+
+    def compute(self):
+        """
+        Run the ODE system at the current inputs.
+
+        Returns
+        -------
+        ndarray[num_nodes, state_size]
+            Packed state derivatives.
+        """
+        if self._direct_transfers is not None:
+            return self._compute_direct()
+
+        self._run(self.problem.run_model)
+
+        return self._get_rates('rate_comp')
+
+    def _compute_direct(self):
+        # Transfer the inputs and compute the rates without running the problem.
+        model = self.problem.model
+        ode_comp = model.ode_comp
+        num = self.num_nodes
+
+        for src, tgt, shape in self._direct_transfers:
+            ode_comp._inputs[tgt] = model._outputs[src].reshape(shape)
+
+        ode_comp.compute(ode_comp._inputs, ode_comp._outputs)
+
+        F = np.empty((num, self.state_size))
+        for state_name, state in iteritems(self.ode_function._states):
+            F[:, self.state_slices[state_name]] = \
+                ode_comp._outputs[state['rate_source']].reshape((num, -1))
+
+        return F
+
+    def get_stiff_rates(self):
+        """
+        Return the stiff part of the derivatives computed by the last call to compute.
+
+        Returns
+        -------
+        ndarray[num_nodes, state_size]
+            Packed stiff parts of the state derivatives.
+        """
+        return self._get_rates('stiff_rate_comp')
+
+    def _get_rates(self, comp_name):
+        problem = self.problem
+        num = self.num_nodes
+
+        F = np.empty((num, self.state_size))
+        for state_name in self.ode_function._states:
+            F[:, self.state_slices[state_name]] = \
+                problem['%s.%s' % (comp_name, get_name('F', state_name))].reshape((num, -1))
+
+        return F
+
+    def compute_jacobians(self):
+        """
+        Compute the node-diagonal blocks of the ODE Jacobian at the current inputs.
+
+        Returns
+        -------
+        dict
+            'y': ndarray[num_nodes, state_size, state_size],
+            't': ndarray[num_nodes, state_size],
+            'static': ndarray[num_nodes, state_size, static_size],
+            'dynamic': ndarray[num_nodes, state_size, dynamic_size].
+            If split is True, these are the Jacobians of the non-stiff part, and those of the
+            stiff part are added with the keys 'stiff_y', 'stiff_t', 'stiff_static', and
+            'stiff_dynamic'.
+        """
+        wrt = []
+        for key in ['y', 't', 'static', 'dynamic']:
+            wrt.extend(self._wrt.get(key, []))
+
+        self._run(self.problem.run_model)
+        totals = self._run(self.problem.compute_totals, of=self._of, wrt=wrt)
+
+        jacobians = self._get_jacobians(totals, 'rate_comp')
+        if self.split:
+            for key, jacobian in iteritems(self._get_jacobians(totals, 'stiff_rate_comp')):
+                jacobians['stiff_' + key] = jacobian
+
+        return jacobians
+
+    def _get_jacobians(self, totals, comp_name):
+        num = self.num_nodes
+        n = self.state_size
+
+        arange = np.arange(num)
+
+        jacobians = {
+            'y': np.zeros((num, n, n)),
+            't': np.zeros((num, n)),
+            'static': np.zeros((num, n, self.static_size)),
+            'dynamic': np.zeros((num, n, self.dynamic_size)),
+        }
+
+        for state_name, of_slice in iteritems(self.state_slices):
+            of_name = '%s.%s' % (comp_name, get_name('F', state_name))
+            of_size = of_slice.stop - of_slice.start
+
+            for name, wrt_slice in iteritems(self.state_slices):
+                wrt_size = wrt_slice.stop - wrt_slice.start
+                block = totals[of_name, 'inputs.%s' % get_name('Y', name)].reshape(
+                    (num, of_size, num, wrt_size))
+                jacobians['y'][:, of_slice, wrt_slice] = block[arange, :, arange, :]
+
+            if self._has_time:
+                block = totals[of_name, 'inputs.t'].reshape((num, of_size, num))
+                jacobians['t'][:, of_slice] = block[arange, :, arange]
+
+            for name, wrt_slice in iteritems(self.static_slices):
+                wrt_size = wrt_slice.stop - wrt_slice.start
+                block = totals[of_name, 'inputs.%s' % get_name('static_parameter', name)].reshape(
+                    (num, of_size, num, wrt_size))
+                # The static parameter is broadcast to all nodes, so the node derivatives add.
+                jacobians['static'][:, of_slice, wrt_slice] = np.sum(block, axis=2)
+
+            for name, wrt_slice in iteritems(self.dynamic_slices):
+                wrt_size = wrt_slice.stop - wrt_slice.start
+                block = totals[of_name, 'inputs.%s' % get_name('dynamic_parameter', name)].reshape(
+                    (num, of_size, num, wrt_size))
+                jacobians['dynamic'][:, of_slice, wrt_slice] = block[arange, :, arange, :]
+
+        return jacobians
+
+    def _run(self, func, **kwargs):
+        # The printing of the solvers of a model evaluating this problem is not affected.
+        with preserved_solver_printing():
+            return func(**kwargs)
+
+
+class _RateComp(ExplicitComponent):
+
+    def initialize(self):
+        self.options.declare('states', types=dict)
+        self.options.declare('time_units', types=str, allow_none=True)
+        self.options.declare('num_nodes', types=int)
+
+    def setup(self):
+        time_units = self.options['time_units']
+        num = self.options['num_nodes']
+
+        for state_name, state in iteritems(self.options['states']):
+            size = np.prod(state['shape'])
+            rate_units = get_rate_units(state['units'], time_units)
+
+            in_name = get_name('in', state_name)
+            F_name = get_name('F', state_name)
+
+            self.add_input(in_name, shape=(num,) + state['shape'], units=rate_units, val=0.)
+            self.add_output(F_name, shape=(num,) + state['shape'], units=rate_units)
+
+            ones = np.ones(num * size)
+            arange = np.arange(num * size)
+            self.declare_partials(F_name, in_name, val=ones, rows=arange, cols=arange)
+
+    def compute(self, inputs, outputs):
+        for state_name in self.options['states']:
+            outputs[get_name('F', state_name)] = inputs[get_name('in', state_name)]
+
+
+def _get_slices(variables_dict):
+    slices = {}
+    size = 0
+    for name, variable in iteritems(variables_dict):
+        var_size = int(np.prod(variable['shape']))
+        slices[name] = slice(size, size + var_size)
+        size += var_size
+
+    return slices, size
@@ -0,0 +1,102 @@
+import numpy as np
+
+from ozone.utils.ode_evaluator import ODEEvaluator
+
+
+class PartitionedStepper(object):
+    """
+    Take single steps of an explicit partitioned Runge--Kutta method, and their linearizations.
+
+    The positions declared in the state pairs of the ODEFunction use the position coefficients,
+    and all the other states use the velocity coefficients. Each stage is one evaluation of
+    the ODE, as for an explicit GLMStepper, with the coefficients applied per state.
+    The interface is that of GLMStepper.
+    """
+
+    def __init__(self, ode_function, position_A, position_B, velocity_A, velocity_B):
+        """
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+        position_A, position_B : ndarray
+            The coefficients and the weights for the positions.
+        velocity_A, velocity_B : ndarray
+            The coefficients and the weights for the other states.
+        """
+        assert len(ode_function._state_pairs) > 0, \
+            'Partitioned methods require position/velocity state pairs on the ODEFunction'
+
+        self.num_stages = velocity_A.shape[0]
+        self.num_step_vars = 1
+
+        self.ode_step = ODEEvaluator(ode_function, 1)
+        self.ode_stages = ODEEvaluator(ode_function, self.num_stages)
+
+        is_position = np.zeros(self.ode_step.state_size, bool)
+        for position, velocity in ode_function._state_pairs:
+            is_position[self.ode_step.state_slices[position]] = True
+
+        # The coefficients of each stage and state, [i_stage, j_stage, state index].
+        self.glm_A = np.where(is_position, position_A[:, :, None], velocity_A[:, :, None])
+        self.glm_B = np.where(is_position, position_B[0][:, None], velocity_B[0][:, None])
+
+    def compute_step(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Compute the stage values and derivatives of one step in place; return the new step vector.
+        glm_A = self.glm_A
+
+        evaluator = self.ode_step
+
+        for i_stage in range(self.num_stages):
+            Y[i_stage] = y_old[0] + h * np.sum(glm_A[i_stage, :i_stage] * F[:i_stage], axis=0)
+
+            evaluator.set_inputs(Y[i_stage:i_stage + 1],
+                t=stage_times[i_stage:i_stage + 1], static=static,
+                dynamic=dynamic[i_stage:i_stage + 1])
+            F[i_stage] = evaluator.compute()[0]
+
+        return y_old + h * np.sum(self.glm_B * F, axis=0)
+
+    def linearize_step(self, Y, h, stage_times, static, dynamic):
+        evaluator = self.ode_stages
+        evaluator.set_inputs(Y, t=stage_times, static=static, dynamic=dynamic)
+        evaluator.compute()
+        return evaluator.compute_jacobians()
+
+    def tangent_step(self, d_y_old, h, d_h, F, jacobians, d_stage_times, d_static, d_dynamic):
+        # Linearization of one step; returns the perturbation of the new step vector.
+        glm_A = self.glm_A
+
+        # Perturbation of the stage derivatives due to everything but the stage values.
+        d_F = jacobians['t'] * d_stage_times[:, None] \
+            + np.einsum('jab,b->ja', jacobians['static'], d_static) \
+            + np.einsum('jab,jb->ja', jacobians['dynamic'], d_dynamic)
+
+        for i_stage in range(self.num_stages):
+            d_Y = d_y_old[0] \
+                + np.sum(glm_A[i_stage, :i_stage] * (d_h * F[:i_stage] + h * d_F[:i_stage]),
+                    axis=0)
+            d_F[i_stage] += jacobians['y'][i_stage].dot(d_Y)
+
+        return d_y_old + np.sum(self.glm_B * (d_h * F + h * d_F), axis=0)
+
+    def adjoint_step(self, b_y_new, h, F, jacobians):
+        # Transpose of tangent_step; returns the adjoints of the step's inputs.
+        glm_A = self.glm_A
+
+        b_y_old = b_y_new.copy()
+        b_h = np.sum(b_y_new[0] * self.glm_B * F)
+        b_F = h * self.glm_B * b_y_new[0]
+
+        for i_stage in range(self.num_stages - 1, -1, -1):
+            b_Y = jacobians['y'][i_stage].T.dot(b_F[i_stage])
+
+            b_y_old[0] += b_Y
+            b_h += np.sum(glm_A[i_stage, :i_stage] * F[:i_stage] * b_Y)
+            b_F[:i_stage] += h * glm_A[i_stage, :i_stage] * b_Y
+
+        b_stage_times = np.einsum('ja,ja->j', jacobians['t'], b_F)
+        b_static = np.einsum('jab,ja->b', jacobians['static'], b_F)
+        b_dynamic = np.einsum('jab,ja->jb', jacobians['dynamic'], b_F)
+
+        return b_y_old, b_h, b_stage_times, b_static, b_dynamic
@@ -0,0 +1,208 @@
+import numpy as np
+import scipy.linalg
+
+from ozone.utils.ode_evaluator import ODEEvaluator
+
+
+class RosenbrockStepper(object):
+    """
+    Take single steps of a Rosenbrock method, and their linearizations, on packed NumPy arrays.
+
+    The stages are computed sequentially with one ODE evaluation and one linear solve each,
+    using a single LU factorization of I - h gamma J per step, where J and f_t are the ODE
+    Jacobians at the first stage, (t_n, y_n). The interface is that of GLMStepper: Y and F hold
+    the stage values y_n + sum_j<i alpha_ij k_j and their derivatives.
+
+    Since J and f_t enter the step, its linearization involves second derivatives of the ODE,
+    in the directions (gamma_i h, z_i) with z_i = sum_j<=i gamma_ij k_j. The ODE function only
+    provides first derivatives, so these are computed in linearize_step by central differences
+    of the ODE Jacobian, with one pair of evaluations per step. Unlike those of the other
+    methods, the derivatives of the steps are therefore not exact: the differences have a
+    truncation error of order fd_step ** 2 times the third derivatives of the ODE and a roundoff
+    error of order machine epsilon / fd_step times the Jacobian, so with the default fd_step the
+    relative error of the total derivatives is about 1e-10 for smooth ODEs. The time derivative
+    f_t is the partial derivative with respect to t, so the variation of the dynamic parameters
+    within a step is not part of the linear systems.
+    """
+
+    def __init__(self, ode_function, glm_A, glm_B, gamma, fd_step=1e-5):
+        """
+        Parameters
+        ----------
+        ode_function : ODEFunction
+            The ODE function instance representing the 'f' in dy_dt = f(t, y, x).
+        glm_A, glm_B : ndarray
+            The alpha coefficients and the weights of the Rosenbrock method.
+        gamma : ndarray
+            The lower-triangular gamma matrix of the Rosenbrock method.
+        fd_step : float
+            Relative step of the central differences of the ODE Jacobian, which balances their
+            truncation and roundoff errors near the default, the cube root of machine epsilon.
+        """
+        self.glm_A = glm_A
+        self.glm_B = glm_B
+        self.gamma = gamma
+        self.gamma_sums = np.sum(gamma, 1)
+        self.fd_step = fd_step
+
+        self.num_stages = glm_A.shape[0]
+        self.num_step_vars = 1
+
+        self.ode_step = ODEEvaluator(ode_function, 1)
+        self.ode_stages = ODEEvaluator(ode_function, self.num_stages)
+
+    def factorize(self, h, jac):
+        # LU factorization of I - h gamma J, shared by all stages of a step.
+        n = jac.shape[0]
+        return scipy.linalg.lu_factor(np.eye(n) - h * self.gamma[0, 0] * jac)
+
+    def compute_step(self, y_old, h, stage_times, static, dynamic, Y, F):
+        # Compute the stage values and derivatives of one step in place; return the new step vector.
+        num_stages = self.num_stages
+        glm_A = self.glm_A
+        gamma = self.gamma
+        gamma_sums = self.gamma_sums
+
+        evaluator = self.ode_step
+
+        Y[0] = y_old[0]
+        evaluator.set_inputs(Y[:1], t=stage_times[:1], static=static, dynamic=dynamic[:1])
+        F[0] = evaluator.compute()[0]
+
+        jacobians = evaluator.compute_jacobians()
+        jac = jacobians['y'][0]
+        jac_t = jacobians['t'][0]
+        lu = self.factorize(h, jac)
+
+        K = np.zeros(F.shape)
+        for i_stage in range(num_stages):
+            if i_stage > 0:
+                Y[i_stage] = y_old[0] + glm_A[i_stage, :i_stage].dot(K[:i_stage])
+
+                evaluator.set_inputs(Y[i_stage:i_stage + 1],
+                    t=stage_times[i_stage:i_stage + 1], static=static,
+                    dynamic=dynamic[i_stage:i_stage + 1])
+                F[i_stage] = evaluator.compute()[0]
+
+            rhs = h * F[i_stage] + h * jac.dot(gamma[i_stage, :i_stage].dot(K[:i_stage])) \
+                + gamma_sums[i_stage] * h ** 2 * jac_t
+            K[i_stage] = scipy.linalg.lu_solve(lu, rhs)
+
+        return y_old + self.glm_B.dot(K)
+
+    def linearize_step(self, Y, h, stage_times, static, dynamic):
+        num_stages = self.num_stages
+        gamma = self.gamma
+        gamma_sums = self.gamma_sums
+
+        evaluator = self.ode_stages
+        evaluator.set_inputs(Y, t=stage_times, static=static, dynamic=dynamic)
+        F = evaluator.compute()
+        jacobians = evaluator.compute_jacobians()
+
+        jac = jacobians['y'][0]
+        jac_t = jacobians['t'][0]
+        lu = self.factorize(h, jac)
+
+        # The stage increments are recovered from the stage derivatives.
+        K = np.zeros(F.shape)
+        for i_stage in range(num_stages):
+            rhs = h * F[i_stage] + h * jac.dot(gamma[i_stage, :i_stage].dot(K[:i_stage])) \
+                + gamma_sums[i_stage] * h ** 2 * jac_t
+            K[i_stage] = scipy.linalg.lu_solve(lu, rhs)
+
+        # Derivatives of J z_i + gamma_i h f_t at (t_n, y_n), one direction per stage.
+        d_y = gamma.dot(K)
+        d_t = gamma_sums * h
+        norms = np.sqrt(np.sum(d_y ** 2, axis=1) + d_t ** 2)
+        eps = self.fd_step * (1. + np.linalg.norm(Y[0])) / np.where(norms > 0., norms, 1.)
+
+        perturbed = []
+        for sign in [1., -1.]:
+            evaluator.set_inputs(Y[0] + sign * eps[:, None] * d_y,
+                t=stage_times[0] + sign * eps * d_t, static=static,
+                dynamic=np.tile(dynamic[0], (num_stages, 1)))
+            perturbed.append(evaluator.compute_jacobians())
+
+        for key in ['y', 't', 'static', 'dynamic']:
+            diff = perturbed[0][key] - perturbed[1][key]
+            jacobians['d2_' + key] = diff / (2 * eps.reshape((-1,) + (1,) * (diff.ndim - 1)))
+        jacobians['k'] = K
+
+        return jacobians
+
+    def tangent_step(self, d_y_old, h, d_h, F, jacobians, d_stage_times, d_static, d_dynamic):
+        # Linearization of one step; returns the perturbation of the new step vector.
+        num_stages = self.num_stages
+        glm_A = self.glm_A
+        gamma = self.gamma
+        gamma_sums = self.gamma_sums
+
+        jac_y = jacobians['y']
+        jac = jac_y[0]
+        jac_t = jacobians['t'][0]
+        K = jacobians['k']
+        lu = self.factorize(h, jac)
+
+        # Perturbation of the stage derivatives due to everything but the stage values.
+        d_F_fixed = jacobians['t'] * d_stage_times[:, None] \
+            + np.einsum('jab,b->ja', jacobians['static'], d_static) \
+            + np.einsum('jab,jb->ja', jacobians['dynamic'], d_dynamic)
+
+        # Perturbation of J z_i + gamma_i h f_t due to the point (t_n, y_n) of the Jacobians.
+        d_G = np.einsum('jab,b->ja', jacobians['d2_y'], d_y_old[0]) \
+            + jacobians['d2_t'] * d_stage_times[0] \
+            + np.einsum('jab,b->ja', jacobians['d2_static'], d_static) \
+            + np.einsum('jab,b->ja', jacobians['d2_dynamic'], d_dynamic[0])
+
+        d_K = np.zeros(K.shape)
+        for i_stage in range(num_stages):
+            d_Y = d_y_old[0] + glm_A[i_stage, :i_stage].dot(d_K[:i_stage])
+
+            rhs = d_h * (K[i_stage] / h + gamma_sums[i_stage] * h * jac_t) \
+                + h * (jac_y[i_stage].dot(d_Y) + d_F_fixed[i_stage] + d_G[i_stage]) \
+                + h * jac.dot(gamma[i_stage, :i_stage].dot(d_K[:i_stage]))
+            d_K[i_stage] = scipy.linalg.lu_solve(lu, rhs)
+
+        return d_y_old + self.glm_B.dot(d_K)
+
+    def adjoint_step(self, b_y_new, h, F, jacobians):
+        # Transpose of tangent_step; returns the adjoints of the step's inputs.
+        num_stages = self.num_stages
+        glm_A = self.glm_A
+        gamma = self.gamma
+        gamma_sums = self.gamma_sums
+
+        jac_y = jacobians['y']
+        jac = jac_y[0]
+        jac_t = jacobians['t'][0]
+        K = jacobians['k']
+        lu = self.factorize(h, jac)
+
+        b_K = self.glm_B.T.dot(b_y_new)
+        b_y_old = b_y_new.copy()
+        b_h = 0.
+        b_stage_times = np.zeros(num_stages)
+        b_static = np.zeros(jacobians['static'].shape[2])
+        b_dynamic = np.zeros((num_stages, jacobians['dynamic'].shape[2]))
+
+        for i_stage in range(num_stages - 1, -1, -1):
+            b_rhs = scipy.linalg.lu_solve(lu, b_K[i_stage], trans=1)
+
+            b_h += b_rhs.dot(K[i_stage] / h + gamma_sums[i_stage] * h * jac_t)
+
+            b_Y = h * jac_y[i_stage].T.dot(b_rhs)
+            b_y_old[0] += b_Y
+            b_K[:i_stage] += np.outer(glm_A[i_stage, :i_stage], b_Y)
+            b_K[:i_stage] += h * np.outer(gamma[i_stage, :i_stage], jac.T.dot(b_rhs))
+
+            b_stage_times[i_stage] += h * jacobians['t'][i_stage].dot(b_rhs)
+            b_static += h * jacobians['static'][i_stage].T.dot(b_rhs)
+            b_dynamic[i_stage] += h * jacobians['dynamic'][i_stage].T.dot(b_rhs)
+
+            b_y_old[0] += h * jacobians['d2_y'][i_stage].T.dot(b_rhs)
+            b_stage_times[0] += h * jacobians['d2_t'][i_stage].dot(b_rhs)
+            b_static += h * jacobians['d2_static'][i_stage].T.dot(b_rhs)
+            b_dynamic[0] += h * jacobians['d2_dynamic'][i_stage].T.dot(b_rhs)
+
+        return b_y_old, b_h, b_stage_times, b_static, b_dynamic
@@ -1,5 +1,7 @@
 import numpy as np
 import time
+import os
+import multiprocessing
 
 from openmdao.api import Problem, ScipyOptimizer, IndepVarComp
 
@@ -9,6 +11,15 @@ from ozone.methods_list import get_method
 
 
 def run_integration(num_times, t0, t1, initial_conditions, ode_function, formulation, method_name):
+    runtime, cpu_time, errors = _run_integration(
+        num_times, t0, t1, initial_conditions, ode_function, formulation, method_name)
+
+    return runtime, errors
+
+
+def _run_integration(num_times, t0, t1, initial_conditions, ode_function, formulation,
+        method_name):
+    # The wall-clock and CPU times of run_driver, and the errors at t1.
     exact_solution = ode_function.get_exact_solution(initial_conditions, t0, t1)
     times = np.linspace(t0, t1, num_times)
 
@@ -28,19 +39,28 @@ def run_integration(num_times, t0, t1, initial_conditions, ode_function, formula
     with nostdout():
         prob.setup()
         runtime0 = time.time()
+        cpu_time0 = _process_time()
         prob.run_driver()
+        cpu_time1 = _process_time()
         runtime1 = time.time()
 
     runtime = runtime1 - runtime0
+    cpu_time = cpu_time1 - cpu_time0
     errors = {}
     for key in exact_solution:
         errors[key] = np.linalg.norm(prob['state:%s' % key][-1] - exact_solution[key])
 
-    return runtime, errors
+    return runtime, cpu_time, errors
 
 
 def compute_runtimes(num_times_vector, t0, t1,
-        ode_function, formulation, method_name, initial_conditions):
+        ode_function, formulation, method_name, initial_conditions, num_workers=None):
+    if num_workers is not None:
+        results = compute_study(num_times_vector, t0, t1, ode_function,
+            [method_name], [formulation], initial_conditions, num_workers=num_workers)
+
+        return results['step_size'], results['runtime']
+
     num = len(num_times_vector)
 
     step_sizes_vector = np.zeros(num)
@@ -71,7 +91,15 @@ def compute_ideal_runtimes(step_sizes_vector, runtimes_vector):
 
 
 def compute_convergence_order(num_times_vector, t0, t1, state_name,
-        ode_function, formulation, method_name, initial_conditions):
+        ode_function, formulation, method_name, initial_conditions, num_workers=None):
+    if num_workers is not None:
+        results = compute_study(num_times_vector, t0, t1, ode_function,
+            [method_name], [formulation], initial_conditions, state_name=state_name,
+            num_workers=num_workers)
+
+        return results['error'], results['step_size'], results['order'][1:], \
+            get_method(method_name).order
+
     num = len(num_times_vector)
 
     step_sizes_vector = np.zeros(num)
@@ -120,3 +148,165 @@ def compute_ideal_error(step_sizes_vector, errors_vector, ideal_order):
     ])
 
     return ideal_step_sizes_vector, ideal_errors_vector
+
+
+# The fields of the rows of the table returned by compute_study.
+study_dtype = np.dtype([
+    ('method_name', 'U64'),
+    ('formulation', 'U64'),
+    ('num_times', int),
+    ('step_size', float),
+    ('runtime', float),
+    ('cpu_time', float),
+    ('error', float),
+    ('order', float),
+    ('ideal_order', float),
+])
+
+
+def compute_study(num_times_vector, t0, t1, ode_function, method_names, formulations,
+        initial_conditions, state_name=None, num_workers=None):
+    """
+    Run every combination of method, formulation, and number of times, and tabulate them.
+
+    Each case is integrated as in run_integration. With num_workers, the cases are run by a
+    pool of worker processes, each in a new process. A case only runs while it holds one of
+    the CPUs of this process, to which it is pinned if the platform allows it, so the timings
+    of concurrent cases do not contend for a CPU; the CPU time of run_driver is recorded too.
+
+    Parameters
+    ----------
+    num_times_vector : np.ndarray[:]
+        Numbers of times of the cases of each method and formulation, in increasing order.
+    t0 : float
+        Integration start time.
+    t1 : float
+        Integration end time.
+    ode_function : ODEFunction
+        The ODE function, which must provide get_exact_solution.
+    method_names : list of str
+        The time integration methods.
+    formulations : list of str
+        The formulations of the integrator.
+    initial_conditions : dict
+        Dictionary of initial condition values keyed by state name.
+    state_name : str or None
+        The state whose error at t1 is tabulated; if None, the largest error of the states.
+    num_workers : int or None
+        Number of worker processes, or None to run the cases in this process.
+
+    Returns
+    -------
+    np.ndarray
+        Structured array of the cases with the fields of study_dtype, ordered by method,
+        formulation, and number of times. The order is that estimated from each case and the
+        previous one of the same method and formulation, and nan for the first one.
+    """
+    cases = [
+        (method_name, formulation, int(num_times))
+        for method_name in method_names
+        for formulation in formulations
+        for num_times in num_times_vector]
+
+    global _study
+    _study = (t0, t1, ode_function, initial_conditions)
+
+    try:
+        if num_workers is not None:
+            context = get_context()
+            cpus = context.Queue()
+            for cpu in _get_cpus():
+                cpus.put(cpu)
+
+            pool = context.Pool(num_workers, initializer=_initialize_worker,
+                initargs=(cpus, _study), maxtasksperchild=1)
+            try:
+                outcomes = pool.map(_run_case, cases, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            outcomes = [_run_case(case) for case in cases]
+    finally:
+        _study = None
+
+    results = np.zeros(len(cases), study_dtype)
+    for row, (method_name, formulation, num_times), (runtime, cpu_time, errors) in zip(
+            results, cases, outcomes):
+        row['method_name'] = method_name
+        row['formulation'] = formulation
+        row['num_times'] = num_times
+        row['step_size'] = (t1 - t0) / (num_times - 1)
+        row['runtime'] = runtime
+        row['cpu_time'] = cpu_time
+        row['error'] = errors[state_name] if state_name is not None else max(errors.values())
+        row['ideal_order'] = get_method(method_name).order
+
+    num = len(num_times_vector)
+    for i_start in range(0, len(cases), num):
+        rows = results[i_start:i_start + num]
+        rows['order'][0] = np.nan
+        rows['order'][1:] = np.log(rows['error'][1:] / rows['error'][:-1]) \
+            / np.log(rows['step_size'][1:] / rows['step_size'][:-1])
+
+    return results
+
+
+def get_context():
+    """
+    Return the context of the worker processes of compute_study and of the benchmarks.
+
+    Workers are forked where possible, so they start without importing the package again;
+    otherwise, and on Python 2, which has no contexts, the default start method is used.
+
+    Returns
+    -------
+    module or multiprocessing.context.BaseContext
+        The fork context if available, or the multiprocessing module.
+    """
+    if hasattr(multiprocessing, 'get_context') \
+            and 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+
+    return multiprocessing
+
+
+_study = None
+_worker_cpus = None
+
+# The CPU time of this process; Python 2 only has time.clock.
+_process_time = time.process_time if hasattr(time, 'process_time') else time.clock
+
+
+def _get_cpus():
+    # The CPUs this process may run on.
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(multiprocessing.cpu_count()))
+
+
+def _initialize_worker(cpus, study):
+    # The queue of free CPUs is shared by the workers, and each gets its own copy of the study.
+    global _study, _worker_cpus
+    _study = study
+    _worker_cpus = cpus
+
+
+def _run_case(case):
+    method_name, formulation, num_times = case
+    t0, t1, ode_function, initial_conditions = _study
+
+    if _worker_cpus is None:
+        return _run_integration(num_times, t0, t1, dict(initial_conditions), ode_function,
+            formulation, method_name)
+
+    cpu = _worker_cpus.get()
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, [cpu])
+
+        return _run_integration(num_times, t0, t1, dict(initial_conditions), ode_function,
+            formulation, method_name)
+    finally:
+        _worker_cpus.put(cpu)
@@ -0,0 +1,123 @@
+import time
+
+import numpy as np
+
+
+def propagate_segment(stepper, y_start, h_vec, stage_times, static, dynamic):
+    """
+    Take the steps of one time segment with a stepper, starting from a given step vector.
+
+    Parameters
+    ----------
+    stepper : GLMStepper, RosenbrockStepper, IMEXStepper, ExponentialStepper, etc.
+        The stepper of a one-step method.
+    y_start : ndarray[1, n]
+        The step vector at the start of the segment.
+    h_vec : ndarray[num_steps]
+        The step sizes of the segment.
+    stage_times : ndarray[num_steps, num_stages]
+        The stage times of the segment.
+    static : ndarray[p]
+        The static parameters.
+    dynamic : ndarray[num_steps, num_stages, q]
+        The dynamic parameters at the stages of the segment.
+
+    Returns
+    -------
+    ndarray[num_steps + 1, 1, n]
+        The step vectors of the segment.
+    ndarray[num_steps, num_stages, n]
+        The stage values of the segment.
+    ndarray[num_steps, num_stages, n]
+        The stage derivatives of the segment.
+    float
+        The wall time of the propagation.
+    """
+    num_steps = len(h_vec)
+    n = y_start.shape[-1]
+
+    y = np.zeros((num_steps + 1, 1, n))
+    Y = np.zeros((num_steps, stepper.num_stages, n))
+    F = np.zeros((num_steps, stepper.num_stages, n))
+
+    start_time = time.time()
+
+    y[0] = y_start
+    for i_step in range(num_steps):
+        y[i_step + 1] = stepper.compute_step(y[i_step], h_vec[i_step],
+            stage_times[i_step], static, dynamic[i_step], Y[i_step], F[i_step])
+
+    return y, Y, F, time.time() - start_time
+
+
+class SegmentPool(object):
+    """
+    Propagate time segments with a stepper, in worker processes if num_workers is given.
+
+    The worker processes are created at the first call to map and reused by the later calls,
+    until close is called. The stepper is passed to each worker once, when the worker starts; it
+    is inherited with the fork start method and pickled otherwise, in which case its ODE systems
+    are set up again in the worker.
+    """
+
+    def __init__(self, stepper, num_workers=None):
+        """
+        Parameters
+        ----------
+        stepper : GLMStepper, RosenbrockStepper, IMEXStepper, ExponentialStepper, etc.
+            The stepper of a one-step method.
+        num_workers : int or None
+            The number of worker processes, or None to propagate the segments in this process.
+        """
+        assert num_workers is None or num_workers >= 1, 'num_workers must be at least 1'
+
+        self.stepper = stepper
+        self.num_workers = num_workers
+
+        self._pool = None
+
+    def map(self, tasks):
+        """
+        Propagate segments independently of each other.
+
+        Parameters
+        ----------
+        tasks : list of tuple
+            The arguments of propagate_segment after the stepper, one tuple per segment.
+
+        Returns
+        -------
+        list of tuple
+            The return values of propagate_segment, in the order of the tasks.
+        """
+        if self.num_workers is None:
+            return [propagate_segment(self.stepper, *task) for task in tasks]
+
+        if self._pool is None:
+            from ozone.utils.run_utils import get_context
+
+            self._pool = get_context().Pool(self.num_workers,
+                initializer=_initialize_worker, initargs=(self.stepper,))
+
+        return self._pool.map(_propagate_segment_in_worker, tasks)
+
+    def close(self):
+        """
+        Terminate the worker processes, if any; the next call to map creates them again.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+_worker_stepper = None
+
+
+def _initialize_worker(stepper):
+    global _worker_stepper
+    _worker_stepper = stepper
+
+
+def _propagate_segment_in_worker(task):
+    return propagate_segment(_worker_stepper, *task)
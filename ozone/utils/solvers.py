@@ -0,0 +1,459 @@
+import numpy as np
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+from six import iteritems
+from scipy.sparse.linalg import LinearOperator
+
+from openmdao.api import NonlinearBlockGS, NewtonSolver, LinearBlockGS, ScipyKrylov
+from openmdao.solvers.solver import LinearSolver
+
+from ozone.utils.var_names import get_name
+from ozone.utils.compat import subsolver_printing, get_assembled_matrix, gmres
+
+
+class SolverHistoryMixin(object):
+    """
+    Record the residual norm of every iteration of every solve of an OpenMDAO solver.
+
+    The norms are recorded through the iteration hooks of the solver, regardless of the iprint
+    setting: a solve starts in _iter_initialize, which returns the initial norm, and each
+    iteration ends with _iter_get_norm, after _iter_count is incremented. These hooks, and
+    ScipyKrylovHistory._monitor, are the solver methods overridden here; the other OpenMDAO
+    internals are read through ozone.utils.compat.
+    """
+
+    def __init__(self, **kwargs):
+        super(SolverHistoryMixin, self).__init__(**kwargs)
+
+        self.residual_history = []
+
+    def _iter_initialize(self):
+        norm0, norm = super(SolverHistoryMixin, self)._iter_initialize()
+
+        self.residual_history.append([norm])
+        return norm0, norm
+
+    def _iter_get_norm(self):
+        norm = super(SolverHistoryMixin, self)._iter_get_norm()
+
+        # The norm is also computed in _iter_initialize, with an iteration count of 0.
+        if self._iter_count > 0:
+            self.residual_history[-1].append(norm)
+        return norm
+
+    def get_iteration_counts(self):
+        """
+        Return the number of iterations taken in each solve.
+
+        Returns
+        -------
+        list of int
+            The iteration counts, in the order of the solves.
+        """
+        # The first norm of each solve is the initial residual.
+        return [len(history) - 1 for history in self.residual_history]
+
+
+class PredictorMixin(object):
+    """
+    Call a predictor, which sets the initial guess of the outputs, before each nonlinear solve.
+    """
+
+    def __init__(self, predictor=None, **kwargs):
+        super(PredictorMixin, self).__init__(**kwargs)
+
+        self.predictor = predictor
+
+    def _iter_initialize(self):
+        if self.predictor is not None:
+            self.predictor()
+
+        return super(PredictorMixin, self)._iter_initialize()
+
+
+class NonlinearBlockGSHistory(SolverHistoryMixin, NonlinearBlockGS):
+    pass
+
+
+class NewtonSolverHistory(PredictorMixin, SolverHistoryMixin, NewtonSolver):
+    pass
+
+
+class LinearBlockGSHistory(SolverHistoryMixin, LinearBlockGS):
+    pass
+
+
+class ScipyKrylovHistory(ScipyKrylov):
+
+    def __init__(self, **kwargs):
+        super(ScipyKrylovHistory, self).__init__(**kwargs)
+
+        self.residual_history = []
+
+    def _monitor(self, res):
+        # SciPy calls this with the residual norm of each GMRES iteration; the iteration count
+        # is reset to 0 before each solve.
+        if self._iter_count == 0:
+            self.residual_history.append([])
+        self.residual_history[-1].append(res)
+
+        super(ScipyKrylovHistory, self)._monitor(res)
+
+    def get_iteration_counts(self):
+        # SciPy reports the residual after each iteration, not the initial residual.
+        return [len(history) for history in self.residual_history]
+
+
+class BlockTriangularPrecon(LinearBlockGS):
+    """
+    A single forward (or, in rev mode, backward) block Gauss-Seidel sweep from a zero guess.
+
+    This applies the inverse of the block lower-triangular part of the Jacobian of a group,
+    so it is a fixed linear operator that can be used as a Krylov preconditioner.
+    """
+
+    def __init__(self, **kwargs):
+        super(BlockTriangularPrecon, self).__init__(**kwargs)
+
+        self.options['maxiter'] = 1
+        self.options['atol'] = 0.
+        self.options['rtol'] = 0.
+        self.options['iprint'] = -1
+
+    def solve(self, vec_names, mode, rel_systems=None):
+        # LinearBlockGS starts from the current solution vector in fwd mode.
+        if mode == 'fwd':
+            for vec_name in vec_names:
+                self._system._vectors['output'][vec_name].set_const(0.)
+
+        return super(BlockTriangularPrecon, self).solve(vec_names, mode, rel_systems)
+
+
+class SharedFactorization(object):
+    """
+    LU factorization of an assembled Jacobian shared between SimplifiedNewtonSolvers.
+
+    Groups with the same structure, such as the step groups of time-marching, can share one
+    factorization, so a step starts from the factorization left by the previous step. The
+    factorization is owned here, independently of that of the linear solver of the groups,
+    which is only used for the derivatives. Sparse Jacobians, such as the block-diagonal
+    Jacobians of ensembles, are factorized with a sparse LU.
+
+    Attributes
+    ----------
+    lup : tuple, SuperLU, or None
+        The factorization, as returned by scipy.linalg.lu_factor for a dense Jacobian or by
+        scipy.sparse.linalg.splu for a sparse Jacobian.
+    stale : bool
+        True if the factorization should be recomputed at the next Newton iteration.
+    num_factorizations : int
+        The number of times the Jacobian has been linearized and factorized.
+    """
+
+    def __init__(self):
+        self.lup = None
+        self.stale = True
+        self.num_factorizations = 0
+
+    def factorize(self, matrix):
+        """
+        Factorize a Jacobian.
+
+        Parameters
+        ----------
+        matrix : ndarray or csc_matrix
+            The dense or sparse Jacobian of the residuals with respect to the outputs.
+        """
+        if scipy.sparse.issparse(matrix):
+            self.lup = scipy.sparse.linalg.splu(matrix)
+        else:
+            self.lup = scipy.linalg.lu_factor(matrix)
+        self.stale = False
+        self.num_factorizations += 1
+
+    def solve(self, rhs):
+        """
+        Solve with the factorized Jacobian.
+
+        Parameters
+        ----------
+        rhs : ndarray
+            The right-hand side.
+
+        Returns
+        -------
+        ndarray
+            The solution.
+        """
+        if isinstance(self.lup, tuple):
+            return scipy.linalg.lu_solve(self.lup, rhs)
+        return self.lup.solve(rhs)
+
+
+class SimplifiedNewtonSolver(NewtonSolverHistory):
+    """
+    Newton solver that keeps the factorization of the Jacobian across iterations and solves.
+
+    The Jacobian is only relinearized and refactorized when the factorization is stale:
+    initially, and after an iteration that reduces the residual norm by less than a factor of
+    max_convergence_rate. The group must have a dense or csc assembled Jacobian, which is
+    factorized by the SharedFactorization; the linear solver is only used for the derivatives.
+    """
+
+    def __init__(self, factorization=None, **kwargs):
+        super(SimplifiedNewtonSolver, self).__init__(**kwargs)
+
+        if factorization is None:
+            factorization = SharedFactorization()
+
+        self.factorization = factorization
+        self._last_norm = None
+
+    def _declare_options(self):
+        super(SimplifiedNewtonSolver, self)._declare_options()
+
+        self.options.declare('max_convergence_rate', default=0.5, types=float,
+            desc='Ratio of successive residual norms above which the Jacobian is refactorized')
+
+    def _iter_get_norm(self):
+        norm = super(SimplifiedNewtonSolver, self)._iter_get_norm()
+
+        # The norm is also computed before the first iteration, with an iteration count of 0.
+        if self._iter_count > 0 and norm > self.options['atol'] \
+                and norm > self.options['max_convergence_rate'] * self._last_norm:
+            self.factorization.stale = True
+
+        self._last_norm = norm
+        return norm
+
+    def _iter_execute(self):
+        system = self._system
+        factorization = self.factorization
+
+        with subsolver_printing(self):
+            if factorization.stale or factorization.lup is None:
+                factorization.factorize(get_assembled_matrix(self))
+
+            outputs = system._outputs
+            outputs.set_data(
+                outputs.get_data() - factorization.solve(system._residuals.get_data()))
+
+
+class NewtonKrylovFDSolver(NewtonSolverHistory):
+    """
+    Jacobian-free Newton-Krylov solver using finite differences of the residuals.
+
+    Each Newton direction is computed with GMRES, whose products with the Jacobian are
+    (R(u + eps v) - R(u)) / eps, so the partials are not evaluated during the solve. Since
+    the products are only accurate to about sqrt(eps), GMRES stops at the relative tolerance
+    linear_rtol (inexact Newton). The restart, iteration limit, and preconditioner are taken
+    from the linear solver, which must be a ScipyKrylov instance and is otherwise only used for
+    the derivatives.
+    """
+
+    def __init__(self, **kwargs):
+        super(NewtonKrylovFDSolver, self).__init__(**kwargs)
+
+        self.linear_iteration_counts = []
+
+    def _declare_options(self):
+        super(NewtonKrylovFDSolver, self)._declare_options()
+
+        self.options.declare('fd_step', default=1e-7, types=float,
+            desc='Relative step of the finite-difference Jacobian-vector products')
+        self.options.declare('linear_rtol', default=1e-6, types=float,
+            desc='Relative tolerance of GMRES for each Newton direction')
+
+    def _iter_execute(self):
+        system = self._system
+        linear_solver = self.linear_solver
+        fd_step = self.options['fd_step']
+
+        outputs = system._outputs
+        residuals = system._residuals
+        u0 = outputs.get_data()
+        r0 = residuals.get_data()
+        size = len(u0)
+        norm_u = np.linalg.norm(u0)
+
+        def matvec(v):
+            norm_v = np.linalg.norm(v)
+            if norm_v == 0.:
+                return np.zeros(size)
+
+            eps = fd_step * (1. + norm_u) / norm_v
+            outputs.set_data(u0 + eps * v)
+            system._apply_nonlinear()
+            jac_v = (residuals.get_data() - r0) / eps
+            outputs.set_data(u0)
+            return jac_v
+
+        if linear_solver.precon is not None:
+            precon = linear_solver.precon
+            d_inputs = system._vectors['input']['linear']
+            d_outputs = system._vectors['output']['linear']
+            d_residuals = system._vectors['residual']['linear']
+
+            def precon_matvec(b):
+                d_inputs.set_const(0.)
+                d_residuals.set_data(b)
+                precon.solve(['linear'], 'fwd')
+                return d_outputs.get_data()
+
+            M = LinearOperator((size, size), matvec=precon_matvec, dtype=float)
+        else:
+            M = None
+
+        counter = [0]
+
+        def callback(res):
+            counter[0] += 1
+
+        # The residuals and the preconditioner are evaluated during the iterations.
+        with subsolver_printing(self):
+            du, info = gmres(LinearOperator((size, size), matvec=matvec, dtype=float), -r0,
+                rtol=self.options['linear_rtol'], atol=0., M=M,
+                restart=linear_solver.options['restart'],
+                maxiter=linear_solver.options['maxiter'], callback=callback)
+        self.linear_iteration_counts.append(counter[0])
+
+        outputs.set_data(u0 + du)
+
+
+class StagePrecon(LinearSolver):
+    """
+    Preconditioner for the step groups of implicit time-marching.
+
+    The stage equations (I - h (A x J)) dY = rhs are approximated stage by stage with
+    (I - h A[k, k] J) dY_k = rhs_k, which are solved with the preconditioning function of the
+    ODEFunction. The stage derivatives and the new step vector are then updated consistently,
+    with J dY_k = (dY_k - rhs_k) / (h A[k, k]). The coupling between stages is left to the
+    Krylov iterations. In rev mode, the transpose of this operator is applied, which solves
+    (I - h A[k, k] J^T) with transpose_preconditioner, or with preconditioner if it is None, as
+    for a symmetric J.
+    """
+
+    def _declare_options(self):
+        super(StagePrecon, self)._declare_options()
+
+        self.options.declare('preconditioner')
+        self.options.declare('transpose_preconditioner', default=None, allow_none=True)
+        self.options.declare('states', types=dict)
+        self.options.declare('glm_A', types=np.ndarray)
+        self.options.declare('glm_B', types=np.ndarray)
+        self.options.declare('i_step', types=int)
+
+        self.options['maxiter'] = 1
+        self.options['iprint'] = -1
+
+    def solve(self, vec_names, mode, rel_systems=None):
+        system = self._system
+        states = self.options['states']
+        i_step = self.options['i_step']
+
+        h = system._inputs['stage_comp.h'][0]
+
+        Y_names = {}
+        F_names = {}
+        y_new_names = {}
+        stage_y = {}
+        for state_name, state in iteritems(states):
+            Y_names[state_name] = 'stage_comp.%s' % get_name('Y', state_name, i_step=i_step)
+            F_names[state_name] = 'ode_comp.%s' % state['rate_source']
+            y_new_names[state_name] = 'step_comp.%s' % get_name(
+                'y_new', state_name, i_step=i_step)
+            stage_y[state_name] = system._outputs[Y_names[state_name]]
+
+        for vec_name in vec_names:
+            d_outputs = system._vectors['output'][vec_name]
+            d_residuals = system._vectors['residual'][vec_name]
+
+            # Outputs that are not stage variables, e.g., other ODE outputs, are left as is.
+            if mode == 'fwd':
+                d_outputs.set_vec(d_residuals)
+                self._solve_fwd(d_outputs, d_residuals, h, Y_names, F_names, y_new_names,
+                    stage_y)
+            else:
+                d_residuals.set_vec(d_outputs)
+                self._solve_rev(d_outputs, d_residuals, h, Y_names, F_names, y_new_names,
+                    stage_y)
+
+        return False, 0., 0.
+
+    def _solve_fwd(self, d_outputs, d_residuals, h, Y_names, F_names, y_new_names, stage_y):
+        preconditioner = self.options['preconditioner']
+        states = self.options['states']
+        glm_A = self.options['glm_A']
+        glm_B = self.options['glm_B']
+
+        rhs = {}
+        for state_name in states:
+            rhs[state_name] = d_residuals[Y_names[state_name]] + h * np.einsum(
+                'ij,j...->i...', glm_A, d_residuals[F_names[state_name]])
+
+        for i_stage in range(glm_A.shape[0]):
+            gamma = h * glm_A[i_stage, i_stage]
+
+            stage_rhs = {state_name: rhs[state_name][i_stage] for state_name in states}
+
+            if gamma == 0.:
+                stage_dY = stage_rhs
+            else:
+                stage_dY = preconditioner(
+                    {state_name: stage_y[state_name][i_stage] for state_name in states},
+                    gamma, stage_rhs)
+
+            for state_name in states:
+                dY = d_outputs[Y_names[state_name]]
+                dF = d_outputs[F_names[state_name]]
+
+                dY[i_stage] = stage_dY[state_name]
+                if gamma != 0.:
+                    dF[i_stage] += (dY[i_stage] - stage_rhs[state_name]) / gamma
+
+                d_outputs[Y_names[state_name]] = dY
+                d_outputs[F_names[state_name]] = dF
+
+        for state_name in states:
+            d_outputs[y_new_names[state_name]] = d_residuals[y_new_names[state_name]] \
+                + h * np.einsum('ij,j...->i...', glm_B, d_outputs[F_names[state_name]])
+
+    def _solve_rev(self, d_outputs, d_residuals, h, Y_names, F_names, y_new_names, stage_y):
+        # The transpose of _solve_fwd, from the new step vector back to the right-hand sides.
+        preconditioner = self.options['transpose_preconditioner']
+        if preconditioner is None:
+            preconditioner = self.options['preconditioner']
+        states = self.options['states']
+        glm_A = self.options['glm_A']
+        glm_B = self.options['glm_B']
+
+        # b_ denotes the adjoint (reverse-mode seed) of a variable.
+        b_F = {}
+        b_rhs = {}
+        for state_name in states:
+            b_F[state_name] = d_outputs[F_names[state_name]] + h * np.einsum(
+                'ij,i...->j...', glm_B, d_outputs[y_new_names[state_name]])
+            b_rhs[state_name] = np.array(d_outputs[Y_names[state_name]])
+
+        for i_stage in range(glm_A.shape[0]):
+            gamma = h * glm_A[i_stage, i_stage]
+
+            if gamma == 0.:
+                continue
+
+            stage_b_dY = {
+                state_name: b_rhs[state_name][i_stage] + b_F[state_name][i_stage] / gamma
+                for state_name in states}
+            stage_b_rhs = preconditioner(
+                {state_name: stage_y[state_name][i_stage] for state_name in states},
+                gamma, stage_b_dY)
+
+            for state_name in states:
+                b_rhs[state_name][i_stage] = stage_b_rhs[state_name] \
+                    - b_F[state_name][i_stage] / gamma
+
+        for state_name in states:
+            d_residuals[Y_names[state_name]] = b_rhs[state_name]
+            d_residuals[F_names[state_name]] = b_F[state_name] + h * np.einsum(
+                'ij,i...->j...', glm_A, b_rhs[state_name])
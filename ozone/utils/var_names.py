@@ -2,7 +2,7 @@
 # initial_conditions ode_inputs ode_states ode_outputs
 # ode_initial_conditions params states outputs
 
-def get_name(var_type, state_name, i_step=None, i_stage=None, j_stage=None):
+def get_name(var_type, state_name, i_step=None, i_stage=None, j_stage=None, i_segment=None):
     name = '{}:{}'.format(var_type, state_name)
 
     if j_stage is not None:
@@ -14,4 +14,7 @@ def get_name(var_type, state_name, i_step=None, i_stage=None, j_stage=None):
     if i_step is not None:
         name = 'step{}_{}'.format(i_step, name)
 
+    if i_segment is not None:
+        name = 'segment{}_{}'.format(i_segment, name)
+
     return name
@@ -12,7 +12,16 @@ setup(name='ozone',
         'ozone/components',
         'ozone/integrators',
         'ozone/methods',
+        'ozone/methods/runge_kutta',
+        'ozone/methods/linear_multistep',
+        'ozone/methods/rosenbrock',
+        'ozone/methods/imex',
+        'ozone/methods/exponential',
+        'ozone/methods/partitioned',
         'ozone/utils',
+        'ozone/benchmarks',
+        'ozone/tests',
+        'ozone/tests/ode_function_library',
     ],
     install_requires=[
     ],